@@ -6,14 +6,26 @@ Signal flow: Scraper -> scraper_signal (Supabase) -> Alarm Engine -> alarm table
 
 Uses: scraper_standalone/alarm_calculator.py (AlarmCalculator class)
 This is the SAME alarm calculator used by the Admin Panel (PC-based).
+
+Shard modu (ALARM_ENGINE_SHARDS > 1): aktif maçlar match_id_hash aralığına göre
+N shard'a bölünür, her shard ayrı bir process'te hesaplanır (process cycle sonunda
+kapanır, bellek geri verilir). Shard'lar hiçbir şey yazmaz; supervisor alarmları
+birleştirip tek yazma fazında upsert eder. Shard süreleri / RSS heartbeat'e yazılır.
 """
 
 import os
 import sys
 import time
+import multiprocessing
 import requests
+from concurrent.futures import ProcessPoolExecutor, as_completed
 from datetime import datetime, timezone
 
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
 sys.path.insert(0, os.path.dirname(__file__))
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), 'scraper_standalone'))
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), 'desktop', 'scraper_standalone'))
@@ -27,6 +39,9 @@ POLL_INTERVAL = 30
 IDLE_LOG_INTERVAL = 300
 ERROR_WAIT = 60
 
+ALARM_SHARDS = max(1, int(os.environ.get('ALARM_ENGINE_SHARDS', '1') or 1))
+SHARD_MEMORY_MB = int(os.environ.get('ALARM_SHARD_MEMORY_MB', '0') or 0)  # 0 = limitsiz
+
 HEADERS_READ = {
     'apikey': SUPABASE_ANON_KEY,
     'Authorization': f'Bearer {SUPABASE_ANON_KEY}',
@@ -55,6 +70,83 @@ def get_calculator():
     return _calculator
 
 
+def _peak_rss_mb():
+    """Bu process'in tepe RSS'i (MB). Linux'ta ru_maxrss KB cinsindendir."""
+    if resource is None:
+        return None
+    return round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1)
+
+
+def _run_shard(index, count):
+    """Shard worker process: sadece kendi hash aralığını hesaplar, yazmaları döndürür."""
+    started = time.time()
+    if SHARD_MEMORY_MB and resource is not None:
+        limit = SHARD_MEMORY_MB * 1024 * 1024
+        resource.setrlimit(resource.RLIMIT_AS, (limit, limit))
+    calc = AlarmCalculator(
+        supabase_url=SUPABASE_URL,
+        supabase_key=SUPABASE_SERVICE_KEY or SUPABASE_ANON_KEY,
+        logger_callback=lambda msg: print(f"[Shard {index + 1}/{count}] {msg}")
+    )
+    result = calc.run_shard_calculations(index, count)
+    result['shard'] = index
+    result['seconds'] = round(time.time() - started, 1)
+    result['rss_mb'] = _peak_rss_mb()
+    return result
+
+
+def run_sharded_calculations(count):
+    """Supervisor: count shard'ı paralel hesapla, alarmları birleştirip tek fazda yaz.
+    Returns: (total_alarms, shard_stats)"""
+    started = time.time()
+    results = []
+    errors = []
+    ctx = multiprocessing.get_context('spawn')
+    with ProcessPoolExecutor(max_workers=count, mp_context=ctx) as pool:
+        futures = {pool.submit(_run_shard, i, count): i for i in range(count)}
+        for fut in as_completed(futures):
+            index = futures[fut]
+            try:
+                results.append(fut.result())
+            except Exception as e:
+                errors.append(f"shard {index + 1}: {str(e)[:100]}")
+                print(f"[Engine] Shard {index + 1}/{count} hatasi: {e}")
+    if not results:
+        raise RuntimeError("Tum shard'lar basarisiz: " + "; ".join(errors))
+    results.sort(key=lambda r: r['shard'])
+    compute_seconds = time.time() - started
+
+    calc = get_calculator()
+    write_started = time.time()
+    written = calc.apply_captured_writes([r['writes'] for r in results])
+    calc._cleanup_expired_match_alarms()
+    write_seconds = time.time() - write_started
+
+    total_alarms = sum(r['total'] for r in results)
+    shard_stats = {
+        'shards': count,
+        'compute_seconds': round(compute_seconds, 1),
+        'write_seconds': round(write_seconds, 1),
+        'written': written,
+        'supervisor_rss_mb': _peak_rss_mb(),
+        'per_shard': [
+            {
+                'shard': r['shard'] + 1,
+                'seconds': r['seconds'],
+                'rss_mb': r['rss_mb'],
+                'alarms': r['total'],
+                'writes': len(r['writes']),
+            }
+            for r in results
+        ],
+        'errors': errors,
+    }
+    for s in shard_stats['per_shard']:
+        print(f"[Engine] Shard {s['shard']}/{count}: {s['seconds']}s, RSS {s['rss_mb']}MB, {s['alarms']} alarm")
+    print(f"[Engine] Shard hesaplama {compute_seconds:.1f}s + yazma {write_seconds:.1f}s ({written} kayit)")
+    return total_alarms, shard_stats
+
+
 def check_unprocessed_signals():
     try:
         url = f"{SUPABASE_URL}/rest/v1/scraper_signal?processed=eq.false&order=created_at.asc&limit=1"
@@ -89,7 +181,11 @@ def mark_signal_processed(signal_id):
         return False
 
 
-def update_engine_heartbeat(status, alarm_count=0, error_msg=None):
+_heartbeat_has_shard_stats = True  # migrations/2026_10_18_alarm_engine_shards.sql
+
+
+def update_engine_heartbeat(status, alarm_count=0, error_msg=None, shard_stats=None):
+    global _heartbeat_has_shard_stats
     try:
         now = datetime.now(timezone.utc).isoformat()
         data = {
@@ -100,12 +196,19 @@ def update_engine_heartbeat(status, alarm_count=0, error_msg=None):
             "error_message": error_msg,
             "updated_at": now
         }
+        if shard_stats is not None and _heartbeat_has_shard_stats:
+            data["shard_stats"] = shard_stats
         url = f"{SUPABASE_URL}/rest/v1/scraper_heartbeat?on_conflict=source"
         headers = {
             **HEADERS_WRITE,
             'Prefer': 'return=representation,resolution=merge-duplicates'
         }
         r = requests.post(url, json=data, headers=headers, timeout=10)
+        if r.status_code == 400 and "shard_stats" in data and "shard_stats" in r.text:
+            # Kolon henüz yok — migration çalıştırılana kadar shard_stats'sız yaz
+            _heartbeat_has_shard_stats = False
+            data.pop("shard_stats")
+            r = requests.post(url, json=data, headers=headers, timeout=10)
         return r.status_code in [200, 201]
     except Exception:
         return False
@@ -125,13 +228,18 @@ def process_signal(signal):
     update_engine_heartbeat("calculating")
 
     try:
-        calc = get_calculator()
-        total_alarms = calc.run_all_calculations()
+        shard_stats = None
+        if ALARM_SHARDS > 1:
+            total_alarms, shard_stats = run_sharded_calculations(ALARM_SHARDS)
+        else:
+            calc = get_calculator()
+            total_alarms = calc.run_all_calculations()
 
         mark_signal_processed(signal_id)
 
         print(f"\n[Engine] Hesaplama tamamlandi - {total_alarms} alarm uretildi")
-        update_engine_heartbeat("idle", alarm_count=total_alarms)
+        shard_errors = "; ".join(shard_stats['errors'])[:200] if shard_stats and shard_stats['errors'] else None
+        update_engine_heartbeat("idle", alarm_count=total_alarms, error_msg=shard_errors, shard_stats=shard_stats)
         return True
 
     except Exception as e:
@@ -147,6 +255,7 @@ def run_engine():
     print("SMARTXFLOW ALARM ENGINE v2.0")
     print("Using: scraper_standalone/alarm_calculator.py (AlarmCalculator)")
     print(f"Poll interval: {POLL_INTERVAL}s")
+    print(f"Shards: {ALARM_SHARDS}" + (f" (shard bellek limiti: {SHARD_MEMORY_MB}MB)" if SHARD_MEMORY_MB else ""))
     print(f"Supabase URL: {SUPABASE_URL[:30]}..." if SUPABASE_URL else "Supabase URL: NOT SET")
     print("=" * 60)
 
@@ -15,10 +15,12 @@ import threading
 import time
 import queue
 import mimetypes
+import hmac
+import base64
 mimetypes.init()
 from functools import wraps
 from datetime import datetime, timedelta, timezone
-from flask import Flask, render_template, jsonify, request, Response, send_from_directory, session, redirect, make_response
+from flask import Flask, render_template, jsonify, request, Response, send_from_directory, session, redirect, make_response, g
 
 # Conditional import for compression (not needed in desktop mode)
 if os.environ.get('SMARTX_DESKTOP') != '1':
@@ -44,6 +46,32 @@ _admin_warmup_lock = threading.Lock()
 # ============================================
 _cache_lock = threading.Lock()
 
+# ============================================
+# UPDATE BROKER (SSE /api/updates/stream)
+# Cache her yenilendiğinde eklenen/değişen/silinen kayıtlar sürümlü diff olarak yayınlanır
+# ============================================
+from services.update_broker import UpdateBroker
+from services import wire_format
+update_broker = UpdateBroker()
+
+def _publish_update(channel, items, key_fn):
+    try:
+        event = update_broker.publish(channel, items, key_fn)
+        if event:
+            print(f"[Updates] v{event['v']} {channel}: +{len(event['added'])} ~{len(event['changed'])} -{len(event['removed'])}")
+    except Exception as e:
+        print(f"[Updates] Publish error ({channel}): {e}")
+
+def _alarm_update_key(alarm):
+    return alarm.get('id') or f"{alarm.get('match_id_hash', '')}|{alarm.get('selection', '')}|{alarm.get('trigger_at') or alarm.get('created_at', '')}"
+
+def _publish_alarm_updates(data):
+    if not isinstance(data, dict):
+        return
+    for alarm_type, alarms in data.items():
+        if isinstance(alarms, list):
+            _publish_update(f'alarms:{alarm_type}', alarms, _alarm_update_key)
+
 # ============================================
 # SERVER-SIDE ALARM CACHE
 # Reduces Supabase calls from ~2s to <50ms
@@ -114,6 +142,7 @@ def set_alarm_cache(data):
     with _cache_lock:
         _server_alarm_cache = data
         _server_alarm_cache_time = time.time()
+    _publish_alarm_updates(data)
 # ============================================
 
 # ============================================
@@ -148,6 +177,7 @@ def set_matches_cache(market, data):
             _server_matches_cache_time.pop(oldest_key, None)
         _server_matches_cache[market] = data
         _server_matches_cache_time[market] = time.time()
+    _publish_update(f'matches:{market}', data, lambda m: m.get('match_id'))
 # ============================================
 
 # ============================================
@@ -215,6 +245,8 @@ static_dir = resource_path("static")
 
 from core.settings import init_mode, is_server_mode, is_client_mode
 from core.timezone import now_turkey, now_turkey_iso, now_turkey_formatted, format_turkey_time, format_time_only, TURKEY_TZ
+from core.timezone import kickoff_epoch, snapshot_epoch
+from core.telegram_governor import get_governor as get_telegram_governor
 from services.supabase_client import (
     get_database, get_supabase_client,
     get_sharp_alarms_from_supabase,
@@ -344,7 +376,8 @@ def inject_asset_version():
 
 # Gzip/Brotli compression - only for web mode (not desktop)
 if Compress is not None:
-    app.config['COMPRESS_MIMETYPES'] = ['text/html', 'text/css', 'text/javascript', 'application/json', 'application/javascript']
+    app.config['COMPRESS_MIMETYPES'] = ['text/html', 'text/css', 'text/javascript', 'application/json', 'application/javascript',
+                                        wire_format.COLUMNAR_JSON_MIME, wire_format.MSGPACK_MIME]
     app.config['COMPRESS_LEVEL'] = 6  # Compression level (1-9, 6 is balanced)
     app.config['COMPRESS_MIN_SIZE'] = 500  # Only compress responses > 500 bytes
     Compress(app)
@@ -466,12 +499,112 @@ def _license_block(error, message, status=403):
         return redirect(f'/app?next={request.path}')
     return jsonify({'error': error, 'message': message}), status
 
+# ============================================
+# SIGNED LICENSE TOKENS
+# /api/licenses/validate ve /api/license/status kısa ömürlü HMAC token döner:
+#   v1.<b64(payload)>.<b64(hmac_sha256)>  payload = {k, p, e, d, x}
+# license_required X-License-Token'ı disk / ağ I/O olmadan doğrular;
+# iptal edilen lisanslar arka planda senkronlanan revocation set'inden düşer.
+# Secret sadece LICENSE_TOKEN_SECRET env'inden gelir (session secret'ına veya
+# kaynaktaki bir varsayılana düşülmez); yoksa token üretilmez / kabul edilmez,
+# client'lar X-License-Key yoluna devam eder.
+# ============================================
+_LICENSE_TOKEN_SECRET = os.environ.get('LICENSE_TOKEN_SECRET', '').strip().encode('utf-8')
+if not _LICENSE_TOKEN_SECRET:
+    print("[LicenseToken] LICENSE_TOKEN_SECRET tanımlı değil - imzalı lisans token'ları devre dışı")
+LICENSE_TOKEN_TTL = 300
+LICENSE_REVOCATION_SYNC_INTERVAL = 60
+_revoked_license_keys = set()
+_revocation_sync_started = False
+_revocation_sync_lock = threading.Lock()
+
+def _b64e(raw):
+    return base64.urlsafe_b64encode(raw).rstrip(b'=').decode('ascii')
+
+def _b64d(text):
+    return base64.urlsafe_b64decode(text + '=' * (-len(text) % 4))
+
+def issue_license_token(key, plan, expires_dt=None, device_id=''):
+    """Lisans için imzalı token üret (ömür: LICENSE_TOKEN_TTL, lisans bitişini geçmez).
+    LICENSE_TOKEN_SECRET yoksa (None, 0) döner."""
+    if not _LICENSE_TOKEN_SECRET:
+        return None, 0
+    now = int(time.time())
+    lic_exp = 0
+    token_exp = now + LICENSE_TOKEN_TTL
+    if expires_dt:
+        lic_exp = int(expires_dt.replace(tzinfo=timezone.utc).timestamp())
+        token_exp = min(token_exp, lic_exp)
+    payload = {'k': key, 'p': plan or 'core', 'e': lic_exp, 'd': device_id or '', 'x': token_exp}
+    body = _b64e(json.dumps(payload, separators=(',', ':')).encode('utf-8'))
+    sig = _b64e(hmac.new(_LICENSE_TOKEN_SECRET, f"v1.{body}".encode('ascii'), 'sha256').digest())
+    return f"v1.{body}.{sig}", token_exp - now
+
+def verify_license_token(token):
+    """Token geçerliyse payload dict, değilse None. Sadece CPU — I/O yok."""
+    if not _LICENSE_TOKEN_SECRET:
+        return None
+    try:
+        version, body, sig = token.split('.')
+        if version != 'v1':
+            return None
+        expected = hmac.new(_LICENSE_TOKEN_SECRET, f"v1.{body}".encode('ascii'), 'sha256').digest()
+        if not hmac.compare_digest(expected, _b64d(sig)):
+            return None
+        claims = json.loads(_b64d(body))
+    except Exception:
+        return None
+    if claims.get('x', 0) < time.time():
+        return None
+    if claims.get('k') in _revoked_license_keys:
+        return None
+    return claims
+
+def _sync_revoked_licenses():
+    """İptal edilmiş lisans anahtarlarını periyodik olarak çek (worker başına 1 thread)."""
+    global _revoked_license_keys
+    while True:
+        try:
+            rows = license_select('licenses', 'key', {'status': 'revoked'})
+            if rows is not None:
+                revoked = {r.get('key') for r in rows if r.get('key')}
+                if revoked != _revoked_license_keys:
+                    _revoked_license_keys = revoked
+                    for k in revoked:
+                        _validated_licenses.pop(k, None)
+                    print(f"[LicenseToken] Revocation list synced: {len(revoked)} revoked")
+        except Exception as e:
+            print(f"[LicenseToken] Revocation sync error: {e}")
+        time.sleep(LICENSE_REVOCATION_SYNC_INTERVAL)
+
+def _ensure_revocation_sync():
+    global _revocation_sync_started
+    if _revocation_sync_started:
+        return
+    with _revocation_sync_lock:
+        if _revocation_sync_started:
+            return
+        _revocation_sync_started = True
+    threading.Thread(target=_sync_revoked_licenses, daemon=True).start()
+
 def license_required(f):
     @wraps(f)
     def decorated(*args, **kwargs):
         if os.environ.get('SMARTX_DESKTOP') == '1':
             return f(*args, **kwargs)
         
+        # İmzalı token DB'ye sorulmadan kabul edilir. İptal edilen lisans bu worker'ın
+        # revocation sync'i (LICENSE_REVOCATION_SYNC_INTERVAL) gelene kadar, cihazı
+        # kaldırılan / sıfırlanan lisans ise token bitene kadar (LICENSE_TOKEN_TTL, 5 dk)
+        # erişmeye devam edebilir; token'ı dolan client X-License-Key (DB kontrollü) yoluna düşer.
+        token = request.headers.get('X-License-Token', '').strip()
+        if token:
+            _ensure_revocation_sync()
+            claims = verify_license_token(token)
+            if claims:
+                g.license_claims = claims
+                return f(*args, **kwargs)
+        
         header_key = request.headers.get('X-License-Key', '').strip()
         
         if session.get('license_plan') == 'test':
@@ -480,7 +613,6 @@ def license_required(f):
         lic_valid = session.get('license_valid')
         if lic_valid:
             session_key = session.get('license_key', '') or header_key
-            print(f"[LicenseCheck] SESSION path: key={session_key[:8] if session_key else 'NONE'}... last_check={session.get('license_last_check', 0)}")
             if not session_key:
                 print(f"[LicenseCheck] SESSION: no key found, clearing session")
                 session.pop('license_valid', None)
@@ -526,7 +658,6 @@ def license_required(f):
         
         if header_key:
             cached = _validated_licenses.get(header_key)
-            print(f"[LicenseCheck] HEADER path: key={header_key[:8]}... cached={'YES' if cached else 'NO'}")
             if not cached:
                 # Try disk cache first (populated by another worker or previous run)
                 _load_license_cache()
@@ -570,7 +701,8 @@ def add_header(response):
         response.headers['Pragma'] = 'no-cache'
         response.headers['Expires'] = '0'
         response.headers['Surrogate-Control'] = 'no-store'
-    response.headers['Vary'] = 'Accept-Encoding'
+    # Ekle, ezme: _wire_response Vary: Accept koyar (cache'ler JSON / msgpack'i karıştırmasın)
+    response.vary.add('Accept-Encoding')
     return response
 
 cleanup_thread = None
@@ -606,6 +738,13 @@ def cleanup_old_matches():
                 print(f"[Cleanup] Deleted {total} old records from {len(deleted)} tables")
             else:
                 print(f"[Cleanup] No old records to delete")
+            # Chunk'li silmenin sure butcesi dolduysa kalan tablolar bir sonraki
+            # cache purge turunda (5 dk) kaldigi yerden devam eder
+            pending = [t for t, st in supabase.last_retention_report.items()
+                       if st.get('status') in ('partial', 'pending')]
+            if pending:
+                last_cleanup_date = None
+                print(f"[Cleanup] {len(pending)} tables pending, resuming in next cycle")
         else:
             print(f"[Cleanup] Supabase not available, skipping cleanup")
     except Exception as e:
@@ -646,6 +785,8 @@ def start_cleanup_scheduler():
                         _purge_expired_caches()
                     except Exception as e:
                         print(f"[Cache] Purge error: {e}")
+                    if last_cleanup_date is None:
+                        cleanup_old_matches()
                 
                 cleanup_old_matches()
             except Exception as e:
@@ -668,9 +809,12 @@ def run_alarm_calculations():
         # LIVE RELOAD: Refresh configs from Supabase before calculations
         refresh_configs_from_supabase()
         
+        # Tüm hesaplayıcılar aynı history'yi paylaşır (market başına tek batch fetch)
+        loader = _new_history_loader(None)
+        
         # Sharp alarms
         try:
-            new_sharp = calculate_sharp_scores(sharp_config)
+            new_sharp = calculate_sharp_scores(sharp_config, loader)
             if new_sharp:
                 sharp_alarms = new_sharp
                 save_sharp_alarms_to_file(sharp_alarms)
@@ -680,7 +824,7 @@ def run_alarm_calculations():
         
         # Big Money alarms
         try:
-            new_bigmoney = calculate_big_money_scores(big_money_config)
+            new_bigmoney = calculate_big_money_scores(big_money_config, loader)
             if new_bigmoney:
                 big_money_alarms = new_bigmoney
                 save_big_money_alarms_to_file(big_money_alarms)
@@ -690,7 +834,7 @@ def run_alarm_calculations():
         
         # Volume Shock alarms
         try:
-            new_volumeshock = calculate_volume_shock_scores(volume_shock_config)
+            new_volumeshock = calculate_volume_shock_scores(volume_shock_config, loader)
             if new_volumeshock:
                 volume_shock_alarms = new_volumeshock
                 save_volume_shock_alarms_to_file(volume_shock_alarms)
@@ -701,7 +845,7 @@ def run_alarm_calculations():
         # PublicMove (Public Move) alarms
         try:
             global publicmove_alarms
-            new_publicmove = calculate_publicmove_scores(publicmove_config)
+            new_publicmove = calculate_publicmove_scores(publicmove_config, loader)
             if new_publicmove:
                 publicmove_alarms = new_publicmove
                 save_publicmove_alarms_to_file(publicmove_alarms)
@@ -712,7 +856,7 @@ def run_alarm_calculations():
         # VolumeLeader alarms
         try:
             global volume_leader_alarms
-            new_volumeleader = calculate_volume_leader_scores(volume_leader_config)
+            new_volumeleader = calculate_volume_leader_scores(volume_leader_config, loader)
             if new_volumeleader:
                 # Merge with existing alarms
                 existing_keys = set()
@@ -1262,6 +1406,23 @@ def _build_enriched_matches(matches_data):
         })
     return enriched
 
+def _iter_paginated_matches(market, today_only=False, page_limit=200, max_pages=50):
+    """db.get_matches_paginated sayfalarını keyset cursor ile sırayla üret.
+    Çağıran aradığını bulunca break edebilir; kalan sayfalar hiç çekilmez."""
+    cursor = None
+    offset = 0
+    for _ in range(max_pages):
+        result = db.get_matches_paginated(market, limit=page_limit, offset=offset, today_only=today_only, cursor=cursor)
+        page_matches = result.get('matches', [])
+        if not page_matches:
+            return
+        yield page_matches
+        if not result.get('has_more', False):
+            return
+        cursor = result.get('next_cursor')
+        if not cursor:
+            offset += len(page_matches)
+
 def _warmup_matches():
     """Fill matches cache for both all and today_future keys"""
     from concurrent.futures import ThreadPoolExecutor, as_completed
@@ -1271,8 +1432,10 @@ def _warmup_matches():
         return 'moneyway_1x2_all', data
 
     def fetch_today():
-        result = db.get_matches_paginated('moneyway_1x2', limit=600, offset=0, today_only=True)
-        return 'moneyway_1x2_today_future', result.get('matches', [])
+        matches = []
+        for page_matches in _iter_paginated_matches('moneyway_1x2', today_only=True, page_limit=300):
+            matches.extend(page_matches)
+        return 'moneyway_1x2_today_future', matches
 
     total = 0
     with ThreadPoolExecutor(max_workers=2) as ex:
@@ -1409,6 +1572,17 @@ def trigger_admin_warmup():
         _admin_warmup_started = True
     threading.Thread(target=_lazy_admin_warmup, daemon=True).start()
 
+def _wire_response(payload):
+    """Content negotiation: varsayılan JSON; Accept: application/x-msgpack veya
+    application/vnd.smartxflow.columnar+json (ya da ?format=msgpack|columnar) → sütunsal kodlama"""
+    mime = wire_format.negotiate(request.headers.get('Accept', ''), request.args.get('format'))
+    if mime == wire_format.JSON_MIME:
+        resp = jsonify(payload)
+    else:
+        resp = Response(wire_format.dumps(payload, mime), mimetype=mime)
+    resp.vary.add('Accept')
+    return resp
+
 @app.route('/api/matches')
 @license_required
 def get_matches():
@@ -1418,6 +1592,7 @@ def get_matches():
     
     Params:
     - bulk=1: Returns ALL matches at once (uses server cache, instant on hit)
+    - cursor=<next_cursor>: Keyset page after the previous response (non-bulk)
     - refresh=true: Force cache refresh
     
     Result: Cache hit = 0ms, Cache miss = ~2s (fetches all pages)
@@ -1448,7 +1623,7 @@ def get_matches():
             resp_data = {'matches': cached_data, 'total': len(cached_data), 'has_more': False}
             if ft_scores:
                 resp_data['finished_scores'] = ft_scores
-            return jsonify(resp_data)
+            return _wire_response(resp_data)
         
         # Cache miss - fetch ALL matches in one go
         all_matches = []
@@ -1459,20 +1634,7 @@ def get_matches():
             page_matches_list = [matches_with_latest]
         else:
             # For ALL / today_future mode, paginate through all results
-            page_matches_list = []
-            current_offset = 0
-            page_limit = 100
-            max_pages = 50
-            
-            for page in range(max_pages):
-                result = db.get_matches_paginated(market, limit=page_limit, offset=current_offset, today_only=(date_filter == 'today_future'))
-                page_matches = result.get('matches', [])
-                if not page_matches:
-                    break
-                page_matches_list.append(page_matches)
-                current_offset += len(page_matches)
-                if not result.get('has_more', False):
-                    break
+            page_matches_list = list(_iter_paginated_matches(market, today_only=(date_filter == 'today_future'), page_limit=100))
         
         # Process all pages
         for page_matches in page_matches_list:
@@ -1605,12 +1767,13 @@ def get_matches():
         resp_data = {'matches': all_matches, 'total': len(all_matches), 'has_more': False}
         if ft_scores:
             resp_data['finished_scores'] = ft_scores
-        return jsonify(resp_data)
+        return _wire_response(resp_data)
     
     # PAGINATED MODE (legacy): Use for non-bulk requests
     # Use new paginated function for ALL/no date_filter (most common case)
     if date_filter is None:
-        result = db.get_matches_paginated(market, limit=limit, offset=offset)
+        cursor = request.args.get('cursor') or None
+        result = db.get_matches_paginated(market, limit=limit, offset=offset, cursor=cursor)
         
         # Transform to expected format
         enriched = []
@@ -1697,11 +1860,12 @@ def get_matches():
         resp_data = {
             'matches': enriched,
             'total': result.get('total', len(enriched)),
-            'has_more': result.get('has_more', False)
+            'has_more': result.get('has_more', False),
+            'next_cursor': result.get('next_cursor')
         }
         if ft_scores:
             resp_data['finished_scores'] = ft_scores
-        return jsonify(resp_data)
+        return _wire_response(resp_data)
     
     # Fallback to old method for date_filter (today/yesterday)
     now = time.time()
@@ -1717,7 +1881,7 @@ def get_matches():
             resp_data = {'matches': sliced, 'total': len(cached_data), 'has_more': offset + limit < len(cached_data)}
             if ft_scores:
                 resp_data['finished_scores'] = ft_scores
-            return jsonify(resp_data)
+            return _wire_response(resp_data)
     
     matches_with_latest = db.get_all_matches_with_latest(market, date_filter=date_filter)
     
@@ -1809,7 +1973,145 @@ def get_matches():
     resp_data = {'matches': sliced, 'total': len(enriched), 'has_more': offset + limit < len(enriched)}
     if ft_scores:
         resp_data['finished_scores'] = ft_scores
-    return jsonify(resp_data)
+    return _wire_response(resp_data)
+
+
+def _build_history_chart_data(history, market):
+    """Legacy history satırlarından Chart.js formatında labels/datasets üret."""
+    chart_data = {'labels': [], 'datasets': []}
+    if not history:
+        return chart_data
+    for h in history:
+        timestamp = h.get('ScrapedAt', '')
+        try:
+            dt = datetime.fromisoformat(timestamp)
+            chart_data['labels'].append(dt.strftime('%H:%M'))
+        except:
+            chart_data['labels'].append(timestamp[:16] if timestamp else '')
+    if market in ['moneyway_1x2', 'dropping_1x2']:
+        series = [('Odds1', '1', '#4ade80', '1'), ('OddsX', 'X', '#fbbf24', 'X'), ('Odds2', '2', '#60a5fa', '2')]
+    elif market in ['moneyway_ou25', 'dropping_ou25']:
+        series = [('Under', None, '#60a5fa', 'Under'), ('Over', None, '#4ade80', 'Over')]
+    elif market in ['moneyway_btts', 'dropping_btts']:
+        series = [('Yes', None, '#4ade80', 'Yes'), ('No', None, '#f87171', 'No')]
+    else:
+        series = []
+    for key, alt_key, color, label in series:
+        values = []
+        for h in history:
+            val = h.get(key, h.get(alt_key, '')) if alt_key else h.get(key, '')
+            try:
+                v = float(str(val).split('\n')[0]) if val else None
+                values.append(v)
+            except:
+                values.append(None)
+        chart_data['datasets'].append({
+            'label': label,
+            'data': values,
+            'borderColor': color,
+            'tension': 0.1,
+            'fill': False
+        })
+    return chart_data
+
+
+def _downsample_history(history, target_points):
+    """Geçmişi target_points satıra indir; ilk ve son satır her zaman korunur,
+    aradakiler zaman sırasına göre eşit aralıklarla seçilir."""
+    n = len(history)
+    if not target_points or target_points < 2 or n <= target_points:
+        return history
+    step = (n - 1) / (target_points - 1)
+    return [history[int(round(i * step))] for i in range(target_points)]
+
+
+_HISTORY_ALL_MARKETS = ['moneyway_1x2', 'moneyway_ou25', 'moneyway_btts',
+                        'dropping_1x2', 'dropping_ou25', 'dropping_btts']
+_HISTORY_MULTI_MAX_MATCHES = 50
+_MATCH_HASH_RE = re.compile(r'^[0-9a-f]{8,32}$')
+
+
+@app.route('/api/match/history/multi', methods=['GET', 'POST'])
+@license_required
+def get_match_history_multi():
+    """Birden fazla maçın tüm market geçmişini tek istekte döndür (match_id_hash bazlı).
+
+    Parametreler (query string veya JSON body):
+      hashes:  virgülle ayrılmış match_id_hash listesi (max 50)
+      markets: opsiyonel market listesi (varsayılan: 6 market)
+      cursors: opsiyonel {market: scraped_at} (POST body'de nesne, GET'te JSON string)
+      after:   opsiyonel tek scraped_at cursor'u (cursors yoksa tüm marketlere uygulanır)
+      points:  opsiyonel hedef nokta sayısı (sunucu tarafı downsampling)
+
+    Yanıt: {'matches': {hash: {market: {'history', 'chart_data'}}},
+            'cursors': {market: son scraped_at}, 'cursor': en büyük scraped_at}
+    İstemci bir sonraki istekte cursors'ı geri gönderir. Cursor'lar overlap ile
+    (scraped_at >= cursor - HISTORY_CURSOR_OVERLAP_SECONDS) okunduğu için geç commit
+    edilen satırlar kaçmaz; tekrar gelen satırlar history 'Id' alanıyla ayıklanır.
+    """
+    if request.method == 'POST':
+        params = request.get_json(silent=True) or {}
+    else:
+        params = request.args
+
+    def _as_list(val):
+        if isinstance(val, (list, tuple)):
+            return [str(v).strip() for v in val if str(v).strip()]
+        return [v.strip() for v in str(val or '').split(',') if v.strip()]
+
+    hashes = []
+    for h in _as_list(params.get('hashes', '')):
+        h = h.lower()
+        if _MATCH_HASH_RE.match(h) and h not in hashes:
+            hashes.append(h)
+    if not hashes:
+        return jsonify({'error': 'Missing hashes parameter', 'matches': {}}), 400
+    if len(hashes) > _HISTORY_MULTI_MAX_MATCHES:
+        return jsonify({'error': f'Too many hashes (max {_HISTORY_MULTI_MAX_MATCHES})', 'matches': {}}), 400
+
+    markets = [m for m in _as_list(params.get('markets', '')) if m in _HISTORY_ALL_MARKETS] or list(_HISTORY_ALL_MARKETS)
+    after = str(params.get('after', '') or '').strip() or None
+    cursors_param = params.get('cursors') or {}
+    if isinstance(cursors_param, str):
+        try:
+            cursors_param = json.loads(cursors_param)
+        except ValueError:
+            cursors_param = {}
+    if not isinstance(cursors_param, dict):
+        cursors_param = {}
+    cursors = {m: (str(cursors_param.get(m, '') or '').strip() or after) for m in markets}
+    try:
+        points = int(params.get('points', 0) or 0)
+    except (TypeError, ValueError):
+        points = 0
+
+    start_time = time.time()
+    raw = db.get_match_history_multi(hashes, markets, after=cursors)
+
+    next_cursors = {m: cursors[m] or '' for m in markets}
+    total_rows = 0
+    result = {}
+    for h in hashes:
+        per_market = {}
+        for market in markets:
+            history = raw.get(h, {}).get(market, [])
+            total_rows += len(history)
+            if history:
+                last_ts = history[-1].get('ScrapedAt', '') or ''
+                if last_ts > next_cursors[market]:
+                    next_cursors[market] = last_ts
+            history = _downsample_history(history, points)
+            per_market[market] = {
+                'history': history,
+                'chart_data': _build_history_chart_data(history, market),
+            }
+        result[h] = per_market
+
+    elapsed = int((time.time() - start_time) * 1000)
+    print(f"[History/Multi] {len(hashes)} matches x {len(markets)} markets, {total_rows} rows in {elapsed}ms"
+          f"{' (after ' + after + ')' if after else ''}")
+    return jsonify({'matches': result, 'cursors': next_cursors,
+                    'cursor': max(next_cursors.values(), default='')})
 
 
 @app.route('/api/match/history/bulk')
@@ -1866,72 +2168,11 @@ def get_match_history_bulk():
         except Exception as e:
             print(f"[History/Bulk] Fuzzy lookup error: {e}")
     
-    all_markets = ['moneyway_1x2', 'moneyway_ou25', 'moneyway_btts', 
-                   'dropping_1x2', 'dropping_ou25', 'dropping_btts']
+    all_markets = _HISTORY_ALL_MARKETS
     
     def _build_market_data(market):
         history = db.get_match_history(resolved_home, resolved_away, market, resolved_league)
-        chart_data = {'labels': [], 'datasets': []}
-        if history:
-            for h in history:
-                timestamp = h.get('ScrapedAt', '')
-                try:
-                    dt = datetime.fromisoformat(timestamp)
-                    chart_data['labels'].append(dt.strftime('%H:%M'))
-                except:
-                    chart_data['labels'].append(timestamp[:16] if timestamp else '')
-            if market in ['moneyway_1x2', 'dropping_1x2']:
-                for idx, (key, color) in enumerate([('Odds1', '#4ade80'), ('OddsX', '#fbbf24'), ('Odds2', '#60a5fa')]):
-                    alt_key = ['1', 'X', '2'][idx]
-                    values = []
-                    for h in history:
-                        val = h.get(key, h.get(alt_key, ''))
-                        try:
-                            v = float(str(val).split('\n')[0]) if val else None
-                            values.append(v)
-                        except:
-                            values.append(None)
-                    chart_data['datasets'].append({
-                        'label': ['1', 'X', '2'][idx],
-                        'data': values,
-                        'borderColor': color,
-                        'tension': 0.1,
-                        'fill': False
-                    })
-            elif market in ['moneyway_ou25', 'dropping_ou25']:
-                for key, color, label in [('Under', '#60a5fa', 'Under'), ('Over', '#4ade80', 'Over')]:
-                    values = []
-                    for h in history:
-                        val = h.get(key, '')
-                        try:
-                            v = float(str(val).split('\n')[0]) if val else None
-                            values.append(v)
-                        except:
-                            values.append(None)
-                    chart_data['datasets'].append({
-                        'label': label,
-                        'data': values,
-                        'borderColor': color,
-                        'tension': 0.1,
-                        'fill': False
-                    })
-            elif market in ['moneyway_btts', 'dropping_btts']:
-                for key, color, label in [('Yes', '#4ade80', 'Yes'), ('No', '#f87171', 'No')]:
-                    values = []
-                    for h in history:
-                        val = h.get(key, '')
-                        try:
-                            v = float(str(val).split('\n')[0]) if val else None
-                            values.append(v)
-                        except:
-                            values.append(None)
-                    chart_data['datasets'].append({
-                        'label': label,
-                        'data': values,
-                        'borderColor': color,
-                        'tension': 0.1,
-                        'fill': False
-                    })
+        chart_data = _build_history_chart_data(history, market)
         return market, {'history': history, 'chart_data': chart_data}
     
     from concurrent.futures import ThreadPoolExecutor
@@ -2160,21 +2401,19 @@ def update_interval():
     })
 
 
-@app.route('/api/live/matches')
-@license_required
-def get_live_matches():
-    """Canlı maç listesi - live_fixtures + son snapshot verisi"""
+def _fetch_live_matches():
+    """live_fixtures + son snapshot verisinden canlı maç payload'ı (route + update stream ortak)"""
     try:
         supabase = get_supabase_client()
         if not supabase or not supabase.is_available:
-            return jsonify({'matches': [], 'error': 'Supabase bağlantısı yok'}), 200
+            return {'matches': [], 'error': 'Supabase bağlantısı yok'}
 
         headers = supabase._headers()
 
         fix_url = f"{supabase._rest_url('live_fixtures')}?status=eq.live&order=updated_at.desc&limit=200"
         fix_resp = supabase._get_http_client().get(fix_url, headers=headers, timeout=15)
         if fix_resp.status_code != 200:
-            return jsonify({'matches': [], 'error': f'Fixtures HTTP {fix_resp.status_code}'}), 200
+            return {'matches': [], 'error': f'Fixtures HTTP {fix_resp.status_code}'}
         raw_fixtures = fix_resp.json() or []
 
         from datetime import datetime as _dt2, timezone as _tz2
@@ -2210,7 +2449,8 @@ def get_live_matches():
         fixtures = fixtures + ft_fixtures
 
         if not fixtures:
-            return jsonify({'matches': [], 'total': 0}), 200
+            _publish_update('live', [], lambda m: m.get('match_id_hash'))
+            return {'matches': [], 'total': 0}
 
         hashes = [f['match_id_hash'] for f in fixtures]
 
@@ -2323,11 +2563,112 @@ def get_live_matches():
 
             matches.append(match_data)
 
-        return jsonify({'matches': matches, 'total': len(matches)}), 200
+        _publish_update('live', matches, lambda m: m.get('match_id_hash'))
+        return {'matches': matches, 'total': len(matches)}
 
     except Exception as e:
         print(f"[API] /api/live/matches hata: {e}")
-        return jsonify({'matches': [], 'error': str(e)}), 200
+        return {'matches': [], 'error': str(e)}
+
+
+@app.route('/api/live/matches')
+@license_required
+def get_live_matches():
+    """Canlı maç listesi - live_fixtures + son snapshot verisi"""
+    return jsonify(_fetch_live_matches()), 200
+
+
+UPDATES_PUMP_INTERVAL = 30
+UPDATES_ALARM_INTERVAL = 120
+_updates_pump_running = False
+_updates_pump_lock = threading.Lock()
+
+def _updates_pump_loop():
+    """Bu worker'a bağlı stream abonesi olduğu sürece cache'leri taze tut.
+    Periodic warmup sadece master worker'da koşar; slave worker'daki aboneler
+    de güncelleme alsın diye matches sadece cache bayatladıysa yenilenir."""
+    global _updates_pump_running
+    import time as _t
+    last_alarm = 0
+    try:
+        while update_broker.subscriber_count() > 0:
+            try:
+                _fetch_live_matches()
+            except Exception as e:
+                print(f"[Updates] Live refresh error: {e}")
+            now = _t.time()
+            if now - last_alarm >= UPDATES_ALARM_INTERVAL:
+                last_alarm = now
+                try:
+                    _warmup_alarms()
+                except Exception as e:
+                    print(f"[Updates] Alarm refresh error: {e}")
+            with _cache_lock:
+                matches_age = now - _server_matches_cache_time.get('moneyway_1x2_all', 0)
+            if matches_age > SERVER_MATCHES_CACHE_TTL:
+                try:
+                    _warmup_matches()
+                except Exception as e:
+                    print(f"[Updates] Matches refresh error: {e}")
+            _t.sleep(UPDATES_PUMP_INTERVAL)
+    finally:
+        with _updates_pump_lock:
+            _updates_pump_running = False
+
+def _ensure_updates_pump():
+    global _updates_pump_running
+    with _updates_pump_lock:
+        if _updates_pump_running:
+            return
+        _updates_pump_running = True
+    threading.Thread(target=_updates_pump_loop, daemon=True).start()
+
+
+@app.route('/api/updates/stream')
+@license_required
+def updates_stream():
+    """SSE - maç / alarm / canlı maç değişikliklerini sürümlü diff olarak yayınlar.
+    ?since=<id> veya Last-Event-ID ile kaçırılan olaylar tekrar gönderilir;
+    ring buffer dışındaysa 'resync' olayı gelir (client tam listeyi REST'ten çeker).
+    ?channels=matches,alarms,live ile kanal filtrelenir."""
+    import queue
+
+    raw_since = request.args.get('since') or request.headers.get('Last-Event-ID')
+    channels = [c.strip() for c in (request.args.get('channels') or '').split(',') if c.strip()]
+    since, needs_resync = update_broker.parse_since(raw_since)
+    sub, backlog, resync = update_broker.subscribe(since=since, channels=channels or None)
+    needs_resync = needs_resync or resync
+    _ensure_updates_pump()
+
+    def _format(event):
+        return f"id: {update_broker.event_id(event)}\nevent: update\ndata: {json.dumps(event, default=str)}\n\n"
+
+    def generate():
+        try:
+            hello = {'v': update_broker.version, 'epoch': update_broker.epoch}
+            yield f"id: {update_broker.epoch}.{update_broker.version}\nevent: hello\ndata: {json.dumps(hello)}\n\n"
+            if needs_resync:
+                yield f"event: resync\ndata: {json.dumps(hello)}\n\n"
+            for event in backlog:
+                yield _format(event)
+            while True:
+                try:
+                    event = sub.get(timeout=15)
+                except queue.Empty:
+                    yield ": keepalive\n\n"
+                    continue
+                if event is None:
+                    # Yavaş tüketici düşürüldü - client yeniden bağlanıp since ile devam eder
+                    yield "event: dropped\ndata: {}\n\n"
+                    return
+                yield _format(event)
+        finally:
+            sub.close()
+
+    return Response(generate(), mimetype='text/event-stream', headers={
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no'
+    })
 
 
 _ft_scores_cache = {'data': None, 'ts': 0}
@@ -2528,66 +2869,144 @@ def _save_underdog_signals(signals):
         print(f"[UnderdogSignals] save error: {e}")
 
 
+def _build_ft_score_index(ft_scores):
+    """FT skor map'inden tek seferlik arama indeksi kurar.
+    by_name: normalize edilmiş 'home|away' -> entry (birebir eşleşme)
+    by_initial: normalize home'un ilk harfi -> [(home, away, entry)] (fuzzy fallback).
+    _fuzzy_team_match yalnızca aynı harfle başlayan isimleri eşleştirebildiği için
+    bucket'lama sonucu değiştirmez, sadece taranan aday sayısını düşürür."""
+    by_name = {}
+    by_initial = {}
+    seen_ids = set()
+    for ft_key, ft_entry in ft_scores.items():
+        if '|' not in ft_key or not isinstance(ft_entry, dict):
+            continue
+        eid = id(ft_entry)
+        if eid in seen_ids:
+            continue
+        seen_ids.add(eid)
+        ft_h = normalize_field(ft_entry.get('home', ''))
+        ft_a = normalize_field(ft_entry.get('away', ''))
+        if not ft_h or not ft_a:
+            continue
+        by_name.setdefault(f"{ft_h}|{ft_a}", ft_entry)
+        by_initial.setdefault(ft_h[0], []).append((ft_h, ft_a, ft_entry))
+    return {'by_name': by_name, 'by_initial': by_initial}
+
+
+def _lookup_ft_score(sig, ft_scores, ft_index):
+    """Sinyal için FT skor entry'si bul: hash -> ham isim key -> normalize isim -> fuzzy.
+    underdog_signals'ta match_id_hash kolonu yok; hash home/away/league'den üretilir.
+    (entry, is_fuzzy) döner; bulunamazsa (None, False)."""
+    home = sig.get('home_team', '')
+    away = sig.get('away_team', '')
+    h = generate_match_id(home, away, sig.get('league', ''))
+    entry = ft_scores.get(h)
+    if entry:
+        return entry, False
+    entry = ft_scores.get((home + '|' + away).lower())
+    if entry:
+        return entry, False
+    sig_h = normalize_field(home)
+    sig_a = normalize_field(away)
+    if not sig_h or not sig_a:
+        return None, False
+    entry = ft_index['by_name'].get(f"{sig_h}|{sig_a}")
+    if entry:
+        return entry, False
+    for ft_h, ft_a, ft_entry in ft_index['by_initial'].get(sig_h[0], ()):
+        if _fuzzy_team_match(sig_h, ft_h) and _fuzzy_team_match(sig_a, ft_a):
+            return ft_entry, True
+    return None, False
+
+
+_underdog_scores_rpc_missing = False
+
+
+def _write_underdog_scores(supabase, records):
+    """Skorları sadece UPDATE ile yaz: önce bulk_update_underdog_scores RPC (tek istek),
+    RPC yoksa (404) match_key + selection_code üzerinden satır başına PATCH. Yazılan satır sayısı döner."""
+    global _underdog_scores_rpc_missing
+    client = supabase._get_http_client()
+    if not _underdog_scores_rpc_missing:
+        rh = supabase._headers()
+        rh['Prefer'] = 'return=representation'
+        ru = supabase._rest_url('rpc/bulk_update_underdog_scores')
+        rr = client.post(ru, headers=rh, json={'p_rows': records}, timeout=15)
+        if rr.status_code == 200:
+            try:
+                return int(rr.json() or 0)
+            except Exception:
+                return len(records)
+        if rr.status_code == 404:
+            _underdog_scores_rpc_missing = True
+            print("[UnderdogSignals] bulk_update_underdog_scores RPC yok — "
+                  "migrations/2026_10_18_bulk_update_underdog_scores.sql çalıştırın (satır başına PATCH)")
+        else:
+            print(f"[UnderdogSignals] Score RPC non-2xx: {rr.status_code} {rr.text[:200]}")
+            return 0
+    from urllib.parse import quote as _url_quote
+    ph = supabase._headers()
+    written = 0
+    for rec in records:
+        mk = _url_quote(rec['match_key'], safe='')
+        sc = _url_quote(rec['selection_code'], safe='')
+        pu = f"{supabase._rest_url('underdog_signals')}?match_key=eq.{mk}&selection_code=eq.{sc}"
+        pr = client.patch(pu, headers=ph, json={'score': rec['score']}, timeout=5)
+        if pr.status_code in (200, 204):
+            written += 1
+        else:
+            print(f"[UnderdogSignals] Score patch non-2xx: {pr.status_code} mk={rec['match_key']}")
+    return written
+
+
 def _update_underdog_signal_scores():
-    """Fill in FT scores for signals that don't have one yet."""
+    """Fill in FT scores for signals that don't have one yet.
+    Eşleşen skorlar bulk_update_underdog_scores RPC ile tek çağrıda yazılır (sadece UPDATE;
+    RPC yoksa satır başına PATCH). Upsert kullanılmaz: silinmiş sinyal geri insert edilmez.
+    Returns {'matched', 'unmatched', 'fuzzy', 'written'} counts (None on early exit)."""
     try:
         supabase = get_supabase_client()
         if not supabase or not supabase.is_available:
-            return
+            return None
         headers = supabase._headers()
         # Match both NULL and empty-string scores (table default may vary)
-        url = f"{supabase._rest_url('underdog_signals')}?or=(score.is.null,score.eq.)&select=match_key,selection_code,home_team,away_team&limit=300"
+        url = f"{supabase._rest_url('underdog_signals')}?or=(score.is.null,score.eq.)&select=match_key,selection_code,home_team,away_team,league&limit=300"
         resp = supabase._get_http_client().get(url, headers=headers, timeout=10)
         if resp.status_code != 200:
             print(f"[UnderdogSignals] Fetch pending non-2xx: {resp.status_code}")
-            return
+            return None
         pending = resp.json()
         if not pending:
-            return
+            return None
         ft_scores = _get_finished_scores_map()
         if not ft_scores:
-            return
-        # Build normalised FT entries list once
-        ft_entries = []
-        seen_ids = set()
-        for ft_key, ft_entry in ft_scores.items():
-            if '|' not in ft_key or not isinstance(ft_entry, dict):
-                continue
-            eid = id(ft_entry)
-            if eid in seen_ids:
-                continue
-            seen_ids.add(eid)
-            ft_h = normalize_field(ft_entry.get('home', ''))
-            ft_a = normalize_field(ft_entry.get('away', ''))
-            if ft_h and ft_a:
-                ft_entries.append((ft_h, ft_a, ft_entry))
-        updated = 0
+            return None
+        ft_index = _build_ft_score_index(ft_scores)
+        records = []
+        stats = {'matched': 0, 'unmatched': 0, 'fuzzy': 0, 'written': 0}
         for sig in pending:
-            sig_h = normalize_field(sig.get('home_team', ''))
-            sig_a = normalize_field(sig.get('away_team', ''))
-            # Direct key lookup first
-            direct_key = (sig.get('home_team', '') + '|' + sig.get('away_team', '')).lower()
-            entry = ft_scores.get(direct_key)
-            if not entry:
-                for ft_h, ft_a, ft_entry in ft_entries:
-                    if _fuzzy_team_match(sig_h, ft_h) and _fuzzy_team_match(sig_a, ft_a):
-                        entry = ft_entry
-                        break
-            if entry and entry.get('score'):
-                from urllib.parse import quote as _url_quote
-                ph = supabase._headers()
-                mk = _url_quote(sig.get('match_key', ''), safe='')
-                sc = _url_quote(sig.get('selection_code', ''), safe='')
-                pu = f"{supabase._rest_url('underdog_signals')}?match_key=eq.{mk}&selection_code=eq.{sc}"
-                pr = supabase._get_http_client().patch(pu, headers=ph, json={'score': entry['score']}, timeout=5)
-                if pr.status_code in (200, 204):
-                    updated += 1
-                else:
-                    print(f"[UnderdogSignals] Score patch non-2xx: {pr.status_code} mk={sig.get('match_key','')}")
-        if updated:
-            print(f"[UnderdogSignals] Updated scores for {updated} signals")
+            entry, is_fuzzy = _lookup_ft_score(sig, ft_scores, ft_index)
+            if not entry or not entry.get('score'):
+                stats['unmatched'] += 1
+                continue
+            stats['matched'] += 1
+            if is_fuzzy:
+                stats['fuzzy'] += 1
+            records.append({
+                'match_key': sig.get('match_key', ''),
+                'selection_code': sig.get('selection_code', ''),
+                'score': entry['score'],
+            })
+        if records:
+            stats['written'] = _write_underdog_scores(supabase, records)
+        if stats['matched']:
+            print(f"[UnderdogSignals] Scores: matched={stats['matched']} (fuzzy={stats['fuzzy']}) "
+                  f"unmatched={stats['unmatched']} written={stats['written']}")
+        return stats
     except Exception as e:
         print(f"[UnderdogSignals] score update error: {e}")
+        return None
 
 
 _backfill_done = set()
@@ -3086,11 +3505,12 @@ def get_match_details():
         home_lower = home.lower().strip()
         away_lower = away.lower().strip()
         
-        # Use get_matches_paginated which includes latest odds data
-        result = db.get_matches_paginated('moneyway_1x2', limit=500, offset=0)
-        matches_list = result.get('matches', [])
+        # Keyset pages include latest odds data; stop paging once the match is found
+        def _iter_candidates():
+            for page_matches in _iter_paginated_matches('moneyway_1x2', page_limit=200, max_pages=10):
+                yield from page_matches
         
-        for m in matches_list:
+        for m in _iter_candidates():
             m_home = (m.get('home_team') or '').lower().strip()
             m_away = (m.get('away_team') or '').lower().strip()
             # Partial match - isimler içeriyorsa kabul et
@@ -3556,6 +3976,7 @@ def reset_big_money_calculation():
     """Reset Big Money calculation flag (force unlock)"""
     global big_money_calculating, big_money_calc_progress
     big_money_calculating = False
+    calc_jobs.cancel_kind('bigmoney')
     big_money_calc_progress = "Kullanici tarafindan sifirlandi"
     print("[BigMoney] Calculation flag reset by user")
     return jsonify({'success': True, 'message': 'Calculation reset'})
@@ -3563,22 +3984,11 @@ def reset_big_money_calculation():
 
 @app.route('/api/bigmoney/calculate', methods=['POST'])
 def calculate_big_money_alarms_endpoint():
-    """Calculate Big Money alarms based on config"""
-    global big_money_alarms, big_money_calculating
-    try:
-        big_money_calculating = True
-        big_money_alarms = calculate_big_money_scores(big_money_config)
-        save_big_money_alarms_to_file(big_money_alarms)
-        big_money_calculating = False
-        return jsonify({'success': True, 'count': len(big_money_alarms)})
-    except Exception as e:
-        big_money_calculating = False
-        import traceback
-        traceback.print_exc()
-        return jsonify({'success': False, 'error': str(e)}), 500
+    """Calculate Big Money alarms based on config (arka plan job'u, job_id döner)"""
+    return _start_calc_job('bigmoney')
 
 
-def calculate_big_money_scores(config):
+def calculate_big_money_scores(config, loader=None, job=None):
     """
     Calculate Big Money and Huge Money alarms.
     
@@ -3591,6 +4001,8 @@ def calculate_big_money_scores(config):
     if not supabase or not supabase.is_available:
         print("[BigMoney] Supabase not available")
         return alarms
+    if loader is None:
+        loader = HistoryLoader(supabase, job)
     
     # NO DEFAULTS - tüm değerler Supabase'den gelmeli
     limit = config.get('big_money_limit')
@@ -3619,11 +4031,12 @@ def calculate_big_money_scores(config):
                 amount_keys = ['amtyes', 'amtno']
             
             history_table = f"{market}_history"
-            matches = supabase.get_all_matches_with_latest(market)
+            matches = loader.matches(market)
             if not matches:
                 continue
             
             big_money_calc_progress = f"{market_names.get(market, market)} isleniyor... ({idx+1}/3)"
+            _calc_job_progress(job, big_money_calc_progress)
             
             # D-2+ filtresi
             filtered_matches = []
@@ -3660,6 +4073,8 @@ def calculate_big_money_scores(config):
             
             print(f"[BigMoney] Processing {len(filtered_matches)}/{len(matches)} matches for {market}")
             
+            loader.prefetch(history_table, match_pairs(filtered_matches))
+            
             for match in filtered_matches:
                 home = match.get('home_team', match.get('home', match.get('Home', '')))
                 away = match.get('away_team', match.get('away', match.get('Away', '')))
@@ -3667,7 +4082,9 @@ def calculate_big_money_scores(config):
                 if not home or not away:
                     continue
                 
-                history = supabase.get_match_history_for_sharp(home, away, history_table)
+                if job is not None:
+                    job.check_cancelled()
+                history = loader.get(history_table, home, away)
                 if not history or len(history) < 2:
                     continue
                 
@@ -4193,78 +4610,17 @@ def reset_volume_shock_calculation():
     """Reset Volume Shock calculation flag (force unlock)"""
     global volume_shock_calculating, volume_shock_calc_progress
     volume_shock_calculating = False
+    calc_jobs.cancel_kind('volumeshock')
     volume_shock_calc_progress = "Reset by user"
     print("[VolumeShock] Calculation flag reset by user")
     return jsonify({'success': True, 'message': 'Calculation reset'})
 
 @app.route('/api/volumeshock/calculate', methods=['POST'])
 def calculate_volume_shock_alarms():
-    """Calculate Volume Shock alarms based on current config"""
-    global volume_shock_calculating, volume_shock_calc_progress, volume_shock_alarms
-    
-    if volume_shock_calculating:
-        return jsonify({'success': False, 'error': 'Calculation already in progress'})
-    
-    def run_calculation():
-        global volume_shock_calculating, volume_shock_calc_progress, volume_shock_alarms
-        volume_shock_calculating = True
-        volume_shock_calc_progress = "Starting..."
-        
-        try:
-            alarms = calculate_volume_shock_scores(volume_shock_config)
-            volume_shock_alarms = alarms
-            save_volume_shock_alarms_to_file(alarms)
-            volume_shock_calc_progress = f"Completed: {len(alarms)} alarms"
-        except Exception as e:
-            volume_shock_calc_progress = f"Error: {str(e)}"
-            print(f"[VolumeShock] Calculation error: {e}")
-            import traceback
-            traceback.print_exc()
-        finally:
-            volume_shock_calculating = False
-    
-    import threading
-    thread = threading.Thread(target=run_calculation)
-    thread.start()
-    
-    return jsonify({'success': True, 'message': 'Calculation started'})
+    """Calculate Volume Shock alarms based on current config (arka plan job'u, job_id döner)"""
+    return _start_calc_job('volumeshock')
 
-def parse_match_datetime(date_str):
-    """Parse match date/time string to datetime object (Turkey timezone)"""
-    try:
-        if not date_str:
-            return None
-        
-        today = now_turkey().date()
-        
-        # Format: "03.Dec 17:00:00" or "03.Dec17:00:00"
-        date_str = date_str.replace('  ', ' ').strip()
-        
-        # Try various formats
-        formats = [
-            '%d.%b %H:%M:%S',  # 03.Dec 17:00:00
-            '%d.%b%H:%M:%S',   # 03.Dec17:00:00
-            '%d.%m.%Y %H:%M',  # 03.12.2025 17:00
-            '%d.%m.%Y %H:%M:%S'  # 03.12.2025 17:00:00
-        ]
-        
-        for fmt in formats:
-            try:
-                if '%Y' in fmt:
-                    dt = datetime.strptime(date_str, fmt)
-                else:
-                    dt = datetime.strptime(date_str, fmt)
-                    dt = dt.replace(year=today.year)
-                return TURKEY_TZ.localize(dt)
-            except ValueError:
-                continue
-        
-        return None
-    except Exception as e:
-        print(f"[VolumeShock] Date parse error: {e} for '{date_str}'")
-        return None
-
-def calculate_volume_shock_scores(config):
+def calculate_volume_shock_scores(config, loader=None, job=None):
     """Calculate Volume Shock alarms - only for movements well before match"""
     global volume_shock_calc_progress
     
@@ -4298,6 +4654,8 @@ def calculate_volume_shock_scores(config):
     if not supabase or not supabase.is_available:
         print("[VolumeShock] Supabase not available")
         return []
+    if loader is None:
+        loader = HistoryLoader(supabase, job)
     
     alarms = []
     
@@ -4314,6 +4672,7 @@ def calculate_volume_shock_scores(config):
     
     for market in markets:
         volume_shock_calc_progress = f"Processing {market}..."
+        _calc_job_progress(job, volume_shock_calc_progress)
         
         try:
             if '1x2' in market:
@@ -4330,7 +4689,7 @@ def calculate_volume_shock_scores(config):
                 min_volume = min_volume_btts if min_volume_btts is not None else 0
             
             history_table = f"{market}_history"
-            matches = supabase.get_all_matches_with_latest(market)
+            matches = loader.matches(market)
             if not matches:
                 continue
             
@@ -4367,6 +4726,7 @@ def calculate_volume_shock_scores(config):
             
             print(f"[VolumeShock] Processing {len(filtered_matches)}/{len(matches)} matches for {market}")
             
+            candidates = []
             for match in filtered_matches:
                 home = match.get('home_team', match.get('home', match.get('Home', '')))
                 away = match.get('away_team', match.get('away', match.get('Away', '')))
@@ -4386,12 +4746,20 @@ def calculate_volume_shock_scores(config):
                     print(f"[VolumeShock] Skipping {home} vs {away}: volume {total_volume} < min {min_volume}")
                     continue
                 
-                # Parse match kickoff time
-                match_kickoff = parse_match_datetime(match_date_str)
-                if not match_kickoff:
+                # Parse match kickoff time (önbellekli UTC epoch)
+                match_kickoff = kickoff_epoch(match_date_str)
+                if match_kickoff is None:
                     continue
                 
-                history = supabase.get_match_history_for_sharp(home, away, history_table)
+                candidates.append((match, home, away, match_date_str, match_kickoff))
+            
+            # Aday maçların history'si tek batch'te
+            loader.prefetch(history_table, [(c[1], c[2]) for c in candidates])
+            
+            for match, home, away, match_date_str, match_kickoff in candidates:
+                if job is not None:
+                    job.check_cancelled()
+                history = loader.get(history_table, home, away)
                 if not history or len(history) < 2:
                     continue
                 
@@ -4408,18 +4776,12 @@ def calculate_volume_shock_scores(config):
                         if not snapshot_time_str:
                             continue
                         
-                        try:
-                            snapshot_time = datetime.fromisoformat(snapshot_time_str.replace('Z', '+00:00'))
-                            if snapshot_time.tzinfo is None:
-                                snapshot_time = TURKEY_TZ.localize(snapshot_time)
-                            else:
-                                snapshot_time = snapshot_time.astimezone(TURKEY_TZ)
-                        except:
+                        snapshot_ts = snapshot_epoch(snapshot_time_str)
+                        if snapshot_ts is None:
                             continue
                         
                         # Maça kaç saat kaldı?
-                        time_diff = match_kickoff - snapshot_time
-                        hours_to_kickoff = time_diff.total_seconds() / 3600.0
+                        hours_to_kickoff = (match_kickoff - snapshot_ts) / 3600.0
                         
                         # Hacim şoku hesapla
                         if prev_amount > 0 and current_amount > prev_amount:
@@ -4504,6 +4866,7 @@ def reset_sharp_calculation():
     """Reset Sharp calculation flag (force unlock)"""
     global sharp_calculating, sharp_calc_progress
     sharp_calculating = False
+    calc_jobs.cancel_kind('sharp')
     sharp_calc_progress = "Kullanici tarafindan sifirlandi"
     print("[Sharp] Calculation flag reset by user")
     return jsonify({'success': True, 'message': 'Calculation reset'})
@@ -4586,26 +4949,8 @@ def run_cleanup():
 
 @app.route('/api/sharp/calculate', methods=['POST'])
 def calculate_sharp_alarms():
-    """Calculate Sharp alarms based on current config"""
-    global sharp_alarms, sharp_calculating, sharp_calc_progress
-    
-    if sharp_calculating:
-        return jsonify({'success': False, 'error': 'Hesaplama zaten devam ediyor', 'calculating': True})
-    
-    try:
-        sharp_calculating = True
-        sharp_calc_progress = "Hesaplama baslatiliyor..."
-        sharp_alarms = calculate_sharp_scores(sharp_config)
-        save_sharp_alarms_to_file(sharp_alarms)
-        sharp_calc_progress = f"Tamamlandi! {len(sharp_alarms)} alarm bulundu."
-        sharp_calculating = False
-        return jsonify({'success': True, 'count': len(sharp_alarms)})
-    except Exception as e:
-        import traceback
-        traceback.print_exc()
-        sharp_calculating = False
-        sharp_calc_progress = f"Hata: {str(e)}"
-        return jsonify({'success': False, 'error': str(e)}), 500
+    """Calculate Sharp alarms based on current config (arka plan job'u, job_id döner)"""
+    return _start_calc_job('sharp')
 
 
 # ==================== HALK TUZAĞI API ENDPOINTS ====================
@@ -4624,6 +4969,7 @@ def reset_publicmove_calculation():
     """Reset Public Move calculation flag (force unlock)"""
     global publicmove_calculating, publicmove_calc_progress
     publicmove_calculating = False
+    calc_jobs.cancel_kind('publicmove')
     publicmove_calc_progress = "Kullanici tarafindan sifirlandi"
     print("[PublicMove] Calculation flag reset by user")
     return jsonify({'success': True, 'message': 'Calculation reset'})
@@ -4691,29 +5037,11 @@ def delete_publicmove_alarms():
 
 @app.route('/api/publicmove/calculate', methods=['POST'])
 def calculate_publicmove_alarms():
-    """Calculate Public Move alarms based on current config (same logic as Sharp)"""
-    global publicmove_alarms, publicmove_calculating, publicmove_calc_progress
-    
-    if publicmove_calculating:
-        return jsonify({'success': False, 'error': 'Hesaplama zaten devam ediyor', 'calculating': True})
-    
-    try:
-        publicmove_calculating = True
-        publicmove_calc_progress = "Hesaplama baslatiliyor..."
-        publicmove_alarms = calculate_publicmove_scores(publicmove_config)
-        save_publicmove_alarms_to_file(publicmove_alarms)
-        publicmove_calc_progress = f"Tamamlandi! {len(publicmove_alarms)} alarm bulundu."
-        publicmove_calculating = False
-        return jsonify({'success': True, 'count': len(publicmove_alarms)})
-    except Exception as e:
-        import traceback
-        traceback.print_exc()
-        publicmove_calculating = False
-        publicmove_calc_progress = f"Hata: {str(e)}"
-        return jsonify({'success': False, 'error': str(e)}), 500
+    """Calculate Public Move alarms based on current config (arka plan job'u, job_id döner)"""
+    return _start_calc_job('publicmove')
 
 
-def calculate_publicmove_scores(config):
+def calculate_publicmove_scores(config, loader=None, job=None):
     """Calculate Public Move scores for all matches based on config (same as Sharp)"""
     global publicmove_calc_progress
     alarms = []
@@ -4729,6 +5057,8 @@ def calculate_publicmove_scores(config):
     if not supabase or not supabase.is_available:
         print("[PublicMove] Supabase not available")
         return alarms
+    if loader is None:
+        loader = HistoryLoader(supabase, job)
     
     markets = ['moneyway_1x2', 'moneyway_ou25', 'moneyway_btts']
     market_names = {'moneyway_1x2': '1X2', 'moneyway_ou25': 'O/U 2.5', 'moneyway_btts': 'BTTS'}
@@ -4747,13 +5077,14 @@ def calculate_publicmove_scores(config):
                 selections = ['Yes', 'No']
             
             history_table = f"{market}_history"
-            matches = supabase.get_all_matches_with_latest(market)
+            matches = loader.matches(market)
             
             if not matches:
                 print(f"[PublicMove] No matches for {market}")
                 continue
             
             publicmove_calc_progress = f"{market_names.get(market, market)} isleniyor... ({idx+1}/3)"
+            _calc_job_progress(job, publicmove_calc_progress)
             print(f"[PublicMove] Processing {len(matches)} matches for {market}, min_volume: {min_volume}")
             processed = 0
             skipped_old = 0
@@ -4761,6 +5092,7 @@ def calculate_publicmove_scores(config):
             today = now_turkey().date()
             yesterday = today - timedelta(days=1)
             
+            candidates = []
             for match in matches:
                 home = match.get('home_team', match.get('home', match.get('Home', '')))
                 away = match.get('away_team', match.get('away', match.get('Away', '')))
@@ -4834,7 +5166,15 @@ def calculate_publicmove_scores(config):
                 if volume < min_volume:
                     continue
                 
-                history = supabase.get_match_history_for_sharp(home, away, history_table)
+                candidates.append((match, home, away, match_date_str, volume))
+            
+            # Aday maçların history'si tek batch'te
+            loader.prefetch(history_table, [(c[1], c[2]) for c in candidates])
+            
+            for match, home, away, match_date_str, volume in candidates:
+                if job is not None:
+                    job.check_cancelled()
+                history = loader.get(history_table, home, away)
                 
                 if len(history) < 2:
                     continue
@@ -4871,26 +5211,16 @@ def calculate_selection_publicmove(home, away, market, selection, sel_idx, histo
         return None
     
     # PUBLIC MOVE: Sadece son 2 saatteki hareketlere bak
-    now = now_turkey()
-    two_hours_ago = now - timedelta(hours=2)
+    two_hours_ago = int(time.time()) - 2 * 3600
     
     filtered_history = []
     for snap in history:
         scraped_at = snap.get('scraped_at', '')
         if scraped_at:
-            try:
-                # Parse scraped_at timestamp
-                if 'T' in scraped_at:
-                    snap_time_str = scraped_at.split('+')[0].split('.')[0]
-                    snap_time = datetime.strptime(snap_time_str, '%Y-%m-%dT%H:%M:%S')
-                else:
-                    snap_time = datetime.strptime(scraped_at[:19], '%Y-%m-%d %H:%M:%S')
-                
-                # Sadece son 2 saatteki snapshot'ları al
-                if snap_time >= two_hours_ago.replace(tzinfo=None):
-                    filtered_history.append(snap)
-            except:
-                # Parse hatası olursa dahil et
+            # Önbellekli epoch — aynı history her seçim için tekrar parse edilmez
+            snap_ts = snapshot_epoch(scraped_at)
+            # Parse hatası olursa dahil et
+            if snap_ts is None or snap_ts >= two_hours_ago:
                 filtered_history.append(snap)
         else:
             filtered_history.append(snap)
@@ -5057,7 +5387,7 @@ def calculate_selection_publicmove(home, away, market, selection, sel_idx, histo
     return best_candidate
 
 
-def calculate_sharp_scores(config):
+def calculate_sharp_scores(config, loader=None, job=None):
     """Calculate Sharp scores for all matches based on config"""
     global sharp_calc_progress
     alarms = []
@@ -5073,6 +5403,8 @@ def calculate_sharp_scores(config):
     if not supabase or not supabase.is_available:
         print("[Sharp] Supabase not available")
         return alarms
+    if loader is None:
+        loader = HistoryLoader(supabase, job)
     
     markets = ['moneyway_1x2', 'moneyway_ou25', 'moneyway_btts']
     market_names = {'moneyway_1x2': '1X2', 'moneyway_ou25': 'O/U 2.5', 'moneyway_btts': 'BTTS'}
@@ -5091,13 +5423,14 @@ def calculate_sharp_scores(config):
                 selections = ['Yes', 'No']
             
             history_table = f"{market}_history"
-            matches = supabase.get_all_matches_with_latest(market)
+            matches = loader.matches(market)
             
             if not matches:
                 print(f"[Sharp] No matches for {market}")
                 continue
             
             sharp_calc_progress = f"{market_names.get(market, market)} isleniyor... ({idx+1}/3)"
+            _calc_job_progress(job, sharp_calc_progress)
             print(f"[Sharp] Processing {len(matches)} matches for {market}, min_volume: {min_volume}")
             processed = 0
             skipped_old = 0
@@ -5106,6 +5439,7 @@ def calculate_sharp_scores(config):
             today = now_turkey().date()
             yesterday = today - timedelta(days=1)
             
+            candidates = []
             for match in matches:
                 home = match.get('home_team', match.get('home', match.get('Home', '')))
                 away = match.get('away_team', match.get('away', match.get('Away', '')))
@@ -5181,7 +5515,15 @@ def calculate_sharp_scores(config):
                         print(f"[Sharp] Date parse error for {home} vs {away}: {match_date_str} - {e}")
                         # Parse hatası varsa devam et
                 
-                history = supabase.get_match_history_for_sharp(home, away, history_table)
+                candidates.append((match, home, away, match_date_str))
+            
+            # Aday maçların history'si tek batch'te
+            loader.prefetch(history_table, [(c[1], c[2]) for c in candidates])
+            
+            for match, home, away, match_date_str in candidates:
+                if job is not None:
+                    job.check_cancelled()
+                history = loader.get(history_table, home, away)
                 
                 if len(history) < 2:
                     continue
@@ -5744,7 +6086,11 @@ def test_telegram():
             "disable_web_page_preview": True
         }
         
+        governor = get_telegram_governor()
+        if not governor.acquire(token, chat_id, max_wait=30):
+            return jsonify({'success': False, 'error': 'Telegram rate limit kuyrugu dolu, daha sonra tekrar deneyin'})
         response = req.post(url, json=payload, timeout=30)
+        governor.observe(token, chat_id, response)
         if response.status_code == 200:
             return jsonify({'success': True})
         else:
@@ -5814,7 +6160,7 @@ def get_all_alarms_batch():
         if cached_data:
             elapsed = (t.time() - start_time) * 1000
             print(f"[Alarms/All] Cache HIT - {elapsed:.0f}ms")
-            return jsonify(cached_data)
+            return _wire_response(cached_data)
     
     result = {}
     
@@ -5895,7 +6241,7 @@ def get_all_alarms_batch():
         elapsed = (t.time() - start_time) * 1000
         print(f"[Alarms/All] Cache MISS - fetched fresh in {elapsed:.0f}ms")
     
-    return jsonify(result)
+    return _wire_response(result)
 
 
 @app.route('/api/match/<match_id>/snapshot', methods=['GET'])
@@ -6165,6 +6511,7 @@ def reset_volume_leader_calculation():
     """Reset Volume Leader calculation flag (force unlock)"""
     global volume_leader_calculating, volume_leader_calc_progress
     volume_leader_calculating = False
+    calc_jobs.cancel_kind('volumeleader')
     volume_leader_calc_progress = "Kullanici tarafindan sifirlandi"
     print("[VolumeLeader] Calculation flag reset by user")
     return jsonify({'success': True, 'message': 'Calculation reset'})
@@ -6172,43 +6519,11 @@ def reset_volume_leader_calculation():
 
 @app.route('/api/volumeleader/calculate', methods=['POST'])
 def calculate_volume_leader_alarms():
-    """Calculate Volume Leader alarms"""
-    global volume_leader_alarms, volume_leader_calculating, volume_leader_calc_progress
-    
-    if volume_leader_calculating:
-        return jsonify({'success': False, 'error': 'Hesaplama zaten devam ediyor', 'calculating': True})
-    
-    try:
-        volume_leader_calculating = True
-        volume_leader_calc_progress = "Hesaplama başlatılıyor..."
-        
-        new_alarms = calculate_volume_leader_scores(volume_leader_config)
-        
-        # Merge with existing alarms (avoid duplicates)
-        existing_keys = set()
-        for alarm in volume_leader_alarms:
-            key = f"{alarm.get('home', '')}_{alarm.get('away', '')}_{alarm.get('market', '')}_{alarm.get('old_leader', '')}_{alarm.get('new_leader', '')}_{alarm.get('event_time', '')}"
-            existing_keys.add(key)
-        
-        for alarm in new_alarms:
-            key = f"{alarm.get('home', '')}_{alarm.get('away', '')}_{alarm.get('market', '')}_{alarm.get('old_leader', '')}_{alarm.get('new_leader', '')}_{alarm.get('event_time', '')}"
-            if key not in existing_keys:
-                volume_leader_alarms.append(alarm)
-                existing_keys.add(key)
-        
-        save_volume_leader_alarms_to_file(volume_leader_alarms)
-        volume_leader_calc_progress = f"Tamamlandı! {len(new_alarms)} yeni alarm bulundu."
-        volume_leader_calculating = False
-        return jsonify({'success': True, 'count': len(new_alarms), 'total': len(volume_leader_alarms)})
-    except Exception as e:
-        import traceback
-        traceback.print_exc()
-        volume_leader_calculating = False
-        volume_leader_calc_progress = f"Hata: {str(e)}"
-        return jsonify({'success': False, 'error': str(e)}), 500
+    """Calculate Volume Leader alarms (arka plan job'u, job_id döner)"""
+    return _start_calc_job('volumeleader')
 
 
-def calculate_volume_leader_scores(config):
+def calculate_volume_leader_scores(config, loader=None, job=None):
     """
     Calculate Volume Leader Changed alarms.
     
@@ -6225,6 +6540,8 @@ def calculate_volume_leader_scores(config):
     if not supabase or not supabase.is_available:
         print("[VolumeLeader] Supabase not available")
         return alarms
+    if loader is None:
+        loader = HistoryLoader(supabase, job)
     
     # NO DEFAULTS - tüm değerler Supabase'den gelmeli
     leader_threshold = config.get('leader_threshold')
@@ -6260,11 +6577,12 @@ def calculate_volume_leader_scores(config):
                 amount_keys = ['amtyes', 'amtno']
             
             history_table = f"{market}_history"
-            matches = supabase.get_all_matches_with_latest(market)
+            matches = loader.matches(market)
             if not matches:
                 continue
             
             volume_leader_calc_progress = f"{market_names.get(market, market)} işleniyor... ({idx+1}/3)"
+            _calc_job_progress(job, volume_leader_calc_progress)
             
             # D-2+ filter
             filtered_matches = []
@@ -6301,6 +6619,8 @@ def calculate_volume_leader_scores(config):
             
             print(f"[VolumeLeader] {market}: {len(filtered_matches)} matches after D-2+ filter")
             
+            loader.prefetch(history_table, match_pairs(filtered_matches))
+            
             for match in filtered_matches:
                 home = match.get('home_team', match.get('home', match.get('Home', '')))
                 away = match.get('away_team', match.get('away', match.get('Away', '')))
@@ -6310,19 +6630,16 @@ def calculate_volume_leader_scores(config):
                 if not home or not away:
                     continue
                 
-                # Get history for this match using REST API
+                if job is not None:
+                    job.check_cancelled()
+                
+                # Son 50 snapshot (yeniden eskiye) — paylaşılan batch history'den
                 try:
-                    from urllib.parse import quote
-                    home_enc = quote(home, safe='')
-                    away_enc = quote(away, safe='')
-                    history_url = f"{supabase.url}/rest/v1/{history_table}?home=eq.{home_enc}&away=eq.{away_enc}&order=scraped_at.desc&limit=50"
-                    import httpx
-                    resp = httpx.get(history_url, headers=supabase._headers(), timeout=15)
-                    
-                    if resp.status_code != 200 or not resp.json():
+                    history = loader.get(history_table, home, away, tail=50)
+                    if not history:
                         continue
                     
-                    snapshots = resp.json()
+                    snapshots = history[::-1]
                     if len(snapshots) < 2:
                         continue
                     
@@ -6435,6 +6752,220 @@ def calculate_volume_leader_scores(config):
     return alarms
 
 
+# ============================================================================
+# CALC JOBS — admin alarm hesaplamaları arka planda (job id + poll + iptal)
+# /api/<tip>/calculate hemen job_id döner; ilerleme GET /api/calc-jobs/<id>.
+# Aynı çalıştırmadaki hesaplayıcılar tek HistoryLoader'ı paylaşır: her market
+# history'si bir kez, IN-batch sorgularla çekilir.
+# ============================================================================
+from services.calc_jobs import CalcJobRegistry, CalcJobCancelled, HistoryLoader, match_pairs
+calc_jobs = CalcJobRegistry()
+
+
+def _calc_job_progress(job, text):
+    """Job'a ilerleme yaz (iptal istendiyse CalcJobCancelled fırlatır)."""
+    if job is not None:
+        job.set_progress(text)
+
+
+def _run_big_money_job(job, loader):
+    global big_money_alarms, big_money_calculating, big_money_calc_progress
+    big_money_calculating = True
+    big_money_calc_progress = "Hesaplama baslatiliyor..."
+    try:
+        big_money_alarms = calculate_big_money_scores(big_money_config, loader, job)
+        save_big_money_alarms_to_file(big_money_alarms)
+        big_money_calc_progress = f"Tamamlandi! {len(big_money_alarms)} alarm bulundu."
+        return {'count': len(big_money_alarms)}
+    except CalcJobCancelled:
+        big_money_calc_progress = "Iptal edildi"
+        raise
+    except Exception as e:
+        big_money_calc_progress = f"Hata: {str(e)}"
+        raise
+    finally:
+        big_money_calculating = False
+
+
+def _run_volume_shock_job(job, loader):
+    global volume_shock_alarms, volume_shock_calculating, volume_shock_calc_progress
+    volume_shock_calculating = True
+    volume_shock_calc_progress = "Starting..."
+    try:
+        alarms = calculate_volume_shock_scores(volume_shock_config, loader, job)
+        volume_shock_alarms = alarms
+        save_volume_shock_alarms_to_file(alarms)
+        volume_shock_calc_progress = f"Completed: {len(alarms)} alarms"
+        return {'count': len(alarms)}
+    except CalcJobCancelled:
+        volume_shock_calc_progress = "Cancelled"
+        raise
+    except Exception as e:
+        volume_shock_calc_progress = f"Error: {str(e)}"
+        raise
+    finally:
+        volume_shock_calculating = False
+
+
+def _run_sharp_job(job, loader):
+    global sharp_alarms, sharp_calculating, sharp_calc_progress
+    sharp_calculating = True
+    sharp_calc_progress = "Hesaplama baslatiliyor..."
+    try:
+        sharp_alarms = calculate_sharp_scores(sharp_config, loader, job)
+        save_sharp_alarms_to_file(sharp_alarms)
+        sharp_calc_progress = f"Tamamlandi! {len(sharp_alarms)} alarm bulundu."
+        return {'count': len(sharp_alarms)}
+    except CalcJobCancelled:
+        sharp_calc_progress = "Iptal edildi"
+        raise
+    except Exception as e:
+        sharp_calc_progress = f"Hata: {str(e)}"
+        raise
+    finally:
+        sharp_calculating = False
+
+
+def _run_publicmove_job(job, loader):
+    global publicmove_alarms, publicmove_calculating, publicmove_calc_progress
+    publicmove_calculating = True
+    publicmove_calc_progress = "Hesaplama baslatiliyor..."
+    try:
+        publicmove_alarms = calculate_publicmove_scores(publicmove_config, loader, job)
+        save_publicmove_alarms_to_file(publicmove_alarms)
+        publicmove_calc_progress = f"Tamamlandi! {len(publicmove_alarms)} alarm bulundu."
+        return {'count': len(publicmove_alarms)}
+    except CalcJobCancelled:
+        publicmove_calc_progress = "Iptal edildi"
+        raise
+    except Exception as e:
+        publicmove_calc_progress = f"Hata: {str(e)}"
+        raise
+    finally:
+        publicmove_calculating = False
+
+
+def _run_volume_leader_job(job, loader):
+    global volume_leader_alarms, volume_leader_calculating, volume_leader_calc_progress
+    volume_leader_calculating = True
+    volume_leader_calc_progress = "Hesaplama başlatılıyor..."
+    try:
+        new_alarms = calculate_volume_leader_scores(volume_leader_config, loader, job)
+        
+        # Merge with existing alarms (avoid duplicates)
+        existing_keys = set()
+        for alarm in volume_leader_alarms:
+            key = f"{alarm.get('home', '')}_{alarm.get('away', '')}_{alarm.get('market', '')}_{alarm.get('old_leader', '')}_{alarm.get('new_leader', '')}_{alarm.get('event_time', '')}"
+            existing_keys.add(key)
+        
+        for alarm in new_alarms:
+            key = f"{alarm.get('home', '')}_{alarm.get('away', '')}_{alarm.get('market', '')}_{alarm.get('old_leader', '')}_{alarm.get('new_leader', '')}_{alarm.get('event_time', '')}"
+            if key not in existing_keys:
+                volume_leader_alarms.append(alarm)
+                existing_keys.add(key)
+        
+        save_volume_leader_alarms_to_file(volume_leader_alarms)
+        volume_leader_calc_progress = f"Tamamlandı! {len(new_alarms)} yeni alarm bulundu."
+        return {'count': len(new_alarms), 'total': len(volume_leader_alarms)}
+    except CalcJobCancelled:
+        volume_leader_calc_progress = "İptal edildi"
+        raise
+    except Exception as e:
+        volume_leader_calc_progress = f"Hata: {str(e)}"
+        raise
+    finally:
+        volume_leader_calculating = False
+
+
+CALC_JOB_RUNNERS = {
+    'sharp': _run_sharp_job,
+    'publicmove': _run_publicmove_job,
+    'volumeshock': _run_volume_shock_job,
+    'bigmoney': _run_big_money_job,
+    'volumeleader': _run_volume_leader_job,
+}
+
+
+def _new_history_loader(job):
+    supabase = get_supabase_client()
+    return HistoryLoader(supabase, job) if supabase else None
+
+
+def _start_calc_job(kind):
+    """Tek hesaplayıcıyı arka planda başlat; aynı tip çalışıyorsa onun id'sini döner."""
+    runner = CALC_JOB_RUNNERS[kind]
+    job, started = calc_jobs.start(kind, lambda job: runner(job, _new_history_loader(job)),
+                                   exclusive_with=('batch',))
+    return jsonify({
+        'success': True,
+        'job_id': job.id,
+        'kind': job.kind,
+        'started': started,
+        'status_url': f'/api/calc-jobs/{job.id}',
+    })
+
+
+def _run_calc_batch(job, kinds):
+    """Birden fazla hesaplayıcıyı tek loader ile sırayla çalıştır (history paylaşılır).
+
+    Bir hesaplayıcının hatası diğerlerini durdurmaz: errors[kind]'a yazılır.
+    CalcJobCancelled BaseException olduğu için buradan geçip işi iptal eder.
+    """
+    loader = _new_history_loader(job)
+    counts = {}
+    errors = {}
+    for i, kind in enumerate(kinds):
+        _calc_job_progress(job, f"{kind} ({i+1}/{len(kinds)})")
+        try:
+            result = CALC_JOB_RUNNERS[kind](job, loader) or {}
+        except Exception as e:
+            print(f"[CalcJobs] Batch {kind} error: {e}")
+            counts[kind] = 0
+            errors[kind] = str(e)
+            continue
+        counts[kind] = result.get('count', 0)
+    if loader is not None:
+        print(f"[CalcJobs] Batch {','.join(kinds)} history: {loader.stats}")
+    return {'count': sum(counts.values()), 'counts': counts, 'errors': errors}
+
+
+@app.route('/api/calc-jobs', methods=['POST'])
+def start_calc_jobs():
+    """Birden fazla alarm hesaplamasını tek job'da başlat. Body: {"kinds": ["sharp", ...]}"""
+    data = request.get_json(silent=True) or {}
+    kinds = data.get('kinds') or list(CALC_JOB_RUNNERS.keys())
+    unknown = [k for k in kinds if k not in CALC_JOB_RUNNERS]
+    if unknown:
+        return jsonify({'success': False, 'error': f"Bilinmeyen hesaplama: {', '.join(unknown)}"}), 400
+    kinds = list(dict.fromkeys(kinds))
+    job, started = calc_jobs.start('batch', lambda job: _run_calc_batch(job, kinds),
+                                   exclusive_with=tuple(CALC_JOB_RUNNERS))
+    return jsonify({
+        'success': True,
+        'job_id': job.id,
+        'kind': job.kind,
+        'started': started,
+        'status_url': f'/api/calc-jobs/{job.id}',
+    })
+
+
+@app.route('/api/calc-jobs/<job_id>', methods=['GET'])
+def get_calc_job(job_id):
+    """Hesaplama job durumu (status: queued/running/done/failed/cancelled)"""
+    state = calc_jobs.get(job_id)
+    if state is None:
+        return jsonify({'success': False, 'error': 'Job bulunamadi'}), 404
+    return jsonify({'success': True, **state})
+
+
+@app.route('/api/calc-jobs/<job_id>/cancel', methods=['POST'])
+def cancel_calc_job(job_id):
+    """Çalışan hesaplamayı iptal et (bir sonraki maç/market adımında durur)"""
+    if calc_jobs.get(job_id) is None:
+        return jsonify({'success': False, 'error': 'Job bulunamadi'}), 404
+    return jsonify({'success': calc_jobs.cancel(job_id)})
+
+
 DEFAULT_ALARM_SETTINGS = {
     'sharp': {
         'enabled': True,
@@ -9778,7 +10309,9 @@ def validate_license():
                 if not exp_time or exp_time > now_dt:
                     days_left = (exp_time - now_dt).days if exp_time else 9999
                     print(f"[ValidateLic] Supabase timeout, serving from cache for {key[:8]}...")
-                    return jsonify({'valid': True, 'days_left': days_left, 'expires_at': cached.get('expires_str', ''), 'plan': cached.get('plan', 'core')})
+                    token, token_ttl = issue_license_token(key, cached.get('plan', 'core'), exp_time, device_id)
+                    return jsonify({'valid': True, 'days_left': days_left, 'expires_at': cached.get('expires_str', ''), 'plan': cached.get('plan', 'core'),
+                                    'token': token, 'token_expires_in': token_ttl})
             return jsonify({'valid': False, 'error': 'Supabase baglantisi gecici olarak kullanilamiyor, lutfen tekrar deneyin'})
         if not lic:
             return jsonify({'valid': False, 'error': 'Gecersiz lisans anahtari'})
@@ -9846,13 +10379,16 @@ def validate_license():
                 except:
                     pass
             _validated_licenses[key] = {'expires': exp_dt, 'plan': license_data.get('plan') or 'core', 'cached_at': time.time()}
+            token, token_ttl = issue_license_token(key, license_data.get('plan') or 'core', exp_dt, device_id)
             
             return jsonify({
                 'valid': True,
                 'days_left': days_left,
                 'expires_at': expires_at,
                 'email': license_data.get('email'),
-                'plan': license_data.get('plan') or 'core'
+                'plan': license_data.get('plan') or 'core',
+                'token': token,
+                'token_expires_in': token_ttl
             })
         
         if len(device_ids) >= max_devices:
@@ -9885,6 +10421,7 @@ def validate_license():
             except:
                 pass
         _validated_licenses[key] = {'expires': exp_dt, 'plan': license_data.get('plan') or 'core', 'cached_at': time.time()}
+        token, token_ttl = issue_license_token(key, license_data.get('plan') or 'core', exp_dt, device_id)
         
         return jsonify({
             'valid': True,
@@ -9892,7 +10429,9 @@ def validate_license():
             'expires_at': expires_at,
             'email': license_data.get('email'),
             'new_device': True,
-            'plan': license_data.get('plan') or 'core'
+            'plan': license_data.get('plan') or 'core',
+            'token': token,
+            'token_expires_in': token_ttl
         })
         
     except Exception as e:
@@ -9911,7 +10450,7 @@ def license_status():
         if not get_license_db():
             return jsonify({'valid': False, 'error': 'DB_UNAVAILABLE'}), 500
         
-        lic = license_select('licenses', 'expires_at,status,max_devices', {'key': key})
+        lic = license_select('licenses', 'expires_at,status,max_devices,plan', {'key': key})
         if lic is None:
             # Network error (timeout) — check memory/disk cache before blocking
             _load_license_cache()
@@ -9923,7 +10462,8 @@ def license_status():
                     days_left = (exp_time - now_dt).days if exp_time else 9999
                     exp_str = exp_time.isoformat() if exp_time else ''
                     print(f"[LicenseStatus] Supabase timeout, serving from cache for {key[:8]}...")
-                    return jsonify({'valid': True, 'days_left': days_left, 'expires_at': exp_str})
+                    token, token_ttl = issue_license_token(key, cached.get('plan', 'core'), exp_time, device_id)
+                    return jsonify({'valid': True, 'days_left': days_left, 'expires_at': exp_str, 'token': token, 'token_expires_in': token_ttl})
             return jsonify({'valid': False, 'error': 'DB_UNAVAILABLE'}), 503
         if not lic:
             return jsonify({'valid': False, 'error': 'LICENSE_NOT_FOUND', 'days_left': 0}), 404
@@ -9960,7 +10500,14 @@ def license_status():
                 if len(devices) >= max_devices:
                     return jsonify({'valid': False, 'error': 'DEVICE_KICKED', 'days_left': days_left, 'message': 'Baska bir cihazdan giris yapildi'})
         
-        return jsonify({'valid': True, 'days_left': days_left, 'expires_at': expires_at})
+        exp_dt = None
+        if expires_at:
+            try:
+                exp_dt = _parse_expires_naive(expires_at)
+            except Exception:
+                pass
+        token, token_ttl = issue_license_token(key, license_data.get('plan') or 'core', exp_dt, device_id)
+        return jsonify({'valid': True, 'days_left': days_left, 'expires_at': expires_at, 'token': token, 'token_expires_in': token_ttl})
     except Exception as e:
         return jsonify({'valid': False, 'error': str(e)}), 500
 
@@ -10892,7 +11439,12 @@ def _send_payment_telegram(order_no, plan_name, price, full_name, email):
         f"⚡ SmartXFlow Ödeme Sistemi"
     )
     url = f"https://api.telegram.org/bot{bot_token}/sendMessage"
+    governor = get_telegram_governor()
+    if not governor.acquire(bot_token, chat_id, max_wait=30):
+        print(f"[Payment TG] Rate limit queue full, skipping {order_no}")
+        return
     resp = _req.post(url, json={'chat_id': chat_id, 'text': text, 'parse_mode': 'HTML'}, timeout=10)
+    governor.observe(bot_token, chat_id, resp)
     if resp.status_code == 200:
         print(f"[Payment TG] Notification sent for {order_no}")
     else:
@@ -11036,7 +11588,12 @@ def _send_watchdog_telegram(message: str, is_error: bool = True) -> bool:
         emoji = "\U0001f534" if is_error else "\U0001f7e2"
         url = f'https://api.telegram.org/bot{bot_token}/sendMessage'
         data = {'chat_id': chat_id, 'text': f"{emoji} {message}", 'parse_mode': 'HTML'}
+        governor = get_telegram_governor()
+        if not governor.acquire(bot_token, chat_id, max_wait=30):
+            print("[Watchdog] Telegram rate limit kuyrugu dolu, mesaj atlandi")
+            return False
         r = _req.post(url, data=data, timeout=10)
+        governor.observe(bot_token, chat_id, r)
         return r.status_code == 200
     except Exception as e:
         print(f"[Watchdog] Telegram hata: {e}")
@@ -0,0 +1,278 @@
+"""
+Retention — eski satırları sınırlı, sıralı parçalar (chunk) halinde silme
+
+Tek bir `DELETE ...?col=lt.<cutoff>` büyük *_history / *_snapshots tablolarında
+statement timeout (57014) alıyor ve sürdüğü boyunca scraper yazımlarıyla
+çakışıyordu. ChunkedRetention silmeyi retention_delete_chunk RPC'si üzerinden
+yapar (migrations/2026_10_18_retention_chunked_delete.sql):
+
+- Her RPC en fazla `chunk_rows` satır siler (PK, yoksa tarih kolonu sırasıyla).
+- Chunk süresi ölçülür; hedef süreyi (chunk_budget_ms) aşmayacak şekilde chunk
+  boyu büyütülür/küçültülür. 57014 alınırsa chunk yarıya iner.
+- Bir çalıştırmanın toplam süresi run_budget ile sınırlı; bitmeyen tablolar
+  retention_progress tablosuna (yoksa process belleğine) yazılır ve sonraki
+  çalıştırma önce onlardan, öğrenilmiş chunk boyuyla devam eder.
+- Tablo gün bazlı partition'a taşınmışsa (opsiyonel migration) önce eski gün
+  partition'ları retention_drop_partitions ile sabit sürede düşürülür.
+- RPC yoksa (migration uygulanmamış) eski tek-statement silmeye düşülür.
+
+Bağımlılıksız: app (httpx.Client), standalone scraper (requests) ve alarm
+calculator aynı sınıfı kendi HTTP modülüyle kullanır.
+"""
+
+import time
+from typing import Any, Callable, Dict, Iterable, List, NamedTuple, Optional
+
+RPC_DELETE_CHUNK = 'retention_delete_chunk'
+RPC_DROP_PARTITIONS = 'retention_drop_partitions'
+PROGRESS_TABLE = 'retention_progress'
+
+INITIAL_CHUNK_ROWS = 1000
+MIN_CHUNK_ROWS = 100
+MAX_CHUNK_ROWS = 50000
+CHUNK_BUDGET_MS = 2000        # tek RPC hedef süresi (Supabase rol timeout'u ~8s)
+RUN_BUDGET_SECONDS = 300      # bir temizlik çalıştırmasının toplam süresi
+CHUNK_PAUSE_SECONDS = 0.05    # chunk'lar arası scraper yazımlarına nefes
+MAX_TIMEOUT_RETRIES = 3       # MIN_CHUNK_ROWS'da üst üste 57014 → tabloyu bırak
+
+# Process içi progress (retention_progress tablosu yoksa resume buradan)
+_LOCAL_PROGRESS: Dict[str, Dict[str, Any]] = {}
+
+
+class RetentionTarget(NamedTuple):
+    table: str
+    column: str
+    cutoff: str
+
+
+class ChunkedRetention:
+    """targets listesini chunk'lı silen temizleyici.
+
+    base_url: Supabase proje URL'i (…/rest/v1 eklenir)
+    headers:  her istek için header dict döndüren callable
+    http:     .post/.get/.delete sunan modül veya client (httpx, requests)
+    legacy_delete(table, column, cutoff) -> int: RPC yoksa kullanılacak eski yol
+    """
+
+    def __init__(self, base_url: str, headers: Callable[[], Dict[str, str]], http,
+                 legacy_delete: Optional[Callable[[str, str, str], int]] = None,
+                 chunk_budget_ms: int = CHUNK_BUDGET_MS,
+                 run_budget: float = RUN_BUDGET_SECONDS,
+                 pause: float = CHUNK_PAUSE_SECONDS,
+                 log: Callable[[str], None] = print,
+                 request_kwargs: Optional[Dict[str, Any]] = None,
+                 clock: Callable[[], float] = time.monotonic,
+                 sleep: Callable[[float], None] = time.sleep):
+        self.base_url = (base_url or '').rstrip('/')
+        self.headers = headers
+        self.http = http
+        self.legacy_delete = legacy_delete
+        self.chunk_budget_ms = chunk_budget_ms
+        self.run_budget = run_budget
+        self.pause = pause
+        self.log = log
+        self.request_kwargs = request_kwargs or {}
+        self.clock = clock
+        self.sleep = sleep
+        self._rpc_missing = False
+        self._partitions_rpc_missing = False
+        self._progress_table_missing = False
+        self.report: Dict[str, Dict[str, Any]] = {}
+
+    # --- public ---
+    def run(self, targets: Iterable[RetentionTarget]) -> Dict[str, int]:
+        """Hedefleri sil; tablo → silinen satır sayısı döner.
+
+        Ayrıntı (chunk sayısı, en uzun chunk, durum) self.report'ta:
+        status 'done' | 'partial' (bütçe bitti, sonraki çalıştırmada devam) |
+        'pending' (hiç başlanamadı) | 'error'.
+        """
+        start = self.clock()
+        progress = self._load_progress()
+        targets = [RetentionTarget(*t) for t in targets]
+        # Önceki çalıştırmada yarım kalan tablolar önce
+        targets.sort(key=lambda t: 0 if progress.get(t.table, {}).get('status') in ('partial', 'pending') else 1)
+
+        deleted: Dict[str, int] = {}
+        self.report = {}
+        for target in targets:
+            prev = progress.get(target.table) or {}
+            if self.clock() - start >= self.run_budget:
+                state = self._state(target, prev, 'pending')
+            else:
+                state = self._run_target(target, prev, start)
+            self.report[target.table] = state
+            if state['deleted'] > 0:
+                deleted[target.table] = state['deleted']
+            self._save_progress(target, state)
+        return deleted
+
+    @property
+    def pending(self) -> List[str]:
+        """Son çalıştırmada bitirilemeyen tablolar."""
+        return [t for t, s in self.report.items() if s['status'] in ('partial', 'pending')]
+
+    # --- tablo bazlı ---
+    def _state(self, target: RetentionTarget, prev: Dict[str, Any], status: str) -> Dict[str, Any]:
+        rows = prev.get('chunk_rows') or INITIAL_CHUNK_ROWS
+        return {'status': status, 'deleted': 0, 'chunks': 0, 'max_chunk_ms': 0,
+                'chunk_rows': int(rows), 'mode': 'chunked', 'partitions_dropped': 0,
+                'cutoff': target.cutoff}
+
+    def _run_target(self, target: RetentionTarget, prev: Dict[str, Any], start: float) -> Dict[str, Any]:
+        state = self._state(target, prev, 'done')
+        if self._rpc_missing:
+            return self._run_legacy(target, state)
+
+        state['partitions_dropped'] = self._drop_partitions(target)
+
+        rows = min(max(state['chunk_rows'], MIN_CHUNK_ROWS), MAX_CHUNK_ROWS)
+        timeouts = 0
+        while True:
+            if self.clock() - start >= self.run_budget:
+                state['status'] = 'partial'
+                break
+            t0 = self.clock()
+            count, error = self._delete_chunk(target, rows)
+            elapsed_ms = (self.clock() - t0) * 1000
+
+            if error == 'missing':
+                self._rpc_missing = True
+                self.log(f"[Retention] {RPC_DELETE_CHUNK} RPC yok — migrations/2026_10_18_retention_chunked_delete.sql "
+                         f"çalıştırın (tek-statement silmeye düşülüyor)")
+                return self._run_legacy(target, state)
+            if error == 'timeout':
+                timeouts = timeouts + 1 if rows <= MIN_CHUNK_ROWS else 0
+                if timeouts >= MAX_TIMEOUT_RETRIES:
+                    self.log(f"[Retention] {target.table}: {MIN_CHUNK_ROWS} satırlık chunk da timeout — sonraki çalıştırmaya bırakıldı")
+                    state['status'] = 'partial'
+                    break
+                rows = max(MIN_CHUNK_ROWS, rows // 2)
+                continue
+            if error:
+                self.log(f"[Retention] {target.table}: chunk hatası {error}")
+                state['status'] = 'error'
+                break
+
+            state['chunks'] += 1
+            state['deleted'] += count
+            state['max_chunk_ms'] = max(state['max_chunk_ms'], int(elapsed_ms))
+            state['chunk_rows'] = rows
+            if count < rows:
+                break
+            rows = self._next_chunk_rows(rows, elapsed_ms)
+            if self.pause:
+                self.sleep(self.pause)
+        return state
+
+    def _next_chunk_rows(self, rows: int, elapsed_ms: float) -> int:
+        """Bir sonraki chunk'ı bütçenin ~%60'ına hedefle (en fazla 2x büyü, en az yarıya in)."""
+        target_ms = self.chunk_budget_ms * 0.6
+        factor = target_ms / max(elapsed_ms, 1.0)
+        factor = min(2.0, max(0.5, factor))
+        return int(min(MAX_CHUNK_ROWS, max(MIN_CHUNK_ROWS, rows * factor)))
+
+    def _run_legacy(self, target: RetentionTarget, state: Dict[str, Any]) -> Dict[str, Any]:
+        state['mode'] = 'legacy'
+        if self.legacy_delete is None:
+            state['status'] = 'error'
+            return state
+        t0 = self.clock()
+        state['deleted'] = max(0, int(self.legacy_delete(target.table, target.column, target.cutoff) or 0))
+        state['chunks'] = 1
+        state['max_chunk_ms'] = int((self.clock() - t0) * 1000)
+        return state
+
+    # --- HTTP ---
+    def _rpc_url(self, name: str) -> str:
+        return f"{self.base_url}/rest/v1/rpc/{name}"
+
+    def _delete_chunk(self, target: RetentionTarget, rows: int):
+        """(silinen, hata) — hata: None | 'missing' | 'timeout' | metin"""
+        try:
+            resp = self.http.post(self._rpc_url(RPC_DELETE_CHUNK), headers=self.headers(),
+                                  json={'p_table': target.table, 'p_column': target.column,
+                                        'p_cutoff': target.cutoff, 'p_limit': int(rows)},
+                                  timeout=max(10, self.chunk_budget_ms * 3 / 1000), **self.request_kwargs)
+        except Exception as e:
+            if 'timed out' in str(e).lower() or 'timeout' in type(e).__name__.lower():
+                return 0, 'timeout'
+            return 0, str(e)[:200]
+        if resp.status_code == 200:
+            try:
+                return int(resp.json() or 0), None
+            except (TypeError, ValueError):
+                return 0, None
+        text = getattr(resp, 'text', '') or ''
+        if resp.status_code == 404 or 'PGRST202' in text:
+            return 0, 'missing'
+        if '57014' in text or resp.status_code in (408, 504):
+            return 0, 'timeout'
+        return 0, f"{resp.status_code}: {text[:200]}"
+
+    def _drop_partitions(self, target: RetentionTarget) -> int:
+        """Partition'lı tabloda cutoff'tan eski gün partition'larını düşür (değilse 0)."""
+        if self._partitions_rpc_missing:
+            return 0
+        try:
+            resp = self.http.post(self._rpc_url(RPC_DROP_PARTITIONS), headers=self.headers(),
+                                  json={'p_table': target.table, 'p_cutoff': target.cutoff},
+                                  timeout=30, **self.request_kwargs)
+            if resp.status_code == 200:
+                dropped = int(resp.json() or 0)
+                if dropped:
+                    self.log(f"[Retention] {target.table}: {dropped} gün partition'ı düşürüldü (< {target.cutoff})")
+                return dropped
+            if resp.status_code == 404 or 'PGRST202' in (getattr(resp, 'text', '') or ''):
+                self._partitions_rpc_missing = True
+        except Exception as e:
+            self.log(f"[Retention] {target.table}: partition drop hatası {e}")
+        return 0
+
+    def _load_progress(self) -> Dict[str, Dict[str, Any]]:
+        progress = {k: dict(v) for k, v in _LOCAL_PROGRESS.items()}
+        if self._progress_table_missing:
+            return progress
+        try:
+            resp = self.http.get(f"{self.base_url}/rest/v1/{PROGRESS_TABLE}?select=*",
+                                 headers=self.headers(), timeout=15, **self.request_kwargs)
+            if resp.status_code == 200:
+                for row in resp.json() or []:
+                    if row.get('table_name'):
+                        progress[row['table_name']] = row
+            elif resp.status_code == 404:
+                self._progress_table_missing = True
+        except Exception as e:
+            self.log(f"[Retention] progress okunamadı: {e}")
+        return progress
+
+    def _save_progress(self, target: RetentionTarget, state: Dict[str, Any]):
+        row = {'table_name': target.table, 'cutoff': target.cutoff, 'status': state['status'],
+               'deleted_rows': state['deleted'], 'chunks': state['chunks'],
+               'chunk_rows': state['chunk_rows'], 'max_chunk_ms': state['max_chunk_ms']}
+        _LOCAL_PROGRESS[target.table] = row
+        if self._progress_table_missing:
+            return
+        try:
+            headers = self.headers()
+            headers['Prefer'] = 'resolution=merge-duplicates'
+            resp = self.http.post(f"{self.base_url}/rest/v1/{PROGRESS_TABLE}?on_conflict=table_name",
+                                  headers=headers, json=[row], timeout=15, **self.request_kwargs)
+            if resp.status_code == 404:
+                self._progress_table_missing = True
+        except Exception as e:
+            self.log(f"[Retention] progress yazılamadı ({target.table}): {e}")
+
+
+def legacy_range_delete(http, base_url: str, headers: Callable[[], Dict[str, str]],
+                        table: str, column: str, cutoff: str, timeout: int = 60,
+                        **request_kwargs) -> int:
+    """Eski tek-statement `DELETE ?column=lt.cutoff` (RPC yoksa). Silinen satır sayısı."""
+    h = headers()
+    h['Prefer'] = 'count=exact'
+    resp = http.delete(f"{base_url.rstrip('/')}/rest/v1/{table}?{column}=lt.{cutoff}",
+                       headers=h, timeout=timeout, **request_kwargs)
+    if resp.status_code in (200, 204):
+        total = resp.headers.get('content-range', '').split('/')[-1]
+        return int(total) if total.isdigit() else 0
+    return 0
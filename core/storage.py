@@ -3,6 +3,10 @@ import sys
 from typing import List, Tuple, Optional, Dict, Any
 from dataclasses import dataclass
 import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from functools import lru_cache
 from datetime import datetime, timezone
 
 _SUPABASE_AVAILABLE = False
@@ -60,86 +64,223 @@ class StorageBackend:
         raise NotImplementedError
 
 
+_SQLITE_META_TABLE = "_storage_schema"
+# v2 oran/miktar kolonlarını REAL tutuyordu ('£1,234' → 1234.0 geri okunuyordu);
+# v3'te tüm kolonlar TEXT — değerler yazıldığı gibi döner, sayısal parse okuyanda.
+_SQLITE_SCHEMA_VERSION = 3
+_SQLITE_INTERNAL_COLS = ("_gen", "_pos")
+_SQLITE_MAIN_KEY = ("Home", "Away", "League", "Date")
+_SQLITE_HIST_KEY = ("Home", "Away", "ScrapedAt")
+
+
+@lru_cache(maxsize=8192)
+def _match_hash(home: str, away: str, league: str) -> Optional[str]:
+    """make_match_id_hash, süreç içinde cache'li (aynı maçlar her scrape'te tekrar gelir)."""
+    try:
+        from core.hash_utils import make_match_id_hash
+    except ImportError:
+        return None
+    return make_match_id_hash(home, away, league)
+
+
 class SQLiteStorage(StorageBackend):
+    """
+    Yerel / desktop mod backend'i.
+    - Thread başına tek uzun ömürlü bağlantı (WAL, synchronous=NORMAL); close() hepsini kapatır
+    - Kolonlar TEXT (değerler yazıldığı gibi okunur); ana tabloda (Home, Away, League, Date),
+      history'de (Home, Away, ScrapedAt) unique index. match_id_hash kolonu doldurulur ama
+      index'lenmez — yerel okuyucular Home/Away ile sorgular, ikinci index yazmayı yavaşlatıyordu
+    - replace_table: DROP + CREATE yerine tek transaction'da upsert + artık olmayan satırları sil
+    - append_history: tek transaction, cache'li INSERT ... ON CONFLICT ile executemany
+      (Supabase'deki on_conflict='Home,Away,ScrapedAt' ile aynı)
+    Eski sürümlerin yazdığı (index'siz ya da v2 REAL kolonlu) tablolar ilk yazmada bir kez taşınır.
+    Not: ':memory:' yolunda her thread kendi veritabanını görür.
+    """
     def __init__(self, db_path: str):
         self.db_path = db_path
-    def fetch_table_values(self, table_name: str) -> TableResult:
-        conn = sqlite3.connect(self.db_path)
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._connections: List[sqlite3.Connection] = []
+        self._columns: Dict[str, List[str]] = {}
+        self._sql: Dict[Tuple[Any, ...], str] = {}
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None,
+                                   check_same_thread=False, cached_statements=256)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute("PRAGMA temp_store=MEMORY")
+            conn.execute("PRAGMA cache_size=-16000")
+            # Scrape başına dağınık index sayfaları: sık checkpoint aynı sayfayı tekrar tekrar yazar
+            conn.execute("PRAGMA wal_autocheckpoint=4000")
+            conn.execute(f'CREATE TABLE IF NOT EXISTS "{_SQLITE_META_TABLE}" (tbl TEXT PRIMARY KEY, version INTEGER NOT NULL)')
+            self._local.conn = conn
+            with self._lock:
+                self._connections.append(conn)
+        return conn
+    def close(self) -> None:
+        """Tüm thread bağlantılarını kapat (uygulama kapanırken)."""
+        with self._lock:
+            conns, self._connections = self._connections, []
+            self._local = threading.local()
+        for conn in conns:
+            try:
+                conn.close()
+            except Exception:
+                pass
+    @contextmanager
+    def _transaction(self, conn: sqlite3.Connection):
+        conn.execute("BEGIN IMMEDIATE")
         try:
-            cur = conn.cursor()
-            cur.execute(f"SELECT * FROM \"{table_name}\"")
-            headers = [d[0] for d in cur.description]
-            rows = cur.fetchall()
-            return TableResult(headers=headers, rows=rows)
-        finally:
-            conn.close()
+            yield conn
+        except BaseException:
+            conn.execute("ROLLBACK")
+            # Şema cache'i geri alınan DDL'i görmüş olabilir
+            self._columns.clear()
+            raise
+        conn.execute("COMMIT")
+    def _ensure_table(self, conn: sqlite3.Connection, table: str, columns: List[str],
+                      key: Tuple[str, ...]) -> Tuple[List[str], List[Dict[str, Any]]]:
+        """Tabloyu kolon + index'lerle hazırla (transaction içinde çağrılır).
+        Dönüş: (güncel kolonlar, taşınacak eski satırlar)."""
+        cached = self._columns.get(table)
+        if cached is not None and all(c in cached for c in columns):
+            return cached, []
+        existing = [r[1] for r in conn.execute(f'PRAGMA table_info("{table}")')]
+        managed = conn.execute(f'SELECT version FROM "{_SQLITE_META_TABLE}" WHERE tbl=?', (table,)).fetchone()
+        legacy_rows: List[Dict[str, Any]] = []
+        if existing and (not managed or managed[0] != _SQLITE_SCHEMA_VERSION):
+            order = ' ORDER BY "_pos", rowid' if managed else ""
+            cur = conn.execute(f'SELECT * FROM "{table}"{order}')
+            names = [d[0] for d in cur.description]
+            keep = [i for i, n in enumerate(names) if n not in _SQLITE_INTERNAL_COLS]
+            # v2 REAL değerleri TEXT'e çevrilir (biçim geri gelmez: 1234.0 → '1234.0')
+            legacy_rows = [{names[i]: (None if row[i] is None else str(row[i])) for i in keep}
+                           for row in cur.fetchall()]
+            names = [names[i] for i in keep]
+            conn.execute(f'DROP TABLE "{table}"')
+            columns = names + [c for c in columns if c not in names]
+            existing = []
+        if not existing:
+            cols_def = ", ".join(f'"{c}" TEXT' for c in columns)
+            conn.execute(f'CREATE TABLE "{table}" ({cols_def}, "_gen" INTEGER NOT NULL DEFAULT 0, "_pos" INTEGER NOT NULL DEFAULT 0)')
+            existing = list(columns) + list(_SQLITE_INTERNAL_COLS)
+        for c in columns:
+            if c not in existing:
+                conn.execute(f'ALTER TABLE "{table}" ADD COLUMN "{c}" TEXT')
+                existing.append(c)
+        if key:
+            key_cols = ", ".join(f'"{c}"' for c in key)
+            conn.execute(f'CREATE UNIQUE INDEX IF NOT EXISTS "ux_{table}_key" ON "{table}" ({key_cols})')
+        elif "Home" in existing and "Away" in existing:
+            conn.execute(f'CREATE INDEX IF NOT EXISTS "ix_{table}_home_away" ON "{table}" ("Home", "Away")')
+        conn.execute(f'INSERT OR REPLACE INTO "{_SQLITE_META_TABLE}" (tbl, version) VALUES (?, ?)',
+                     (table, _SQLITE_SCHEMA_VERSION))
+        cols = [c for c in existing if c not in _SQLITE_INTERNAL_COLS]
+        self._columns[table] = cols
+        return cols, legacy_rows
+    def _upsert_sql(self, table: str, cols: List[str], key: Tuple[str, ...]) -> str:
+        cache_key = (table, tuple(cols), key)
+        sql = self._sql.get(cache_key)
+        if sql is None:
+            all_cols = list(cols) + list(_SQLITE_INTERNAL_COLS)
+            names = ", ".join(f'"{c}"' for c in all_cols)
+            sql = f'INSERT INTO "{table}" ({names}) VALUES ({", ".join(["?"] * len(all_cols))})'
+            if key:
+                key_cols = ", ".join(f'"{c}"' for c in key)
+                updates = ", ".join(f'"{c}"=excluded."{c}"' for c in all_cols if c not in key)
+                sql += f" ON CONFLICT({key_cols}) DO UPDATE SET {updates}"
+            self._sql[cache_key] = sql
+        return sql
+    @staticmethod
+    def _shape_rows(cols: List[str], key: Tuple[str, ...], records: List[Dict[str, Any]],
+                    fixed: Dict[str, Any], gen: int, ordered: bool) -> List[List[Any]]:
+        """records → executemany parametreleri; sabit kolonlar ve match hash tek geçişte."""
+        fixed_idx = [(i, fixed[c]) for i, c in enumerate(cols) if c in fixed]
+        key_idx = [i for i, c in enumerate(cols) if c in key and c not in fixed]
+        hash_idx = cols.index("match_id_hash") if "match_id_hash" in cols else None
+        rows = []
+        for pos, r in enumerate(records):
+            row = [r.get(c, "") for c in cols]
+            for i, v in fixed_idx:
+                row[i] = v
+            for i in key_idx:
+                if row[i] is None:
+                    row[i] = ""
+            if hash_idx is not None and not row[hash_idx]:
+                row[hash_idx] = _match_hash(r.get("Home") or "", r.get("Away") or "", r.get("League") or "")
+            row.append(gen)
+            row.append(pos if ordered else 0)
+            rows.append(row)
+        return rows
+    @staticmethod
+    def _row_dicts(cur: sqlite3.Cursor) -> List[Dict[str, Any]]:
+        headers = [d[0] for d in cur.description] if cur.description else []
+        keep = [i for i, h in enumerate(headers) if h not in _SQLITE_INTERNAL_COLS]
+        return [{headers[i]: row[i] for i in keep} for row in cur.fetchall()]
+    def fetch_table_values(self, table_name: str) -> TableResult:
+        conn = self._conn()
+        managed = conn.execute(f'SELECT 1 FROM "{_SQLITE_META_TABLE}" WHERE tbl=?', (table_name,)).fetchone()
+        order = ' ORDER BY "_pos", rowid' if managed else ""
+        cur = conn.execute(f'SELECT * FROM "{table_name}"{order}')
+        headers = [d[0] for d in cur.description]
+        keep = [i for i, h in enumerate(headers) if h not in _SQLITE_INTERNAL_COLS]
+        rows = [tuple(row[i] for i in keep) for row in cur.fetchall()]
+        return TableResult(headers=[headers[i] for i in keep], rows=rows)
     def replace_table(self, table_name: str, headers: List[str], records: List[Dict[str, Any]]) -> None:
-        conn = sqlite3.connect(self.db_path)
-        try:
-            cur = conn.cursor()
-            cur.execute(f"DROP TABLE IF EXISTS \"{table_name}\"")
-            cols_def = ", ".join([f'"{h}" TEXT' for h in headers])
-            cur.execute(f"CREATE TABLE IF NOT EXISTS \"{table_name}\" ({cols_def})")
-            cols = ", ".join([f'"{h}"' for h in headers])
-            placeholders = ", ".join(["?"] * len(headers))
-            insert_sql = f"INSERT INTO \"{table_name}\" ({cols}) VALUES ({placeholders})"
-            rows = [[r.get(h, "") for h in headers] for r in records]
-            cur.executemany(insert_sql, rows)
-            conn.commit()
-        finally:
-            conn.close()
+        conn = self._conn()
+        key = tuple(c for c in _SQLITE_MAIN_KEY if c in headers) if "Home" in headers and "Away" in headers else ()
+        gen = time.time_ns()
+        with self._transaction(conn):
+            # Eski tablonun satırları zaten değiştirileceği için taşınmaz
+            cols, _ = self._ensure_table(conn, table_name, list(headers), key)
+            sql = self._upsert_sql(table_name, cols, key)
+            if not key:
+                conn.execute(f'DELETE FROM "{table_name}"')
+            conn.executemany(sql, self._shape_rows(cols, key, records, {}, gen, True))
+            if key:
+                conn.execute(f'DELETE FROM "{table_name}" WHERE "_gen" <> ?', (gen,))
     def append_history(self, hist_table: str, headers: List[str], records: List[Dict[str, Any]], scraped_at: str) -> None:
-        conn = sqlite3.connect(self.db_path)
-        try:
-            cur = conn.cursor()
-            hist_headers = list(headers) + ["ScrapedAt"]
-            cols_def = ", ".join([f'"{h}" TEXT' for h in hist_headers])
-            cur.execute(f"CREATE TABLE IF NOT EXISTS \"{hist_table}\" ({cols_def})")
-            cols = ", ".join([f'"{h}"' for h in hist_headers])
-            placeholders = ", ".join(["?"] * len(hist_headers))
-            insert_sql = f"INSERT INTO \"{hist_table}\" ({cols}) VALUES ({placeholders})"
-            rows = [[r.get(h, "") for h in headers] + [scraped_at] for r in records]
-            cur.executemany(insert_sql, rows)
-            conn.commit()
-        finally:
-            conn.close()
+        conn = self._conn()
+        hist_headers = list(headers) + ["ScrapedAt"]
+        key = _SQLITE_HIST_KEY if "Home" in headers and "Away" in headers else ()
+        if key and "match_id_hash" not in hist_headers:
+            hist_headers.append("match_id_hash")
+        with self._transaction(conn):
+            cols, legacy = self._ensure_table(conn, hist_table, hist_headers, key)
+            sql = self._upsert_sql(hist_table, cols, key)
+            if legacy:
+                conn.executemany(sql, self._shape_rows(cols, key, legacy, {}, 0, False))
+            conn.executemany(sql, self._shape_rows(cols, key, records, {"ScrapedAt": scraped_at}, 0, False))
     def query_row(self, table_name: str, home: str, away: str) -> Optional[Dict[str, Any]]:
-        conn = sqlite3.connect(self.db_path)
-        try:
-            cur = conn.cursor()
-            cur.execute(f"SELECT * FROM \"{table_name}\" WHERE Home=? AND Away=? LIMIT 1", (home, away))
-            row = cur.fetchone()
-            if not row:
-                return None
-            headers = [d[0] for d in cur.description]
-            return {h: row[i] for i, h in enumerate(headers)}
-        finally:
-            conn.close()
+        cur = self._conn().execute(f'SELECT * FROM "{table_name}" WHERE Home=? AND Away=? LIMIT 1', (home, away))
+        rows = self._row_dicts(cur)
+        return rows[0] if rows else None
     def query_history(self, hist_table: str, home: str, away: str) -> List[Dict[str, Any]]:
-        conn = sqlite3.connect(self.db_path)
-        try:
-            cur = conn.cursor()
-            cur.execute(f"SELECT * FROM \"{hist_table}\" WHERE Home=? AND Away=? ORDER BY ScrapedAt", (home, away))
-            rows = cur.fetchall()
-            headers = [d[0] for d in cur.description] if cur.description else []
-            return [{h: row[i] for i, h in enumerate(headers)} for row in rows]
-        finally:
-            conn.close()
+        cur = self._conn().execute(f'SELECT * FROM "{hist_table}" WHERE Home=? AND Away=? ORDER BY ScrapedAt', (home, away))
+        return self._row_dicts(cur)
     def lookup_hist_row_by_label(self, hist_table: str, home: str, away: str, date_label: str) -> Optional[Dict[str, Any]]:
-        conn = sqlite3.connect(self.db_path)
-        try:
-            cur = conn.cursor()
-            cur.execute(
-                f"SELECT * FROM \"{hist_table}\" WHERE Home=? AND Away=? AND Date=? ORDER BY ScrapedAt DESC LIMIT 1",
-                (home, away, date_label),
-            )
-            row = cur.fetchone()
-            headers = [d[0] for d in cur.description] if cur.description else []
-            if row and headers:
-                return {h: row[i] for i, h in enumerate(headers)}
-            return None
-        finally:
-            conn.close()
+        cur = self._conn().execute(
+            f'SELECT * FROM "{hist_table}" WHERE Home=? AND Away=? AND Date=? ORDER BY ScrapedAt DESC LIMIT 1',
+            (home, away, date_label),
+        )
+        rows = self._row_dicts(cur)
+        return rows[0] if rows else None
+
+
+_TABLE_COLUMNS: Dict[str, List[str]] = {}
+_TABLE_COLUMNS_LOCK = threading.Lock()
+
+
+def invalidate_table_columns(table_name: Optional[str] = None) -> None:
+    """SupabaseStorage kolon cache'ini temizle (migration / şema değişikliği sonrası).
+    table_name verilmezse tüm tablolar."""
+    with _TABLE_COLUMNS_LOCK:
+        if table_name is None:
+            _TABLE_COLUMNS.clear()
+        else:
+            _TABLE_COLUMNS.pop(table_name, None)
 
 
 class SupabaseStorage(StorageBackend):
@@ -171,13 +312,29 @@ class SupabaseStorage(StorageBackend):
             batch = filtered[i:i+BATCH]
             self.client.table(table_name).insert(batch).execute()
     def _get_table_columns(self, table_name: str) -> List[str]:
-        try:
-            res = self.client.table(table_name).select('*').limit(1).execute()
-            if res.data:
-                return list(res.data[0].keys())
-        except Exception:
-            pass
-        return []
+        """Tablo kolonları, süreç başına bir kez çözülür: _HISTORY_SCHEMA'daki tablolar kod
+        içindeki sabit şemadan gelir (istek yok; şema değişirse _HISTORY_SCHEMA güncellenir),
+        diğerleri tek select('*').limit(1) ile. Boş tablo / hata [] döner ve cache'lenmez —
+        ilk satır yazılınca sonraki çağrı gerçek kolonları alır. Canlı şema değişikliğinden
+        sonra invalidate_table_columns ile bir sonraki çağrı yeniden introspect eder."""
+        with _TABLE_COLUMNS_LOCK:
+            cached = _TABLE_COLUMNS.get(table_name)
+        if cached is not None:
+            return cached
+        cols = list(self._HISTORY_SCHEMA.get(table_name, []))
+        if not cols:
+            try:
+                res = self.client.table(table_name).select('*').limit(1).execute()
+            except Exception:
+                return []
+            if not res.data:
+                return []
+            cols = list(res.data[0].keys())
+        with _TABLE_COLUMNS_LOCK:
+            _TABLE_COLUMNS[table_name] = cols
+        return cols
+    def invalidate_schema(self, table_name: Optional[str] = None) -> None:
+        invalidate_table_columns(table_name)
     _HISTORY_SCHEMA = {
         'moneyway_1x2_history': ['match_id_hash', 'home', 'away', 'league', 'date', 'odds1', 'oddsx', 'odds2', 'amt1', 'amtx', 'amt2', 'pct1', 'pctx', 'pct2', 'scraped_at'],
         'moneyway_ou25_history': ['match_id_hash', 'home', 'away', 'league', 'date', 'odds_over', 'odds_under', 'amt_over', 'amt_under', 'pct_over', 'pct_under', 'scraped_at'],
@@ -191,13 +348,11 @@ class SupabaseStorage(StorageBackend):
         if history_table == hist_table:
             return
         try:
-            from core.hash_utils import make_match_id_hash
+            from core.hash_utils import make_match_id_hash  # noqa: F401 (_match_hash kullanır)
         except ImportError:
             return
         try:
             table_cols = self._get_table_columns(history_table)
-            if not table_cols:
-                table_cols = self._HISTORY_SCHEMA.get(history_table, [])
             if not table_cols:
                 return
             try:
@@ -213,35 +368,8 @@ class SupabaseStorage(StorageBackend):
                 scraped_ts = scraped_at
                 if scraped_ts and '+' not in scraped_ts and 'Z' not in scraped_ts:
                     scraped_ts = scraped_ts + '+03:00'
-            rows = []
-            for r in records:
-                low = {k.lower(): v for k, v in r.items()}
-                home = low.get('home', '')
-                away = low.get('away', '')
-                league = low.get('league', '')
-                if not home or not away:
-                    continue
-                match_hash = make_match_id_hash(home, away, league)
-                row = {}
-                for col in table_cols:
-                    if col == 'id':
-                        continue
-                    elif col == 'match_id_hash':
-                        row[col] = match_hash
-                    elif col == 'scraped_at':
-                        row[col] = scraped_ts
-                    else:
-                        row[col] = low.get(col, '')
-                rows.append(row)
+            rows = self._shape_history_rows(table_cols, records, scraped_ts)
             if rows:
-                seen = set()
-                unique_rows = []
-                for row in rows:
-                    key = (row.get('match_id_hash', ''), row.get('scraped_at', ''))
-                    if key not in seen:
-                        seen.add(key)
-                        unique_rows.append(row)
-                rows = unique_rows
                 BATCH = 500
                 total_written = 0
                 failed_count = 0
@@ -265,6 +393,32 @@ class SupabaseStorage(StorageBackend):
                 print(f"[Storage] {history_table}: {total_written}/{len(rows)} rows written" + (f" ({failed_count} failed)" if failed_count else ""))
         except Exception as e:
             print(f"[Storage] {history_table} write error: {e}")
+    @staticmethod
+    def _shape_history_rows(table_cols: List[str], records: List[Dict[str, Any]], scraped_ts: str) -> List[Dict[str, Any]]:
+        """records → history satırları tek geçişte: kolon planı bir kez kurulur, hash cache'li,
+        (match_id_hash, scraped_at) tekrarları aynı döngüde elenir."""
+        value_cols = [c for c in table_cols if c not in ('id', 'match_id_hash', 'scraped_at')]
+        has_hash = 'match_id_hash' in table_cols
+        has_ts = 'scraped_at' in table_cols
+        seen = set()
+        rows = []
+        for r in records:
+            low = {k.lower(): v for k, v in r.items()}
+            home = low.get('home', '')
+            away = low.get('away', '')
+            if not home or not away:
+                continue
+            match_hash = _match_hash(home, away, low.get('league', '') or '')
+            if match_hash in seen:
+                continue
+            seen.add(match_hash)
+            row = {col: low.get(col, '') for col in value_cols}
+            if has_hash:
+                row['match_id_hash'] = match_hash
+            if has_ts:
+                row['scraped_at'] = scraped_ts
+            rows.append(row)
+        return rows
     def append_history(self, hist_table: str, headers: List[str], records: List[Dict[str, Any]], scraped_at: str) -> None:
         if not records:
             return
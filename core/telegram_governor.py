@@ -0,0 +1,184 @@
+"""
+Telegram Rate-Limit Governor - süreç geneli gönderim hız sınırlayıcı
+
+Tüm Telegram göndericileri (telegram_notifier, watchdog, ödeme bildirimi) aynı
+governor'dan geçer:
+  - bot (token) başına global bucket  (Telegram: ~30 mesaj/sn)
+  - chat başına bucket                (özel chat ~1 mesaj/sn, grup/kanal 20 mesaj/dk)
+  - 429 retry_after o chat'i ve botu herkes için durdurur; bekleyen tüm
+    çağıranlar aynı bloğa saygı duyar (her thread kendi başına uyumaz)
+Bucket'lar GCRA (virtual scheduling) ile tutulur: acquire() kilit altında bir
+gönderim zamanı rezerve eder, kilidin dışında o zamana kadar uyur.
+stats(): kuyruk derinliği, bekleme / 429 sayaçları.
+"""
+
+import os
+import threading
+import time
+from typing import Any, Callable, Dict, Optional, Tuple
+
+GLOBAL_RATE = float(os.environ.get('TELEGRAM_GLOBAL_RATE', '25'))        # mesaj/sn, bot başına
+GLOBAL_BURST = int(os.environ.get('TELEGRAM_GLOBAL_BURST', '25'))
+CHAT_RATE = float(os.environ.get('TELEGRAM_CHAT_RATE', '1'))             # özel chat
+CHAT_BURST = int(os.environ.get('TELEGRAM_CHAT_BURST', '3'))
+GROUP_RATE = float(os.environ.get('TELEGRAM_GROUP_RATE', str(20 / 60)))  # grup / kanal (chat_id '-' ile başlar)
+GROUP_BURST = int(os.environ.get('TELEGRAM_GROUP_BURST', '5'))
+MAX_WAIT = float(os.environ.get('TELEGRAM_MAX_WAIT', '120'))             # sn; üstü = gönderme
+
+
+class _Gcra:
+    """Tek bucket: tat (theoretical arrival time) + tolerans; blocked_until = retry_after bloğu."""
+
+    __slots__ = ('interval', 'tolerance', 'tat', 'blocked_until')
+
+    def __init__(self, rate: float, burst: int):
+        self.interval = 1.0 / rate
+        self.tolerance = (max(1, burst) - 1) * self.interval
+        self.tat = 0.0
+        self.blocked_until = 0.0
+
+    def earliest(self, now: float) -> float:
+        return max(now, self.tat - self.tolerance, self.blocked_until)
+
+    def take(self, at: float):
+        self.tat = max(self.tat, at) + self.interval
+
+
+def retry_after_from_response(response, default: float = 5.0) -> float:
+    """429 yanıtından retry_after (JSON parameters.retry_after, yoksa Retry-After header)."""
+    try:
+        value = (response.json() or {}).get('parameters', {}).get('retry_after')
+        if value is not None:
+            return float(value)
+    except Exception:
+        pass
+    try:
+        header = (getattr(response, 'headers', None) or {}).get('Retry-After')
+        if header:
+            return float(header)
+    except (TypeError, ValueError):
+        pass
+    return default
+
+
+class TelegramGovernor:
+    """Süreç geneli global + chat başına token bucket ve retry_after bloğu."""
+
+    def __init__(self, global_rate: float = GLOBAL_RATE, global_burst: int = GLOBAL_BURST,
+                 chat_rate: float = CHAT_RATE, chat_burst: int = CHAT_BURST,
+                 group_rate: float = GROUP_RATE, group_burst: int = GROUP_BURST,
+                 max_wait: float = MAX_WAIT,
+                 clock: Callable[[], float] = time.monotonic,
+                 sleep: Callable[[float], None] = time.sleep):
+        self.global_rate, self.global_burst = global_rate, global_burst
+        self.chat_rate, self.chat_burst = chat_rate, chat_burst
+        self.group_rate, self.group_burst = group_rate, group_burst
+        self.max_wait = max_wait
+        self.clock = clock
+        self.sleep = sleep
+        self._lock = threading.Lock()
+        self._bots: Dict[str, _Gcra] = {}
+        self._chats: Dict[Tuple[str, str], _Gcra] = {}
+        self._counters = {
+            'queue_depth': 0,
+            'peak_queue_depth': 0,
+            'granted': 0,
+            'waited': 0,
+            'wait_seconds': 0.0,
+            'throttled_429': 0,
+            'rejected': 0,
+        }
+
+    def _buckets(self, token: str, chat_id: str) -> Tuple[_Gcra, _Gcra]:
+        bot = self._bots.get(token)
+        if bot is None:
+            bot = self._bots[token] = _Gcra(self.global_rate, self.global_burst)
+        key = (token, str(chat_id))
+        chat = self._chats.get(key)
+        if chat is None:
+            group = str(chat_id).startswith('-')
+            chat = self._chats[key] = _Gcra(self.group_rate if group else self.chat_rate,
+                                             self.group_burst if group else self.chat_burst)
+        return bot, chat
+
+    def acquire(self, token: str, chat_id: str, max_wait: Optional[float] = None) -> bool:
+        """Gönderim slotu al (gerekirse bekle). Bekleme max_wait'i aşacaksa False."""
+        max_wait = self.max_wait if max_wait is None else max_wait
+        with self._lock:
+            now = self.clock()
+            bot, chat = self._buckets(token, chat_id)
+            at = max(bot.earliest(now), chat.earliest(now))
+            if at - now > max_wait:
+                self._counters['rejected'] += 1
+                return False
+            bot.take(at)
+            chat.take(at)
+            self._counters['granted'] += 1
+            self._counters['queue_depth'] += 1
+            self._counters['peak_queue_depth'] = max(self._counters['peak_queue_depth'], self._counters['queue_depth'])
+            if at > now:
+                self._counters['waited'] += 1
+                self._counters['wait_seconds'] += at - now
+        try:
+            while True:
+                wait = at - self.clock()
+                if wait > 0:
+                    self.sleep(wait)
+                # Rezervasyondan sonra gelen 429 bloğu da beklenir
+                with self._lock:
+                    blocked = max(bot.blocked_until, chat.blocked_until)
+                    if blocked <= at:
+                        return True
+                    if blocked - self.clock() > max_wait:
+                        self._counters['rejected'] += 1
+                        return False
+                    self._counters['wait_seconds'] += blocked - at
+                    at = blocked
+        finally:
+            with self._lock:
+                self._counters['queue_depth'] -= 1
+
+    def penalize(self, token: str, chat_id: str, retry_after: float):
+        """429: bot ve chat retry_after boyunca tüm göndericiler için durur."""
+        with self._lock:
+            until = self.clock() + max(0.0, float(retry_after))
+            bot, chat = self._buckets(token, chat_id)
+            bot.blocked_until = max(bot.blocked_until, until)
+            chat.blocked_until = max(chat.blocked_until, until)
+            self._counters['throttled_429'] += 1
+
+    def observe(self, token: str, chat_id: str, response) -> bool:
+        """Yanıtı governor'a bildir; 429 ise penalize edip True döner (tekrar denenebilir)."""
+        if getattr(response, 'status_code', None) != 429:
+            return False
+        self.penalize(token, chat_id, retry_after_from_response(response))
+        return True
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            out = dict(self._counters)
+            now = self.clock()
+            out['wait_seconds'] = round(out['wait_seconds'], 3)
+            out['blocked_chats'] = sum(1 for c in self._chats.values() if c.blocked_until > now)
+            out['blocked_bots'] = sum(1 for b in self._bots.values() if b.blocked_until > now)
+        return out
+
+
+_governor: Optional[TelegramGovernor] = None
+_governor_lock = threading.Lock()
+
+
+def get_governor() -> TelegramGovernor:
+    """Süreç geneli governor (ilk çağrıda oluşur)."""
+    global _governor
+    with _governor_lock:
+        if _governor is None:
+            _governor = TelegramGovernor()
+        return _governor
+
+
+def set_governor(governor: Optional[TelegramGovernor]):
+    """Governor'ı değiştir (test / özel limitler); None → varsayılan yeniden oluşur."""
+    global _governor
+    with _governor_lock:
+        _governor = governor
@@ -3,9 +3,11 @@ SmartXFlow Timezone Configuration
 All timestamps use Turkey timezone (Europe/Istanbul)
 """
 
+import re
 import pytz
 from datetime import datetime
-from typing import Optional
+from functools import lru_cache
+from typing import Optional, Tuple
 
 TURKEY_TZ = pytz.timezone('Europe/Istanbul')
 
@@ -89,6 +91,110 @@ def is_today_turkey(timestamp_str: str) -> bool:
     except Exception:
         return False
 
+# ==================== KICKOFF PARSE CACHE ====================
+# Aynı birkaç yüz kickoff string'i her döngüde binlerce kez parse ediliyordu
+# (app hesaplayıcıları, sinyal_engine). Yılsız alanlar string başına bir kez
+# çözülür; datetime + UTC epoch (yıl, tz) başına önbelleklenir. Sınırlı LRU.
+
+KICKOFF_CACHE_SIZE = 4096
+
+_MONTHS = {
+    'jan': 1, 'feb': 2, 'mar': 3, 'apr': 4, 'may': 5, 'jun': 6,
+    'jul': 7, 'aug': 8, 'sep': 9, 'oct': 10, 'nov': 11, 'dec': 12,
+}
+
+# "03.Dec 17:00:00", "03.Dec17:00", "03.12 17:00", "03.12.2025 17:00:00", "08.Apr"
+_KICKOFF_RE = re.compile(
+    r'^\s*(\d{1,2})\.([A-Za-z]{3}|\d{1,2})(?:\.(\d{4}))?'
+    r'\s*(?:(\d{1,2}):(\d{2})(?::(\d{2}))?)?'
+)
+
+
+@lru_cache(maxsize=KICKOFF_CACHE_SIZE)
+def parse_kickoff_fields(date_str: str) -> Optional[Tuple]:
+    """Kickoff string → (year|None, month, day, hour|None, minute|None, second|None).
+
+    Yıl string'de yoksa None (çağıran kendi yılını seçer). Saat yoksa
+    hour/minute/second None. Tanınmayan format / ay → None.
+    """
+    if not date_str:
+        return None
+    m = _KICKOFF_RE.match(date_str)
+    if not m:
+        return None
+    month_part = m.group(2)
+    month = int(month_part) if month_part.isdigit() else _MONTHS.get(month_part.lower())
+    if not month or not 1 <= month <= 12:
+        return None
+    year = int(m.group(3)) if m.group(3) else None
+    if m.group(4) is None:
+        return (year, month, int(m.group(1)), None, None, None)
+    return (year, month, int(m.group(1)), int(m.group(4)), int(m.group(5)),
+            int(m.group(6)) if m.group(6) else 0)
+
+
+@lru_cache(maxsize=KICKOFF_CACHE_SIZE)
+def _kickoff_cached(date_str: str, year: int, tz) -> Optional[Tuple[datetime, int]]:
+    fields = parse_kickoff_fields(date_str)
+    if not fields or fields[3] is None:
+        return None
+    try:
+        naive = datetime(fields[0] or year, fields[1], fields[2], fields[3], fields[4], fields[5])
+    except ValueError:
+        return None
+    dt = tz.localize(naive) if hasattr(tz, 'localize') else naive.replace(tzinfo=tz)
+    return dt, int(dt.timestamp())
+
+
+def kickoff_datetime(date_str: str, year: Optional[int] = None, tz=TURKEY_TZ) -> Optional[datetime]:
+    """Kickoff string → tz-aware datetime (önbellekli).
+
+    year: string'de yıl yoksa kullanılacak yıl (varsayılan: bugünün TR yılı).
+    tz: string'in yorumlanacağı saat dilimi (varsayılan TR).
+    """
+    if not date_str:
+        return None
+    hit = _kickoff_cached(str(date_str).strip(), year or now_turkey().year, tz)
+    return hit[0] if hit else None
+
+
+def kickoff_epoch(date_str: str, year: Optional[int] = None, tz=TURKEY_TZ) -> Optional[int]:
+    """Kickoff'un UTC epoch saniyesi — yakınlık filtreleri int karşılaştırmasıyla yapılır."""
+    if not date_str:
+        return None
+    hit = _kickoff_cached(str(date_str).strip(), year or now_turkey().year, tz)
+    return hit[1] if hit else None
+
+
+@lru_cache(maxsize=KICKOFF_CACHE_SIZE * 16)
+def snapshot_epoch(scraped_at: str) -> Optional[int]:
+    """scraped_at ISO timestamp → UTC epoch. Offset yoksa TR saati kabul edilir."""
+    if not scraped_at:
+        return None
+    try:
+        dt = datetime.fromisoformat(scraped_at.replace('Z', '+00:00'))
+    except ValueError:
+        return None
+    if dt.tzinfo is None:
+        dt = TURKEY_TZ.localize(dt)
+    return int(dt.timestamp())
+
+
+def kickoff_cache_info() -> dict:
+    """Benchmark / log için önbellek istatistikleri."""
+    return {
+        'fields': parse_kickoff_fields.cache_info()._asdict(),
+        'kickoff': _kickoff_cached.cache_info()._asdict(),
+        'snapshot': snapshot_epoch.cache_info()._asdict(),
+    }
+
+
+def clear_kickoff_cache():
+    parse_kickoff_fields.cache_clear()
+    _kickoff_cached.cache_clear()
+    snapshot_epoch.cache_clear()
+
+
 def parse_match_datetime(match_date_str: str) -> Optional[datetime]:
     """
     Parse match date string to datetime object in Turkey timezone.
@@ -98,6 +204,7 @@ def parse_match_datetime(match_date_str: str) -> Optional[datetime]:
     - "DD.MonHH:MM:SS" (without space, from dropping markets)
     - "DD.MM HH:MM"
     - "DD.MMHH:MM" (without space)
+    - "DD.MM.YYYY HH:MM[:SS]"
     
     Args:
         match_date_str: Match date string in various formats (Turkey time)
@@ -109,45 +216,7 @@ def parse_match_datetime(match_date_str: str) -> Optional[datetime]:
         return None
     
     try:
-        import re
-        
-        match_date_str = match_date_str.strip()
-        today = now_turkey()
-        current_year = today.year
-        
-        month_map = {
-            'jan': 1, 'feb': 2, 'mar': 3, 'apr': 4, 'may': 5, 'jun': 6,
-            'jul': 7, 'aug': 8, 'sep': 9, 'oct': 10, 'nov': 11, 'dec': 12,
-            '01': 1, '02': 2, '03': 3, '04': 4, '05': 5, '06': 6,
-            '07': 7, '08': 8, '09': 9, '10': 10, '11': 11, '12': 12,
-            '1': 1, '2': 2, '3': 3, '4': 4, '5': 5, '6': 6,
-            '7': 7, '8': 8, '9': 9
-        }
-        
-        patterns = [
-            r'^(\d{1,2})\.(\w{3})\s+(\d{1,2}):(\d{2})(?::(\d{2}))?',
-            r'^(\d{1,2})\.(\w{3})(\d{1,2}):(\d{2})(?::(\d{2}))?',
-            r'^(\d{1,2})\.(\d{1,2})\s+(\d{1,2}):(\d{2})(?::(\d{2}))?',
-            r'^(\d{1,2})\.(\d{1,2})(\d{1,2}):(\d{2})(?::(\d{2}))?',
-        ]
-        
-        for pattern in patterns:
-            match = re.match(pattern, match_date_str, re.IGNORECASE)
-            if match:
-                day = int(match.group(1))
-                month_part = match.group(2)
-                hour = int(match.group(3))
-                minute = int(match.group(4))
-                second = int(match.group(5)) if match.group(5) else 0
-                
-                month_lower = month_part.lower()[:3] if not month_part.isdigit() else month_part
-                month = month_map.get(month_lower, today.month)
-                
-                match_dt = TURKEY_TZ.localize(datetime(current_year, month, day, hour, minute, second))
-                return match_dt
-        
-        return None
-        
+        return kickoff_datetime(match_date_str)
     except Exception as e:
         print(f"[Timezone] Error parsing match datetime '{match_date_str}': {e}")
         return None
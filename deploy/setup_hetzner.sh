@@ -92,6 +92,7 @@ SUPABASE_ANON_KEY=YOUR_ANON_KEY_HERE
 SUPABASE_SERVICE_ROLE_KEY=YOUR_SERVICE_ROLE_KEY_HERE
 
 SESSION_SECRET=GUCLU_RASTGELE_BIR_SECRET_BURAYA
+LICENSE_TOKEN_SECRET=AYRI_GUCLU_RASTGELE_BIR_SECRET_BURAYA
 
 PAYMENT_BOT_TOKEN=YOUR_TELEGRAM_BOT_TOKEN
 PAYMENT_CHAT_ID=YOUR_TELEGRAM_CHAT_ID
@@ -7,9 +7,10 @@ import os
 import sys
 import json
 import threading
+import bisect
 import tkinter as tk
 from tkinter import ttk, messagebox
-from datetime import datetime
+from datetime import datetime, timedelta
 import requests
 
 try:
@@ -20,6 +21,9 @@ except ImportError:
 
 VERSION = "1.0"
 REFRESH_INTERVAL = 30000
+SYNC_OVERLAP_SECONDS = 30    # cursor geri payı: geç commit olan satırlar kaçmasın
+FULL_RESYNC_EVERY = 20       # her N senkronda bir tam çekim (emniyet)
+PAGE_SIZE = 1000             # PostgREST max-rows: tek yanıt en fazla bu kadar satır
 
 MARKETS = {
     "Moneyway 1X2": "moneyway_1x2",
@@ -81,19 +85,185 @@ class SupabaseClient:
             "Authorization": f"Bearer {self.key}"
         }
     
-    def fetch_table(self, table):
-        try:
+    def _fetch_pages(self, table, params):
+        """Sunucu tek yanıtta en fazla PAGE_SIZE satır döner: kısa sayfa gelene kadar
+        limit/offset ile sayfala (order'da id eşitlik bozucu olmalı). Hata → None"""
+        rows = []
+        while True:
             resp = requests.get(
-                f"{self.url}/rest/v1/{table}?select=*&order=date.desc",
+                f"{self.url}/rest/v1/{table}",
+                params={**params, "limit": PAGE_SIZE, "offset": len(rows)},
                 headers=self._headers(),
                 timeout=15
             )
-            if resp.status_code == 200:
-                return resp.json()
-            return []
+            if resp.status_code != 200:
+                return None
+            page = resp.json()
+            rows.extend(page)
+            if len(page) < PAGE_SIZE:
+                return rows
+    
+    def fetch_table(self, table):
+        # Aynı date'li satırlar id artan: apply_to_tree yeni satırı eşitlerin sonuna ekler
+        try:
+            rows = self._fetch_pages(table, {"select": "*", "order": "date.desc,id.asc"})
+            return rows if rows is not None else []
         except Exception as e:
             print(f"Fetch error: {e}")
             return []
+    
+    def fetch_changed(self, table, since):
+        """updated_at > since olan satırlar. Hata / kolon yok (migration uygulanmamış) → None"""
+        try:
+            return self._fetch_pages(table, {"select": "*", "updated_at": f"gt.{since}",
+                                             "order": "updated_at.asc,id.asc"})
+        except Exception as e:
+            print(f"Fetch error: {e}")
+            return None
+    
+    def fetch_keys(self, table):
+        """Tablodaki tüm satır id'leri (silinenleri bulmak için). Hata → None
+        id keyset ile sayfalanır: sayfalar arasında silinen satır offset'i kaydırıp id atlatmaz"""
+        try:
+            keys = set()
+            last_id = None
+            while True:
+                params = {"select": "id", "order": "id.asc", "limit": PAGE_SIZE}
+                if last_id is not None:
+                    params["id"] = f"gt.{last_id}"
+                resp = requests.get(
+                    f"{self.url}/rest/v1/{table}",
+                    params=params,
+                    headers=self._headers(),
+                    timeout=15
+                )
+                if resp.status_code != 200:
+                    return None
+                page = resp.json()
+                keys.update(str(r.get('id')) for r in page)
+                if len(page) < PAGE_SIZE:
+                    return keys
+                last_id = page[-1].get('id')
+        except Exception as e:
+            print(f"Fetch error: {e}")
+            return None
+
+
+def row_key(row):
+    if row.get('id') is not None:
+        return str(row['id'])
+    return '|'.join(str(row.get(c, '')) for c in ('league', 'home', 'away', 'date'))
+
+
+def row_values(row, columns):
+    values = []
+    for col in columns:
+        val = row.get(col.lower(), row.get(col, ''))
+        if val is None:
+            val = ''
+        values.append(str(val))
+    return tuple(values)
+
+
+def _parse_ts(value):
+    try:
+        return datetime.fromisoformat(str(value).replace('Z', '+00:00'))
+    except (TypeError, ValueError):
+        return None
+
+
+class MarketCache:
+    """Bir marketin yerel kopyası: key → satır + updated_at cursor'ı.
+    replace()/merge() sadece gerçekten değişen satırları (changed) ve silinen key'leri döner."""
+    
+    def __init__(self, table):
+        self.table = table
+        self.rows = {}
+        self.cursor = None
+        self.syncs = 0
+    
+    def since(self):
+        """Bir sonraki delta isteğinin alt sınırı (cursor - SYNC_OVERLAP_SECONDS); cursor yoksa None"""
+        if self.cursor is None:
+            return None
+        return (self.cursor - timedelta(seconds=SYNC_OVERLAP_SECONDS)).isoformat()
+    
+    def _advance(self, rows):
+        for row in rows:
+            ts = _parse_ts(row.get('updated_at'))
+            if ts is not None and (self.cursor is None or ts > self.cursor):
+                self.cursor = ts
+    
+    def merge(self, rows, keys=None):
+        """Delta satırlarını uygula; keys verilirse listede olmayanlar silinir."""
+        changed = {}
+        for row in rows:
+            key = row_key(row)
+            if self.rows.get(key) != row:
+                self.rows[key] = row
+                changed[key] = row
+        deleted = []
+        if keys is not None:
+            deleted = [k for k in self.rows if k not in keys and k not in changed]
+            for k in deleted:
+                del self.rows[k]
+        self._advance(rows)
+        self.syncs += 1
+        return changed, deleted
+    
+    def replace(self, rows):
+        """Tam çekim: tabloyu rows ile değiştir (fark yine changed/deleted olarak döner)."""
+        self.cursor = None
+        return self.merge(rows, {row_key(r) for r in rows})
+
+
+def sync_market(client, cache, lock=None):
+    """Cache'i sunucuyla eşitle. Dönüş: (changed, deleted, full)
+    lock sadece cache'e yazarken tutulur; ağ istekleri kilit dışında"""
+    lock = lock or threading.Lock()
+    since = cache.since()
+    if since is not None and cache.syncs % FULL_RESYNC_EVERY:
+        rows = client.fetch_changed(cache.table, since)
+        keys = client.fetch_keys(cache.table) if rows is not None else None
+        if rows is not None and keys is not None:
+            with lock:
+                changed, deleted = cache.merge(rows, keys)
+            return changed, deleted, False
+    rows = client.fetch_table(cache.table)
+    with lock:
+        changed, deleted = cache.replace(rows)
+    return changed, deleted, True
+
+
+def apply_to_tree(tree, columns, rows, changed, deleted):
+    """Treeview'i yerinde güncelle: sadece silinen / değişen / yeni satırlara dokunur.
+    Sıra sunucudaki gibi date azalan; yeni satırlar bisect ile yerine eklenir."""
+    for key in deleted:
+        if tree.exists(key):
+            tree.delete(key)
+    
+    new_rows = []
+    for key, row in changed.items():
+        if tree.exists(key):
+            tree.item(key, values=row_values(row, columns))
+        else:
+            new_rows.append((str(row.get('date', '')), key, row))
+    if not new_rows:
+        return
+    
+    new_rows.sort(key=lambda r: r[0], reverse=True)
+    children = tree.get_children()
+    if not children:
+        for _, key, row in new_rows:
+            tree.insert('', 'end', iid=key, values=row_values(row, columns))
+        return
+    
+    # Mevcut sıranın artan date listesi; index = date'i >= olan satır sayısı
+    dates_asc = [str(rows[k].get('date', '')) if k in rows else '' for k in reversed(children)]
+    for date, key, row in new_rows:
+        pos = bisect.bisect_left(dates_asc, date)
+        tree.insert('', len(dates_asc) - pos, iid=key, values=row_values(row, columns))
+        dates_asc.insert(pos, date)
 
 
 class SmartXFlowApp:
@@ -114,7 +284,10 @@ class SmartXFlowApp:
         )
         
         self.current_market = "moneyway_1x2"
-        self.data = []
+        self.caches = {}
+        self.tree_market = None
+        self.fetch_lock = threading.Lock()   # senkronlar sırayla (eski delta yeniyi ezmesin)
+        self.sync_lock = threading.Lock()    # cache yazma / UI kopyası (kısa)
         
         self.setup_styles()
         self.create_widgets()
@@ -253,33 +426,39 @@ class SmartXFlowApp:
     
     def load_data(self):
         self.status_label.config(text="Yükleniyor...")
+        market = self.current_market
+        cache = self.caches.setdefault(market, MarketCache(market))
         
         def fetch():
-            data = self.client.fetch_table(self.current_market)
-            self.root.after(0, lambda: self.display_data(data))
+            with self.fetch_lock:
+                changed, deleted, full = sync_market(self.client, cache, self.sync_lock)
+            self.root.after(0, lambda: self.display_data(market, changed, deleted, full))
         
         thread = threading.Thread(target=fetch, daemon=True)
         thread.start()
     
-    def display_data(self, data):
-        columns = MARKET_COLUMNS.get(self.current_market, [])
-        self.setup_columns(columns)
-        
-        for row in data:
-            values = []
-            for col in columns:
-                col_lower = col.lower()
-                val = row.get(col_lower, row.get(col, ''))
-                if val is None:
-                    val = ''
-                values.append(str(val))
-            
-            self.tree.insert('', 'end', values=values)
+    def display_data(self, market, changed, deleted, full):
+        if market != self.current_market:
+            return
+        cache = self.caches[market]
+        # Fetch thread'i aynı anda merge edebilir: cache'i kilit altında kopyala
+        with self.sync_lock:
+            rows = dict(cache.rows)
+        columns = MARKET_COLUMNS.get(market, [])
+        if self.tree_market != market:
+            # Market değişti: tabloyu cache'ten baştan kur
+            self.setup_columns(columns)
+            self.tree_market = market
+            changed, deleted = rows, []
+        apply_to_tree(self.tree, columns, rows, changed, deleted)
         
-        count = len(data)
-        market_name = [k for k, v in MARKETS.items() if v == self.current_market][0]
+        count = len(rows)
+        market_name = [k for k, v in MARKETS.items() if v == market][0]
+        mode = "tam" if full else "delta"
         self.status_label.config(text=f"{count} maç yüklendi")
-        self.stats_label.config(text=f"Market: {market_name} | Toplam: {count} maç | Son güncelleme: {get_turkey_time()}")
+        self.stats_label.config(text=f"Market: {market_name} | Toplam: {count} maç | "
+                                     f"Değişen: {len(changed)} / Silinen: {len(deleted)} ({mode}) | "
+                                     f"Son güncelleme: {get_turkey_time()}")
     
     def auto_refresh(self):
         self.load_data()
@@ -20,6 +20,7 @@ a = Analysis(
         ('BUILD_INFO.txt', '.'),
         ('standalone_scraper.py', '.'),
         ('excapper_scraper.py', '.'),
+        ('fetch_scheduler.py', '.'),
         ('alarm_calculator.py', '.'),
         ('smartxflow.ico', '.'),
         (certifi_path, 'certifi'),
@@ -34,6 +35,7 @@ a = Analysis(
         # Scraper modules
         'standalone_scraper',
         'excapper_scraper',
+        'fetch_scheduler',
         'alarm_calculator',
         # Flask & Web
         'flask',
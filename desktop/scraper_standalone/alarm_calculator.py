@@ -27,6 +27,22 @@ try:
 except ImportError:
     import requests as httpx
 
+try:
+    from core.retention import ChunkedRetention
+except ImportError:
+    ChunkedRetention = None
+
+try:
+    import sys
+    _ROOT_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    if _ROOT_DIR not in sys.path:
+        sys.path.append(_ROOT_DIR)
+    from core.telegram_governor import get_governor, retry_after_from_response
+except ImportError:
+    get_governor = None
+
+TELEGRAM_API_URL = "https://api.telegram.org/bot{token}/sendMessage"
+
 _logger_callback: Optional[Callable[[str], None]] = None
 
 
@@ -310,6 +326,17 @@ def parse_match_date(date_str: str) -> Optional[datetime]:
     return None
 
 
+def _is_hash_key(key: str) -> bool:
+    """12 karakter hex match_id_hash mi (fallback league|home|away|date key'i değil)"""
+    if len(key) != 12:
+        return False
+    try:
+        int(key, 16)
+        return True
+    except ValueError:
+        return False
+
+
 def normalize_date_for_db(date_str: str) -> str:
     """
     Tüm tarih formatlarını PostgreSQL DATE formatına (YYYY-MM-DD) çevir.
@@ -377,6 +404,8 @@ class AlarmCalculator:
         self._matches_cache = {}
         self._telegram_settings = None
         self._telegram_sent_cache = {}
+        self.shard = None             # (index, count) — alarm_engine shard worker modu
+        self._captured_writes = None  # shard worker'da yazmalar burada toplanır (supervisor yazar)
         if logger_callback:
             set_logger(logger_callback)
         self.load_configs()
@@ -796,7 +825,7 @@ class AlarmCalculator:
             else:
                 text = self._format_default_telegram(alarm, alarm_type, home, away, market, selection, timestamp)
             
-            url = f"https://api.telegram.org/bot{token}/sendMessage"
+            url = TELEGRAM_API_URL.format(token=token)
             payload = {
                 "chat_id": chat_id,
                 "text": text,
@@ -804,8 +833,12 @@ class AlarmCalculator:
                 "parse_mode": "HTML"
             }
             
+            # Slot ve 429 bloğu telegram_notifier ile aynı governor'dan (core/telegram_governor.py)
             for attempt in range(3):
                 try:
+                    if get_governor is not None and not get_governor().acquire(token, chat_id):
+                        log(f"[Telegram] Rate limit queue too long, dropped: {alarm_type} - {home} vs {away}")
+                        return False
                     if hasattr(httpx, 'post'):
                         resp = httpx.post(url, json=payload, timeout=30)
                     else:
@@ -816,6 +849,11 @@ class AlarmCalculator:
                         log(f"[Telegram] Sent: {alarm_type} - {home} vs {away}")
                         return True
                     elif resp.status_code == 429:
+                        if get_governor is not None:
+                            # Sonraki acquire (bu ve diğer göndericiler) retry_after bitene kadar bekler
+                            get_governor().observe(token, chat_id, resp)
+                            log(f"[Telegram] Rate limited, retry_after {retry_after_from_response(resp, 5)}s shared by all senders")
+                            continue
                         retry_after = 5
                         try:
                             retry_after = resp.json().get('parameters', {}).get('retry_after', 5)
@@ -1084,6 +1122,9 @@ class AlarmCalculator:
         return resolved
     
     def _post(self, table: str, data: List[Dict], on_conflict=None, _retry=False) -> bool:
+        if self._captured_writes is not None:
+            self._captured_writes.append(('post', table, data, on_conflict))
+            return True
         try:
             # 0. Çoklu alias çözümlemesi (volume_shock_value gibi alanlar için)
             if table in ['volumeshock_alarms']:
@@ -1142,6 +1183,9 @@ class AlarmCalculator:
         return False
     
     def _delete(self, table: str, params: str) -> bool:
+        if self._captured_writes is not None:
+            self._captured_writes.append(('delete', table, params, None))
+            return True
         try:
             if not params or params.strip() == '':
                 params = 'id=gte.1'
@@ -1175,6 +1219,10 @@ class AlarmCalculator:
         if not alarms:
             return 0
         
+        if self._captured_writes is not None:
+            self._captured_writes.append(('upsert', table, alarms, list(key_fields)))
+            return len({'|'.join(str(a.get(f, '')) for f in key_fields) for a in alarms})
+        
         try:
             # Remove duplicates from batch (keep last occurrence)
             seen = {}
@@ -1540,6 +1588,29 @@ class AlarmCalculator:
             log(f"[MONEYWAY BATCH ERROR] {e}")
         return 0
     
+    def _delete_alarms_before(self, table: str, column: str, cutoff: str) -> int:
+        """Tek-statement DELETE (retention RPC yoksa). Silinen satır sayısı."""
+        try:
+            url = f"{self._rest_url(table)}?{column}=lt.{cutoff}"
+            headers = self._headers()
+            headers['Prefer'] = 'return=representation,count=exact'
+            
+            resp = httpx.delete(url, headers=headers, timeout=30)
+            
+            if resp.status_code in [200, 204]:
+                if resp.content:
+                    try:
+                        deleted_data = resp.json()
+                        if isinstance(deleted_data, list):
+                            return len(deleted_data)
+                    except:
+                        pass
+            elif resp.status_code != 404:
+                log(f"  [Cleanup] {table}: Silme hatası {resp.status_code}")
+        except Exception as e:
+            log(f"  [Cleanup] {table}: Hata - {e}")
+        return 0
+    
     def cleanup_old_alarms(self, days_to_keep: int = 7) -> int:
         """
         D-7+ alarmları sil (son 7 gün hariç tüm eski alarmlar)
@@ -1568,34 +1639,21 @@ class AlarmCalculator:
             'mim_alarms'
         ]
         
-        total_deleted = 0
+        targets = [(table, 'match_date', cutoff_str) for table in alarm_tables]
+        if ChunkedRetention is not None:
+            # Sınırlı chunk'larla sil (core/retention.py); RPC yoksa tek-statement DELETE
+            retention = ChunkedRetention(self.url, self._headers, httpx,
+                                         legacy_delete=self._delete_alarms_before, log=log)
+            deleted = retention.run(targets)
+        else:
+            deleted = {table: self._delete_alarms_before(table, column, cutoff)
+                       for table, column, cutoff in targets}
         
-        for table in alarm_tables:
-            try:
-                url = f"{self._rest_url(table)}?match_date=lt.{cutoff_str}"
-                headers = self._headers()
-                headers['Prefer'] = 'return=representation,count=exact'
-                
-                resp = httpx.delete(url, headers=headers, timeout=30)
-                
-                if resp.status_code in [200, 204]:
-                    deleted_count = 0
-                    if resp.content:
-                        try:
-                            deleted_data = resp.json()
-                            if isinstance(deleted_data, list):
-                                deleted_count = len(deleted_data)
-                        except:
-                            pass
-                    if deleted_count > 0:
-                        log(f"  [Cleanup] {table}: {deleted_count} D-2+ kayıt silindi (match_date < {cutoff_str})")
-                        total_deleted += deleted_count
-                elif resp.status_code == 404:
-                    pass
-                else:
-                    log(f"  [Cleanup] {table}: Silme hatası {resp.status_code}")
-            except Exception as e:
-                log(f"  [Cleanup] {table}: Hata - {e}")
+        total_deleted = 0
+        for table, deleted_count in deleted.items():
+            if deleted_count > 0:
+                log(f"  [Cleanup] {table}: {deleted_count} D-7+ kayıt silindi (match_date < {cutoff_str})")
+                total_deleted += deleted_count
         
         if total_deleted > 0:
             log(f"[Cleanup] Alarm temizleme tamamlandı - {total_deleted} alarm silindi (match_date < {cutoff_str})")
@@ -1774,6 +1832,9 @@ class AlarmCalculator:
         
         select_cols = self.MARKET_SELECT_COLS.get(market, '*')
         matches = self._get(market, f'select={select_cols}')
+        if matches and self.shard:
+            matches = [m for m in matches if self._match_in_shard(m)]
+            log(f"  -> shard {self.shard[0] + 1}/{self.shard[1]}: {len(matches)} matches")
         if matches:
             log(f"  -> {len(matches)} matches from {market} table")
             self._matches_cache[market] = matches
@@ -1824,8 +1885,13 @@ class AlarmCalculator:
         
         # Cache'i işaretle - tekrar sorgu yapılmasın
         self._active_hashes_checked = True
+        self._active_fixtures_found = bool(hashes)
         
-        if hashes:
+        if hashes and self.shard:
+            hashes = [h for h in hashes if self._in_shard(h)]
+            log(f"[HISTORY] Shard {self.shard[0] + 1}/{self.shard[1]}: {len(hashes)} fixtures")
+        
+        if self._active_fixtures_found:
             log(f"[HISTORY] Found {len(hashes)} active fixtures (D-1+)")
             self._active_hashes_cache = hashes
             return hashes
@@ -1856,7 +1922,8 @@ class AlarmCalculator:
         
         rows = []
         
-        if active_hashes:
+        # Shard'a hiç fixture düşmediyse de D-1+ modunda kal (3 günlük fallback'e düşme)
+        if active_hashes or getattr(self, '_active_fixtures_found', False):
             log(f"[HISTORY] {actual_table}: Using D-1+ filter ({len(active_hashes)} fixtures)")
             # Hash'leri 50'lik batch'lere böl (URL length limiti için)
             batch_size = 50
@@ -1933,6 +2000,11 @@ class AlarmCalculator:
         
         if fallback_count > 0:
             log(f"[HISTORY WARN] {cache_key}: match_id_hash missing -> {fallback_count} rows using fallback key (league|home|away|date)")
+        if self.shard:
+            # scraped_at fallback'i tüm maçları getirir; hash key'leri shard'a göre süz.
+            # Fallback key'li (hash'siz) satırlar her shard'da kalır — supervisor upsert'te tekilleşir.
+            history_map = {k: v for k, v in history_map.items()
+                           if not _is_hash_key(k) or self._in_shard(k)}
         log(f"[HISTORY] {cache_key}: {len(history_map)} unique matches")
         self._history_cache[cache_key] = history_map
         return history_map
@@ -1983,24 +2055,8 @@ class AlarmCalculator:
         
         return combined
     
-    def run_all_calculations(self) -> int:
-        """Run all alarm calculations - OPTIMIZED with batch fetch
-        Returns: Total number of alarms calculated
-        """
-        log("=" * 50)
-        log("[ALARM SYNC] ALARM HESAPLAMA BASLADI")
-        log(f"[ALARM SYNC] Supabase URL: {self.url[:40]}...")
-        log("=" * 50)
-        
-        # LIVE RELOAD: Refresh configs from Supabase before calculations
-        log("Config yenileniyor...")
-        self.refresh_configs()
-        log(f"Loaded configs: {list(self.configs.keys())}")
-        
-        self._history_cache = {}
-        self._matches_cache = {}
-        
-        # Prefetch all data
+    def _prefetch(self):
+        """Prefetch all data (matches + history, 3 market)"""
         markets = ['moneyway_1x2', 'moneyway_ou25', 'moneyway_btts']
         for market in markets:
             try:
@@ -2015,81 +2071,123 @@ class AlarmCalculator:
         
         log("-" * 30)
         log(f"Cache stats: matches={len(self._matches_cache)}, history={len(self._history_cache)}")
-        
+    
+    def _run_calculators(self):
+        """6 alarm tipini sırayla hesapla. Returns: (total_alarms, alarm_counts)"""
+        steps = [
+            ('BigMoney', 'BigMoney', self.calculate_bigmoney_alarms),
+            ('Sharp', 'Sharp', self.calculate_sharp_alarms),
+            ('VolumeShock', 'VolumeShock', self.calculate_volumeshock_alarms),
+            ('Dropping', 'Dropping', self.calculate_dropping_alarms),
+            ('VolumeLeader', 'VolumeLeader', self.calculate_volumeleader_alarms),
+            ('MIM', 'MIM (Market Impact)', self.calculate_mim_alarms),
+        ]
         total_alarms = 0
         alarm_counts = {}
-        
-        log("1/6 BigMoney hesaplaniyor...")
-        try:
-            bigmoney_count = self.calculate_bigmoney_alarms() or 0
-            alarm_counts['BigMoney'] = bigmoney_count
-            total_alarms += bigmoney_count
-            log(f"  -> BigMoney: {bigmoney_count} alarm")
-        except Exception as e:
-            import traceback
-            log(f"!!! BigMoney error: {e}")
-            log(f"Traceback: {traceback.format_exc()}")
-            alarm_counts['BigMoney'] = 0
-        
-        log("2/6 Sharp hesaplaniyor...")
-        try:
-            sharp_count = self.calculate_sharp_alarms() or 0
-            alarm_counts['Sharp'] = sharp_count
-            total_alarms += sharp_count
-            log(f"  -> Sharp: {sharp_count} alarm")
-        except Exception as e:
-            import traceback
-            log(f"!!! Sharp error: {e}")
-            log(f"Traceback: {traceback.format_exc()}")
-            alarm_counts['Sharp'] = 0
-        
-        log("3/6 VolumeShock hesaplaniyor...")
+        for i, (name, title, calculate) in enumerate(steps, 1):
+            log(f"{i}/{len(steps)} {title} hesaplaniyor...")
+            try:
+                count = calculate() or 0
+                alarm_counts[name] = count
+                total_alarms += count
+                log(f"  -> {name}: {count} alarm")
+            except Exception as e:
+                import traceback
+                log(f"!!! {name} error: {e}")
+                log(f"Traceback: {traceback.format_exc()}")
+                alarm_counts[name] = 0
+        return total_alarms, alarm_counts
+    
+    # ---- Shard modu (alarm_engine supervisor) ----
+    
+    @staticmethod
+    def shard_of(key: str, count: int) -> int:
+        """match_id_hash -> [0, count) hash aralığı (ilk 8 hex = 32 bit).
+        Hash olmayan key'ler (fallback) md5 üzerinden aynı aralığa düşer."""
+        key = str(key)
+        if _is_hash_key(key):
+            value = int(key[:8], 16)
+        else:
+            value = int(hashlib.md5(key.encode('utf-8')).hexdigest()[:8], 16)
+        return (value * count) >> 32
+    
+    def set_shard(self, index: int, count: int):
+        """Bu calculator sadece index. hash aralığındaki maçları hesaplasın (count<=1: hepsi)."""
+        self.shard = (index, count) if count > 1 else None
+        self._history_cache = {}
+        self._matches_cache = {}
+        self._active_hashes_checked = False
+    
+    def _in_shard(self, key: str) -> bool:
+        if not self.shard or not key:
+            return True
+        return self.shard_of(key, self.shard[1]) == self.shard[0]
+    
+    def _match_in_shard(self, match: Dict) -> bool:
+        """Calculator'ların kullandığı match_id_hash ile aynı key üzerinden shard kontrolü."""
+        if not self.shard:
+            return True
+        home = match.get('home', match.get('Home', ''))
+        away = match.get('away', match.get('Away', ''))
+        key = match.get('match_id_hash') or generate_match_id_hash(home, away, match.get('league', ''), match.get('date', ''))
+        return self._in_shard(key)
+    
+    def run_shard_calculations(self, index: int, count: int) -> Dict:
+        """Shard worker: sadece kendi hash aralığını hesaplar, hiçbir şey yazmaz.
+        Returns: {'total', 'counts', 'writes'} — writes supervisor'da apply_captured_writes ile uygulanır."""
+        self.set_shard(index, count)
+        self.refresh_configs()
+        self._captured_writes = []
         try:
-            volumeshock_count = self.calculate_volumeshock_alarms() or 0
-            alarm_counts['VolumeShock'] = volumeshock_count
-            total_alarms += volumeshock_count
-            log(f"  -> VolumeShock: {volumeshock_count} alarm")
-        except Exception as e:
-            import traceback
-            log(f"!!! VolumeShock error: {e}")
-            log(f"Traceback: {traceback.format_exc()}")
-            alarm_counts['VolumeShock'] = 0
+            self._prefetch()
+            total_alarms, alarm_counts = self._run_calculators()
+        finally:
+            writes, self._captured_writes = self._captured_writes, None
+        return {'total': total_alarms, 'counts': alarm_counts, 'writes': writes}
+    
+    def apply_captured_writes(self, shard_writes: List[List[tuple]]) -> int:
+        """Shard'ların yakaladığı yazmaları tek yazma fazında uygula.
+        Aynı (tablo, key_fields) upsert'leri ve (tablo, on_conflict) post'ları tek çağrıda
+        birleşir — dedupe, timestamp koruma ve Telegram bildirimi burada bir kez çalışır."""
+        merged = {}
+        deletes = []
+        for writes in shard_writes:
+            for kind, table, payload, extra in writes:
+                if kind == 'delete':
+                    deletes.append((table, payload))
+                    continue
+                group = (kind, table, tuple(extra) if kind == 'upsert' else extra)
+                merged.setdefault(group, []).extend(payload)
+        
+        written = 0
+        for (kind, table, extra), rows in merged.items():
+            if kind == 'upsert':
+                written += self._upsert_alarms(table, rows, list(extra))
+            elif self._post(table, rows, on_conflict=extra):
+                written += len(rows)
+        for table, params in deletes:
+            self._delete(table, params)
+        return written
+    
+    def run_all_calculations(self) -> int:
+        """Run all alarm calculations - OPTIMIZED with batch fetch
+        Returns: Total number of alarms calculated
+        """
+        log("=" * 50)
+        log("[ALARM SYNC] ALARM HESAPLAMA BASLADI")
+        log(f"[ALARM SYNC] Supabase URL: {self.url[:40]}...")
+        log("=" * 50)
         
-        log("4/6 Dropping hesaplaniyor...")
-        try:
-            dropping_count = self.calculate_dropping_alarms() or 0
-            alarm_counts['Dropping'] = dropping_count
-            total_alarms += dropping_count
-            log(f"  -> Dropping: {dropping_count} alarm")
-        except Exception as e:
-            import traceback
-            log(f"!!! Dropping error: {e}")
-            log(f"Traceback: {traceback.format_exc()}")
-            alarm_counts['Dropping'] = 0
+        # LIVE RELOAD: Refresh configs from Supabase before calculations
+        log("Config yenileniyor...")
+        self.refresh_configs()
+        log(f"Loaded configs: {list(self.configs.keys())}")
         
-        log("5/6 VolumeLeader hesaplaniyor...")
-        try:
-            volumeleader_count = self.calculate_volumeleader_alarms() or 0
-            alarm_counts['VolumeLeader'] = volumeleader_count
-            total_alarms += volumeleader_count
-            log(f"  -> VolumeLeader: {volumeleader_count} alarm")
-        except Exception as e:
-            import traceback
-            log(f"!!! VolumeLeader error: {e}")
-            log(f"Traceback: {traceback.format_exc()}")
-            alarm_counts['VolumeLeader'] = 0
+        self._history_cache = {}
+        self._matches_cache = {}
         
-        log("6/6 MIM (Market Impact) hesaplaniyor...")
-        try:
-            mim_count = self.calculate_mim_alarms() or 0
-            alarm_counts['MIM'] = mim_count
-            total_alarms += mim_count
-            log(f"  -> MIM: {mim_count} alarm")
-        except Exception as e:
-            import traceback
-            log(f"!!! MIM error: {e}")
-            log(f"Traceback: {traceback.format_exc()}")
-            alarm_counts['MIM'] = 0
+        self._prefetch()
+        total_alarms, alarm_counts = self._run_calculators()
         
         log("=" * 50)
         log(f"[ALARM SYNC] HESAPLAMA TAMAMLANDI - TOPLAM: {total_alarms} alarm")
@@ -16,14 +16,18 @@ Yöntem:
 
 import os
 import re
+import sys
 import time
-import random
 import requests
-import concurrent.futures
 from datetime import datetime, timezone
 from typing import Dict, List, Optional, Tuple, Any
 from bs4 import BeautifulSoup
 
+_SCRAPER_DIR = os.path.dirname(os.path.abspath(__file__))
+if _SCRAPER_DIR not in sys.path:
+    sys.path.insert(0, _SCRAPER_DIR)
+from fetch_scheduler import FetchScheduler, size_session_pool, DEFAULT_RATE, DEFAULT_MAX_WINDOW
+
 BASE_URL = "https://www.excapper.com"
 
 def _get_headers() -> dict:
@@ -79,6 +83,14 @@ DETAIL_HEADERS = _get_detail_headers()
 MAX_WORKERS = 2
 FETCH_TIMEOUT = 25
 
+# Detay çekme: nezaket tavanı (istek/sn) + AIMD pencere sınırları (env ile ayarlanabilir)
+MAX_RPS = float(os.environ.get('EXCAPPER_MAX_RPS', DEFAULT_RATE))
+INITIAL_WINDOW = MAX_WORKERS
+MAX_WINDOW = int(os.environ.get('EXCAPPER_MAX_WINDOW', DEFAULT_MAX_WINDOW))
+
+# Son çalıştırmanın fetch özeti (süre, hata oranı, pencere) — FetchStats.to_dict()
+LAST_FETCH_STATS: Dict[str, Any] = {}
+
 # Tab link metni → internal market key
 MARKET_TAB_MAP = {
     'Match Odds':            '1x2',
@@ -203,65 +215,90 @@ def fetch_match_list(session: requests.Session) -> List[Dict]:
 
 # ── Maç detay: odds + hacim + dropping ────────────────────────────────────────
 
+GRAPHS_WINDOW = 12000   # marker'dan itibaren datasets aranan pencere (karakter)
+_EMPTY_ODDS = ('0', '0.0', 'null', 'undefined')
+_GRAPHS_MARKER_RE = re.compile(r"graphsData\[(\d+)\]\['odds'\]")
+# datasets dizisi içindeki token'lar: label: '1',  |  data: [..]  |  [  |  ]
+_DATASET_TOKEN_RE = re.compile(
+    r"label\s*:\s*['\"]([^'\"]+)['\"]\s*,|data\s*:\s*\[([^\]]*)\]|[\[\]]"
+)
+
+
+def _graphs_id(tab_id: str) -> Optional[str]:
+    """'tab_content_259033049' → '259033049'"""
+    m_num = re.search(r'(\d+)', tab_id)
+    return m_num.group(1) if m_num else None
+
+
+def _scan_datasets(html: str, start: int, end: int) -> Dict[str, float]:
+    """Tek odds bloğunun datasets dizisini tek geçişte tara: bracket derinliği ve
+    label/data çiftleri aynı token akışından çıkar.
+    datasets dizisi pencere içinde kapanmıyorsa boş döner."""
+    ds_start = html.find('datasets:', start, end)
+    if ds_start < 0:
+        return {}
+    bopen = html.find('[', ds_start, end)
+    if bopen < 0:
+        return {}
+
+    odds: Dict[str, float] = {}
+    depth = 0
+    pending = None      # data'sını bekleyen label (araya giren label'lar atlanır)
+    broken = False      # sayısal olmayan değer → o ana kadar toplananlar kalır
+    for tok in _DATASET_TOKEN_RE.finditer(html, bopen, end):
+        text = tok.group(0)
+        if text == '[':
+            depth += 1
+        elif text == ']':
+            depth -= 1
+            if depth == 0:
+                return odds
+        elif tok.group(1) is not None:
+            if pending is None:
+                pending = tok.group(1).strip()
+        elif pending is not None:
+            label, pending = pending, None
+            if broken or label in odds:
+                continue   # İlk eşleşme kazanır — sonraki bloğun verisi karışmasın
+            try:
+                nums = [float(x) for x in (v.strip() for v in tok.group(2).split(','))
+                        if x and x not in _EMPTY_ODDS]
+            except ValueError:
+                broken = True
+                continue
+            if nums:
+                odds[label] = nums[0]   # En eski non-zero = açılış oranı
+    return {}
+
+
+def extract_graphsdata_odds(html: str) -> Dict[str, Dict[str, float]]:
+    """
+    Sayfadaki tüm graphsData[<id>]['odds'] bloklarının açılış oranları, tek geçişte.
+    Returns: {'259033049': {'1': 2.50, 'X': 3.20, '2': 3.10}, ...}
+    Aynı id birden fazla geçerse ilk blok kullanılır.
+    """
+    blocks: Dict[str, Dict[str, float]] = {}
+    for m in _GRAPHS_MARKER_RE.finditer(html):
+        nid = m.group(1)
+        if nid not in blocks:
+            blocks[nid] = _scan_datasets(html, m.start(), m.start() + GRAPHS_WINDOW)
+    return blocks
+
+
 def _parse_graphsdata_prev_odds(html: str, tab_id: str) -> Dict[str, float]:
     """
     graphsData JS'inden verilen tab_id için en eski (açılış) oranları çıkar.
     tab_id: 'tab_content_259033049' → numeric_id: '259033049'
     Returns: {'1': 2.50, 'X': 3.20, '2': 3.10, 'Over': 1.80, 'Under': 2.10, ...}
+    Tek tab için; sayfa parse'ı extract_graphsdata_odds ile tüm tabları bir kerede alır.
     """
-    prev_odds: Dict[str, float] = {}
-    try:
-        # tab_content_259033049 → 259033049
-        m_num = re.search(r'(\d+)', tab_id)
-        if not m_num:
-            return prev_odds
-        nid = m_num.group(1)
-
-        # graphsData[259033049]['odds'] bloğunu bul
-        marker = f"graphsData[{nid}]['odds']"
-        idx = html.find(marker)
-        if idx < 0:
-            return prev_odds
-
-        # datasets bloğunun başını bul, sonra her label+data ikilisini doğrudan yakala
-        block = html[idx: idx + 12000]
-
-        # datasets: [ ... ] kapsamını bracket sayımıyla bul (iç içe array sorununu önle)
-        ds_start = block.find('datasets:')
-        if ds_start < 0:
-            return prev_odds
-        bopen = block.find('[', ds_start)
-        if bopen < 0:
-            return prev_odds
-        depth = 0
-        bclose = bopen
-        for ci, ch in enumerate(block[bopen:], bopen):
-            if ch == '[':
-                depth += 1
-            elif ch == ']':
-                depth -= 1
-                if depth == 0:
-                    bclose = ci
-                    break
-        datasets_block = block[bopen: bclose + 1]
-
-        # Her dataset: label: '1' ... data: [0, 2.60, ...] — ilk eşleşme kazanır
-        for ds in re.finditer(
-            r"label\s*:\s*['\"]([^'\"]+)['\"]\s*,.*?data\s*:\s*\[([^\]]*)\]",
-            datasets_block, re.DOTALL
-        ):
-            label = ds.group(1).strip()
-            if label in prev_odds:
-                continue   # Sonraki bloğun verisi karışmasın
-            nums = [
-                float(x.strip()) for x in ds.group(2).split(',')
-                if x.strip() and x.strip() not in ('0', '0.0', 'null', 'undefined')
-            ]
-            if nums:
-                prev_odds[label] = nums[0]   # En eski non-zero = açılış oranı
-    except Exception:
-        pass
-    return prev_odds
+    nid = _graphs_id(tab_id)
+    if not nid:
+        return {}
+    idx = html.find(f"graphsData[{nid}]['odds']")
+    if idx < 0:
+        return {}
+    return _scan_datasets(html, idx, idx + GRAPHS_WINDOW)
 
 
 def fetch_match_detail(game_id: str, session: requests.Session) -> Dict[str, Any]:
@@ -277,15 +314,24 @@ def fetch_match_detail(game_id: str, session: requests.Session) -> Dict[str, Any
     Her tuple: (volume_float, current_odds_float, prev_odds_float_or_0)
     """
     try:
-        url = f"{BASE_URL}/?action=game&id={game_id}"
-        r = session.get(url, headers=_get_detail_headers(), timeout=FETCH_TIMEOUT)
+        r = request_match_detail(game_id, session)
         r.raise_for_status()
     except Exception:
         return {}
+    return parse_match_detail(r.text)
 
-    html = r.text
+
+def request_match_detail(game_id: str, session: requests.Session) -> requests.Response:
+    """Detay sayfası isteği (parse yok) — FetchScheduler status/gecikme ölçer."""
+    url = f"{BASE_URL}/?action=game&id={game_id}"
+    return session.get(url, headers=_get_detail_headers(), timeout=FETCH_TIMEOUT)
+
+
+def parse_match_detail(html: str) -> Dict[str, Any]:
+    """Detay sayfası HTML'i → fetch_match_detail ile aynı market dict'i."""
     soup = BeautifulSoup(html, 'html.parser')
     result: Dict[str, Dict[str, Tuple[float, float, float]]] = {}
+    graphs = extract_graphsdata_odds(html)
 
     for tab_link in soup.select('.smenu a[data-tab]'):
         tab_text = tab_link.get_text(strip=True)
@@ -298,8 +344,8 @@ def fetch_match_detail(game_id: str, session: requests.Session) -> Dict[str, Any
         if not tab_div:
             continue
 
-        # Önceki oranlar graphsData'dan
-        prev_map = _parse_graphsdata_prev_odds(html, tab_id)
+        # Önceki oranlar graphsData'dan (sayfa başına tek tarama)
+        prev_map = graphs.get(_graphs_id(tab_id) or '', {})
 
         # Mevcut oranlar + hacimler charts-bk__item-coef'den
         selections: Dict[str, Tuple[float, float, float]] = {}
@@ -543,22 +589,22 @@ def run_scrape_excapper(writer, logger_callback=None) -> int:
     if not future:
         return 0
 
-    # ── 3. Paralel maç detayı çekme ───────────────────────────────────────
-    _log(f"[Excapper]   Detaylar çekiliyor ({MAX_WORKERS} paralel)...")
-    details: Dict[str, Dict] = {}
-
-    def _fetch_one(match):
-        gid = match['game_id']
-        try:
-            time.sleep(random.uniform(1.0, 2.5))
-            return gid, fetch_match_detail(gid, session)
-        except Exception as e:
-            _log(f"[Excapper]   UYARI: game_id={gid} çekilemedi: {e}")
-            return gid, {}
-
-    with concurrent.futures.ThreadPoolExecutor(max_workers=MAX_WORKERS) as pool:
-        for gid, d in pool.map(_fetch_one, future):
-            details[gid] = d
+    # ── 3. Adaptif maç detayı çekme ───────────────────────────────────────
+    # Sabit worker + rastgele uyku yerine AIMD pencere + token bucket (fetch_scheduler)
+    _log(f"[Excapper]   Detaylar çekiliyor (en fazla {MAX_RPS:g} istek/sn, "
+         f"pencere {INITIAL_WINDOW}..{MAX_WINDOW})...")
+    size_session_pool(session, MAX_WINDOW)
+    scheduler = FetchScheduler(rate=MAX_RPS, initial_window=INITIAL_WINDOW,
+                               max_window=MAX_WINDOW, log=_log)
+    details, stats = scheduler.run(
+        future,
+        fetch=lambda m: request_match_detail(m['game_id'], session),
+        parse=lambda m, r: parse_match_detail(r.text),
+        key=lambda m: m['game_id'],
+    )
+    global LAST_FETCH_STATS
+    LAST_FETCH_STATS = stats.to_dict()
+    _log(f"[Excapper]   Fetch: {stats.summary()}")
 
     # ── 4. Row'ları topla ─────────────────────────────────────────────────
     table_rows: Dict[str, List] = {
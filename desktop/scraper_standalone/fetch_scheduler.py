@@ -0,0 +1,288 @@
+"""
+fetch_scheduler.py — adaptif detay sayfası çekici (Excapper)
+
+Sabit ThreadPoolExecutor + istek başına 1.0–2.5s rastgele uyku yerine:
+  - TokenBucket: saniyede en fazla `rate` istek (nezaket tavanı, burst ile)
+  - AIMD pencere: aynı anda uçuşta olabilecek istek sayısı. Yanıt hızlı ve
+    hatasızsa pencere her RTT'de +1 büyür; 429 / 5xx / timeout ya da gecikme
+    tavanı aşılırsa yarıya iner (RTT başına en fazla bir kez).
+  - 429 ve her 5xx aynı şekilde geri çekilir: pencere daralır, bucket Retry-After
+    (yoksa DEFAULT_RETRY_AFTER) kadar durdurulur, istek geri kuyruğa girer.
+  - Oturumun https havuzu pencerenin üst sınırı kadar bağlantıya ayarlanır.
+Çalıştırma sonunda FetchStats: süre, istek/hata sayısı, hata oranı, p50/p95
+gecikme, ortalama/son pencere.
+"""
+
+import threading
+import time
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+DEFAULT_RATE = 1.2             # istek/sn tavanı (eski 2 worker + ort. 1.75s uyku ≈ 1.1)
+DEFAULT_BURST = 2
+DEFAULT_INITIAL_WINDOW = 2
+DEFAULT_MAX_WINDOW = 6
+DEFAULT_LATENCY_CEILING = 6.0  # sn; üstü tıkanma sayılır
+DEFAULT_MAX_RETRIES = 2
+DEFAULT_RETRY_AFTER = 5.0      # sn; 429 / 5xx yanıtında Retry-After yoksa
+
+
+class TokenBucket:
+    """Thread-safe token bucket: acquire() bir token alınana kadar bekler."""
+
+    def __init__(self, rate: float, burst: int = DEFAULT_BURST,
+                 clock: Callable[[], float] = time.monotonic,
+                 sleep: Callable[[float], None] = time.sleep):
+        self.rate = float(rate)
+        self.burst = max(1, int(burst))
+        self.clock = clock
+        self.sleep = sleep
+        self._tokens = float(self.burst)
+        self._last = clock()
+        self._paused_until = 0.0
+        self._lock = threading.Lock()
+
+    def pause(self, seconds: float):
+        """Retry-After: bucket'ı seconds boyunca durdur (birikmiş token'lar silinir)."""
+        with self._lock:
+            self._paused_until = max(self._paused_until, self.clock() + seconds)
+            self._tokens = 0.0
+
+    def acquire(self):
+        while True:
+            with self._lock:
+                now = self.clock()
+                if now < self._paused_until:
+                    wait = self._paused_until - now
+                else:
+                    self._tokens = min(self.burst, self._tokens + (now - max(self._last, self._paused_until)) * self.rate)
+                    self._last = now
+                    if self._tokens >= 1.0 - 1e-9:
+                        self._tokens = max(0.0, self._tokens - 1.0)
+                        return
+                    wait = (1.0 - self._tokens) / self.rate
+            self.sleep(wait)
+
+
+class AimdWindow:
+    """Eşzamanlı istek penceresi (additive increase / multiplicative decrease)."""
+
+    def __init__(self, initial: int = DEFAULT_INITIAL_WINDOW, maximum: int = DEFAULT_MAX_WINDOW,
+                 latency_ceiling: float = DEFAULT_LATENCY_CEILING,
+                 clock: Callable[[], float] = time.monotonic):
+        self.maximum = max(1, int(maximum))
+        self.size = float(min(max(1, initial), self.maximum))
+        self.latency_ceiling = latency_ceiling
+        self.clock = clock
+        self.in_flight = 0
+        self.decreases = 0
+        self._srtt: Optional[float] = None
+        self._last_decrease = -1e9
+        self._samples: List[float] = []
+        self._cond = threading.Condition()
+
+    @property
+    def limit(self) -> int:
+        return max(1, int(self.size))
+
+    def enter(self):
+        with self._cond:
+            while self.in_flight >= self.limit:
+                self._cond.wait(0.5)
+            self.in_flight += 1
+
+    def leave(self, ok: bool, latency: float):
+        with self._cond:
+            self.in_flight -= 1
+            self._srtt = latency if self._srtt is None else 0.8 * self._srtt + 0.2 * latency
+            if not ok or latency > self.latency_ceiling:
+                # Aynı RTT içindeki toplu hatalar pencereyi tekrar tekrar ezmesin
+                now = self.clock()
+                if now - self._last_decrease >= (self._srtt or latency):
+                    self.size = max(1.0, self.size / 2)
+                    self._last_decrease = now
+                    self.decreases += 1
+            else:
+                self.size = min(float(self.maximum), self.size + 1.0 / self.size)
+            self._samples.append(self.size)
+            self._cond.notify_all()
+
+    @property
+    def average(self) -> float:
+        return sum(self._samples) / len(self._samples) if self._samples else self.size
+
+
+class FetchStats:
+    """Bir çalıştırmanın özeti (scrape süresi + hata oranı)."""
+
+    def __init__(self):
+        self.duration = 0.0
+        self.items = 0
+        self.requests = 0
+        self.ok = 0
+        self.failed = 0
+        self.retries = 0
+        self.status_counts: Dict[str, int] = {}
+        self.latencies: List[float] = []
+        self.window_avg = 0.0
+        self.window_final = 0
+        self.window_decreases = 0
+        self._lock = threading.Lock()
+
+    def record(self, status: str, latency: float):
+        with self._lock:
+            self.requests += 1
+            self.latencies.append(latency)
+            self.status_counts[status] = self.status_counts.get(status, 0) + 1
+
+    @property
+    def error_rate(self) -> float:
+        errors = sum(n for s, n in self.status_counts.items() if s != '200')
+        return errors / self.requests if self.requests else 0.0
+
+    def percentile(self, p: float) -> float:
+        if not self.latencies:
+            return 0.0
+        ordered = sorted(self.latencies)
+        return ordered[min(len(ordered) - 1, int(p * len(ordered)))]
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'duration': round(self.duration, 2),
+            'items': self.items,
+            'requests': self.requests,
+            'ok': self.ok,
+            'failed': self.failed,
+            'retries': self.retries,
+            'error_rate': round(self.error_rate, 4),
+            'status_counts': dict(self.status_counts),
+            'latency_p50': round(self.percentile(0.5), 3),
+            'latency_p95': round(self.percentile(0.95), 3),
+            'window_avg': round(self.window_avg, 2),
+            'window_final': self.window_final,
+            'window_decreases': self.window_decreases,
+        }
+
+    def summary(self) -> str:
+        errors = ', '.join(f"{s}: {n}" for s, n in sorted(self.status_counts.items()) if s != '200')
+        return (f"{self.items} maç, {self.requests} istek, {self.duration:.1f}s, "
+                f"hata %{self.error_rate * 100:.1f}{f' ({errors})' if errors else ''}, "
+                f"başarısız {self.failed}, p50 {self.percentile(0.5):.2f}s / p95 {self.percentile(0.95):.2f}s, "
+                f"pencere ort {self.window_avg:.1f} / son {self.window_final}")
+
+
+def size_session_pool(session, max_connections: int):
+    """requests.Session'ın https/http havuzunu pencere tavanına göre ayarla."""
+    from requests.adapters import HTTPAdapter
+    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=max(1, int(max_connections)))
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    return session
+
+
+def _is_overload(status: str) -> bool:
+    """429 ve tüm 5xx: sunucu yük altında — geri çekil, tekrar dene."""
+    return status == '429' or (len(status) == 3 and status.startswith('5'))
+
+
+def _retry_after(resp) -> Optional[float]:
+    headers = getattr(resp, 'headers', None) or {}
+    value = headers.get('Retry-After') or headers.get('retry-after')
+    if not value:
+        return None
+    try:
+        return min(60.0, max(0.0, float(value)))
+    except (TypeError, ValueError):
+        return None
+
+
+class FetchScheduler:
+    """items'ı fetch(item) ile çek; başarılıları parse(item, response) ile işle.
+
+    fetch: istek atıp status_code'lu response döner (exception = timeout/bağlantı hatası)
+    parse: pencere slotu bırakıldıktan sonra aynı worker thread'de çalışır
+    run() → ({key(item): parse sonucu}, FetchStats)
+    """
+
+    def __init__(self, rate: float = DEFAULT_RATE, burst: int = DEFAULT_BURST,
+                 initial_window: int = DEFAULT_INITIAL_WINDOW, max_window: int = DEFAULT_MAX_WINDOW,
+                 latency_ceiling: float = DEFAULT_LATENCY_CEILING, max_retries: int = DEFAULT_MAX_RETRIES,
+                 log: Callable[[str], None] = print,
+                 clock: Callable[[], float] = time.monotonic,
+                 sleep: Callable[[float], None] = time.sleep):
+        self.bucket = TokenBucket(rate, burst, clock=clock, sleep=sleep)
+        self.window = AimdWindow(initial_window, max_window, latency_ceiling, clock=clock)
+        self.max_retries = max_retries
+        self.log = log
+        self.clock = clock
+        self.sleep = sleep
+
+    def run(self, items: Iterable[Any], fetch: Callable[[Any], Any],
+            parse: Callable[[Any, Any], Any], key: Callable[[Any], Any] = lambda x: x
+            ) -> Tuple[Dict[Any, Any], FetchStats]:
+        queue: List[Tuple[Any, int]] = [(item, 0) for item in items]
+        queue.reverse()
+        stats = FetchStats()
+        stats.items = len(queue)
+        results: Dict[Any, Any] = {}
+        lock = threading.Lock()
+        start = self.clock()
+
+        def worker():
+            while True:
+                with lock:
+                    if not queue:
+                        return
+                    item, attempt = queue.pop()
+                self.window.enter()
+                self.bucket.acquire()
+                t0 = self.clock()
+                resp, error = None, None
+                try:
+                    resp = fetch(item)
+                except Exception as e:
+                    error = e
+                latency = self.clock() - t0
+                status = str(getattr(resp, 'status_code', 'timeout' if error else 'error'))
+                ok = status == '200'
+                overload = _is_overload(status)
+                self.window.leave(ok or not (overload or error is not None), latency)
+                stats.record(status, latency)
+
+                if ok:
+                    try:
+                        value = parse(item, resp)
+                    except Exception as e:
+                        self.log(f"[Fetch]   UYARI: parse hatası {key(item)}: {e}")
+                        value = None
+                    with lock:
+                        results[key(item)] = value
+                        stats.ok += 1
+                    continue
+
+                retryable = error is not None or overload
+                if retryable and attempt < self.max_retries:
+                    if overload:
+                        # 5xx de 429 gibi: hemen tekrar denemek yük altındaki sunucuyu ezer
+                        wait = _retry_after(resp)
+                        self.bucket.pause(wait if wait is not None else DEFAULT_RETRY_AFTER)
+                    with lock:
+                        stats.retries += 1
+                        queue.insert(0, (item, attempt + 1))
+                    continue
+                with lock:
+                    stats.failed += 1
+                if error is not None:
+                    self.log(f"[Fetch]   UYARI: {key(item)} çekilemedi: {error}")
+
+        threads = [threading.Thread(target=worker, name=f"fetch-{i}", daemon=True)
+                   for i in range(self.window.maximum)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+
+        stats.duration = self.clock() - start
+        stats.window_avg = self.window.average
+        stats.window_final = self.window.limit
+        stats.window_decreases = self.window.decreases
+        return results, stats
@@ -2,6 +2,10 @@
 Alarm Card Image Generator for Telegram Notifications
 Generates visual alarm cards matching the web UI design exactly
 Uses Inter font for perfect match
+
+Fontlar (weight, size) başına süreç boyunca bir kez yüklenir; kartın statik
+katmanı (zemin, kenarlık, rozet, hero bloğu, ÖNCEKİ başlığı/noktaları, buton)
+layout başına bir kez çizilip cache'lenir, her render yalnızca dinamik metni basar.
 """
 
 from PIL import Image, ImageDraw, ImageFont
@@ -9,6 +13,7 @@ from io import BytesIO
 from datetime import datetime
 import pytz
 import os
+import threading
 
 SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
 FONTS_DIR = os.path.join(SCRIPT_DIR, 'fonts')
@@ -33,8 +38,29 @@ HERO_BORDER = (60, 45, 30)
 
 MONTHS_TR = ['Oca', 'Şub', 'Mar', 'Nis', 'May', 'Haz', 'Tem', 'Ağu', 'Eyl', 'Eki', 'Kas', 'Ara']
 
+BADGE_BG = (48, 35, 22)
+HERO_TOP = 14 + 30 + 12 + 22 + 16 + 8
+HERO_HEIGHT = 70
+HERO_RADIUS = 8
+
+_FONT_CACHE = {}
+_BACKGROUND_CACHE = {}
+_BACKGROUND_CACHE_MAX = 64
+_CACHE_LOCK = threading.Lock()
+
 
 def get_font(size, weight='regular'):
+    """(weight, size) başına tek ImageFont (süreç geneli cache)."""
+    key = (weight, size)
+    font = _FONT_CACHE.get(key)
+    if font is None:
+        font = _load_font(size, weight)
+        with _CACHE_LOCK:
+            font = _FONT_CACHE.setdefault(key, font)
+    return font
+
+
+def _load_font(size, weight):
     weight_map = {
         'regular': 'Inter-Regular.ttf',
         'medium': 'Inter-Medium.ttf',
@@ -128,6 +154,88 @@ def draw_rounded_rect(draw, xy, radius, fill, outline=None, width=1):
         draw.rounded_rectangle([x1, y1, x2, y2], radius=radius, outline=outline, width=width)
 
 
+def _bigmoney_background(card_height, prev_top, prev_count, btn_top):
+    """BIG MONEY kartının statik katmanı; (yükseklik, ÖNCEKİ konumu, satır sayısı, buton konumu)
+    başına bir kez çizilir. Çağıran .copy() üzerine çizer."""
+    key = ('bigmoney', CARD_WIDTH, card_height, prev_top, prev_count, btn_top)
+    bg = _BACKGROUND_CACHE.get(key)
+    if bg is not None:
+        return bg
+    
+    img = Image.new('RGB', (CARD_WIDTH, card_height), BG_COLOR)
+    draw = ImageDraw.Draw(img)
+    
+    draw_rounded_rect(draw, (0, 0, CARD_WIDTH, card_height), 16, CARD_BG)
+    
+    draw.rectangle([0, 8, LEFT_BORDER_WIDTH, card_height - 8], fill=ORANGE)
+    
+    font_badge = get_font(10, 'bold')
+    badge_text = "BIG MONEY"
+    badge_width = draw.textlength(badge_text, font=font_badge) + 16
+    badge_height = 20
+    badge_x = CARD_PADDING + LEFT_BORDER_WIDTH
+    badge_y = 14
+    draw_rounded_rect(draw, (badge_x, badge_y, badge_x + badge_width, badge_y + badge_height), 6, BADGE_BG)
+    draw.text((badge_x + 8, badge_y + 4), badge_text, fill=ORANGE, font=font_badge)
+    
+    hero_margin = CARD_PADDING + LEFT_BORDER_WIDTH
+    hero_width = CARD_WIDTH - hero_margin - CARD_PADDING
+    hero_img = Image.new('RGBA', (hero_width, HERO_HEIGHT), (0, 0, 0, 0))
+    hero_draw = ImageDraw.Draw(hero_img)
+    
+    for i in range(HERO_HEIGHT):
+        ratio = i / HERO_HEIGHT
+        r = int(HERO_BG_START[0] * (1 - ratio) + HERO_BG_END[0] * ratio)
+        g = int(HERO_BG_START[1] * (1 - ratio) + HERO_BG_END[1] * ratio)
+        b = int(HERO_BG_START[2] * (1 - ratio) + HERO_BG_END[2] * ratio)
+        hero_draw.line([(0, i), (hero_width, i)], fill=(r, g, b, 255))
+    
+    mask = Image.new('L', (hero_width, HERO_HEIGHT), 0)
+    mask_draw = ImageDraw.Draw(mask)
+    mask_draw.rounded_rectangle([0, 0, hero_width, HERO_HEIGHT], radius=HERO_RADIUS, fill=255)
+    
+    hero_img.putalpha(mask)
+    img.paste(hero_img, (hero_margin, HERO_TOP), hero_img)
+    
+    draw.rounded_rectangle([hero_margin, HERO_TOP, hero_margin + hero_width, HERO_TOP + HERO_HEIGHT], radius=HERO_RADIUS, outline=HERO_BORDER, width=1)
+    
+    font_hero_label = get_font(11, 'medium')
+    label_text = "Büyük Para Girişi"
+    label_width = draw.textlength(label_text, font=font_hero_label)
+    label_x = hero_margin + (hero_width - label_width) / 2
+    draw.text((label_x, HERO_TOP + 48), label_text, fill=ORANGE, font=font_hero_label)
+    
+    if prev_top is not None:
+        draw.text((CARD_PADDING + LEFT_BORDER_WIDTH, prev_top), "ÖNCEKİ", fill=TEXT_MUTED, font=get_font(10, 'medium'))
+        row_y = prev_top + 18
+        for _ in range(prev_count):
+            draw.ellipse([CARD_PADDING + LEFT_BORDER_WIDTH, row_y + 4, CARD_PADDING + LEFT_BORDER_WIDTH + 6, row_y + 10], fill=ORANGE)
+            row_y += 26
+    
+    btn_height = 36
+    btn_left = CARD_PADDING + LEFT_BORDER_WIDTH
+    btn_right = CARD_WIDTH - CARD_PADDING
+    btn_bottom = btn_top + btn_height
+    
+    btn_bg = (30, 30, 32)
+    draw_rounded_rect(draw, (btn_left, btn_top, btn_right, btn_bottom), 8, btn_bg, (48, 54, 61), 1)
+    
+    btn_text = "Maç Detayı"
+    font_btn = get_font(12, 'semibold')
+    btn_text_width = draw.textlength(btn_text, font=font_btn)
+    btn_text_x = btn_left + (btn_right - btn_left - btn_text_width) / 2
+    draw.text((btn_text_x, btn_top + 10), btn_text, fill=ORANGE, font=font_btn)
+    
+    arrow_x = btn_text_x + btn_text_width + 6
+    draw.text((arrow_x, btn_top + 10), "→", fill=ORANGE, font=font_btn)
+    
+    with _CACHE_LOCK:
+        if len(_BACKGROUND_CACHE) >= _BACKGROUND_CACHE_MAX:
+            _BACKGROUND_CACHE.clear()
+        bg = _BACKGROUND_CACHE.setdefault(key, img)
+    return bg
+
+
 def generate_bigmoney_card(
     home_team: str,
     away_team: str,
@@ -151,36 +259,24 @@ def generate_bigmoney_card(
     
     card_height = base_height + kickoff_section + total_section + prev_section + multiplier_section + cta_section + 10
     
-    img = Image.new('RGB', (CARD_WIDTH, card_height), BG_COLOR)
-    draw = ImageDraw.Draw(img)
+    has_total = bool(total_money and total_money != current_money)
+    prev_top = HERO_TOP + HERO_HEIGHT + 12 + (28 if has_total else 0) + 4
+    btn_top = prev_top - 4 + (prev_count * 26 + 22 if prev_count > 0 else 0) + (24 if kickoff_utc else 0) + 8
     
-    draw_rounded_rect(draw, (0, 0, CARD_WIDTH, card_height), 16, CARD_BG)
-    
-    draw.rectangle([0, 8, LEFT_BORDER_WIDTH, card_height - 8], fill=ORANGE)
+    img = _bigmoney_background(card_height, prev_top if prev_count > 0 else None, prev_count, btn_top).copy()
+    draw = ImageDraw.Draw(img)
     
-    font_badge = get_font(10, 'bold')
     font_time = get_font(12, 'regular')
     font_match = get_font(16, 'semibold')
     font_market = get_font(12, 'regular')
     font_hero = get_font(28, 'extrabold')
-    font_hero_label = get_font(11, 'medium')
     font_total_val = get_font(14, 'semibold')
     font_total_lbl = get_font(11, 'medium')
-    font_prev_title = get_font(10, 'medium')
     font_prev = get_font(12, 'regular')
     font_mult = get_font(11, 'bold')
     
     y = 14
     
-    badge_text = "BIG MONEY"
-    badge_width = draw.textlength(badge_text, font=font_badge) + 16
-    badge_height = 20
-    badge_x = CARD_PADDING + LEFT_BORDER_WIDTH
-    
-    badge_bg = (48, 35, 22)
-    draw_rounded_rect(draw, (badge_x, y, badge_x + badge_width, y + badge_height), 6, badge_bg)
-    draw.text((badge_x + 8, y + 4), badge_text, fill=ORANGE, font=font_badge)
-    
     if alarm_time:
         time_str = format_tr_datetime(alarm_time)
         time_width = draw.textlength(time_str, font=font_time)
@@ -200,34 +296,10 @@ def generate_bigmoney_card(
     market_text = f"{market} · {selection}"
     draw.text((CARD_PADDING + LEFT_BORDER_WIDTH, y), market_text, fill=TEXT_SECONDARY, font=font_market)
     
-    y += 16
-    y += 8
-    
     hero_margin = CARD_PADDING + LEFT_BORDER_WIDTH
     hero_width = CARD_WIDTH - hero_margin - CARD_PADDING
-    hero_height = 70
-    hero_top = y
-    hero_bottom = y + hero_height
-    hero_radius = 8
-    
-    hero_img = Image.new('RGBA', (hero_width, hero_height), (0, 0, 0, 0))
-    hero_draw = ImageDraw.Draw(hero_img)
-    
-    for i in range(hero_height):
-        ratio = i / hero_height
-        r = int(HERO_BG_START[0] * (1 - ratio) + HERO_BG_END[0] * ratio)
-        g = int(HERO_BG_START[1] * (1 - ratio) + HERO_BG_END[1] * ratio)
-        b = int(HERO_BG_START[2] * (1 - ratio) + HERO_BG_END[2] * ratio)
-        hero_draw.line([(0, i), (hero_width, i)], fill=(r, g, b, 255))
-    
-    mask = Image.new('L', (hero_width, hero_height), 0)
-    mask_draw = ImageDraw.Draw(mask)
-    mask_draw.rounded_rectangle([0, 0, hero_width, hero_height], radius=hero_radius, fill=255)
-    
-    hero_img.putalpha(mask)
-    img.paste(hero_img, (hero_margin, hero_top), hero_img)
-    
-    draw.rounded_rectangle([hero_margin, hero_top, hero_margin + hero_width, hero_bottom], radius=hero_radius, outline=HERO_BORDER, width=1)
+    hero_top = HERO_TOP
+    hero_bottom = HERO_TOP + HERO_HEIGHT
     
     display_money = total_money if total_money else current_money
     money_text = format_money_uk(display_money)
@@ -235,14 +307,9 @@ def generate_bigmoney_card(
     money_x = hero_margin + (hero_width - money_width) / 2
     draw.text((money_x, hero_top + 14), money_text, fill=ORANGE, font=font_hero)
     
-    label_text = "Büyük Para Girişi"
-    label_width = draw.textlength(label_text, font=font_hero_label)
-    label_x = hero_margin + (hero_width - label_width) / 2
-    draw.text((label_x, hero_top + 48), label_text, fill=ORANGE, font=font_hero_label)
-    
     y = hero_bottom + 12
     
-    if total_money and total_money != current_money:
+    if has_total:
         total_str = format_money_uk(total_money)
         toplam_text = "Toplam"
         
@@ -258,15 +325,12 @@ def generate_bigmoney_card(
     
     if previous_alarms and len(previous_alarms) > 0:
         y += 4
-        draw.text((CARD_PADDING + LEFT_BORDER_WIDTH, y), "ÖNCEKİ", fill=TEXT_MUTED, font=font_prev_title)
         y += 18
         
         for prev in previous_alarms[:4]:
             prev_time = format_prev_datetime(prev.get('time', ''))
             prev_money = format_money_uk(prev.get('money', 0))
             
-            draw.ellipse([CARD_PADDING + LEFT_BORDER_WIDTH, y + 4, CARD_PADDING + LEFT_BORDER_WIDTH + 6, y + 10], fill=ORANGE)
-            
             draw.text((CARD_PADDING + LEFT_BORDER_WIDTH + 12, y), prev_time, fill=TEXT_SECONDARY, font=font_prev)
             
             money_w = draw.textlength(prev_money, font=font_prev)
@@ -281,35 +345,13 @@ def generate_bigmoney_card(
         mult_x = CARD_WIDTH - CARD_PADDING - mult_width
         mult_y = 14
         
-        mult_bg = (48, 35, 22)
-        draw_rounded_rect(draw, (mult_x, mult_y, mult_x + mult_width, mult_y + mult_height), 10, mult_bg)
+        draw_rounded_rect(draw, (mult_x, mult_y, mult_x + mult_width, mult_y + mult_height), 10, BADGE_BG)
         draw.text((mult_x + 6, mult_y + 3), mult_text, fill=ORANGE, font=font_mult)
     
     if kickoff_utc:
         font_kickoff = get_font(12, 'regular')
         kickoff_str = format_kickoff(kickoff_utc)
         draw.text((CARD_PADDING + LEFT_BORDER_WIDTH, y), kickoff_str, fill=TEXT_SECONDARY, font=font_kickoff)
-        y += 24
-    
-    y += 8
-    btn_height = 36
-    btn_margin = CARD_PADDING + LEFT_BORDER_WIDTH
-    btn_left = btn_margin
-    btn_right = CARD_WIDTH - CARD_PADDING
-    btn_top = y
-    btn_bottom = y + btn_height
-    
-    btn_bg = (30, 30, 32)
-    draw_rounded_rect(draw, (btn_left, btn_top, btn_right, btn_bottom), 8, btn_bg, (48, 54, 61), 1)
-    
-    btn_text = "Maç Detayı"
-    font_btn = get_font(12, 'semibold')
-    btn_text_width = draw.textlength(btn_text, font=font_btn)
-    btn_text_x = btn_left + (btn_right - btn_left - btn_text_width) / 2
-    draw.text((btn_text_x, btn_top + 10), btn_text, fill=ORANGE, font=font_btn)
-    
-    arrow_x = btn_text_x + btn_text_width + 6
-    draw.text((arrow_x, btn_top + 10), "→", fill=ORANGE, font=font_btn)
     
     buffer = BytesIO()
     img.save(buffer, format='PNG', quality=95)
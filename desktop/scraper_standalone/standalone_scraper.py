@@ -75,6 +75,12 @@ except ImportError:
         canonical = f"{league_norm}|{home_norm}|{away_norm}"
         return hashlib.md5(canonical.encode('utf-8')).hexdigest()[:12]
 
+# Chunk'li retention silme (core/retention.py) - yoksa cleanup tek-statement DELETE kullanir
+try:
+    from core.retention import ChunkedRetention
+except ImportError:
+    ChunkedRetention = None
+
 
 def get_ssl_cert_path():
     """Get SSL certificate path with fallback for PyInstaller temp folder issues"""
@@ -382,7 +388,35 @@ class SupabaseWriter:
         if skipped > 0:
             log(f"  [HISTORY WARN] {table}: {skipped} satir skip (eksik field)")
         
-        return self.insert_rows(table, history_rows)
+        ok = self.insert_rows(table, history_rows)
+        if ok and history_rows and table.endswith('_history'):
+            self.refresh_latest_snapshots(table[:-len('_history')], scraped_at)
+        return ok
+    
+    def refresh_latest_snapshots(self, market: str, since: str) -> Optional[int]:
+        """match_latest_snapshots tablosunu az önce yazılan history satırlarıyla güncelle.
+        migrations/2026_10_18_match_latest_snapshots.sql uygulanmamışsa sessizce atlanır
+        (history yazımı bundan etkilenmez)."""
+        if getattr(self, '_latest_rpc_missing', False):
+            return None
+        try:
+            resp = requests.post(
+                f"{self.url}/rest/v1/rpc/refresh_match_latest_snapshots",
+                headers=self._headers(),
+                json={"p_market": market, "p_since": since},
+                timeout=30,
+                verify=SSL_VERIFY
+            )
+            if resp.status_code == 200:
+                return resp.json()
+            if resp.status_code == 404:
+                self._latest_rpc_missing = True
+                log(f"  [LATEST] refresh_match_latest_snapshots yok - migration uygulanmamis, atlaniyor")
+            else:
+                log(f"  [LATEST ERR] {market}: {resp.status_code}: {resp.text[:200]}")
+        except Exception as e:
+            log(f"  [LATEST ERR] {market}: {e}")
+        return None
     
     def upsert_fixtures(self, fixtures: List[Dict[str, Any]]) -> bool:
         """Fixtures tablosuna UPSERT - match_id_hash unique key"""
@@ -722,7 +756,7 @@ def cleanup_old_matches(writer: SupabaseWriter, logger_callback=None):
     - D-8+ (öncesi): Silinir
     
     Temizlenen tablolar:
-    - history tablolari (scraped_at bazli)
+    - history / snapshot / live tablolari (kendi tarih kolonu, chunk'li)
     - moneyway/dropping tablolari (date bazli)
     - fixtures (fixture_date bazli)
     - alarm tablolari
@@ -742,7 +776,7 @@ def cleanup_old_matches(writer: SupabaseWriter, logger_callback=None):
     
     total_deleted = 0
     
-    # 1. History tablolari (scraped_at bazli)
+    # 1. History tablolari (tarih bazli silme 3. adimda, orphan temizligi 4. adimda)
     history_tables = [
         "moneyway_1x2_history",
         "moneyway_ou25_history",
@@ -752,17 +786,6 @@ def cleanup_old_matches(writer: SupabaseWriter, logger_callback=None):
         "dropping_btts_history",
     ]
     
-    for table in history_tables:
-        try:
-            cutoff_iso = d_minus_8.strftime('%Y-%m-%dT00:00:00')
-            url = f"{writer._rest_url(table)}?scraped_at=lt.{cutoff_iso}"
-            resp = requests.delete(url, headers=writer._headers(), timeout=30)
-            if resp.status_code in [200, 204]:
-                _log(f"  [Cleanup] {table}: D-8+ kayitlar silindi")
-                total_deleted += 1
-        except Exception as e:
-            _log(f"  [Cleanup] {table}: Hata - {e}")
-    
     # 2. Moneyway/Dropping canli tablolari (date bazli - DD.Mon formatinda)
     live_tables = [
         "moneyway_1x2",
@@ -814,49 +837,49 @@ def cleanup_old_matches(writer: SupabaseWriter, logger_callback=None):
         except Exception as e:
             _log(f"  [Cleanup] {table}: Hata - {e}")
     
-    # 3. Fixtures (fixture_date bazli)
-    try:
-        cutoff_date = d_minus_8.strftime('%Y-%m-%d')
-        url = f"{writer._rest_url('fixtures')}?fixture_date=lt.{cutoff_date}"
-        resp = requests.delete(url, headers=writer._headers(), timeout=30)
-        if resp.status_code in [200, 204]:
-            _log(f"  [Cleanup] fixtures: D-8+ kayitlar silindi")
-            total_deleted += 1
-    except Exception as e:
-        _log(f"  [Cleanup] fixtures: Hata - {e}")
+    # 3. History / fixtures / snapshot / live tablolari: kendi tarih kolonuna gore,
+    # sinirli chunk'larla (core/retention.py). RPC yoksa eski tek-statement DELETE.
+    cutoff_date = d_minus_8.strftime('%Y-%m-%d')
+    targets = [(table, 'scraped_at', d_minus_8.strftime('%Y-%m-%dT00:00:00')) for table in history_tables]
+    targets += [
+        ('fixtures', 'fixture_date', cutoff_date),
+        ('moneyway_snapshots', 'scraped_at_utc', cutoff_date),
+        ('live_snapshots', 'snapshot_at', cutoff_date),
+        ('live_fixtures', 'fixture_date', cutoff_date),
+    ]
 
-    # 4. Snapshot tablolari (scraped_at_utc bazli)
-    snapshot_cutoff = d_minus_8.strftime('%Y-%m-%d')
-    for snap_table, snap_col in [
-        ('moneyway_snapshots', 'scraped_at_utc'),
-    ]:
+    def _legacy_delete(table, column, cutoff):
+        headers = writer._headers()
+        headers['Prefer'] = 'count=exact'
+        resp = requests.delete(f"{writer._rest_url(table)}?{column}=lt.{cutoff}",
+                               headers=headers, timeout=60, verify=SSL_VERIFY)
+        if resp.status_code not in [200, 204]:
+            return 0
+        total = resp.headers.get('content-range', '').split('/')[-1]
+        return int(total) if total.isdigit() else 0
+
+    if ChunkedRetention is not None:
+        retention = ChunkedRetention(writer.url, writer._headers, requests,
+                                     legacy_delete=_legacy_delete, log=_log,
+                                     request_kwargs={'verify': SSL_VERIFY})
         try:
-            url = f"{writer._rest_url(snap_table)}?{snap_col}=lt.{snapshot_cutoff}"
-            resp = requests.delete(url, headers=writer._headers(), timeout=60)
-            if resp.status_code in [200, 204]:
-                _log(f"  [Cleanup] {snap_table}: D-8+ kayitlar silindi")
-                total_deleted += 1
+            retention.run(targets)
         except Exception as e:
-            _log(f"  [Cleanup] {snap_table}: Hata - {e}")
-
-    # 5. Live tablolari
-    try:
-        url = f"{writer._rest_url('live_snapshots')}?snapshot_at=lt.{snapshot_cutoff}"
-        resp = requests.delete(url, headers=writer._headers(), timeout=60)
-        if resp.status_code in [200, 204]:
-            _log(f"  [Cleanup] live_snapshots: D-8+ kayitlar silindi")
-            total_deleted += 1
-    except Exception as e:
-        _log(f"  [Cleanup] live_snapshots: Hata - {e}")
-
-    try:
-        url = f"{writer._rest_url('live_fixtures')}?fixture_date=lt.{snapshot_cutoff}"
-        resp = requests.delete(url, headers=writer._headers(), timeout=60)
-        if resp.status_code in [200, 204]:
-            _log(f"  [Cleanup] live_fixtures: D-8+ kayitlar silindi")
-            total_deleted += 1
-    except Exception as e:
-        _log(f"  [Cleanup] live_fixtures: Hata - {e}")
+            _log(f"  [Cleanup] Retention hatasi: {e}")
+        for table, state in retention.report.items():
+            _log(f"  [Cleanup] {table}: {state['deleted']} kayit silindi ({state['mode']}, "
+                 f"{state['chunks']} chunk, max {state['max_chunk_ms']}ms, {state['status']})")
+            total_deleted += state['deleted']
+        if retention.pending:
+            _log(f"  [Cleanup] Sure butcesi doldu, sonraki calistirmada devam: {', '.join(retention.pending)}")
+    else:
+        for table, column, cutoff in targets:
+            try:
+                count = _legacy_delete(table, column, cutoff)
+                _log(f"  [Cleanup] {table}: {count} D-8+ kayit silindi")
+                total_deleted += count
+            except Exception as e:
+                _log(f"  [Cleanup] {table}: Hata - {e}")
 
     if total_deleted > 0:
         _log(f"[Cleanup] Tamamlandi - {total_deleted} islem")
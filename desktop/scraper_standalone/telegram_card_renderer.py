@@ -2,10 +2,17 @@
 Telegram Card Renderer - HTML to PNG
 Renders alarm cards exactly like the web UI using Playwright
 For use in Admin.exe (Windows environment where Playwright works)
+
+Tüm render'lar tek bir renderer thread'inde (kendi event loop'u + tek browser)
+çalışır; render_html_to_png her thread'den güvenle çağrılabilir,
+submit_html_render / submit_alarm_card_png Future döner.
 """
 
 import asyncio
+import atexit
+import concurrent.futures
 import logging
+import threading
 from io import BytesIO
 from datetime import datetime
 from typing import Optional, List, Dict
@@ -27,8 +34,14 @@ logger = logging.getLogger(__name__)
 
 MONTHS_TR = ['Oca', 'Şub', 'Mar', 'Nis', 'May', 'Haz', 'Tem', 'Ağu', 'Eyl', 'Eki', 'Kas', 'Ara']
 
+VIEWPORT_WIDTH = 400
+VIEWPORT_HEIGHT = 800
+MAX_CONCURRENT_PAGES = int(os.environ.get('CARD_RENDER_MAX_PAGES', '3'))
+RENDER_TIMEOUT = 30.0
+
 _browser_instance = None
 _playwright_instance = None
+# Yalnızca renderer thread'inin loop'unda kullanılır
 _browser_lock = asyncio.Lock()
 _chromium_available = None
 
@@ -461,37 +474,138 @@ async def close_browser():
             logger.info("[CardRenderer] Playwright instance stopped")
 
 
-async def render_html_to_png_async(html: str) -> bytes:
-    if not PLAYWRIGHT_AVAILABLE:
-        raise RuntimeError("Playwright not available - install with: pip install playwright && playwright install chromium")
+async def render_html_to_png_async(html: str, browser=None) -> bytes:
+    if browser is None:
+        if not PLAYWRIGHT_AVAILABLE:
+            raise RuntimeError("Playwright not available - install with: pip install playwright && playwright install chromium")
+        browser = await get_browser()
     
-    browser = await get_browser()
-    page = await browser.new_page(viewport={'width': 400, 'height': 800})
+    page = await browser.new_page(viewport={'width': VIEWPORT_WIDTH, 'height': VIEWPORT_HEIGHT})
     
     try:
-        await page.set_content(html)
-        await page.wait_for_load_state('networkidle')
-        await asyncio.sleep(0.5)
+        await page.set_content(html, wait_until='networkidle')
+        # Inter (Google Fonts) yüklenmeden çekilen kare fallback fontla çıkar
+        await page.evaluate('document.fonts.ready.then(() => true)')
         
         card = await page.query_selector('.card')
-        if card:
-            screenshot = await card.screenshot(type='png')
-        else:
-            screenshot = await page.screenshot(type='png')
+        box = await card.bounding_box() if card else None
+        if not box:
+            return await page.screenshot(type='png')
         
-        return screenshot
+        bottom = int(box['y'] + box['height']) + 1
+        if bottom > VIEWPORT_HEIGHT:
+            await page.set_viewport_size({'width': VIEWPORT_WIDTH, 'height': bottom})
+        # Sadece kart dikdörtgeni: sayfanın geri kalanı kodlanmaz
+        return await page.screenshot(type='png', clip=box, animations='disabled', caret='hide')
     finally:
         await page.close()
 
 
-def render_html_to_png(html: str) -> bytes:
-    try:
-        loop = asyncio.get_event_loop()
-    except RuntimeError:
+class CardRenderThread:
+    """
+    Tek renderer thread'i: kendi event loop'u ve tek browser'ı vardır.
+    submit() herhangi bir thread'den çağrılabilir ve concurrent.futures.Future döner;
+    aynı anda en fazla max_pages sayfa açık olur (birden çok alarm hesaplayıcısı paralel render eder).
+    browser_factory: browser döndüren coroutine fonksiyonu (varsayılan get_browser)
+    """
+    
+    def __init__(self, max_pages: int = MAX_CONCURRENT_PAGES, browser_factory=None, name: str = 'card-renderer'):
+        self.max_pages = max(1, int(max_pages))
+        self.browser_factory = browser_factory or get_browser
+        self.name = name
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._thread: Optional[threading.Thread] = None
+        self._pages: Optional[asyncio.Semaphore] = None
+        self._ready = threading.Event()
+        self._lock = threading.Lock()
+        self.rendered = 0
+        self.failed = 0
+    
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+    
+    def start(self):
+        with self._lock:
+            if not self.running:
+                self._ready.clear()
+                self._thread = threading.Thread(target=self._run, name=self.name, daemon=True)
+                self._thread.start()
+        # Başka bir thread'in başlattığı loop'un hazır olmasını da bekle
+        self._ready.wait()
+    
+    def _run(self):
         loop = asyncio.new_event_loop()
         asyncio.set_event_loop(loop)
+        self._loop = loop
+        self._pages = asyncio.Semaphore(self.max_pages)
+        self._ready.set()
+        try:
+            loop.run_forever()
+        finally:
+            loop.close()
+    
+    async def _render(self, html: str) -> bytes:
+        async with self._pages:
+            try:
+                browser = await self.browser_factory()
+                png = await render_html_to_png_async(html, browser=browser)
+                self.rendered += 1
+                return png
+            except Exception:
+                self.failed += 1
+                raise
+    
+    def submit(self, html: str) -> concurrent.futures.Future:
+        """HTML'i renderer thread'inde PNG'ye çevir; Future.result() → bytes."""
+        self.start()
+        return asyncio.run_coroutine_threadsafe(self._render(html), self._loop)
+    
+    def render(self, html: str, timeout: float = RENDER_TIMEOUT) -> bytes:
+        future = self.submit(html)
+        try:
+            return future.result(timeout)
+        except concurrent.futures.TimeoutError:
+            future.cancel()
+            raise
     
-    return loop.run_until_complete(render_html_to_png_async(html))
+    def stop(self, timeout: float = 10.0):
+        """Browser'ı kapat, loop'u durdur (atexit)."""
+        with self._lock:
+            loop, thread = self._loop, self._thread
+            if thread is None or not thread.is_alive():
+                return
+            if self.browser_factory is get_browser:
+                try:
+                    asyncio.run_coroutine_threadsafe(close_browser(), loop).result(timeout)
+                except Exception as e:
+                    logger.warning(f"[CardRenderer] Browser close failed: {e}")
+            loop.call_soon_threadsafe(loop.stop)
+            thread.join(timeout)
+            self._thread = None
+            self._loop = None
+
+
+_renderer: Optional[CardRenderThread] = None
+_renderer_lock = threading.Lock()
+
+
+def get_renderer() -> CardRenderThread:
+    """Süreç geneli renderer thread'i (ilk çağrıda başlar)."""
+    global _renderer
+    with _renderer_lock:
+        if _renderer is None:
+            _renderer = CardRenderThread()
+            atexit.register(_renderer.stop)
+        return _renderer
+
+
+def submit_html_render(html: str) -> concurrent.futures.Future:
+    return get_renderer().submit(html)
+
+
+def render_html_to_png(html: str) -> bytes:
+    return get_renderer().render(html)
 
 
 def render_bigmoney_card_png(
@@ -524,7 +638,7 @@ def render_bigmoney_card_png(
     return render_html_to_png(html)
 
 
-def render_alarm_card_png(
+def alarm_card_html(
     alarm_type: str,
     home_team: str,
     away_team: str,
@@ -533,11 +647,11 @@ def render_alarm_card_png(
     alarm_time: str = None,
     kickoff_utc: str = None,
     **kwargs
-) -> bytes:
+) -> str:
     alarm_type = alarm_type.lower()
     
     if alarm_type == 'bigmoney':
-        return render_bigmoney_card_png(
+        return generate_bigmoney_html(
             home_team=home_team,
             away_team=away_team,
             market=market,
@@ -551,7 +665,7 @@ def render_alarm_card_png(
             multiplier=kwargs.get('multiplier')
         )
     
-    return render_bigmoney_card_png(
+    return generate_bigmoney_html(
         home_team=home_team,
         away_team=away_team,
         market=market,
@@ -562,6 +676,15 @@ def render_alarm_card_png(
     )
 
 
+def render_alarm_card_png(*args, **kwargs) -> bytes:
+    return render_html_to_png(alarm_card_html(*args, **kwargs))
+
+
+def submit_alarm_card_png(*args, **kwargs) -> concurrent.futures.Future:
+    """render_alarm_card_png'nin bloklamayan hali: Future.result() → PNG bytes."""
+    return submit_html_render(alarm_card_html(*args, **kwargs))
+
+
 if __name__ == "__main__":
     logging.basicConfig(level=logging.INFO)
     print("Testing BigMoney card render...")
@@ -1,13 +1,19 @@
 """
 Telegram Notification Module for SmartXFlow
 Single responsibility: Send messages to Telegram with retry and rate limit handling
+
+Tüm gönderimler süreç geneli governor'dan (core/telegram_governor.py) slot alır:
+global + chat başına bucket, 429 retry_after'ı bütün göndericiler paylaşır.
 """
 
 import os
 import time
 import logging
 import ssl
-from typing import Optional
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import List, Optional, Tuple, Union
 from datetime import datetime
 from io import BytesIO
 
@@ -94,6 +100,15 @@ except ImportError:
         def mark_chromium_unavailable():
             pass
 
+try:
+    import sys
+    _ROOT_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    if _ROOT_DIR not in sys.path:
+        sys.path.append(_ROOT_DIR)
+    from core.telegram_governor import get_governor, retry_after_from_response
+except ImportError:
+    get_governor = None
+
 logger = logging.getLogger(__name__)
 
 TELEGRAM_MESSAGE_MODE = os.environ.get('TELEGRAM_MESSAGE_MODE', 'image')
@@ -101,12 +116,42 @@ TELEGRAM_MESSAGE_MODE = os.environ.get('TELEGRAM_MESSAGE_MODE', 'image')
 TELEGRAM_API_URL = "https://api.telegram.org/bot{token}/sendMessage"
 TELEGRAM_PHOTO_URL = "https://api.telegram.org/bot{token}/sendPhoto"
 
+# png (olduğu gibi) | palette | webp
+PHOTO_ENCODING = os.environ.get('TELEGRAM_PHOTO_ENCODING', 'png').lower()
+PHOTO_CACHE_SIZE = 512
+
+# (token, sha256, encoding) → Telegram file_id
+_photo_file_ids: "OrderedDict[Tuple[str, str, str], str]" = OrderedDict()
+_photo_upload_locks = {}
+_photo_cache_lock = threading.Lock()
+_photo_stats = {'uploaded': 0, 'uploaded_bytes': 0, 'reused': 0}
+
 def get_telegram_credentials() -> tuple:
     """Get Telegram credentials from environment"""
     token = os.environ.get('TELEGRAM_BOT_TOKEN') or os.environ.get('TELEGRAM_TOKEN')
     chat_id = os.environ.get('TELEGRAM_CHAT_ID')
     return token, chat_id
 
+def _acquire_send_slot(token: str, chat_id: str) -> bool:
+    """Governor'dan gönderim slotu al (global + chat bucket, aktif retry_after bloğu)."""
+    if get_governor is None:
+        return True
+    if get_governor().acquire(token, chat_id):
+        return True
+    logger.warning(f"[Telegram] Rate limit queue too long for chat {chat_id}, message dropped")
+    return False
+
+
+def _handle_rate_limited(token: str, chat_id: str, response, fallback_delay: float):
+    """429: governor'a bildir (sonraki acquire herkes için bekler); governor yoksa burada uyu."""
+    if get_governor is not None:
+        get_governor().observe(token, chat_id, response)
+        logger.warning(f"[Telegram] Rate limited (429), retry_after {retry_after_from_response(response, fallback_delay)}s shared by all senders")
+    else:
+        logger.warning(f"[Telegram] Rate limited. Waiting {fallback_delay}s before retry")
+        time.sleep(fallback_delay)
+
+
 def send_telegram_message(text: str, token: Optional[str] = None, chat_id: Optional[str] = None) -> bool:
     """
     Send a message to Telegram with retry and rate limit handling.
@@ -141,23 +186,21 @@ def send_telegram_message(text: str, token: Optional[str] = None, chat_id: Optio
     
     for attempt in range(max_retries):
         try:
+            if not _acquire_send_slot(token, chat_id):
+                return False
             if USE_HTTPX:
                 response = httpx.post(url, json=payload, timeout=30)
                 status_code = response.status_code
-                response_json = response.json() if response.status_code == 200 else {}
             else:
                 response = requests.post(url, json=payload, timeout=30)
                 status_code = response.status_code
-                response_json = response.json() if response.status_code == 200 else {}
             
             if status_code == 200:
                 logger.info(f"[Telegram] Message sent successfully")
                 return True
             
             elif status_code == 429:
-                retry_after = response_json.get('parameters', {}).get('retry_after', retry_delays[attempt])
-                logger.warning(f"[Telegram] Rate limited. Waiting {retry_after}s before retry {attempt + 1}/{max_retries}")
-                time.sleep(retry_after)
+                _handle_rate_limited(token, chat_id, response, retry_delays[attempt])
                 continue
             
             else:
@@ -182,33 +225,81 @@ def send_telegram_message(text: str, token: Optional[str] = None, chat_id: Optio
     return False
 
 
-def send_telegram_photo(
-    photo: BytesIO,
-    caption: str = "",
-    token: Optional[str] = None,
-    chat_id: Optional[str] = None
-) -> bool:
+def _photo_cache_key(token: str, data: bytes) -> Tuple[str, str, str]:
+    return token, hashlib.sha256(data).hexdigest(), PHOTO_ENCODING
+
+
+def _cached_file_id(key) -> Optional[str]:
+    with _photo_cache_lock:
+        file_id = _photo_file_ids.get(key)
+        if file_id:
+            _photo_file_ids.move_to_end(key)
+        return file_id
+
+
+def _remember_file_id(key, response_json: dict):
+    """sendPhoto yanıtındaki en büyük PhotoSize'ın file_id'sini sakla (file_id bota özeldir)."""
+    sizes = (response_json.get('result') or {}).get('photo') or []
+    if not sizes:
+        return
+    with _photo_cache_lock:
+        _photo_file_ids[key] = sizes[-1].get('file_id')
+        _photo_file_ids.move_to_end(key)
+        while len(_photo_file_ids) > PHOTO_CACHE_SIZE:
+            evicted, _ = _photo_file_ids.popitem(last=False)
+            _photo_upload_locks.pop(evicted, None)
+
+
+def _forget_file_id(key):
+    with _photo_cache_lock:
+        _photo_file_ids.pop(key, None)
+
+
+def _count_photo(**deltas):
+    with _photo_cache_lock:
+        for name, value in deltas.items():
+            _photo_stats[name] += value
+
+
+def _upload_lock(key) -> threading.Lock:
+    with _photo_cache_lock:
+        return _photo_upload_locks.setdefault(key, threading.Lock())
+
+
+def encode_photo(data: bytes, encoding: str = None) -> Tuple[bytes, str, str]:
     """
-    Send a photo to Telegram with retry and rate limit handling.
-    
-    Args:
-        photo: BytesIO buffer containing the image
-        caption: Optional caption for the photo
-        token: Bot token (optional, reads from env if not provided)
-        chat_id: Chat ID (optional, reads from env if not provided)
-    
-    Returns:
-        True if photo sent successfully, False otherwise
+    Opsiyonel boyut küçültücü yeniden kodlama (TELEGRAM_PHOTO_ENCODING):
+      png     → olduğu gibi
+      palette → 256 renk paletli PNG (optimize)
+      webp    → WebP (quality 90)
+    Sonuç orijinalden büyükse ya da Pillow yoksa orijinal döner.
+    Dönüş: (bytes, dosya adı, mime)
     """
-    if not token:
-        token, env_chat_id = get_telegram_credentials()
-        if not chat_id:
-            chat_id = env_chat_id
-    
-    if not token or not chat_id:
-        logger.warning("[Telegram] Missing TELEGRAM_BOT_TOKEN or TELEGRAM_CHAT_ID")
-        return False
-    
+    encoding = (encoding or PHOTO_ENCODING).lower()
+    if encoding not in ('palette', 'webp'):
+        return data, 'alarm.png', 'image/png'
+    try:
+        from PIL import Image
+        img = Image.open(BytesIO(data)).convert('RGB')
+        out = BytesIO()
+        if encoding == 'palette':
+            img.quantize(colors=256, method=Image.Quantize.FASTOCTREE).save(out, format='PNG', optimize=True)
+            name, mime = 'alarm.png', 'image/png'
+        else:
+            img.save(out, format='WEBP', quality=90, method=4)
+            name, mime = 'alarm.webp', 'image/webp'
+        encoded = out.getvalue()
+        if len(encoded) < len(data):
+            return encoded, name, mime
+    except Exception as e:
+        logger.warning(f"[Telegram] Photo re-encode ({encoding}) failed, sending original: {e}")
+    return data, 'alarm.png', 'image/png'
+
+
+def _post_photo(token: str, chat_id: str, caption: str, upload: Optional[Tuple[bytes, str, str]] = None,
+                file_id: Optional[str] = None) -> Tuple[bool, dict]:
+    """Tek chat'e sendPhoto: upload=(bytes, ad, mime) multipart, file_id → JSON (yükleme yok).
+    Dönüş: (başarılı mı, yanıt JSON'u)."""
     url = TELEGRAM_PHOTO_URL.format(token=token)
     
     max_retries = 3
@@ -216,52 +307,128 @@ def send_telegram_photo(
     
     for attempt in range(max_retries):
         try:
-            photo.seek(0)
-            files = {"photo": ("alarm.png", photo, "image/png")}
             data = {"chat_id": chat_id}
             if caption:
                 data["caption"] = caption
                 data["parse_mode"] = "HTML"
             
-            if USE_HTTPX:
-                response = httpx.post(url, files=files, data=data, timeout=30)
-                status_code = response.status_code
-                response_json = response.json() if response.status_code == 200 else {}
+            if not _acquire_send_slot(token, chat_id):
+                return False, {}
+            post = httpx.post if USE_HTTPX else requests.post
+            if file_id:
+                response = post(url, json=dict(data, photo=file_id), timeout=30)
             else:
-                response = requests.post(url, files=files, data=data, timeout=30)
-                status_code = response.status_code
-                response_json = response.json() if response.status_code == 200 else {}
+                body, name, mime = upload
+                response = post(url, files={"photo": (name, BytesIO(body), mime)}, data=data, timeout=30)
+            status_code = response.status_code
             
             if status_code == 200:
-                logger.info(f"[Telegram] Photo sent successfully")
-                return True
+                logger.info(f"[Telegram] Photo sent successfully" + (" (cached file_id)" if file_id else ""))
+                try:
+                    return True, response.json()
+                except Exception:
+                    return True, {}
             
             elif status_code == 429:
-                retry_after = response_json.get('parameters', {}).get('retry_after', retry_delays[attempt])
-                logger.warning(f"[Telegram] Rate limited. Waiting {retry_after}s before retry {attempt + 1}/{max_retries}")
-                time.sleep(retry_after)
+                _handle_rate_limited(token, chat_id, response, retry_delays[attempt])
                 continue
             
+            elif status_code == 400 and file_id:
+                # file_id geçersiz / süresi dolmuş: çağıran yeniden yükler
+                logger.warning(f"[Telegram] Cached file_id rejected: {response.text[:100]}")
+                return False, {}
+            
             else:
                 logger.error(f"[Telegram] Photo failed with status {status_code}: {response.text}")
                 if attempt < max_retries - 1:
                     time.sleep(retry_delays[attempt])
                     continue
                 set_telegram_error(f"Foto API hatası {status_code}: {response.text[:100]}")
-                return False
+                return False, {}
                 
         except Exception as e:
             logger.error(f"[Telegram] Photo error on attempt {attempt + 1}: {e}")
             if check_ssl_error(e):
                 set_telegram_error(f"SSL hatası (foto): {e}")
-                return False
+                return False, {}
             if attempt < max_retries - 1:
                 time.sleep(retry_delays[attempt])
                 continue
             set_telegram_error(f"Foto gönderilemedi: {e}")
-            return False
+            return False, {}
     
-    return False
+    return False, {}
+
+
+def _send_photo_to_chat(token: str, chat_id: str, data: bytes, key, caption: str) -> bool:
+    file_id = _cached_file_id(key)
+    if file_id:
+        ok, _ = _post_photo(token, chat_id, caption, file_id=file_id)
+        if ok:
+            _count_photo(reused=1)
+            return True
+        _forget_file_id(key)
+    # Aynı görüntüyü aynı anda gönderen thread'ler tek yükleme yapar
+    with _upload_lock(key):
+        file_id = _cached_file_id(key)
+        if file_id:
+            ok, _ = _post_photo(token, chat_id, caption, file_id=file_id)
+            if ok:
+                _count_photo(reused=1)
+                return True
+            _forget_file_id(key)
+        upload = encode_photo(data)
+        ok, response_json = _post_photo(token, chat_id, caption, upload=upload)
+        if ok:
+            _count_photo(uploaded=1, uploaded_bytes=len(upload[0]))
+            _remember_file_id(key, response_json)
+        return ok
+
+
+def send_telegram_photo(
+    photo: BytesIO,
+    caption: str = "",
+    token: Optional[str] = None,
+    chat_id: Optional[Union[str, List[str]]] = None
+) -> bool:
+    """
+    Send a photo to Telegram with retry and rate limit handling.
+    
+    Aynı içerik (sha256) bu bot ile daha önce yüklendiyse Telegram file_id'si
+    ile gönderilir (multipart yükleme yok); chat listesine fan-out tek yükleme yapar.
+    
+    Args:
+        photo: BytesIO buffer containing the image
+        caption: Optional caption for the photo
+        token: Bot token (optional, reads from env if not provided)
+        chat_id: Chat ID or list of chat IDs (optional, reads from env if not provided)
+    
+    Returns:
+        True if photo sent successfully (to every chat), False otherwise
+    """
+    if not token:
+        token, env_chat_id = get_telegram_credentials()
+        if not chat_id:
+            chat_id = env_chat_id
+    
+    if not token or not chat_id:
+        logger.warning("[Telegram] Missing TELEGRAM_BOT_TOKEN or TELEGRAM_CHAT_ID")
+        return False
+    
+    photo.seek(0)
+    data = photo.read()
+    key = _photo_cache_key(token, data)
+    chat_ids = [chat_id] if isinstance(chat_id, (str, int)) else list(chat_id)
+    
+    ok = True
+    for cid in chat_ids:
+        ok = _send_photo_to_chat(token, cid, data, key, caption) and ok
+    return ok
+
+
+def get_photo_cache_stats() -> dict:
+    with _photo_cache_lock:
+        return dict(_photo_stats, cached_file_ids=len(_photo_file_ids), encoding=PHOTO_ENCODING)
 
 
 MONTHS_TR = ['Oca', 'Şub', 'Mar', 'Nis', 'May', 'Haz', 'Tem', 'Ağu', 'Eyl', 'Eki', 'Kas', 'Ara']
@@ -848,6 +1015,11 @@ def send_alarm_with_image(
     return send_telegram_message(msg)
 
 
+def get_rate_limit_stats() -> dict:
+    """Governor kuyruk derinliği ve throttle sayaçları (admin paneli / log için)."""
+    return get_governor().stats() if get_governor is not None else {}
+
+
 def send_test_message() -> bool:
     """Send a test message to verify Telegram configuration."""
     return send_telegram_message("✅ SmartXFlow Telegram test başarılı!")
@@ -0,0 +1,8 @@
+-- Migration: 2026-10-18
+-- Supabase dashboard SQL Editor'de çalıştır
+-- scraper_heartbeat.shard_stats: alarm_engine shard modunda (ALARM_ENGINE_SHARDS > 1)
+-- her cycle'ın shard bazlı süre / RSS / alarm sayıları.
+-- Kolon yoksa alarm_engine heartbeat'i shard_stats olmadan yazmaya devam eder.
+
+ALTER TABLE public.scraper_heartbeat
+    ADD COLUMN IF NOT EXISTS shard_stats JSONB;
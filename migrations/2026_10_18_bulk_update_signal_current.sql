@@ -0,0 +1,55 @@
+-- Migration: 2026-10-18
+-- Supabase dashboard SQL Editor'de çalıştır
+-- bulk_update_signal_current: sinyal tablolarının current_* kolonlarını tek çağrıda
+-- günceller (sinyal_engine her cycle'da satır başına PATCH yerine bunu kullanır).
+-- Sadece UPDATE yapar — silinmiş bir sinyal geri insert edilmez.
+-- RPC yoksa sinyal_engine satır başına PATCH'e düşer (sadece değişen satırlar).
+
+CREATE OR REPLACE FUNCTION public.bulk_update_signal_current(
+    p_table TEXT,
+    p_rows  JSONB
+) RETURNS INTEGER
+LANGUAGE plpgsql
+SECURITY DEFINER
+SET search_path = public
+AS $$
+DECLARE
+    v_set   TEXT;
+    v_count INTEGER;
+BEGIN
+    IF p_table NOT IN ('underdog_signals', 'confirmed_money_signals',
+                       'confirmed_money_v2_signals', 'fake_sharp_signals') THEN
+        RAISE EXCEPTION 'unknown signal table: %', p_table;
+    END IF;
+
+    v_set := 'current_odds = r.current_odds, current_pct = r.current_pct, '
+          || 'current_volume = r.current_volume, last_updated_at = r.last_updated_at';
+    IF p_table = 'underdog_signals' THEN
+        v_set := v_set || ', current_amt = r.current_amt';
+    ELSE
+        v_set := v_set || ', match_date = COALESCE(r.match_date, t.match_date)';
+    END IF;
+
+    EXECUTE format($q$
+        UPDATE %I AS t SET %s
+        FROM jsonb_to_recordset($1) AS r(
+            match_key       TEXT,
+            selection_code  TEXT,
+            current_odds    TEXT,
+            current_pct     TEXT,
+            current_amt     TEXT,
+            current_volume  TEXT,
+            match_date      TEXT,
+            last_updated_at TIMESTAMPTZ
+        )
+        WHERE t.match_key = r.match_key
+          AND t.selection_code = r.selection_code
+    $q$, p_table, v_set)
+    USING p_rows;
+
+    GET DIAGNOSTICS v_count = ROW_COUNT;
+    RETURN v_count;
+END;
+$$;
+
+GRANT EXECUTE ON FUNCTION public.bulk_update_signal_current(TEXT, JSONB) TO anon, authenticated, service_role;
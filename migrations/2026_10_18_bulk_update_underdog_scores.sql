@@ -0,0 +1,35 @@
+-- Migration: 2026-10-18
+-- Supabase dashboard SQL Editor'de çalıştır
+-- bulk_update_underdog_scores: skoru boş underdog sinyallerine FT skorunu tek
+-- çağrıda yazar (app.py _update_underdog_signal_scores).
+-- Sadece UPDATE yapar — silinmiş bir sinyal geri insert edilmez, NOT NULL
+-- kolonlar eksik satır olarak gönderilmez. Dolu skorların üzerine yazmaz.
+-- RPC yoksa app.py satır başına PATCH'e düşer.
+
+CREATE OR REPLACE FUNCTION public.bulk_update_underdog_scores(
+    p_rows JSONB
+) RETURNS INTEGER
+LANGUAGE plpgsql
+SECURITY DEFINER
+SET search_path = public
+AS $$
+DECLARE
+    v_count INTEGER;
+BEGIN
+    UPDATE underdog_signals AS t
+    SET score = r.score
+    FROM jsonb_to_recordset(p_rows) AS r(
+        match_key      TEXT,
+        selection_code TEXT,
+        score          TEXT
+    )
+    WHERE t.match_key = r.match_key
+      AND t.selection_code = r.selection_code
+      AND (t.score IS NULL OR t.score = '');
+
+    GET DIAGNOSTICS v_count = ROW_COUNT;
+    RETURN v_count;
+END;
+$$;
+
+GRANT EXECUTE ON FUNCTION public.bulk_update_underdog_scores(JSONB) TO anon, authenticated, service_role;
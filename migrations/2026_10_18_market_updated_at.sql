@@ -0,0 +1,49 @@
+-- Migration: 2026-10-18
+-- Supabase dashboard SQL Editor'de çalıştır
+-- Market tablolarına updated_at: masaüstü uygulaması (desktop_app/smartxflow_app.py)
+-- her yenilemede tüm tabloyu çekmek yerine sadece updated_at > son senkron olan
+-- satırları ister (silinenler id listesiyle bulunur).
+-- Scraper her turda tüm satırları upsert ettiği için trigger updated_at'i sadece
+-- satır gerçekten değiştiğinde ilerletir; değişmeyen maçlar delta'ya girmez.
+
+-- 1. Kolon + index
+DO $$
+DECLARE
+    t TEXT;
+BEGIN
+    FOREACH t IN ARRAY ARRAY['moneyway_1x2', 'moneyway_ou25', 'moneyway_btts',
+                             'dropping_1x2', 'dropping_ou25', 'dropping_btts'] LOOP
+        EXECUTE format('ALTER TABLE public.%I ADD COLUMN IF NOT EXISTS updated_at TIMESTAMPTZ DEFAULT NOW()', t);
+        EXECUTE format('CREATE INDEX IF NOT EXISTS %I ON public.%I (updated_at)', 'idx_' || t || '_updated_at', t);
+    END LOOP;
+END $$;
+
+-- 2. Trigger: içerik değiştiyse updated_at = NOW()
+CREATE OR REPLACE FUNCTION public.touch_market_updated_at()
+RETURNS TRIGGER
+LANGUAGE plpgsql
+AS $$
+BEGIN
+    IF TG_OP = 'INSERT' THEN
+        NEW.updated_at := NOW();
+    ELSIF NEW IS DISTINCT FROM OLD THEN
+        NEW.updated_at := NOW();
+    END IF;
+    RETURN NEW;
+END;
+$$;
+
+DO $$
+DECLARE
+    t TEXT;
+BEGIN
+    FOREACH t IN ARRAY ARRAY['moneyway_1x2', 'moneyway_ou25', 'moneyway_btts',
+                             'dropping_1x2', 'dropping_ou25', 'dropping_btts'] LOOP
+        EXECUTE format('DROP TRIGGER IF EXISTS trg_%s_updated_at ON public.%I', t, t);
+        EXECUTE format('CREATE TRIGGER trg_%s_updated_at BEFORE INSERT OR UPDATE ON public.%I '
+                       'FOR EACH ROW EXECUTE FUNCTION public.touch_market_updated_at()', t, t);
+    END LOOP;
+END $$;
+
+-- Kontrol:
+-- SELECT count(*), max(updated_at) FROM moneyway_1x2;
@@ -0,0 +1,112 @@
+-- Migration: 2026-10-18
+-- Supabase dashboard SQL Editor'de çalıştır
+-- match_latest_snapshots: her market + match_id_hash için son, bir önceki ve açılış
+-- snapshot'ı. Okuyucular (get_all_matches_with_latest, get_matches_paginated,
+-- get_opening_odds_batch, sinyal_engine.fetch_latest_snapshots) history tablosunu
+-- taramak yerine buradan okur → maliyet aktif maç sayısıyla orantılı.
+-- Scraper her history yazımından sonra refresh_match_latest_snapshots(market, scraped_at)
+-- RPC'sini çağırır; sadece yeni yazılan satırlar işlenir.
+
+-- 1. Tablo
+CREATE TABLE IF NOT EXISTS public.match_latest_snapshots (
+    market              TEXT NOT NULL,
+    match_id_hash       TEXT NOT NULL,
+    latest              JSONB NOT NULL,
+    latest_scraped_at   TIMESTAMPTZ NOT NULL,
+    previous            JSONB,
+    previous_scraped_at TIMESTAMPTZ,
+    opening             JSONB,
+    opening_scraped_at  TIMESTAMPTZ,
+    updated_at          TIMESTAMPTZ DEFAULT NOW(),
+    PRIMARY KEY (market, match_id_hash)
+);
+
+CREATE INDEX IF NOT EXISTS idx_mls_market_latest
+    ON public.match_latest_snapshots (market, latest_scraped_at DESC);
+
+-- 2. Refresh fonksiyonu
+-- p_since'ten sonra yazılan history satırlarından her maç için en yeni (rn=1) ve
+-- bir önceki (rn=2) satırı alır. Mevcut kayıt sadece daha yeni bir snapshot geldiyse
+-- güncellenir; eski "latest" otomatik olarak "previous" olur. opening sadece ilk
+-- insert'te (pencerenin en eski satırı) yazılır, sonra değişmez.
+CREATE OR REPLACE FUNCTION public.refresh_match_latest_snapshots(
+    p_market TEXT,
+    p_since  TIMESTAMPTZ DEFAULT NOW() - INTERVAL '30 minutes'
+) RETURNS INTEGER
+LANGUAGE plpgsql
+SECURITY DEFINER
+SET search_path = public
+AS $$
+DECLARE
+    v_count INTEGER;
+BEGIN
+    IF p_market NOT IN ('moneyway_1x2', 'moneyway_ou25', 'moneyway_btts',
+                        'dropping_1x2', 'dropping_ou25', 'dropping_btts') THEN
+        RAISE EXCEPTION 'unknown market: %', p_market;
+    END IF;
+
+    EXECUTE format($q$
+        WITH ranked AS (
+            SELECT h.match_id_hash,
+                   to_jsonb(h) AS row_data,
+                   h.scraped_at,
+                   row_number() OVER (PARTITION BY h.match_id_hash ORDER BY h.scraped_at DESC, h.id DESC) AS rn_desc,
+                   row_number() OVER (PARTITION BY h.match_id_hash ORDER BY h.scraped_at ASC,  h.id ASC)  AS rn_asc
+            FROM %I h
+            WHERE h.scraped_at >= $1
+              AND h.match_id_hash IS NOT NULL
+              AND h.match_id_hash <> ''
+        ),
+        agg AS (
+            SELECT match_id_hash,
+                   MAX(row_data::text)   FILTER (WHERE rn_desc = 1) AS latest,
+                   MAX(scraped_at)       FILTER (WHERE rn_desc = 1) AS latest_scraped_at,
+                   MAX(row_data::text)   FILTER (WHERE rn_desc = 2) AS previous,
+                   MAX(scraped_at)       FILTER (WHERE rn_desc = 2) AS previous_scraped_at,
+                   MAX(row_data::text)   FILTER (WHERE rn_asc = 1)  AS opening,
+                   MAX(scraped_at)       FILTER (WHERE rn_asc = 1)  AS opening_scraped_at
+            FROM ranked
+            WHERE rn_desc <= 2 OR rn_asc = 1
+            GROUP BY match_id_hash
+        )
+        INSERT INTO public.match_latest_snapshots AS t
+            (market, match_id_hash, latest, latest_scraped_at, previous, previous_scraped_at,
+             opening, opening_scraped_at, updated_at)
+        SELECT $2, a.match_id_hash, a.latest::jsonb, a.latest_scraped_at,
+               a.previous::jsonb, a.previous_scraped_at,
+               a.opening::jsonb, a.opening_scraped_at, NOW()
+        FROM agg a
+        ON CONFLICT (market, match_id_hash) DO UPDATE SET
+            previous = CASE
+                WHEN EXCLUDED.previous_scraped_at IS NOT NULL
+                     AND EXCLUDED.previous_scraped_at > t.latest_scraped_at THEN EXCLUDED.previous
+                ELSE t.latest END,
+            previous_scraped_at = CASE
+                WHEN EXCLUDED.previous_scraped_at IS NOT NULL
+                     AND EXCLUDED.previous_scraped_at > t.latest_scraped_at THEN EXCLUDED.previous_scraped_at
+                ELSE t.latest_scraped_at END,
+            latest = EXCLUDED.latest,
+            latest_scraped_at = EXCLUDED.latest_scraped_at,
+            opening = COALESCE(t.opening, EXCLUDED.opening),
+            opening_scraped_at = COALESCE(t.opening_scraped_at, EXCLUDED.opening_scraped_at),
+            updated_at = NOW()
+        WHERE EXCLUDED.latest_scraped_at > t.latest_scraped_at
+    $q$, p_market || '_history')
+    USING p_since, p_market;
+
+    GET DIAGNOSTICS v_count = ROW_COUNT;
+    RETURN v_count;
+END;
+$$;
+
+GRANT EXECUTE ON FUNCTION public.refresh_match_latest_snapshots(TEXT, TIMESTAMPTZ) TO anon, authenticated, service_role;
+GRANT SELECT ON public.match_latest_snapshots TO anon, authenticated;
+
+-- 3. İlk doldurma (retention penceresi D-8 — tüm history tek seferde işlenir).
+-- opening'in gerçek ilk snapshot olması için pencere history'nin tamamını kapsamalı.
+SELECT public.refresh_match_latest_snapshots('moneyway_1x2',  NOW() - INTERVAL '9 days');
+SELECT public.refresh_match_latest_snapshots('moneyway_ou25', NOW() - INTERVAL '9 days');
+SELECT public.refresh_match_latest_snapshots('moneyway_btts', NOW() - INTERVAL '9 days');
+SELECT public.refresh_match_latest_snapshots('dropping_1x2',  NOW() - INTERVAL '9 days');
+SELECT public.refresh_match_latest_snapshots('dropping_ou25', NOW() - INTERVAL '9 days');
+SELECT public.refresh_match_latest_snapshots('dropping_btts', NOW() - INTERVAL '9 days');
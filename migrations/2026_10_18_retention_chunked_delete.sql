@@ -0,0 +1,136 @@
+-- Migration: 2026-10-18
+-- Supabase dashboard SQL Editor'de çalıştır
+-- retention_delete_chunk: D-8 temizliğini tek büyük DELETE yerine sınırlı chunk'larla
+-- yapar (core/retention.py). Her çağrı en fazla p_limit satırı indeksli tarih kolonu
+-- sırasıyla siler. ORDER BY id (SERIAL PK) + tarih filtresi planner'ı PK'yi baştan
+-- tarayıp tarih filtresini satır satır uygulamaya itebiliyordu; tarih indeksi üzerinde
+-- range + LIMIT her chunk'ta sabit maliyetli. Bu yüzden her hedefin silme kolonunda
+-- indeks olmalı (bölüm 3).
+-- Kısa statement'lar 57014 (statement timeout) almaz ve scraper yazımlarını bloklamaz.
+-- retention_progress: yarım kalan temizliğin kaldığı yer + öğrenilmiş chunk boyu.
+-- RPC yoksa client eski tek-statement silmeye düşer.
+
+-- 1. Progress tablosu
+CREATE TABLE IF NOT EXISTS public.retention_progress (
+    table_name   TEXT PRIMARY KEY,
+    cutoff       TEXT NOT NULL,
+    status       TEXT NOT NULL DEFAULT 'done',
+    deleted_rows BIGINT NOT NULL DEFAULT 0,
+    chunks       INTEGER NOT NULL DEFAULT 0,
+    chunk_rows   INTEGER,
+    max_chunk_ms INTEGER,
+    updated_at   TIMESTAMPTZ DEFAULT NOW()
+);
+
+ALTER TABLE public.retention_progress ENABLE ROW LEVEL SECURITY;
+DROP POLICY IF EXISTS retention_progress_all ON public.retention_progress;
+CREATE POLICY retention_progress_all ON public.retention_progress FOR ALL USING (true) WITH CHECK (true);
+
+CREATE OR REPLACE FUNCTION public.retention_progress_touch() RETURNS TRIGGER
+LANGUAGE plpgsql AS $$
+BEGIN
+    NEW.updated_at := NOW();
+    RETURN NEW;
+END;
+$$;
+
+DROP TRIGGER IF EXISTS trg_retention_progress_touch ON public.retention_progress;
+CREATE TRIGGER trg_retention_progress_touch BEFORE INSERT OR UPDATE ON public.retention_progress
+    FOR EACH ROW EXECUTE FUNCTION public.retention_progress_touch();
+
+-- 2. Chunk silme
+CREATE OR REPLACE FUNCTION public.retention_delete_chunk(
+    p_table  TEXT,
+    p_column TEXT,
+    p_cutoff TEXT,
+    p_limit  INTEGER DEFAULT 1000
+) RETURNS INTEGER
+LANGUAGE plpgsql
+SECURITY DEFINER
+SET search_path = public
+AS $$
+DECLARE
+    v_rel   REGCLASS;
+    v_count INTEGER;
+BEGIN
+    IF p_table NOT IN (
+        'moneyway_1x2_history', 'moneyway_ou25_history', 'moneyway_btts_history',
+        'dropping_1x2_history', 'dropping_ou25_history', 'dropping_btts_history',
+        'moneyway_1x2', 'moneyway_ou25', 'moneyway_btts',
+        'dropping_1x2', 'dropping_ou25', 'dropping_btts',
+        'moneyway_snapshots', 'dropping_odds_snapshots', 'live_snapshots',
+        'fixtures', 'live_fixtures', 'scraper_signal', 'telegram_sent_log',
+        'sharp_alarms', 'bigmoney_alarms', 'volumeshock_alarms', 'dropping_alarms',
+        'volume_leader_alarms', 'mim_alarms', 'match_latest_snapshots'
+    ) THEN
+        RAISE EXCEPTION 'retention: unknown table %', p_table;
+    END IF;
+
+    v_rel := to_regclass(format('public.%I', p_table));
+    IF v_rel IS NULL THEN
+        RETURN 0;
+    END IF;
+    IF NOT EXISTS (SELECT 1 FROM pg_attribute
+                   WHERE attrelid = v_rel AND attname = p_column AND NOT attisdropped) THEN
+        RAISE EXCEPTION 'retention: unknown column %.%', p_table, p_column;
+    END IF;
+
+    -- Dış koşul tekrar: partition'lı tabloda ctid partition'lar arası tekil değil
+    EXECUTE format($q$
+        DELETE FROM public.%1$I
+        WHERE ctid = ANY(ARRAY(
+                SELECT ctid FROM public.%1$I
+                WHERE %2$I < %3$L
+                ORDER BY %2$I
+                LIMIT $1))
+          AND %2$I < %3$L
+    $q$, p_table, p_column, p_cutoff)
+    USING GREATEST(1, LEAST(p_limit, 50000));
+
+    GET DIAGNOSTICS v_count = ROW_COUNT;
+    RETURN v_count;
+END;
+$$;
+
+GRANT EXECUTE ON FUNCTION public.retention_delete_chunk(TEXT, TEXT, TEXT, INTEGER) TO anon, authenticated, service_role;
+GRANT SELECT, INSERT, UPDATE ON public.retention_progress TO anon, authenticated, service_role;
+
+-- 3. Chunk alt sorgusu için silme kolonu indeksleri
+-- Zaten var olanlar: *_history(scraped_at) idx_*_hist_at, moneyway_snapshots /
+-- dropping_odds_snapshots(scraped_at_utc), live_snapshots(snapshot_at),
+-- live_fixtures(fixture_date) — 2026_06_20_indexes_and_heartbeat.sql.
+-- Eksik olanlar burada; tablo/kolon yoksa (eski kurulum) atlanır. CREATE INDEX
+-- tablo boyunca yazmaları bekletir — bu tablolar küçük, yoğun olmayan saatte çalıştır.
+DO $$
+DECLARE
+    v_t RECORD;
+BEGIN
+    FOR v_t IN
+        SELECT * FROM (VALUES
+            ('moneyway_1x2',         'date',         'idx_mw1x2_date'),
+            ('moneyway_ou25',        'date',         'idx_mwou25_date'),
+            ('moneyway_btts',        'date',         'idx_mwbtts_date'),
+            ('dropping_1x2',         'date',         'idx_do1x2_date'),
+            ('dropping_ou25',        'date',         'idx_doou25_date'),
+            ('dropping_btts',        'date',         'idx_dobtts_date'),
+            ('fixtures',             'fixture_date', 'idx_fixtures_fixture_date'),
+            ('sharp_alarms',         'match_date',   'idx_sharp_alarms_match_date'),
+            ('bigmoney_alarms',      'match_date',   'idx_bigmoney_alarms_match_date'),
+            ('volumeshock_alarms',   'match_date',   'idx_volumeshock_alarms_match_date'),
+            ('dropping_alarms',      'match_date',   'idx_dropping_alarms_match_date'),
+            ('volume_leader_alarms', 'match_date',   'idx_volume_leader_alarms_match_date'),
+            ('mim_alarms',           'match_date',   'idx_mim_alarms_match_date'),
+            ('scraper_signal',       'created_at',   'idx_scraper_signal_created_at'),
+            ('telegram_sent_log',    'last_sent_at', 'idx_telegram_sent_log_last_sent_at'),
+            -- idx_mls_market_latest (market, latest_scraped_at) market'siz range'e yaramaz
+            ('match_latest_snapshots', 'latest_scraped_at', 'idx_mls_latest_scraped_at')
+        ) AS t(table_name, column_name, index_name)
+    LOOP
+        CONTINUE WHEN NOT EXISTS (SELECT 1 FROM information_schema.columns
+                                  WHERE table_schema = 'public'
+                                    AND table_name = v_t.table_name AND column_name = v_t.column_name);
+        EXECUTE format('CREATE INDEX IF NOT EXISTS %I ON public.%I (%I)',
+                       v_t.index_name, v_t.table_name, v_t.column_name);
+    END LOOP;
+END;
+$$;
@@ -0,0 +1,234 @@
+-- Migration: 2026-10-18
+-- Supabase dashboard SQL Editor'de çalıştır (OPSİYONEL — önce
+-- 2026_10_18_retention_chunked_delete.sql uygulanmış olmalı)
+-- Büyük append-only tabloları (*_history, moneyway_snapshots, dropping_odds_snapshots,
+-- live_snapshots) gün bazlı RANGE partition'a taşır. Eski günler tek tek satır silmek
+-- yerine DROP TABLE ile sabit sürede düşürülür; core/retention.py her temizlikte önce
+-- retention_drop_partitions'ı çağırır (tablo partition'lı değilse 0 döner), kalan
+-- satırları (DEFAULT partition vb.) chunk'lı silme temizler.
+--
+-- Taşıma tablo başına ayrı ve elle yapılır (yoğun olmayan saatte):
+--     SELECT public.retention_partition_table('moneyway_1x2_history', 'scraped_at');
+--     SELECT public.retention_partition_table('live_snapshots', 'snapshot_at');
+-- Eski tablo <tablo>_legacy adıyla kalır; kontrol sonrası DROP TABLE ile silin.
+-- Yeni günlerin partition'ları retention_ensure_partitions ile önceden açılır
+-- (retention_drop_partitions bunu her çağrıda yapar); eksik gün DEFAULT'a düşer.
+
+-- 1. Gün partition'larını önceden aç
+CREATE OR REPLACE FUNCTION public.retention_ensure_partitions(
+    p_table      TEXT,
+    p_days_ahead INTEGER DEFAULT 7
+) RETURNS INTEGER
+LANGUAGE plpgsql
+SECURITY DEFINER
+SET search_path = public
+AS $$
+DECLARE
+    v_day     DATE;
+    v_name    TEXT;
+    v_created INTEGER := 0;
+BEGIN
+    IF NOT EXISTS (SELECT 1 FROM pg_partitioned_table
+                   WHERE partrelid = to_regclass(format('public.%I', p_table))) THEN
+        RETURN 0;
+    END IF;
+    FOR v_day IN SELECT generate_series(CURRENT_DATE - 1, CURRENT_DATE + p_days_ahead, INTERVAL '1 day')::DATE LOOP
+        v_name := format('%s_p%s', p_table, to_char(v_day, 'YYYYMMDD'));
+        CONTINUE WHEN to_regclass(format('public.%I', v_name)) IS NOT NULL;
+        BEGIN
+            EXECUTE format('CREATE TABLE public.%I PARTITION OF public.%I FOR VALUES FROM (%L) TO (%L)',
+                           v_name, p_table, to_char(v_day, 'YYYY-MM-DD'), to_char(v_day + 1, 'YYYY-MM-DD'));
+            v_created := v_created + 1;
+        EXCEPTION WHEN others THEN
+            -- DEFAULT partition'da o güne ait satır varsa açılamaz; chunk'lı silme temizler
+            RAISE NOTICE 'retention: % açılamadı: %', v_name, SQLERRM;
+        END;
+    END LOOP;
+    RETURN v_created;
+END;
+$$;
+
+-- 2. Cutoff'tan eski gün partition'larını düşür (partition'lı değilse 0)
+CREATE OR REPLACE FUNCTION public.retention_drop_partitions(
+    p_table  TEXT,
+    p_cutoff TEXT
+) RETURNS INTEGER
+LANGUAGE plpgsql
+SECURITY DEFINER
+SET search_path = public
+AS $$
+DECLARE
+    v_rel     REGCLASS;
+    v_cutoff  DATE := left(p_cutoff, 10)::DATE;
+    v_child   RECORD;
+    v_dropped INTEGER := 0;
+BEGIN
+    IF p_table NOT IN (
+        'moneyway_1x2_history', 'moneyway_ou25_history', 'moneyway_btts_history',
+        'dropping_1x2_history', 'dropping_ou25_history', 'dropping_btts_history',
+        'moneyway_snapshots', 'dropping_odds_snapshots', 'live_snapshots'
+    ) THEN
+        RETURN 0;
+    END IF;
+    v_rel := to_regclass(format('public.%I', p_table));
+    IF v_rel IS NULL OR NOT EXISTS (SELECT 1 FROM pg_partitioned_table WHERE partrelid = v_rel) THEN
+        RETURN 0;
+    END IF;
+    FOR v_child IN
+        SELECT c.relname
+        FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid
+        WHERE i.inhparent = v_rel
+          AND c.relname ~ ('^' || p_table || '_p[0-9]{8}$')
+    LOOP
+        -- Partition [gün, gün+1): üst sınır cutoff'a eşit/küçükse tamamı eski
+        IF to_date(right(v_child.relname, 8), 'YYYYMMDD') + 1 <= v_cutoff THEN
+            EXECUTE format('DROP TABLE public.%I', v_child.relname);
+            v_dropped := v_dropped + 1;
+        END IF;
+    END LOOP;
+    PERFORM public.retention_ensure_partitions(p_table);
+    RETURN v_dropped;
+END;
+$$;
+
+-- 3. Mevcut tabloyu gün partition'lı tabloya taşı (tek seferlik, elle)
+-- Kolonlar/default'lar/indeksler/policy'ler kopyalanır. Partition'lı tabloda her
+-- unique index partition kolonunu içermek zorunda: PK (*_history / snapshot
+-- tablolarında SERIAL id) (id, p_column) olur; diğer UNIQUE constraint/index'ler
+-- p_column'u zaten içeriyorsa aynen kopyalanır, içermiyorsa taşıma hiçbir şey
+-- değiştirilmeden hata ile durur (unique garantisi sessizce kaybolmasın).
+-- Sadece son p_keep_days günün satırları taşınır (eskiler zaten silinecekti).
+CREATE OR REPLACE FUNCTION public.retention_partition_table(
+    p_table      TEXT,
+    p_column     TEXT,
+    p_keep_days  INTEGER DEFAULT 8,
+    p_days_ahead INTEGER DEFAULT 7
+) RETURNS TEXT
+LANGUAGE plpgsql
+SECURITY DEFINER
+SET search_path = public
+AS $$
+DECLARE
+    v_rel     REGCLASS := to_regclass(format('public.%I', p_table));
+    v_legacy  TEXT := p_table || '_legacy';
+    v_from    DATE := CURRENT_DATE - p_keep_days;
+    v_day     DATE;
+    v_idx     RECORD;
+    v_pol     RECORD;
+    v_con     RECORD;
+    v_pk_cols TEXT;
+    v_uniques TEXT[];
+    v_seq     TEXT;
+    v_moved   BIGINT;
+BEGIN
+    IF p_table NOT IN (
+        'moneyway_1x2_history', 'moneyway_ou25_history', 'moneyway_btts_history',
+        'dropping_1x2_history', 'dropping_ou25_history', 'dropping_btts_history',
+        'moneyway_snapshots', 'dropping_odds_snapshots', 'live_snapshots'
+    ) THEN
+        RAISE EXCEPTION 'retention: % partition listesinde değil', p_table;
+    END IF;
+    IF v_rel IS NULL THEN
+        RAISE EXCEPTION 'retention: % yok', p_table;
+    END IF;
+    IF EXISTS (SELECT 1 FROM pg_partitioned_table WHERE partrelid = v_rel) THEN
+        RETURN p_table || ' zaten partition''lı';
+    END IF;
+
+    EXECUTE format('LOCK TABLE public.%I IN ACCESS EXCLUSIVE MODE', p_table);
+
+    -- Partition kolonunu içermeyen unique index (PK hariç) taşınamaz: önce kontrol
+    FOR v_idx IN
+        SELECT ic.relname AS name
+        FROM pg_index x JOIN pg_class ic ON ic.oid = x.indexrelid
+        WHERE x.indrelid = v_rel AND x.indisunique AND NOT x.indisprimary
+          AND NOT EXISTS (SELECT 1 FROM pg_attribute a
+                          WHERE a.attrelid = v_rel AND a.attname = p_column
+                            AND a.attnum = ANY(x.indkey::SMALLINT[]))
+    LOOP
+        RAISE EXCEPTION 'retention: % unique index % partition kolonunu (%) içermiyor',
+                        p_table, v_idx.name, p_column;
+    END LOOP;
+
+    SELECT string_agg(quote_ident(a.attname), ', ' ORDER BY k.ord)
+    INTO v_pk_cols
+    FROM pg_index x
+    CROSS JOIN LATERAL unnest(x.indkey::SMALLINT[]) WITH ORDINALITY AS k(attnum, ord)
+    JOIN pg_attribute a ON a.attrelid = x.indrelid AND a.attnum = k.attnum
+    WHERE x.indrelid = v_rel AND x.indisprimary AND a.attname <> p_column;
+
+    -- UNIQUE constraint'ler (partition kolonunu içerdikleri yukarıda doğrulandı)
+    SELECT array_agg(format('ADD CONSTRAINT %I %s', conname, pg_get_constraintdef(oid)))
+    INTO v_uniques
+    FROM pg_constraint
+    WHERE conrelid = v_rel AND contype = 'u';
+    v_seq := pg_get_serial_sequence(format('public.%I', p_table), 'id');
+
+    EXECUTE format('ALTER TABLE public.%I RENAME TO %I', p_table, v_legacy);
+    -- Constraint adları index adlarıyla aynı namespace'te: legacy'dekiler yeniden adlandırılır
+    FOR v_con IN
+        SELECT conname FROM pg_constraint
+        WHERE conrelid = v_rel AND contype IN ('p', 'u')
+    LOOP
+        EXECUTE format('ALTER TABLE public.%I RENAME CONSTRAINT %I TO %I',
+                       v_legacy, v_con.conname, left(v_con.conname, 55) || '_legacy');
+    END LOOP;
+    EXECUTE format('CREATE TABLE public.%I (LIKE public.%I INCLUDING DEFAULTS INCLUDING STORAGE) '
+                   'PARTITION BY RANGE (%I)', p_table, v_legacy, p_column);
+    IF v_pk_cols IS NOT NULL THEN
+        EXECUTE format('ALTER TABLE public.%I ADD PRIMARY KEY (%s, %I)', p_table, v_pk_cols, p_column);
+    END IF;
+    IF v_uniques IS NOT NULL THEN
+        EXECUTE format('ALTER TABLE public.%I %s', p_table, array_to_string(v_uniques, ', '));
+    END IF;
+    IF v_seq IS NOT NULL THEN
+        -- SERIAL sekansı yeni tabloya bağlanır; legacy DROP edilince silinmesin
+        EXECUTE format('ALTER SEQUENCE %s OWNED BY public.%I.id', v_seq, p_table);
+    END IF;
+
+    -- Constraint'e bağlı olmayan indeksleri (unique dahil) yeni (parent) tabloda yeniden oluştur
+    FOR v_idx IN
+        SELECT ic.relname AS name, pg_get_indexdef(x.indexrelid) AS def
+        FROM pg_index x JOIN pg_class ic ON ic.oid = x.indexrelid
+        WHERE x.indrelid = v_rel
+          AND NOT EXISTS (SELECT 1 FROM pg_constraint c WHERE c.conindid = x.indexrelid AND c.conrelid = v_rel)
+    LOOP
+        EXECUTE format('ALTER INDEX public.%I RENAME TO %I', v_idx.name, left(v_idx.name, 55) || '_legacy');
+        EXECUTE replace(v_idx.def, format(' ON public.%s ', v_legacy), format(' ON public.%s ', p_table));
+    END LOOP;
+
+    EXECUTE format('CREATE TABLE public.%I PARTITION OF public.%I DEFAULT', p_table || '_pdefault', p_table);
+    FOR v_day IN SELECT generate_series(v_from, CURRENT_DATE + p_days_ahead, INTERVAL '1 day')::DATE LOOP
+        EXECUTE format('CREATE TABLE public.%I PARTITION OF public.%I FOR VALUES FROM (%L) TO (%L)',
+                       format('%s_p%s', p_table, to_char(v_day, 'YYYYMMDD')), p_table,
+                       to_char(v_day, 'YYYY-MM-DD'), to_char(v_day + 1, 'YYYY-MM-DD'));
+    END LOOP;
+
+    EXECUTE format('INSERT INTO public.%I SELECT * FROM public.%I WHERE %I >= %L',
+                   p_table, v_legacy, p_column, to_char(v_from, 'YYYY-MM-DD'));
+    GET DIAGNOSTICS v_moved = ROW_COUNT;
+
+    -- RLS + policy'ler legacy tablodan aynen kopyalanır
+    IF (SELECT relrowsecurity FROM pg_class WHERE oid = to_regclass(format('public.%I', v_legacy))) THEN
+        EXECUTE format('ALTER TABLE public.%I ENABLE ROW LEVEL SECURITY', p_table);
+    END IF;
+    FOR v_pol IN
+        SELECT policyname, permissive, cmd, roles, qual, with_check
+        FROM pg_policies WHERE schemaname = 'public' AND tablename = v_legacy
+    LOOP
+        EXECUTE format('CREATE POLICY %I ON public.%I AS %s FOR %s TO %s%s%s',
+                       v_pol.policyname, p_table, v_pol.permissive, v_pol.cmd,
+                       array_to_string(v_pol.roles, ', '),
+                       COALESCE(' USING (' || v_pol.qual || ')', ''),
+                       COALESCE(' WITH CHECK (' || v_pol.with_check || ')', ''));
+    END LOOP;
+    EXECUTE format('GRANT SELECT, INSERT, UPDATE, DELETE ON public.%I TO anon, authenticated, service_role', p_table);
+
+    RETURN format('%s: %s satır taşındı, eski tablo %s', p_table, v_moved, v_legacy);
+END;
+$$;
+
+GRANT EXECUTE ON FUNCTION public.retention_ensure_partitions(TEXT, INTEGER) TO anon, authenticated, service_role;
+GRANT EXECUTE ON FUNCTION public.retention_drop_partitions(TEXT, TEXT) TO anon, authenticated, service_role;
+-- retention_partition_table sadece SQL Editor'den (postgres rolü) çalıştırılır
+REVOKE EXECUTE ON FUNCTION public.retention_partition_table(TEXT, TEXT, INTEGER, INTEGER) FROM PUBLIC, anon, authenticated;
@@ -0,0 +1,46 @@
+#!/usr/bin/env python3
+"""Excapper detay sayfalarını tests/fixtures/excapper/ altına kaydet.
+
+tests/test_graphsdata_extract.py bu klasördeki her *.html sayfasında tek geçişli
+extract_graphsdata_odds'u eski tab başına parser ile karşılaştırır. Scraper'ın
+kullandığı session/header'larla ana sayfadaki ilk N prematch maçın detay sayfası
+çekilir; istekler arasında scraper'ın nezaket tavanı (MAX_RPS) korunur.
+
+    python scripts/capture_excapper_fixtures.py [adet=10]
+"""
+import os
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, 'desktop', 'scraper_standalone'))
+
+import requests
+from excapper_scraper import MAX_RPS, fetch_match_list, request_match_detail
+
+OUT_DIR = os.path.join(ROOT, 'tests', 'fixtures', 'excapper')
+
+
+def main(count: int = 10) -> int:
+    os.makedirs(OUT_DIR, exist_ok=True)
+    session = requests.Session()
+    matches = fetch_match_list(session)
+    print(f"[Fixtures] {len(matches)} maç bulundu, {min(count, len(matches))} detay kaydedilecek")
+    saved = 0
+    for match in matches[:count]:
+        time.sleep(1.0 / MAX_RPS)
+        resp = request_match_detail(match['game_id'], session)
+        if resp.status_code != 200 or "graphsData[" not in resp.text:
+            print(f"[Fixtures]   {match['game_id']}: atlandı (HTTP {resp.status_code})")
+            continue
+        path = os.path.join(OUT_DIR, f"{match['game_id']}.html")
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write(resp.text)
+        saved += 1
+        print(f"[Fixtures]   {match['game_id']}: {match['home']} - {match['away']} → {os.path.relpath(path, ROOT)}")
+    print(f"[Fixtures] {saved} sayfa kaydedildi")
+    return 0 if saved else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main(int(sys.argv[1]) if len(sys.argv) > 1 else 10))
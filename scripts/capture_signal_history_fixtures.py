@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+"""Sinyal engine'in bir tarama cycle'ında okuduğu gerçek veriyi tests/fixtures/signal_history/ altına kaydet.
+
+tests/test_signal_frame.py bu klasördeki her *.json dosyasında vektörel
+HistoryFrame taramasını (CM / CMv2 / FS / EML) kayıttaki beklenen sinyallerle
+karşılaştırır. Beklenen sinyaller kayıt anında satır bazlı referans döngülerle
+(tests/test_signal_frame.py) üretilir; frame yolu farklı sonuç verirse uyarı basılır,
+kayıt yine yazılır (test kırmızıya düşsün).
+sinyal_engine'in kendi fetch fonksiyonları kullanılır (SUPABASE_URL / SUPABASE_ANON_KEY).
+
+    python scripts/capture_signal_history_fixtures.py [ad=<UTC zaman damgası>]
+"""
+import json
+import os
+import sys
+from datetime import datetime, timezone
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, 'tests'))
+
+import sinyal_engine as se
+from test_signal_frame import _ref_cm, _ref_cm_v2, _ref_eml_stable, _ref_fs
+
+OUT_DIR = os.path.join(ROOT, 'tests', 'fixtures', 'signal_history')
+
+
+def _split_aliases(history):
+    """Aynı listeyi paylaşan alias key'ler (hash + home|away|date) → tek kopya + alias haritası."""
+    primary, aliases, seen = {}, {}, {}
+    for key, rows in history.items():
+        owner = seen.get(id(rows))
+        if owner is None:
+            seen[id(rows)] = key
+            primary[key] = rows
+        else:
+            aliases[key] = owner
+    return primary, aliases
+
+
+def main(name=None) -> int:
+    name = name or datetime.now(timezone.utc).strftime('%Y%m%dT%H%M%SZ')
+    latest = se.fetch_latest_snapshots()
+    if not latest:
+        print("[Fixtures] latest snapshot yok (SUPABASE_URL / anahtar?)")
+        return 1
+    active_keys = se.fetch_live_active_keys()
+    history = se.fetch_recent_history(active_keys)
+    first = se.fetch_first_snapshots(active_keys)
+    cooldowns = {'cm': se.fetch_cm_recent_cooldowns(), 'cmv2': se.fetch_cm_v2_recent_cooldowns(),
+                 'fs': se.fetch_fs_cooldown()}
+
+    latest_by_hash = {}
+    for snap in latest.values():
+        if snap.get('home') and snap.get('away'):
+            latest_by_hash[se._make_match_id_hash(snap['home'], snap['away'], snap.get('league', ''))] = snap
+    eml_history = se.fetch_eml_history(set(latest_by_hash))
+    eml_existing = se.fetch_eml_existing()
+
+    expected = {
+        'cm': _ref_cm(latest, history, cooldowns['cm'], first),
+        'cmv2': _ref_cm_v2(latest, history, cooldowns['cmv2'], first),
+        'fs': _ref_fs(latest, history, cooldowns['fs'], first),
+        'eml': [list(t) for t in _ref_eml_stable(eml_history, latest_by_hash, eml_existing)],
+    }
+    frame = se.HistoryFrame(history)
+    for kind, fn in (('cm', se.find_confirmed_money), ('cmv2', se.find_confirmed_money_v2),
+                     ('fs', se.find_fake_sharp)):
+        if fn(latest, frame, cooldowns[kind], first) != expected[kind]:
+            print(f"[Fixtures] UYARI: {kind} frame sonucu referanstan farklı")
+
+    primary, aliases = _split_aliases(history)
+    doc = {
+        'captured_at': datetime.now(timezone.utc).isoformat(),
+        'latest': latest,
+        'history': primary,
+        'history_aliases': aliases,
+        'first': first,
+        'cooldowns': {k: sorted(list(p) for p in v) for k, v in cooldowns.items()},
+        'eml': {'history': eml_history, 'existing': sorted(list(p) for p in eml_existing)},
+        'expected': expected,
+    }
+    os.makedirs(OUT_DIR, exist_ok=True)
+    path = os.path.join(OUT_DIR, f"{name}.json")
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(doc, f, ensure_ascii=False, indent=1)  # sort_keys yok: sinyal sırası latest sırasını izler
+    print(f"[Fixtures] {len(latest)} maç, {sum(len(r) for r in primary.values())} history satırı, "
+          f"sinyal: " + ', '.join(f"{k}={len(v)}" for k, v in expected.items())
+          + f" → {os.path.relpath(path, ROOT)}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1] if len(sys.argv) > 1 else None))
@@ -0,0 +1,332 @@
+"""
+Calc jobs — admin alarm hesaplamaları için arka plan işleri
+
+/api/<tip>/calculate artık hesaplamayı request thread'inde çalıştırmaz: bir
+CalcJob başlatıp hemen job_id döner. Client GET /api/calc-jobs/<id> ile
+ilerlemeyi sorar, POST /api/calc-jobs/<id>/cancel ile iptal eder.
+
+gunicorn birden fazla worker çalıştırdığı için poll isteği işi başlatan
+worker'a düşmeyebilir; iş durumu JOBS_DIR altında JSON olarak yansıtılır ve
+iptal işareti de bir dosya (<id>.cancel) ile iletilir.
+
+HistoryLoader: bir çalıştırma boyunca kullanılan history önbelleği. Hesaplayıcı
+maç döngüsünden önce prefetch() ile o marketteki tüm aday maçların history'sini
+tek bir IN-batch sorgusuyla çeker; aynı çalıştırmadaki diğer hesaplayıcılar
+aynı tabloyu tekrar çekmez. Maç başına sadece ilk HISTORY_HEAD_ROWS ve son
+HISTORY_TAIL_ROWS snapshot tutulur (hesaplayıcıların baktığı kısımlar).
+
+'batch' işi ile tekil hesaplayıcı işleri birbirini dışlar: biri çalışırken
+diğeri başlatılırsa çalışan iş döner (aynı global alarm listelerine yazarlar).
+"""
+import json
+import os
+import threading
+import time
+import uuid
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+JOBS_DIR = '/tmp/smartxflow_calc_jobs'
+MAX_JOBS = 50
+STALE_RUNNING_SECONDS = 15 * 60
+
+FINISHED_STATES = ('done', 'failed', 'cancelled')
+
+HISTORY_HEAD_ROWS = 1000   # get_match_history_for_sharp ile aynı: ilk 1000 snapshot
+HISTORY_TAIL_ROWS = 50     # son snapshot'lara bakan hesaplayıcılar (volume leader)
+
+
+class CalcJobCancelled(BaseException):
+    """İş kullanıcı tarafından iptal edildi.
+
+    BaseException: hesaplayıcılardaki market/maç bazlı `except Exception`
+    blokları iptali yutmasın, doğrudan registry'ye çıksın.
+    """
+
+
+class CalcJob:
+    """Tek bir arka plan hesaplaması (durum + ilerleme + iptal bayrağı)."""
+
+    def __init__(self, kind: str, jobs_dir: Optional[str] = JOBS_DIR):
+        self.id = uuid.uuid4().hex[:12]
+        self.kind = kind
+        self.status = 'queued'
+        self.progress = ''
+        self.result: Optional[Dict] = None
+        self.error: Optional[str] = None
+        self.created_at = time.time()
+        self.updated_at = self.created_at
+        self.finished_at: Optional[float] = None
+        self._cancel = threading.Event()
+        self._jobs_dir = jobs_dir
+
+    # --- iptal ---
+    def cancel(self):
+        self._cancel.set()
+        if self._jobs_dir:
+            try:
+                open(os.path.join(self._jobs_dir, f"{self.id}.cancel"), 'w').close()
+            except OSError:
+                pass
+
+    def cancelled(self) -> bool:
+        if self._cancel.is_set():
+            return True
+        if self._jobs_dir and os.path.exists(os.path.join(self._jobs_dir, f"{self.id}.cancel")):
+            self._cancel.set()
+            return True
+        return False
+
+    def check_cancelled(self):
+        if self.cancelled():
+            raise CalcJobCancelled(self.id)
+
+    def set_progress(self, text: str):
+        """İlerleme metnini güncelle; iptal istendiyse CalcJobCancelled fırlatır."""
+        self.progress = text
+        self.updated_at = time.time()
+        self._persist()
+        self.check_cancelled()
+
+    # --- durum ---
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'job_id': self.id,
+            'kind': self.kind,
+            'status': self.status,
+            'progress': self.progress,
+            'result': self.result,
+            'error': self.error,
+            'created_at': self.created_at,
+            'updated_at': self.updated_at,
+            'finished_at': self.finished_at,
+        }
+
+    def _persist(self):
+        if not self._jobs_dir:
+            return
+        try:
+            os.makedirs(self._jobs_dir, exist_ok=True)
+            path = os.path.join(self._jobs_dir, f"{self.id}.json")
+            tmp = f"{path}.{os.getpid()}.tmp"
+            with open(tmp, 'w') as f:
+                json.dump(self.to_dict(), f, default=str)
+            os.replace(tmp, path)
+        except OSError as e:
+            print(f"[CalcJobs] State write error ({self.id}): {e}")
+
+
+class CalcJobRegistry:
+    """Process içi iş listesi; durumlar JOBS_DIR'e de yazılır (worker'lar arası)."""
+
+    def __init__(self, jobs_dir: Optional[str] = JOBS_DIR, max_jobs: int = MAX_JOBS):
+        self._jobs_dir = jobs_dir
+        self._max_jobs = max_jobs
+        self._jobs: Dict[str, CalcJob] = {}
+        self._lock = threading.Lock()
+
+    def start(self, kind: str, target: Callable[[CalcJob], Optional[Dict]],
+              exclusive_with: Iterable[str] = ()) -> Tuple[CalcJob, bool]:
+        """kind için iş başlat. Aynı tipte (veya exclusive_with'teki bir tipte)
+        çalışan iş varsa onu döner.
+
+        (job, started) döner; started=False ise mevcut iş tekrar kullanıldı.
+        target(job) sonuç dict'i döner (ör. {'count': 12}).
+        """
+        with self._lock:
+            for other in (kind, *exclusive_with):
+                running = self._find_running(other)
+                if running is not None:
+                    return running, False
+            job = CalcJob(kind, self._jobs_dir)
+            self._jobs[job.id] = job
+            self._trim()
+        job._persist()
+
+        thread = threading.Thread(target=self._run, args=(job, target),
+                                  name=f"calc-{kind}-{job.id}", daemon=True)
+        thread.start()
+        return job, True
+
+    def _run(self, job: CalcJob, target: Callable[[CalcJob], Optional[Dict]]):
+        job.status = 'running'
+        job._persist()
+        started = time.time()
+        try:
+            job.result = target(job) or {}
+            job.status = 'done'
+        except CalcJobCancelled:
+            job.status = 'cancelled'
+            job.progress = 'Iptal edildi'
+            print(f"[CalcJobs] {job.kind} ({job.id}) cancelled")
+        except Exception as e:
+            job.status = 'failed'
+            job.error = str(e)
+            print(f"[CalcJobs] {job.kind} ({job.id}) failed: {e}")
+            import traceback
+            traceback.print_exc()
+        finally:
+            job.finished_at = time.time()
+            job.updated_at = job.finished_at
+            job._persist()
+            if self._jobs_dir:
+                try:
+                    os.remove(os.path.join(self._jobs_dir, f"{job.id}.cancel"))
+                except OSError:
+                    pass
+            print(f"[CalcJobs] {job.kind} ({job.id}) {job.status} in {job.finished_at - started:.1f}s")
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """Durum dict'i; bu worker'da yoksa JOBS_DIR'deki kopyadan okunur."""
+        job = self._jobs.get(job_id)
+        if job is not None:
+            return job.to_dict()
+        return self._read_state(job_id)
+
+    def cancel(self, job_id: str) -> bool:
+        job = self._jobs.get(job_id)
+        if job is not None:
+            if job.status in FINISHED_STATES:
+                return False
+            job.cancel()
+            return True
+        state = self._read_state(job_id)
+        if not state or state.get('status') in FINISHED_STATES:
+            return False
+        try:
+            open(os.path.join(self._jobs_dir, f"{job_id}.cancel"), 'w').close()
+            return True
+        except OSError:
+            return False
+
+    def cancel_kind(self, kind: str) -> bool:
+        """kind tipinde çalışan işi (varsa) iptal et."""
+        state = self.running(kind)
+        return bool(state) and self.cancel(state['job_id'])
+
+    def running(self, kind: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            job = self._find_running(kind)
+        return job.to_dict() if job is not None else None
+
+    def _find_running(self, kind: str):
+        for job in self._jobs.values():
+            if job.kind == kind and job.status not in FINISHED_STATES:
+                return job
+        # Diğer worker'da çalışan aynı tip iş (yakın zamanda güncellenmiş)
+        if self._jobs_dir and os.path.isdir(self._jobs_dir):
+            now = time.time()
+            for name in os.listdir(self._jobs_dir):
+                if not name.endswith('.json'):
+                    continue
+                state = self._read_state(name[:-5])
+                if (state and state.get('kind') == kind
+                        and state.get('status') not in FINISHED_STATES
+                        and now - (state.get('updated_at') or 0) < STALE_RUNNING_SECONDS):
+                    return _RemoteJob(state)
+        return None
+
+    def _read_state(self, job_id: str) -> Optional[Dict[str, Any]]:
+        if not self._jobs_dir or not job_id.isalnum():
+            return None
+        try:
+            with open(os.path.join(self._jobs_dir, f"{job_id}.json")) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def _trim(self):
+        """En eski bitmiş işleri bellekten ve diskten at (lock altında)."""
+        if len(self._jobs) <= self._max_jobs:
+            return
+        finished = sorted((j for j in self._jobs.values() if j.status in FINISHED_STATES),
+                          key=lambda j: j.created_at)
+        for job in finished[:len(self._jobs) - self._max_jobs]:
+            self._jobs.pop(job.id, None)
+            if self._jobs_dir:
+                try:
+                    os.remove(os.path.join(self._jobs_dir, f"{job.id}.json"))
+                except OSError:
+                    pass
+
+
+class _RemoteJob:
+    """Başka worker'da çalışan işin salt okunur görünümü."""
+
+    def __init__(self, state: Dict[str, Any]):
+        self._state = state
+        self.id = state.get('job_id')
+        self.kind = state.get('kind')
+        self.status = state.get('status')
+
+    def to_dict(self) -> Dict[str, Any]:
+        return dict(self._state)
+
+
+class HistoryLoader:
+    """Bir hesaplama çalıştırması boyunca paylaşılan (tablo, home, away) → history önbelleği."""
+
+    def __init__(self, client, job: Optional[CalcJob] = None):
+        self.client = client
+        self.job = job
+        self._cache: Dict[Tuple[str, str, str], List[Dict]] = {}
+        self._matches: Dict[str, List[Dict]] = {}
+        self.stats = {'prefetched': 0, 'hits': 0, 'misses': 0}
+
+    def matches(self, market: str) -> List[Dict]:
+        """get_all_matches_with_latest(market) — çalıştırma başına bir kez."""
+        if market not in self._matches:
+            self._matches[market] = self.client.get_all_matches_with_latest(market) or []
+        return self._matches[market]
+
+    def prefetch(self, history_table: str, pairs: Iterable[Tuple[str, str]]):
+        """Henüz önbellekte olmayan çiftleri tek batch sorguyla çek.
+        Sadece dönen çiftler önbelleğe girer; hata veren batch'lerinkiler get()'te tekil yola düşer."""
+        missing = sorted({(h, a) for h, a in pairs
+                          if h and a and (history_table, h, a) not in self._cache})
+        if not missing:
+            return
+        if self.job is not None:
+            self.job.check_cancelled()
+        fetched = self.client.get_match_histories_for_sharp(missing, history_table,
+                                                            per_match_limit=HISTORY_HEAD_ROWS,
+                                                            tail=HISTORY_TAIL_ROWS)
+        for (home, away), rows in fetched.items():
+            self._cache[(history_table, home, away)] = rows or []
+        self.stats['prefetched'] += len(fetched)
+
+    def get(self, history_table: str, home: str, away: str, limit: int = HISTORY_HEAD_ROWS,
+            tail: Optional[int] = None) -> List[Dict]:
+        """scraped_at asc sıralı snapshot listesi.
+
+        Varsayılan get_match_history_for_sharp ile aynı satırları verir (ilk 1000);
+        tail=N (N <= HISTORY_TAIL_ROWS) son N snapshot'ı verir.
+        """
+        if tail is not None and tail > HISTORY_TAIL_ROWS:
+            raise ValueError(f"tail en fazla {HISTORY_TAIL_ROWS} olabilir")
+        key = (history_table, home, away)
+        rows = self._cache.get(key)
+        if rows is not None:
+            self.stats['hits'] += 1
+        else:
+            self.stats['misses'] += 1
+            rows = self.client.get_match_history_for_sharp(home, away, history_table) or []
+            if len(rows) >= HISTORY_HEAD_ROWS:
+                # Tek maç yolu 1000'de kesiyor — son snapshot'lar için batch yolunu kullan
+                rows = self.client.get_match_histories_for_sharp(
+                    [(home, away)], history_table, per_match_limit=HISTORY_HEAD_ROWS,
+                    tail=HISTORY_TAIL_ROWS).get((home, away)) or rows
+            self._cache[key] = rows
+        if tail is not None:
+            return rows[-tail:] if tail else []
+        return rows[:limit]
+
+
+def match_pairs(matches: Iterable[Dict]) -> List[Tuple[str, str]]:
+    """get_all_matches_with_latest çıktısından (home, away) çiftleri."""
+    pairs = []
+    for match in matches:
+        home = match.get('home_team', match.get('home', match.get('Home', '')))
+        away = match.get('away_team', match.get('away', match.get('Away', '')))
+        if home and away:
+            pairs.append((home, away))
+    return pairs
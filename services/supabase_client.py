@@ -12,6 +12,21 @@ from typing import List, Dict, Any, Optional
 from datetime import datetime, timedelta
 import json
 
+from core.retention import ChunkedRetention, RetentionTarget
+
+# after cursor'ları bu kadar geriden (scraped_at=gte) okunur: geç commit edilen
+# satırlar kaçmaz, tekrar gelenler id ile ayıklanır.
+HISTORY_CURSOR_OVERLAP_SECONDS = 120
+
+
+def _cursor_with_overlap(after: str, seconds: int = HISTORY_CURSOR_OVERLAP_SECONDS) -> str:
+    """scraped_at cursor'unu overlap kadar geri çek (parse edilemezse olduğu gibi)."""
+    try:
+        ts = datetime.fromisoformat(after.replace('Z', '+00:00'))
+    except (TypeError, ValueError):
+        return after
+    return (ts - timedelta(seconds=seconds)).isoformat()
+
 
 class SupabaseClient:
     """REST API based Supabase client"""
@@ -23,6 +38,7 @@ class SupabaseClient:
         self._last_data_update_cache_time = None
         self._cache_duration = 60
         self._http_client = None
+        self.last_retention_report: Dict[str, Dict[str, Any]] = {}
         self._load_credentials()
 
     def _get_http_client(self):
@@ -260,6 +276,73 @@ class SupabaseClient:
                     print(f"Error get_match_history from {market}_history (after {max_retries} retries): {e}")
                     return []
     
+    def get_match_history_multi(self, match_hashes: List[str], markets: List[str], after=None) -> Dict[str, Dict[str, List[Dict[str, Any]]]]:
+        """Birden fazla maçın birden fazla market geçmişini match_id_hash ile toplu çek.
+
+        Her market için tek IN sorgusu (50'lik hash batch'leri) atılır; isim bazlı
+        eq/ilike araması yapılmaz. after verilirse (tek cursor veya {market: cursor})
+        sadece scraped_at >= cursor - HISTORY_CURSOR_OVERLAP_SECONDS olan satırlar döner.
+        Overlap geç commit edilen satırları yakalar; satırlar 'Id' taşır, istemci
+        elindekilerle Id üzerinden tekilleştirir.
+
+        Returns: {match_id_hash: {market: [legacy rows, scraped_at asc]}}
+        """
+        result = {h: {m: [] for m in markets} for h in match_hashes}
+        if not self.is_available or not match_hashes or not markets:
+            return result
+
+        import urllib.parse
+        import concurrent.futures
+        hash_batch_size = 50
+        page_size = 1000
+        max_pages = 20
+        cursors = after if isinstance(after, dict) else {m: after for m in markets}
+        batches = [match_hashes[i:i + hash_batch_size] for i in range(0, len(match_hashes), hash_batch_size)]
+
+        def fetch_market(market):
+            history_table = f"{market}_history"
+            cursor = cursors.get(market)
+            after_filter = (f"&scraped_at=gte.{urllib.parse.quote(_cursor_with_overlap(cursor), safe='')}"
+                            if cursor else '')
+            rows_out = []
+            seen_ids = set()
+            for batch in batches:
+                hash_list = ','.join(batch)
+                offset = 0
+                for _page in range(max_pages):
+                    url = (f"{self._rest_url(history_table)}?select=*&match_id_hash=in.({hash_list}){after_filter}"
+                           f"&order=scraped_at.asc,id.asc&limit={page_size}&offset={offset}")
+                    try:
+                        resp = self._get_http_client().get(url, headers=self._headers(), timeout=20)
+                    except Exception as e:
+                        print(f"[HistoryMulti] {history_table} batch error: {e}")
+                        break
+                    if resp.status_code != 200:
+                        print(f"[HistoryMulti] {history_table} HTTP {resp.status_code}: {resp.text[:200]}")
+                        break
+                    rows = resp.json()
+                    for row in rows:
+                        row_id = row.get('id')
+                        if row_id is not None:
+                            if row_id in seen_ids:
+                                continue
+                            seen_ids.add(row_id)
+                        rows_out.append(row)
+                    if len(rows) < page_size:
+                        break
+                    offset += page_size
+            return market, rows_out
+
+        with concurrent.futures.ThreadPoolExecutor(max_workers=min(6, len(markets))) as executor:
+            for market, rows in executor.map(fetch_market, markets):
+                for row in rows:
+                    h = row.get('match_id_hash', '')
+                    if h in result:
+                        legacy = self._history_row_to_legacy(row, market)
+                        legacy['Id'] = row.get('id')
+                        result[h][market].append(legacy)
+        return result
+
     def _history_row_to_legacy(self, row: Dict, market: str) -> Dict[str, Any]:
         result = {
             'ScrapedAt': row.get('scraped_at', ''),
@@ -340,6 +423,82 @@ class SupabaseClient:
         
         return result
     
+    _latest_table_available = None  # None: henüz denenmedi, False: migration uygulanmamış
+
+    def get_latest_snapshots(self, market: str, match_hashes: List[str] = None, since: str = None) -> Optional[Dict[str, Dict[str, Any]]]:
+        """match_latest_snapshots tablosundan maç başına son/önceki/açılış snapshot'ı oku.
+
+        match_hashes verilirse sadece o maçlar (100'lük IN batch'leri), verilmezse
+        latest_scraped_at >= since olan tüm maçlar sayfalanarak çekilir.
+        Kayıtlardaki latest/previous/opening alanları ham history satırlarıdır.
+
+        Returns: {match_id_hash: {'latest', 'previous', 'opening', ...}} veya tablo
+        yoksa None (çağıran eski history taramasına düşer).
+        """
+        if not self.is_available or self._latest_table_available is False:
+            return None
+        from urllib.parse import quote
+        select = "match_id_hash,latest,latest_scraped_at,previous,previous_scraped_at,opening,opening_scraped_at"
+        base = f"{self._rest_url('match_latest_snapshots')}?select={select}&market=eq.{market}"
+        urls = []
+        if match_hashes is not None:
+            batch_size = 100
+            for i in range(0, len(match_hashes), batch_size):
+                urls.append(f"{base}&match_id_hash=in.({','.join(match_hashes[i:i+batch_size])})")
+        else:
+            since_filter = f"&latest_scraped_at=gte.{quote(since, safe='')}" if since else ''
+            urls.append(f"{base}{since_filter}&order=latest_scraped_at.desc,match_id_hash.asc")
+        result = {}
+        page_size = 1000
+        try:
+            for url in urls:
+                offset = 0
+                for _page in range(50):
+                    resp = self._get_http_client().get(f"{url}&limit={page_size}&offset={offset}", headers=self._headers(), timeout=30)
+                    if resp.status_code == 404 or (resp.status_code == 400 and '42P01' in resp.text):
+                        print(f"[Latest] match_latest_snapshots yok - migrations/2026_10_18_match_latest_snapshots.sql uygulanmalı")
+                        SupabaseClient._latest_table_available = False
+                        return None
+                    if resp.status_code != 200:
+                        print(f"[Latest] HTTP {resp.status_code}: {resp.text[:200]}")
+                        return None
+                    rows = resp.json()
+                    for rec in rows:
+                        result[rec['match_id_hash']] = rec
+                    if len(rows) < page_size:
+                        break
+                    offset += page_size
+            SupabaseClient._latest_table_available = True
+            return result
+        except Exception as e:
+            print(f"[Latest] Error: {e}")
+            return None
+
+    def _fetch_latest_rows(self, market: str, match_hashes: List[str], log_prefix: str = '[Supabase]') -> Dict[str, Dict]:
+        """Verilen maçların son history satırı: önce match_latest_snapshots,
+        tablo yoksa history'de 50'lik IN batch'leri (eski yöntem)."""
+        latest = self.get_latest_snapshots(market, match_hashes)
+        if latest is not None:
+            return {h: rec['latest'] for h, rec in latest.items() if rec.get('latest')}
+        history_table = f"{market}_history"
+        odds_cache = {}
+        batch_size = 50
+        for i in range(0, len(match_hashes), batch_size):
+            hash_list = ','.join(match_hashes[i:i+batch_size])
+            if not hash_list:
+                continue
+            try:
+                batch_url = f"{self._rest_url(history_table)}?match_id_hash=in.({hash_list})&order=scraped_at.desc&limit=1000"
+                batch_resp = self._get_http_client().get(batch_url, headers=self._headers(), timeout=30)
+                if batch_resp.status_code == 200:
+                    for row in batch_resp.json():
+                        h = row.get('match_id_hash', '')
+                        if h and h not in odds_cache:
+                            odds_cache[h] = row
+            except Exception as e:
+                print(f"{log_prefix} batch {i//batch_size + 1} error: {e}")
+        return odds_cache
+
     def get_all_matches_with_latest(self, market: str, date_filter: str = None) -> List[Dict[str, Any]]:
         """Get all matches with LATEST data from history table (not stale base table)
         
@@ -386,27 +545,8 @@ class SupabaseClient:
                 if not fixtures:
                     return []
                 
-                odds_cache = {}
                 hashes = [fix.get('match_id_hash', '') for fix in fixtures if fix.get('match_id_hash')]
-                batch_size = 50
-                
-                for i in range(0, len(hashes), batch_size):
-                    batch_hashes = hashes[i:i+batch_size]
-                    hash_list = ','.join(batch_hashes)
-                    
-                    if not hash_list:
-                        continue
-                    
-                    try:
-                        batch_url = f"{self._rest_url(history_table)}?match_id_hash=in.({hash_list})&order=scraped_at.desc&limit=1000"
-                        batch_resp = self._get_http_client().get(batch_url, headers=self._headers(), timeout=30)
-                        if batch_resp.status_code == 200:
-                            for row in batch_resp.json():
-                                h = row.get('match_id_hash', '')
-                                if h and h not in odds_cache:
-                                    odds_cache[h] = row
-                    except Exception as e:
-                        print(f"[Supabase] YESTERDAY batch error: {e}")
+                odds_cache = self._fetch_latest_rows(market, hashes, '[Supabase] YESTERDAY')
                 
                 with_odds = 0
                 matches = []
@@ -457,24 +597,8 @@ class SupabaseClient:
                 fixtures = fix_resp.json()
                 print(f"[Supabase] PAST({date_filter}): Got {len(fixtures)} fixtures")
                 if fixtures:
-                    odds_cache = {}
                     hashes = [fix.get('match_id_hash', '') for fix in fixtures if fix.get('match_id_hash')]
-                    batch_size = 50
-                    for i in range(0, len(hashes), batch_size):
-                        batch_hashes = hashes[i:i+batch_size]
-                        hash_list = ','.join(batch_hashes)
-                        if not hash_list:
-                            continue
-                        try:
-                            batch_url = f"{self._rest_url(history_table)}?match_id_hash=in.({hash_list})&order=scraped_at.desc&limit=1000"
-                            batch_resp = self._get_http_client().get(batch_url, headers=self._headers(), timeout=30)
-                            if batch_resp.status_code == 200:
-                                for row in batch_resp.json():
-                                    h = row.get('match_id_hash', '')
-                                    if h and h not in odds_cache:
-                                        odds_cache[h] = row
-                        except Exception as e:
-                            print(f"[Supabase] PAST({date_filter}) batch error: {e}")
+                    odds_cache = self._fetch_latest_rows(market, hashes, f'[Supabase] PAST({date_filter})')
                     matches = []
                     with_odds = 0
                     for fix in fixtures:
@@ -630,31 +754,9 @@ class SupabaseClient:
                 if not fixtures:
                     return []
                 
-                # Step 2: Batch fetch odds from history using match_id_hash (reliable matching)
-                from urllib.parse import quote
-                odds_cache = {}
+                # Step 2: Latest odds per match_id_hash (match_latest_snapshots, history fallback)
                 hashes = [fix.get('match_id_hash', '') for fix in fixtures if fix.get('match_id_hash')]
-                batch_size = 50
-                
-                for i in range(0, len(hashes), batch_size):
-                    batch_hashes = hashes[i:i+batch_size]
-                    hash_list = ','.join(batch_hashes)
-                    
-                    if not hash_list:
-                        continue
-                    
-                    try:
-                        batch_url = f"{self._rest_url(history_table)}?match_id_hash=in.({hash_list})&order=scraped_at.desc&limit=1000"
-                        batch_resp = self._get_http_client().get(batch_url, headers=self._headers(), timeout=30)
-                        
-                        if batch_resp.status_code == 200:
-                            rows = batch_resp.json()
-                            for row in rows:
-                                h = row.get('match_id_hash', '')
-                                if h and h not in odds_cache:
-                                    odds_cache[h] = row
-                    except Exception as e:
-                        print(f"[Supabase] TODAY batch {i//batch_size + 1} error: {e}")
+                odds_cache = self._fetch_latest_rows(market, hashes, '[Supabase] TODAY')
                 
                 print(f"[Supabase] TODAY: Batch fetched odds for {len(odds_cache)}/{len(fixtures)} matches")
                 
@@ -706,36 +808,43 @@ class SupabaseClient:
                 # Note: Supabase has 1000 row default limit, use parallel Range requests
                 import concurrent.futures
                 
-                history_rows = []
-                batch_size = 1000
-                max_rows = 15000  # Reduced for performance balance
-                
-                def fetch_batch(offset):
-                    headers = self._headers()
-                    headers['Range'] = f'{offset}-{offset + batch_size - 1}'
-                    history_url = f"{self._rest_url(history_table)}?select=*&order=scraped_at.desc"
-                    resp = self._get_http_client().get(history_url, headers=headers, timeout=30)
-                    if resp.status_code in [200, 206]:
-                        return resp.json()
-                    return []
-                
-                # Fetch all batches in parallel for speed
-                offsets = list(range(0, max_rows, batch_size))
-                with concurrent.futures.ThreadPoolExecutor(max_workers=2) as executor:
-                    results = list(executor.map(fetch_batch, offsets))
-                
-                for batch in results:
-                    if batch:
-                        history_rows.extend(batch)
-                
-                print(f"[Supabase] ALL: Got {len(history_rows)} history rows (parallel)")
-                
-                # Deduplicate by match_id_hash - keep first (latest) occurrence
-                odds_by_hash = {}
-                for row in history_rows:
-                    match_hash = row.get('match_id_hash', '')
-                    if match_hash and match_hash not in odds_by_hash:
-                        odds_by_hash[match_hash] = row
+                # Preferred: match_latest_snapshots (one row per active match)
+                latest_since = (datetime.now(pytz.UTC) - timedelta(days=7)).strftime('%Y-%m-%dT%H:%M:%SZ')
+                latest_records = self.get_latest_snapshots(market, since=latest_since)
+                if latest_records is not None:
+                    odds_by_hash = {h: rec['latest'] for h, rec in latest_records.items() if rec.get('latest')}
+                    print(f"[Supabase] ALL: Got {len(odds_by_hash)} latest rows from match_latest_snapshots")
+                else:
+                    history_rows = []
+                    batch_size = 1000
+                    max_rows = 15000  # Reduced for performance balance
+                    
+                    def fetch_batch(offset):
+                        headers = self._headers()
+                        headers['Range'] = f'{offset}-{offset + batch_size - 1}'
+                        history_url = f"{self._rest_url(history_table)}?select=*&order=scraped_at.desc"
+                        resp = self._get_http_client().get(history_url, headers=headers, timeout=30)
+                        if resp.status_code in [200, 206]:
+                            return resp.json()
+                        return []
+                    
+                    # Fetch all batches in parallel for speed
+                    offsets = list(range(0, max_rows, batch_size))
+                    with concurrent.futures.ThreadPoolExecutor(max_workers=2) as executor:
+                        results = list(executor.map(fetch_batch, offsets))
+                    
+                    for batch in results:
+                        if batch:
+                            history_rows.extend(batch)
+                    
+                    print(f"[Supabase] ALL: Got {len(history_rows)} history rows (parallel)")
+                    
+                    # Deduplicate by match_id_hash - keep first (latest) occurrence
+                    odds_by_hash = {}
+                    for row in history_rows:
+                        match_hash = row.get('match_id_hash', '')
+                        if match_hash and match_hash not in odds_by_hash:
+                            odds_by_hash[match_hash] = row
                 
                 print(f"[Supabase] ALL: {len(odds_by_hash)} unique matches by hash")
                 
@@ -849,18 +958,23 @@ class SupabaseClient:
             print(f"[Supabase] EXCEPTION in get_all_matches_with_latest: {e}")
             return []
     
-    def get_matches_paginated(self, market: str, limit: int = 20, offset: int = 0, today_only: bool = False) -> Dict[str, Any]:
-        """FAST paginated match fetch - fixtures-first approach
+    def get_matches_paginated(self, market: str, limit: int = 20, offset: int = 0, today_only: bool = False, cursor: str = None) -> Dict[str, Any]:
+        """Keyset paginated match fetch - fixtures-first approach
         
-        Returns: {matches: [...], total: N, has_more: bool}
+        Returns: {matches: [...], total: N, has_more: bool, next_cursor: str|None}
         
-        Strategy (NEW - fixtures-first for performance):
-        1. Get ALL D-1+ fixtures (single source of truth for active matches)
-        2. Get history data ONLY for these fixture hashes (targeted query)
-        3. Build match list from fixtures, enriched with history odds
+        Strategy:
+        1. Get ONE page of fixtures ordered by (kickoff_utc nulls last, fixture_date,
+           match_id_hash). cursor = "<kickoff_utc>|<match_id_hash>" of the last row of
+           the previous page (next_cursor); kickoff_utc'si olmayan eski fixture'lar sona
+           düşer ve "date:<fixture_date>|<match_id_hash>" cursor'u ile sayfalanır.
+           Without a cursor, offset is applied instead.
+        2. total: PostgREST count=estimated (planner estimate, no full scan)
+        3. Latest odds ONLY for this page's hashes: one IN query, then a per-hash
+           eq/limit=1 lookup for the few hashes the IN query missed (bounded by limit)
         """
         if not self.is_available:
-            return {'matches': [], 'total': 0, 'has_more': False}
+            return {'matches': [], 'total': 0, 'has_more': False, 'next_cursor': None}
         
         try:
             import time
@@ -873,44 +987,61 @@ class SupabaseClient:
             tr_tz = pytz.timezone('Europe/Istanbul')
             now_tr = datetime.now(tr_tz)
             today_date = now_tr.date()
-            seven_days_ago_str = (today_date - timedelta(days=7)).strftime('%Y-%m-%d')
-            today_str = today_date.strftime('%Y-%m-%d')
             
             history_table = f"{market}_history"
+            limit = max(1, int(limit))
             
-            # Step 1: Get fixtures (today+ or D-7+ depending on mode)
+            # Step 1: One page of fixtures (today+ or D-7+ depending on mode)
             # today_only: Istanbul bugününü al ama UTC fixture_date bir gün geride kalabilir
             # (ör. 01:00 İstanbul = 22:00 UTC önceki gün) → bir gün buffer ekle
             if today_only:
-                yesterday_str = (today_date - timedelta(days=1)).strftime('%Y-%m-%d')
-                date_gte = yesterday_str
+                date_gte = (today_date - timedelta(days=1)).strftime('%Y-%m-%d')
             else:
-                date_gte = seven_days_ago_str
-            fix_url = f"{self._rest_url('fixtures')}?select=match_id_hash,home_team,away_team,league,kickoff_utc,fixture_date&fixture_date=gte.{date_gte}"
-            fix_resp = self._get_http_client().get(fix_url, headers=self._headers(), timeout=30)
-            
-            fixtures_list = []
-            fixtures_by_hash = {}
-            if fix_resp.status_code == 200:
-                fixtures_list = fix_resp.json()
-                for fix in fixtures_list:
-                    match_hash = fix.get('match_id_hash', '')
-                    if match_hash:
-                        fixtures_by_hash[match_hash] = fix
+                date_gte = (today_date - timedelta(days=7)).strftime('%Y-%m-%d')
+            fix_url = (f"{self._rest_url('fixtures')}?select=match_id_hash,home_team,away_team,league,kickoff_utc,fixture_date"
+                       f"&fixture_date=gte.{date_gte}"
+                       f"&order=kickoff_utc.asc.nullslast,fixture_date.asc,match_id_hash.asc&limit={limit + 1}")
+            if cursor and '|' in cursor:
+                cur_key, cur_hash = cursor.rsplit('|', 1)
+                h = quote(cur_hash, safe='')
+                if cur_key.startswith('date:'):
+                    # kickoff_utc'siz segment: (fixture_date, match_id_hash) keyset
+                    d = quote(f'"{cur_key[5:]}"', safe='')
+                    fix_url += (f"&kickoff_utc=is.null"
+                                f"&or=(fixture_date.gt.{d},and(fixture_date.eq.{d},match_id_hash.gt.{h}))")
+                else:
+                    k = quote(f'"{cur_key}"', safe='')
+                    fix_url += (f"&or=(kickoff_utc.gt.{k},and(kickoff_utc.eq.{k},match_id_hash.gt.{h}),"
+                                f"kickoff_utc.is.null)")
+            elif offset:
+                fix_url += f"&offset={int(offset)}"
+            fix_headers = self._headers()
+            fix_headers['Prefer'] = 'count=estimated'
+            fix_resp = self._get_http_client().get(fix_url, headers=fix_headers, timeout=30)
+            if fix_resp.status_code not in (200, 206):
+                print(f"[Paginated] Fixtures HTTP {fix_resp.status_code}: {fix_resp.text[:200]}")
+                return {'matches': [], 'total': 0, 'has_more': False, 'next_cursor': None}
+            
+            fixtures_list = [f for f in fix_resp.json() if f.get('match_id_hash')]
+            has_more = len(fixtures_list) > limit
+            fixtures_list = fixtures_list[:limit]
             
-            mode_label = "today+" if today_only else "D-7+"
-            print(f"[Paginated] Got {len(fixtures_by_hash)} {mode_label} fixtures")
+            total = 0
+            content_range = fix_resp.headers.get('Content-Range', '')
+            if '/' in content_range:
+                try:
+                    total = int(content_range.split('/')[-1])
+                except ValueError:
+                    total = 0
             
-            if not fixtures_by_hash:
-                return {'matches': [], 'total': 0, 'has_more': False}
+            if not fixtures_list:
+                return {'matches': [], 'total': total, 'has_more': False, 'next_cursor': None}
             
-            # Step 2: Get history data - two-phase approach using composite index
-            # Phase 1: batch IN queries (fast, catches recently-scraped active matches)
-            # Phase 2: individual eq queries for matches not found in phase 1 (catches older/inactive matches)
-            all_hashes = list(fixtures_by_hash.keys())
+            # Step 2: Latest odds for this page only (match_latest_snapshots, history fallback)
+            page_hashes = [f['match_id_hash'] for f in fixtures_list]
             odds_by_hash = {}
             hash_batch_size = 50
-
+            
             def fetch_history_by_hashes(batch_hashes):
                 hash_list = ','.join(batch_hashes)
                 lim = len(batch_hashes) * 10
@@ -922,7 +1053,7 @@ class SupabaseClient:
                 except Exception as e:
                     print(f"[Paginated] History batch error: {e}")
                 return []
-
+            
             def fetch_history_single(match_hash):
                 url = f"{self._rest_url(history_table)}?select=*&match_id_hash=eq.{match_hash}&order=scraped_at.desc&limit=1"
                 try:
@@ -933,36 +1064,38 @@ class SupabaseClient:
                 except Exception as e:
                     print(f"[Paginated] Single history error {match_hash}: {e}")
                 return None
-
-            # Phase 1: batch queries
-            batches = [all_hashes[i:i+hash_batch_size] for i in range(0, len(all_hashes), hash_batch_size)]
-            with concurrent.futures.ThreadPoolExecutor(max_workers=2) as executor:
-                futures = [executor.submit(fetch_history_by_hashes, b) for b in batches]
-                for future in concurrent.futures.as_completed(futures):
-                    try:
-                        rows = future.result()
-                    except Exception:
-                        continue
-                    for row in rows:
-                        match_hash = row.get('match_id_hash', '')
-                        if match_hash and match_hash not in odds_by_hash:
+            
+            latest_records = self.get_latest_snapshots(market, page_hashes)
+            if latest_records is not None:
+                odds_by_hash = {h: rec['latest'] for h, rec in latest_records.items() if rec.get('latest')}
+            else:
+                batches = [page_hashes[i:i+hash_batch_size] for i in range(0, len(page_hashes), hash_batch_size)]
+                with concurrent.futures.ThreadPoolExecutor(max_workers=2) as executor:
+                    for rows in executor.map(fetch_history_by_hashes, batches):
+                        for row in rows:
+                            match_hash = row.get('match_id_hash', '')
+                            if match_hash and match_hash not in odds_by_hash:
+                                odds_by_hash[match_hash] = row
+            
+            # IN sorgusunun limit'ine takılan (uzun süredir scrape edilmeyen) maçlar:
+            # sayfa boyutuyla sınırlı, tek tek son satır çekilir
+            missing = [h for h in page_hashes if h not in odds_by_hash]
+            if missing:
+                with concurrent.futures.ThreadPoolExecutor(max_workers=2) as executor:
+                    for match_hash, row in zip(missing, executor.map(fetch_history_single, missing)):
+                        if row:
                             odds_by_hash[match_hash] = row
-
-            # Phase 2: kaldırıldı — 268 eşzamanlı sorgu Supabase'i aşırı yüklüyordu (statement timeout 57014)
-            # Phase 1'de bulunamayan maçlar boş odds ile gösterilir, bu kabul edilebilir.
-
-            print(f"[Paginated] Got history for {len(odds_by_hash)}/{len(all_hashes)} matches")
+            
+            print(f"[Paginated] Got history for {len(odds_by_hash)}/{len(page_hashes)} page matches ({len(missing)} via single lookup)")
             
             # Step 3: Build match list from fixtures, enriched with history
             matches = []
-            for match_hash, fix in fixtures_by_hash.items():
-                home = fix.get('home_team', '')
-                away = fix.get('away_team', '')
-                league = fix.get('league', '')
+            for fix in fixtures_list:
+                match_hash = fix['match_id_hash']
                 kickoff_utc = fix.get('kickoff_utc', '')
                 
-                # Format date
-                date_display = fix.get('fixture_date', '')
+                # Format date (kickoff_utc yoksa history'nin eski date/time kolonu, o da yoksa fixture_date)
+                date_display = (odds_by_hash.get(match_hash) or {}).get('date') or fix.get('fixture_date', '')
                 if kickoff_utc:
                     try:
                         if isinstance(kickoff_utc, str):
@@ -974,36 +1107,40 @@ class SupabaseClient:
                     except:
                         pass
                 
-                # Get odds from history if available
                 if match_hash in odds_by_hash:
                     latest_odds = self._normalize_history_row(odds_by_hash[match_hash], market)
                 else:
                     latest_odds = self._get_empty_odds(market)
                 
                 matches.append({
-                    'home_team': home,
-                    'away_team': away,
-                    'league': league,
+                    'home_team': fix.get('home_team', ''),
+                    'away_team': fix.get('away_team', ''),
+                    'league': fix.get('league', ''),
                     'date': date_display,
                     'match_id_hash': match_hash,
-                    'kickoff_utc': kickoff_utc,
+                    'kickoff_utc': kickoff_utc or '',
                     'latest': latest_odds
                 })
             
-            total = len(matches)
+            last = fixtures_list[-1]
+            next_cursor = None
+            if has_more:
+                cur_key = last.get('kickoff_utc') or f"date:{last.get('fixture_date') or ''}"
+                next_cursor = f"{cur_key}|{last['match_id_hash']}"
             elapsed = time.time() - start_time
-            print(f"[Paginated] Completed in {elapsed:.2f}s - {total} matches (fixtures-first)")
+            print(f"[Paginated] Completed in {elapsed:.2f}s - {len(matches)} matches (total~{total}, has_more={has_more})")
             
             return {
                 'matches': matches,
                 'total': total,
-                'has_more': False
+                'has_more': has_more,
+                'next_cursor': next_cursor
             }
         except Exception as e:
             print(f"[Paginated] EXCEPTION: {e}")
             import traceback
             traceback.print_exc()
-            return {'matches': [], 'total': 0, 'has_more': False}
+            return {'matches': [], 'total': 0, 'has_more': False, 'next_cursor': None}
     
     def _get_empty_odds(self, market: str) -> Dict[str, Any]:
         """Return empty odds structure for a market"""
@@ -1427,31 +1564,36 @@ class SupabaseClient:
                 return opening_by_hash
             
             history_table = f"{market}_history"
-            
-            # Process in parallel batches of 100 hashes (URL length limit)
-            import concurrent.futures
-            batch_size = 100
             all_rows = []
             
-            def fetch_batch(batch_hashes):
-                hash_list = ','.join(batch_hashes)
-                url = f"{self._rest_url(history_table)}?match_id_hash=in.({hash_list})&order=scraped_at.asc&limit=2000"
-                try:
-                    resp = self._get_http_client().get(url, headers=self._headers(), timeout=30)
-                    if resp.status_code == 200:
-                        return resp.json()
-                except Exception:
-                    pass
-                return []
-            
-            # Split into batches and fetch in parallel
-            batches = [missing_hashes[i:i+batch_size] for i in range(0, len(missing_hashes), batch_size)]
-            
-            with concurrent.futures.ThreadPoolExecutor(max_workers=2) as executor:
-                results = list(executor.map(fetch_batch, batches))
-            
-            for batch_result in results:
-                all_rows.extend(batch_result)
+            # Preferred: opening row kept in match_latest_snapshots (one row per match)
+            latest_records = self.get_latest_snapshots(market, missing_hashes)
+            if latest_records is not None:
+                all_rows = [rec['opening'] for rec in latest_records.values() if rec.get('opening')]
+            else:
+                # Process in parallel batches of 100 hashes (URL length limit)
+                import concurrent.futures
+                batch_size = 100
+                
+                def fetch_batch(batch_hashes):
+                    hash_list = ','.join(batch_hashes)
+                    url = f"{self._rest_url(history_table)}?match_id_hash=in.({hash_list})&order=scraped_at.asc&limit=2000"
+                    try:
+                        resp = self._get_http_client().get(url, headers=self._headers(), timeout=30)
+                        if resp.status_code == 200:
+                            return resp.json()
+                    except Exception:
+                        pass
+                    return []
+                
+                # Split into batches and fetch in parallel
+                batches = [missing_hashes[i:i+batch_size] for i in range(0, len(missing_hashes), batch_size)]
+                
+                with concurrent.futures.ThreadPoolExecutor(max_workers=2) as executor:
+                    results = list(executor.map(fetch_batch, batches))
+                
+                for batch_result in results:
+                    all_rows.extend(batch_result)
             
             # Group by match_id_hash and take FIRST (oldest) record for each
             # Since we ordered by scraped_at asc, first occurrence is the oldest
@@ -1575,12 +1717,18 @@ class SupabaseClient:
             missing = [h for h in match_hashes if h not in found_hashes]
             
             if missing:
-                missing_batches = [missing[i:i+batch_size] for i in range(0, len(missing), batch_size)]
-                all_oldest = []
-                with concurrent.futures.ThreadPoolExecutor(max_workers=2) as executor:
-                    results = list(executor.map(fetch_oldest_batch, missing_batches))
-                for batch_result in results:
-                    all_oldest.extend(batch_result)
+                # Oldest snapshot fallback: opening row from match_latest_snapshots,
+                # full history scan only when the table is not deployed
+                latest_records = self.get_latest_snapshots(market, missing)
+                if latest_records is not None:
+                    all_oldest = [rec['opening'] for rec in latest_records.values() if rec.get('opening')]
+                else:
+                    missing_batches = [missing[i:i+batch_size] for i in range(0, len(missing), batch_size)]
+                    all_oldest = []
+                    with concurrent.futures.ThreadPoolExecutor(max_workers=2) as executor:
+                        results = list(executor.map(fetch_oldest_batch, missing_batches))
+                    for batch_result in results:
+                        all_oldest.extend(batch_result)
                 
                 seen = set()
                 for row in all_oldest:
@@ -1924,6 +2072,76 @@ class SupabaseClient:
             print(f"[Sharp] History error for {home} vs {away}: {e}")
             return []
     
+    def get_match_histories_for_sharp(self, pairs: List[tuple], history_table: str,
+                                      batch_size: int = 30, page_size: int = 1000,
+                                      per_match_limit: Optional[int] = 1000,
+                                      tail: int = 0) -> Dict[tuple, List[Dict]]:
+        """Birden fazla maçın history'sini tek seferde çek (N+1 yerine home=in.(...) batch'leri).
+
+        get_match_history_for_sharp ile aynı satırları döner: her (home, away) için
+        scraped_at asc sıralı ilk per_match_limit snapshot (None = hepsi). tail > 0
+        ise limiti aşan maçlara son `tail` snapshot da eklenir (ilk N + son tail,
+        sıralı; aradakiler bellekte tutulmaz).
+        Sonuç {(home, away): rows}; hiç satırı olmayan çiftler boş liste alır.
+        İsteği hata veren batch'lerin çiftleri sonuçta yer almaz (çağıran tekil yola düşer).
+        """
+        from collections import deque
+        from urllib.parse import quote
+        wanted = {(h, a) for h, a in pairs if h and a}
+        if not self.is_available or not wanted:
+            return {pair: [] for pair in wanted}
+
+        result: Dict[tuple, List[Dict]] = {}
+        homes = sorted({h for h, _ in wanted})
+        requests_made = 0
+        failed = 0
+        for i in range(0, len(homes), batch_size):
+            batch = homes[i:i + batch_size]
+            batch_homes = set(batch)
+            heads = {pair: [] for pair in wanted if pair[0] in batch_homes}
+            tails = {pair: deque(maxlen=tail) for pair in heads} if tail else {}
+            quoted = ','.join('"' + h.replace('\\', '\\\\').replace('"', '\\"') + '"' for h in batch)
+            home_filter = quote(f'in.({quoted})', safe='')
+            offset = 0
+            ok = True
+            while True:
+                url = (f"{self._rest_url(history_table)}?home={home_filter}"
+                       f"&order=scraped_at.asc,id.asc&limit={page_size}&offset={offset}")
+                try:
+                    resp = self._get_http_client().get(url, headers=self._headers(), timeout=30)
+                except Exception as e:
+                    print(f"[Sharp] Batch history error ({history_table}, {len(batch)} homes): {e}")
+                    ok = False
+                    break
+                requests_made += 1
+                if resp.status_code != 200:
+                    print(f"[Sharp] Batch history fetch failed: {resp.status_code} ({history_table})")
+                    ok = False
+                    break
+                rows = resp.json()
+                for row in rows:
+                    pair = (row.get('home'), row.get('away'))
+                    bucket = heads.get(pair)
+                    if bucket is None:
+                        continue
+                    if per_match_limit is None or len(bucket) < per_match_limit:
+                        bucket.append(row)
+                    elif tail:
+                        tails[pair].append(row)
+                if len(rows) < page_size:
+                    break
+                offset += page_size
+            if not ok:
+                failed += len(heads)
+                continue
+            for pair, bucket in heads.items():
+                result[pair] = bucket + list(tails[pair]) if tail else bucket
+
+        found = sum(1 for rows in result.values() if rows)
+        print(f"[Sharp] Batch history {history_table}: {found}/{len(wanted)} matches, {requests_made} requests"
+              f"{f', {failed} failed' if failed else ''}")
+        return result
+
     def save_sharp_config(self, config: Dict) -> bool:
         """Save Sharp config to Supabase"""
         return True
@@ -1996,8 +2214,6 @@ class SupabaseClient:
         """
         if not self.is_available:
             return {}
-        
-        deleted = {}
 
         from datetime import datetime as _dt, timedelta as _td
         try:
@@ -2011,92 +2227,43 @@ class SupabaseClient:
             scraper_signal_cutoff = cutoff_date + 'T00:00:00'
             telegram_cutoff = cutoff_date + 'T00:00:00'
 
-        # Snapshot tablolari: satirin KENDI tarihine (scraped_at_utc) gore D-8 oncesi
-        # her satir tek-statement SQL ile silinir — orphan dahil, fixture eslestirmesine bakilmaz.
-        snapshot_tables = ['moneyway_snapshots', 'dropping_odds_snapshots']
-        for table in snapshot_tables:
-            table_count = self._delete_before_simple(table, 'scraped_at_utc', cutoff_date)
-            if table_count > 0:
-                deleted[table] = table_count
-            print(f"[Cleanup] {table}: {table_count} satir silindi (scraped_at_utc < {cutoff_date})")
-
-        # live_snapshots: EN BUYUK tablo. Hash eslestirmesi YOK — snapshot_at'e gore
-        # D-8 oncesi her satir tek-statement SQL ile silinir (orphan/birikinti dahil).
-        ls_count = self._delete_before_simple('live_snapshots', 'snapshot_at', cutoff_date)
-        if ls_count > 0:
-            deleted['live_snapshots'] = ls_count
-        print(f"[Cleanup] live_snapshots: {ls_count} satir silindi (snapshot_at < {cutoff_date})")
-
-        # History tablolari: scraped_at'e (Turkiye +03:00 string, lex karsilastirma) gore
-        # D-8 oncesi her satir silinir — orphan dahil. (id PK yok → tek-statement.)
+        # Her tablo satirin KENDI tarih kolonuna gore temizlenir (orphan dahil, hash eslestirmesi yok).
+        # Silme core/retention.py ile sinirli chunk'larla yapilir (57014 / uzun lock yok);
+        # retention_delete_chunk RPC'si yoksa eski tek-statement DELETE'e (_delete_before_simple) duser.
         history_tables = ['moneyway_1x2_history', 'moneyway_ou25_history', 'moneyway_btts_history',
                           'dropping_1x2_history', 'dropping_ou25_history', 'dropping_btts_history']
-        for table in history_tables:
-            table_count = self._delete_before_simple(table, 'scraped_at', cutoff_date)
-            if table_count > 0:
-                deleted[table] = table_count
-            print(f"[Cleanup] {table}: {table_count} satir silindi (scraped_at < {cutoff_date})")
-
-        # Ana market tablolari (guncel-durum, upsert): match_id_hash KOLONU YOK — kendi 'date'
-        # (mac tarihi, ISO timestamp) kolonuna gore D-8 oncesi her satir tek-statement SQL ile
-        # silinir. (Eski hash-bazli silme var olmayan kolona filtre uyguluyordu, bu yuzden bu
-        # tablolar hic temizlenmiyordu.)
         main_tables = ['moneyway_1x2', 'moneyway_ou25', 'moneyway_btts',
                        'dropping_1x2', 'dropping_ou25', 'dropping_btts']
-        for table in main_tables:
-            table_count = self._delete_before_simple(table, 'date', cutoff_date)
-            if table_count > 0:
-                deleted[table] = table_count
-            print(f"[Cleanup] {table}: {table_count} satir silindi (date < {cutoff_date})")
-
-        # fixtures + live_fixtures: kendi 'fixture_date' kolonuna gore D-8 oncesi her satir
-        # tek-statement SQL ile silinir (match_id_hash null olsa bile gider — orphan dahil).
-        for fix_table in ['fixtures', 'live_fixtures']:
-            fix_count = self._delete_before_simple(fix_table, 'fixture_date', cutoff_date)
-            if fix_count > 0:
-                deleted[fix_table] = fix_count
-            print(f"[Cleanup] {fix_table}: {fix_count} satir silindi (fixture_date < {cutoff_date})")
-        
+        targets = [RetentionTarget(t, 'scraped_at_utc', cutoff_date)
+                   for t in ('moneyway_snapshots', 'dropping_odds_snapshots')]
+        # live_snapshots: EN BUYUK tablo — snapshot_at'e gore
+        targets.append(RetentionTarget('live_snapshots', 'snapshot_at', cutoff_date))
+        # History: scraped_at (Turkiye +03:00 string, lex karsilastirma; id SERIAL PK)
+        targets += [RetentionTarget(t, 'scraped_at', cutoff_date) for t in history_tables]
+        # Ana market tablolari (guncel-durum, upsert): match_id_hash KOLONU YOK — kendi 'date'
+        # (mac tarihi, ISO timestamp) kolonuna gore. (Eski hash-bazli silme var olmayan kolona
+        # filtre uyguluyordu, bu yuzden bu tablolar hic temizlenmiyordu.)
+        targets += [RetentionTarget(t, 'date', cutoff_date) for t in main_tables]
+        # fixtures + live_fixtures: fixture_date (match_id_hash null olsa bile gider)
+        targets += [RetentionTarget(t, 'fixture_date', cutoff_date) for t in ('fixtures', 'live_fixtures')]
+        # match_latest_snapshots: her refresh mac x market basina bir satir upsert eder;
+        # son snapshot'i D-8'den eski maclar (history'leri de siliniyor) latest_scraped_at'e gore
+        targets.append(RetentionTarget('match_latest_snapshots', 'latest_scraped_at', cutoff_date))
         # Sinyal tablolari (confirmed_money, underdog, fake_sharp, confirmed_money_v2, early_money_lock)
         # tarih bazli silinmiyor — tum gecmis sinyaller korunur.
-
-        ss_count = 0
-        try:
-            headers_del = self._headers()
-            headers_del['Prefer'] = 'return=representation'
-            del_url = f"{self._rest_url('scraper_signal')}?created_at=lt.{scraper_signal_cutoff}"
-            del_resp = httpx.delete(del_url, headers=headers_del, timeout=60)
-            if del_resp.status_code == 200:
-                try:
-                    ss_count = len(del_resp.json()) if isinstance(del_resp.json(), list) else 0
-                    if ss_count > 0:
-                        deleted['scraper_signal'] = ss_count
-                except:
-                    pass
-            elif del_resp.status_code not in [204, 404]:
-                print(f"[Cleanup] Error deleting scraper_signal: {del_resp.status_code}")
-            print(f"[Cleanup] scraper_signal: {ss_count} satir silindi (created_at < {scraper_signal_cutoff})")
-        except Exception as e:
-            print(f"[Cleanup] Exception for scraper_signal: {e}")
-
-        tg_count = 0
-        try:
-            headers_del = self._headers()
-            headers_del['Prefer'] = 'return=representation'
-            del_url = f"{self._rest_url('telegram_sent_log')}?last_sent_at=lt.{telegram_cutoff}"
-            del_resp = httpx.delete(del_url, headers=headers_del, timeout=60)
-            if del_resp.status_code == 200:
-                try:
-                    tg_count = len(del_resp.json()) if isinstance(del_resp.json(), list) else 0
-                    if tg_count > 0:
-                        deleted['telegram_sent_log'] = tg_count
-                except:
-                    pass
-            elif del_resp.status_code not in [204, 404]:
-                print(f"[Cleanup] Error deleting telegram_sent_log: {del_resp.status_code}")
-            print(f"[Cleanup] telegram_sent_log: {tg_count} satir silindi (last_sent_at < {telegram_cutoff} / >30d)")
-        except Exception as e:
-            print(f"[Cleanup] Exception for telegram_sent_log: {e}")
+        targets.append(RetentionTarget('scraper_signal', 'created_at', scraper_signal_cutoff))
+        targets.append(RetentionTarget('telegram_sent_log', 'last_sent_at', telegram_cutoff))
+
+        retention = ChunkedRetention(self.url, self._headers, httpx,
+                                     legacy_delete=self._delete_before_simple)
+        deleted = retention.run(targets)
+        self.last_retention_report = retention.report
+        for table, state in retention.report.items():
+            print(f"[Cleanup] {table}: {state['deleted']} satir silindi "
+                  f"({state['cutoff']} oncesi, {state['mode']}, {state['chunks']} chunk, "
+                  f"max {state['max_chunk_ms']}ms, {state['status']})")
+        if retention.pending:
+            print(f"[Cleanup] Sure butcesi doldu, sonraki calistirmada devam: {', '.join(retention.pending)}")
 
         return deleted
     
@@ -2721,6 +2888,12 @@ class HybridDatabase:
                 return history
         return self.local.get_match_history(home, away, market)
     
+    def get_match_history_multi(self, match_hashes: List[str], markets: List[str], after: str = None) -> Dict[str, Dict[str, List[Dict[str, Any]]]]:
+        """Hash bazlı toplu geçmiş - sadece Supabase (local DB'de match_id_hash yok)"""
+        if self.supabase.is_available:
+            return self.supabase.get_match_history_multi(match_hashes, markets, after=after)
+        return {h: {m: [] for m in markets} for h in match_hashes}
+    
     def get_all_matches_with_latest(self, market: str, date_filter: str = None) -> List[Dict[str, Any]]:
         """Get all matches with latest snapshot from Supabase or local"""
         if self.supabase.is_available:
@@ -2729,16 +2902,17 @@ class HybridDatabase:
                 return matches
         return self.local.get_all_matches_with_latest(market)
     
-    def get_matches_paginated(self, market: str, limit: int = 20, offset: int = 0, today_only: bool = False) -> Dict[str, Any]:
-        """FAST paginated match fetch - delegates to Supabase"""
+    def get_matches_paginated(self, market: str, limit: int = 20, offset: int = 0, today_only: bool = False, cursor: str = None) -> Dict[str, Any]:
+        """Keyset paginated match fetch - delegates to Supabase"""
         if self.supabase.is_available:
-            return self.supabase.get_matches_paginated(market, limit=limit, offset=offset, today_only=today_only)
-        # Fallback to local (no pagination - just return all)
+            return self.supabase.get_matches_paginated(market, limit=limit, offset=offset, today_only=today_only, cursor=cursor)
+        # Fallback to local (offset pagination over the full list)
         matches = self.local.get_all_matches_with_latest(market)
         return {
             'matches': matches[offset:offset + limit],
             'total': len(matches),
-            'has_more': offset + limit < len(matches)
+            'has_more': offset + limit < len(matches),
+            'next_cursor': None
         }
     
     def save_scraped_data(self, market: str, rows: List[Dict[str, Any]]) -> int:
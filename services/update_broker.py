@@ -0,0 +1,195 @@
+"""
+Update broker — sürümlü diff yayını (SSE /api/updates/stream)
+
+Warmup / cache yenilemesi yeni veri ürettiğinde kanal bazında (matches:<market>,
+alarms, live) önceki yayınla karşılaştırıp sadece eklenen / değişen / silinen
+kayıtları yayınlar. Her olay artan bir sürüm numarası taşır; client yeniden
+bağlanınca ?since=<v> (veya Last-Event-ID) ile kaçırdığı olayları ring
+buffer'dan alır. Buffer'ın dışına düştüyse "resync" olayı gönderilir ve client
+tam listeyi REST'ten bir kez çeker.
+
+Her abone sınırlı bir queue.Queue alır; kuyruğu dolan (yavaş) abone düşürülür,
+böylece tek bir yavaş bağlantı yayıncıyı bloklamaz. Boştaki abone sadece
+q.get(timeout) üzerinde bekler — CPU maliyeti yok.
+"""
+import hashlib
+import json
+import os
+import queue
+import threading
+import time
+from collections import deque
+from typing import Any, Callable, Dict, Iterable, List, Optional
+
+DEFAULT_QUEUE_SIZE = 64
+DEFAULT_HISTORY_SIZE = 256
+
+_DROPPED = object()
+
+
+def _fingerprint(item: Any) -> str:
+    """Kaydın içerik özeti — sadece değişiklik tespiti için."""
+    raw = json.dumps(item, sort_keys=True, default=str, separators=(',', ':'))
+    return hashlib.md5(raw.encode('utf-8')).hexdigest()
+
+
+class Subscription:
+    """Tek bir SSE bağlantısı. get() None dönerse bağlantı kapatılmalı."""
+
+    def __init__(self, broker: 'UpdateBroker', channels: Optional[set], maxsize: int):
+        self.broker = broker
+        self.channels = channels
+        self.queue: 'queue.Queue' = queue.Queue(maxsize=maxsize)
+        self.dropped = False
+
+    def wants(self, channel: str) -> bool:
+        if not self.channels:
+            return True
+        return channel in self.channels or channel.split(':', 1)[0] in self.channels
+
+    def get(self, timeout: float = 15) -> Optional[Dict]:
+        """Sıradaki olay; timeout'ta queue.Empty fırlatır, düşürüldüyse None."""
+        event = self.queue.get(timeout=timeout)
+        if event is _DROPPED:
+            return None
+        return event
+
+    def close(self):
+        self.broker.unsubscribe(self)
+
+
+class UpdateBroker:
+    """Kanal bazlı sürümlü diff yayıncısı (process içi, thread-safe)."""
+
+    def __init__(self, queue_size: int = DEFAULT_QUEUE_SIZE, history_size: int = DEFAULT_HISTORY_SIZE):
+        self._lock = threading.Lock()
+        # Sürüm numaraları process'e özel; gunicorn worker'ları / restart arası
+        # karışmasın diye SSE id'leri "<epoch>.<v>" formatında gönderilir.
+        self.epoch = f"{os.getpid():x}{int(time.time()) & 0xffffff:x}"
+        self._queue_size = queue_size
+        self._version = 0
+        self._fingerprints: Dict[str, Dict[str, str]] = {}
+        self._history: deque = deque(maxlen=history_size)
+        self._subscribers: List[Subscription] = []
+        self.stats = {'published': 0, 'skipped': 0, 'dropped_clients': 0}
+
+    @property
+    def version(self) -> int:
+        return self._version
+
+    def subscriber_count(self) -> int:
+        with self._lock:
+            return len(self._subscribers)
+
+    def publish(self, channel: str, items: Iterable[Dict], key_fn: Callable[[Dict], Any]) -> Optional[Dict]:
+        """Kanalın tam listesini al, öncekiyle diff'le, değişiklik varsa yayınla.
+
+        İlk yayında (baseline yok) sadece baseline kaydedilir, olay üretilmez —
+        client zaten tam listeyi REST'ten almış olur.
+        """
+        current: Dict[str, str] = {}
+        by_key: Dict[str, Dict] = {}
+        for item in items or []:
+            try:
+                key = key_fn(item)
+            except Exception:
+                key = None
+            if not key:
+                continue
+            key = str(key)
+            current[key] = _fingerprint(item)
+            by_key[key] = item
+
+        with self._lock:
+            previous = self._fingerprints.get(channel)
+            self._fingerprints[channel] = current
+            if previous is None:
+                return None
+
+            added = [by_key[k] for k, fp in current.items() if k not in previous]
+            changed = [by_key[k] for k, fp in current.items() if k in previous and previous[k] != fp]
+            removed = [k for k in previous if k not in current]
+            if not added and not changed and not removed:
+                self.stats['skipped'] += 1
+                return None
+
+            self._version += 1
+            event = {
+                'v': self._version,
+                'channel': channel,
+                'ts': time.time(),
+                'added': added,
+                'changed': changed,
+                'removed': removed,
+            }
+            self._history.append(event)
+            self.stats['published'] += 1
+
+            alive = []
+            for sub in self._subscribers:
+                if not sub.wants(channel):
+                    alive.append(sub)
+                    continue
+                try:
+                    sub.queue.put_nowait(event)
+                    alive.append(sub)
+                except queue.Full:
+                    self._drop(sub)
+            self._subscribers = alive
+        return event
+
+    def _drop(self, sub: Subscription):
+        """Yavaş aboneyi düşür (lock altında çağrılır)."""
+        sub.dropped = True
+        self.stats['dropped_clients'] += 1
+        try:
+            while True:
+                sub.queue.get_nowait()
+        except queue.Empty:
+            pass
+        sub.queue.put_nowait(_DROPPED)
+
+    def event_id(self, event: Dict) -> str:
+        return f"{self.epoch}.{event['v']}"
+
+    def parse_since(self, raw: Optional[str]):
+        """'<epoch>.<v>' veya '<v>' → (v, needs_resync). Farklı epoch → resync."""
+        if not raw:
+            return None, False
+        raw = str(raw).strip()
+        epoch, _, v = raw.rpartition('.')
+        if epoch and epoch != self.epoch:
+            return None, True
+        try:
+            return int(v), False
+        except ValueError:
+            return None, True
+
+    def subscribe(self, since: Optional[int] = None, channels: Optional[Iterable[str]] = None):
+        """Yeni abone. (subscription, backlog, needs_resync) döner.
+
+        since verilirse ring buffer'daki v > since olaylar backlog olarak döner;
+        since buffer'ın dışındaysa needs_resync=True.
+        """
+        sub = Subscription(self, set(channels) if channels else None, self._queue_size)
+        backlog: List[Dict] = []
+        needs_resync = False
+        with self._lock:
+            if since is not None and since > self._version:
+                # Başka worker / yeniden başlamış process'in sürümü
+                needs_resync = True
+            elif since is not None and since < self._version:
+                oldest = self._history[0]['v'] if self._history else self._version + 1
+                if since < oldest - 1:
+                    needs_resync = True
+                else:
+                    backlog = [e for e in self._history if e['v'] > since and sub.wants(e['channel'])]
+            self._subscribers.append(sub)
+        return sub, backlog, needs_resync
+
+    def unsubscribe(self, sub: Subscription):
+        with self._lock:
+            try:
+                self._subscribers.remove(sub)
+            except ValueError:
+                pass
@@ -0,0 +1,255 @@
+"""
+Wire format — /api/matches ve /api/alarms/all için kompakt sütunsal kodlama
+
+Varsayılan yanıt JSON olarak kalır. Client Accept header'ı (veya ?format=) ile
+kompakt formatı ister:
+  application/x-msgpack                     → sütunsal belge, MessagePack (msgpack kuruluysa)
+  application/vnd.smartxflow.columnar+json  → aynı belge, JSON
+
+Sütunsal belge: {"v": 1, "k": [anahtar sözlüğü], "s": [string tablosu], "d": kök}
+  - dict listeleri (maçlar, alarmlar, iç içe odds) tabloya çevrilir: anahtar adları
+    satır başına tekrarlanmaz, her anahtar bir sütundur
+  - sayı sütunları tipli dizi (msgpack'te little-endian int64/float64 bin)
+  - "2.35", "45.2%", "£12,345" gibi aynı biçimli sayı string'leri ölçekli int
+    dizisi + biçim (ondalık, ön/son ek, binlik ayracı) olarak taşınır ve birebir
+    aynı string'e geri çevrilir
+  - tekrar eden string'ler belge genelinde tekilleştirilir (string tablosu index'i)
+decode_columnar(encode_columnar(x)) == x (JSON ile gelen veri için).
+"""
+import json
+import re
+import sys
+from array import array
+from typing import Any, Dict, List, Optional, Tuple
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+FORMAT_VERSION = 1
+JSON_MIME = 'application/json'
+COLUMNAR_JSON_MIME = 'application/vnd.smartxflow.columnar+json'
+MSGPACK_MIME = 'application/x-msgpack'
+
+_NUMBER_RE = re.compile(r'(\D*?)(-?\d[\d,]*(?:\.(\d+))?)(\D*)$')
+_INT64 = (-(1 << 63), (1 << 63) - 1)
+
+
+def _number_formatter(scale: int, prefix: str = '', suffix: str = '', grouped: bool = False):
+    """Ölçekli int → biçimli string fonksiyonu (sütun başına bir kez kurulur)."""
+    if not scale:
+        if grouped:
+            return lambda v: f"{prefix}{v:,}{suffix}"
+        return lambda v: f"{prefix}{v}{suffix}"
+    unit = 10 ** scale
+    spec = ',' if grouped else ''
+
+    def fmt(v: int) -> str:
+        whole, frac = divmod(-v if v < 0 else v, unit)
+        return f"{prefix}{'-' if v < 0 else ''}{whole:{spec}}.{frac:0{scale}d}{suffix}"
+    return fmt
+
+
+def _as_numbers(values: List[str]):
+    """Tüm değerler aynı biçimde sayı string'iyse ("2.35", "45.2%", "£12,345")
+    (scale, prefix, suffix, grouped, ints); biçim birebir geri üretilemiyorsa None."""
+    m = _NUMBER_RE.match(values[0]) if values else None
+    if not m:
+        return None
+    prefix, suffix = m.group(1), m.group(4)
+    scale = len(m.group(3) or '')
+    grouped = ',' in m.group(2)
+    fmt = _number_formatter(scale, prefix, suffix, grouped)
+    ints = []
+    for s in values:
+        m = _NUMBER_RE.match(s)
+        if not m or m.group(1) != prefix or m.group(4) != suffix:
+            return None
+        v = int(m.group(2).replace(',', '').replace('.', ''))
+        if not (_INT64[0] <= v <= _INT64[1]) or fmt(v) != s:
+            return None
+        ints.append(v)
+    return scale, prefix, suffix, grouped, ints
+
+
+def _pack(values: list, code: str, binary: bool):
+    if not binary:
+        return values
+    arr = array(code, values)
+    if sys.byteorder == 'big':
+        arr.byteswap()
+    return arr.tobytes()
+
+
+def _unpack(data, code: str) -> list:
+    if not isinstance(data, (bytes, bytearray)):
+        return data
+    arr = array(code)
+    arr.frombytes(data)
+    if sys.byteorder == 'big':
+        arr.byteswap()
+    return arr.tolist()
+
+
+class _Encoder:
+    def __init__(self, binary: bool):
+        self.binary = binary
+        self.keys: Dict[str, int] = {}
+        self.strings: Dict[str, int] = {}
+
+    def key(self, k: str) -> int:
+        idx = self.keys.get(k)
+        if idx is None:
+            idx = self.keys[k] = len(self.keys)
+        return idx
+
+    def string(self, s: str) -> int:
+        idx = self.strings.get(s)
+        if idx is None:
+            idx = self.strings[s] = len(self.strings)
+        return idx
+
+    def node(self, value: Any):
+        if isinstance(value, str):
+            return ['s', self.string(value)]
+        if isinstance(value, dict):
+            return ['o', [self.key(k) for k in value], [self.node(v) for v in value.values()]]
+        if isinstance(value, (list, tuple)):
+            if value and all(isinstance(v, dict) for v in value):
+                return self.table(value)
+            return ['a', [self.node(v) for v in value]]
+        return value
+
+    def table(self, rows: List[dict]):
+        order: Dict[str, None] = {}
+        for row in rows:
+            for k in row:
+                order.setdefault(k, None)
+        columns = []
+        for k in order:
+            present = [i for i, row in enumerate(rows) if k in row]
+            column = self.column([rows[i][k] for i in present])
+            if len(present) != len(rows):
+                column = ['?', _pack(present, 'q', self.binary), column]
+            columns.append(column)
+        return ['t', len(rows), [self.key(k) for k in order], columns]
+
+    def column(self, values: list):
+        if all(type(v) is str for v in values):
+            numbers = _as_numbers(values)
+            if numbers is not None:
+                scale, prefix, suffix, grouped, ints = numbers
+                return ['d', scale, prefix, suffix, int(grouped), _pack(ints, 'q', self.binary)]
+            if len(set(values)) * 2 > len(values):
+                # Çoğu tekil: tablo index'i kazandırmaz
+                return ['L', values]
+            return ['S', _pack([self.string(v) for v in values], 'q', self.binary)]
+        if all(type(v) is int and _INT64[0] <= v <= _INT64[1] for v in values):
+            return ['i', _pack(values, 'q', self.binary)]
+        if all(type(v) is float for v in values):
+            return ['f', _pack(values, 'd', self.binary)]
+        if all(isinstance(v, dict) for v in values):
+            return self.table(values)
+        return ['n', [self.node(v) for v in values]]
+
+
+class _Decoder:
+    def __init__(self, keys: List[str], strings: List[str]):
+        self.keys = keys
+        self.strings = strings
+
+    def node(self, value: Any):
+        if not isinstance(value, list):
+            return value
+        tag = value[0]
+        if tag == 's':
+            return self.strings[value[1]]
+        if tag == 'o':
+            keys = self.keys
+            return {keys[k]: self.node(v) for k, v in zip(value[1], value[2])}
+        if tag == 'a':
+            return [self.node(v) for v in value[1]]
+        if tag == 't':
+            return self.table(value)
+        raise ValueError(f"unknown node tag: {tag!r}")
+
+    def table(self, value) -> List[dict]:
+        _, n_rows, key_ids, columns = value
+        full_keys, full_cols, sparse = [], [], []
+        for key_id, column in zip(key_ids, columns):
+            if column[0] == '?':
+                sparse.append((self.keys[key_id], column))
+            else:
+                full_keys.append(self.keys[key_id])
+                full_cols.append(self.column(column))
+        if full_cols:
+            rows = [dict(zip(full_keys, vals)) for vals in zip(*full_cols)]
+        else:
+            rows = [{} for _ in range(n_rows)]
+        for k, column in sparse:
+            for i, v in zip(_unpack(column[1], 'q'), self.column(column[2])):
+                rows[i][k] = v
+        return rows
+
+    def column(self, column) -> list:
+        tag = column[0]
+        if tag == 'S':
+            strings = self.strings
+            return [strings[i] for i in _unpack(column[1], 'q')]
+        if tag == 'd':
+            _, scale, prefix, suffix, grouped, data = column
+            return list(map(_number_formatter(scale, prefix, suffix, bool(grouped)), _unpack(data, 'q')))
+        if tag == 'L':
+            return column[1]
+        if tag == 'i':
+            return _unpack(column[1], 'q')
+        if tag == 'f':
+            return _unpack(column[1], 'd')
+        if tag == 't':
+            return self.table(column)
+        if tag == 'n':
+            return [self.node(v) for v in column[1]]
+        raise ValueError(f"unknown column tag: {tag!r}")
+
+
+def encode_columnar(obj: Any, binary: bool = False) -> Dict[str, Any]:
+    """JSON uyumlu nesneyi sütunsal belgeye çevir (binary=True: tipli diziler bytes)."""
+    enc = _Encoder(binary)
+    root = enc.node(obj)
+    return {'v': FORMAT_VERSION, 'k': list(enc.keys), 's': list(enc.strings), 'd': root}
+
+
+def decode_columnar(doc: Dict[str, Any]) -> Any:
+    if doc.get('v') != FORMAT_VERSION:
+        raise ValueError(f"unsupported columnar version: {doc.get('v')!r}")
+    return _Decoder(doc['k'], doc['s']).node(doc['d'])
+
+
+def negotiate(accept: str = '', fmt: Optional[str] = None) -> str:
+    """Accept header / ?format= → yanıt mime'ı. Varsayılan ve msgpack yoksa: JSON."""
+    accept = (accept or '').lower()
+    fmt = (fmt or '').lower()
+    if msgpack is not None and (fmt == 'msgpack' or MSGPACK_MIME in accept):
+        return MSGPACK_MIME
+    if fmt in ('columnar', 'msgpack') or COLUMNAR_JSON_MIME in accept:
+        return COLUMNAR_JSON_MIME
+    return JSON_MIME
+
+
+def dumps(obj: Any, mime: str) -> bytes:
+    if mime == MSGPACK_MIME:
+        return msgpack.packb(encode_columnar(obj, binary=True), use_bin_type=True)
+    if mime == COLUMNAR_JSON_MIME:
+        obj = encode_columnar(obj)
+    return json.dumps(obj, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+
+
+def loads(data: bytes, mime: str) -> Any:
+    """Client tarafı: yanıt gövdesini Content-Type'a göre çöz."""
+    if mime == MSGPACK_MIME:
+        return decode_columnar(msgpack.unpackb(data, raw=False))
+    obj = json.loads(data)
+    if mime == COLUMNAR_JSON_MIME:
+        return decode_columnar(obj)
+    return obj
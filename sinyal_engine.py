@@ -21,9 +21,12 @@ import time
 import re
 import hashlib
 import requests
+import numpy as np
 from datetime import datetime, timezone, timedelta
 from urllib.parse import quote as url_quote
 
+from core.timezone import parse_kickoff_fields, kickoff_datetime
+
 SUPABASE_URL = os.environ.get('SUPABASE_URL', '')
 SUPABASE_ANON_KEY = os.environ.get('SUPABASE_ANON_KEY', '')
 SUPABASE_SERVICE_KEY = os.environ.get('SUPABASE_SERVICE_ROLE_KEY', '')
@@ -207,6 +210,48 @@ def parse_volume_amt(val):
         return 0.0
 
 
+_latest_state_available = None  # None: denenmedi, False: match_latest_snapshots yok
+
+
+def fetch_latest_state_rows(market, since_iso):
+    """match_latest_snapshots'tan latest_scraped_at >= since_iso olan maçların son
+    history satırlarını döner (maç başına 1 satır, en yeni önce).
+    Tablo yoksa / hata olursa None — çağıran history taramasına düşer."""
+    global _latest_state_available
+    if _latest_state_available is False:
+        return None
+    rows = []
+    page_size = 1000
+    offset = 0
+    try:
+        while True:
+            url = (
+                f"{SUPABASE_URL}/rest/v1/match_latest_snapshots"
+                f"?select=latest&market=eq.{market}"
+                f"&latest_scraped_at=gte.{url_quote(since_iso, safe='')}"
+                f"&order=latest_scraped_at.desc,match_id_hash.asc"
+                f"&limit={page_size}&offset={offset}"
+            )
+            r = requests.get(url, headers=_headers_read(), timeout=20)
+            if r.status_code == 404 or (r.status_code == 400 and '42P01' in r.text):
+                _latest_state_available = False
+                log("[Fetch] match_latest_snapshots yok — history taramasına dönülüyor")
+                return None
+            if r.status_code != 200:
+                log(f"[Fetch] match_latest_snapshots HTTP {r.status_code}")
+                return None
+            page = r.json()
+            rows.extend(rec['latest'] for rec in page if rec.get('latest'))
+            if len(page) < page_size:
+                break
+            offset += page_size
+        _latest_state_available = True
+        return rows
+    except Exception as e:
+        log(f"[Fetch] match_latest_snapshots hata: {e}")
+        return None
+
+
 def fetch_latest_snapshots():
     """moneyway_1x2 tablosundan her maç için en son snapshot'ı çek.
     moneyway_1x2: scheduled scraper tarafından her 15dk'da sıfırlanıp yeniden yazılan
@@ -215,8 +260,8 @@ def fetch_latest_snapshots():
     Anahtar: tabloda gerçek match_id_hash varsa onu kullan; yoksa home|away|date
     (fetch_recent_history() / fetch_first_snapshots() da aynı formatı kullanır — lookup tutarlılığı sağlanır).
 
-    EK: moneyway_1x2_history'den son 2 saatin en güncel snapshot'ları da eklenir
-    (history fallback). Bu sayede maç başladıktan sonra canlı tablodan düşen maçlar
+    EK: son 2 saatte güncellenen maçların en güncel snapshot'ları da eklenir
+    (history fallback; match_latest_snapshots varsa oradan, yoksa moneyway_1x2_history). Bu sayede maç başladıktan sonra canlı tablodan düşen maçlar
     için de FakeSharp sinyali üretilebilir. Canlı tablo her zaman önceliklidir.
     """
     try:
@@ -249,16 +294,23 @@ def fetch_latest_snapshots():
         # sinyalinin üretilebilmesi amacıyla history tablosundan ek snapshot çekilir.
         try:
             cutoff_2h = (datetime.now(timezone.utc) - timedelta(hours=2)).isoformat()
-            hist_url = (
-                f"{SUPABASE_URL}/rest/v1/moneyway_1x2_history"
-                f"?select=home,away,league,date,odds1,oddsx,odds2,pct1,pctx,pct2,amt1,amtx,amt2,volume,scraped_at"
-                f"&scraped_at=gte.{cutoff_2h}"
-                f"&order=scraped_at.desc"
-                f"&limit=20000"
-            )
-            hr = requests.get(hist_url, headers=_headers_read(), timeout=20)
-            if hr.status_code == 200:
-                hist_rows = hr.json()
+            hist_rows = fetch_latest_state_rows('moneyway_1x2', cutoff_2h)
+            hr = None
+            if hist_rows is None and _RECENT_HISTORY.sync():
+                # match_latest_snapshots yok → 2sa'lik dilim kayan history penceresinden
+                # (ayrı 20000 satırlık sorgu yok). Satırlar kopyalanır; cache'tekiler değişmez.
+                hist_rows = [dict(row) for row in _RECENT_HISTORY.rows_since(time.time() - 2 * 3600)]
+            if hist_rows is None:
+                hist_url = (
+                    f"{SUPABASE_URL}/rest/v1/moneyway_1x2_history"
+                    f"?select=home,away,league,date,odds1,oddsx,odds2,pct1,pctx,pct2,amt1,amtx,amt2,volume,scraped_at"
+                    f"&scraped_at=gte.{url_quote(cutoff_2h, safe='')}"
+                    f"&order=scraped_at.desc"
+                    f"&limit=20000"
+                )
+                hr = requests.get(hist_url, headers=_headers_read(), timeout=20)
+                hist_rows = hr.json() if hr.status_code == 200 else None
+            if hist_rows is not None:
                 # Her maç için sadece en güncel (desc sıralı, ilk gelen) snapshot'ı al
                 hist_latest = {}
                 for row in hist_rows:
@@ -279,7 +331,7 @@ def fetch_latest_snapshots():
                         fallback_count += 1
                 log(f"[Fetch] {live_count} maç (live) + {fallback_count} maç (history fallback, son 2sa)")
             else:
-                log(f"[Fetch] History fallback HTTP {hr.status_code} — atlandı")
+                log(f"[Fetch] History fallback HTTP {hr.status_code if hr is not None else '-'} — atlandı")
                 log(f"[Fetch] {live_count} maç (live) + 0 maç (history fallback)")
         except Exception as he:
             log(f"[Fetch] History fallback hata: {he} — atlandı")
@@ -355,6 +407,414 @@ def update_heartbeat(status):
         pass
 
 
+# ============================================================
+# SIGNAL WRITER — tablo başına bellek içi index + toplu insert/update/delete
+# ============================================================
+# Her sinyal tablosunun mevcut satırları scan'ler arasında bellekte tutulur.
+# İlk yüklemede (ve SIGNAL_INDEX_FULL_RELOAD'da bir) tablo en yeniden eskiye
+# okunur; arada sadece created_at >= server_cursor - SIGNAL_INDEX_OVERLAP olan
+# satırlar çekilir (başka process'in yazdıkları dahil). server_cursor sadece
+# sunucudan okunan satırlarla ilerler, yerel insert'ler onu ilerletmez.
+# Insert / delete / current_* update küme farkıyla hesaplanır ve her biri tek
+# (veya selection_code başına bir) istekle uygulanır.
+
+POSTGREST_MAX_ROWS = 1000        # sunucu max-rows: daha büyük limit sessizce buna kırpılır
+SIGNAL_INDEX_FULL_RELOAD = 30 * 60
+SIGNAL_INDEX_OVERLAP = 120       # sn — geç commit edilen satırlar için reconcile cursor'u geri payı
+SIGNAL_DELETE_CHUNK = 100
+
+
+def _parse_created_at(value):
+    try:
+        dt = datetime.fromisoformat(str(value).replace('Z', '+00:00'))
+        if dt.tzinfo is None:
+            dt = dt.replace(tzinfo=timezone.utc)
+        return dt.timestamp()
+    except Exception:
+        return time.time()
+
+
+def _iso_minus(value, seconds):
+    return datetime.fromtimestamp(_parse_created_at(value) - seconds, tz=timezone.utc).isoformat()
+
+
+def fetch_keyset(table, select, filters='', ts_col='created_at', desc=False, max_rows=None, timeout=12):
+    """(ts_col, id) sıralı keyset sayfalama (sayfa = POSTGREST_MAX_ROWS); select ts_col ve id içermeli.
+    desc=True: en yeniler önce (max_rows sınırı en eskileri düşürür). Hata → None."""
+    op, direction = ('lt', 'desc') if desc else ('gt', 'asc')
+    page_size = POSTGREST_MAX_ROWS
+    rows = []
+    last = None
+    while max_rows is None or len(rows) < max_rows:
+        url = (
+            f"{SUPABASE_URL}/rest/v1/{table}?select={select}{filters}"
+            f"&order={ts_col}.{direction},id.{direction}&limit={page_size}"
+        )
+        if last is not None:
+            ts = url_quote(f'"{last[ts_col]}"', safe='')
+            url += f"&or=({ts_col}.{op}.{ts},and({ts_col}.eq.{ts},id.{op}.{last['id']}))"
+        r = requests.get(url, headers=_headers_read(), timeout=timeout)
+        if r.status_code != 200:
+            log(f"[Keyset] {table} HTTP {r.status_code}: {r.text[:200]}")
+            return None
+        page = r.json()
+        rows.extend(page)
+        if len(page) < page_size:
+            break
+        last = page[-1]
+    return rows if max_rows is None else rows[:max_rows]
+
+
+class SignalTableIndex:
+    """Bir sinyal tablosunun (match_key, selection_code) → satır index'i."""
+
+    def __init__(self, table, select, label, max_rows=5000):
+        self.table = table
+        self.select = select
+        self.label = label
+        self.max_rows = max_rows
+        self.rows = {}
+        self.server_cursor = None   # sunucudan okunan en yeni created_at
+        self.loaded_at = 0.0
+
+    @staticmethod
+    def key_of(row):
+        return (row.get('match_key', ''), row.get('selection_code', ''))
+
+    def _fetch(self, filters='', desc=False):
+        return fetch_keyset(self.table, f"id,{self.select},created_at", filters,
+                            desc=desc, max_rows=self.max_rows)
+
+    def _absorb_server(self, rows):
+        for row in rows:
+            self.rows[self.key_of(row)] = row
+            ca = row.get('created_at')
+            if ca and (self.server_cursor is None or _parse_created_at(ca) > _parse_created_at(self.server_cursor)):
+                self.server_cursor = ca
+
+    def load(self):
+        """Index'i tazele ve mevcut satır listesini döndür."""
+        try:
+            started = datetime.now(timezone.utc).isoformat()
+            full = not self.loaded_at or (time.time() - self.loaded_at) > SIGNAL_INDEX_FULL_RELOAD
+            if full:
+                rows = self._fetch(desc=True)
+                if rows is None:
+                    return list(self.rows.values())
+                if len(rows) >= self.max_rows:
+                    log(f"[{self.label}-Index] {self.max_rows} satır sınırı: en eski satırlar index dışı")
+                self.rows = {}
+                self.server_cursor = None
+                self._absorb_server(rows)
+                self.server_cursor = self.server_cursor or started
+                self.loaded_at = time.time()
+            else:
+                since = _iso_minus(self.server_cursor, SIGNAL_INDEX_OVERLAP)
+                rows = self._fetch(f"&created_at=gte.{url_quote(since, safe='')}")
+                if rows is not None:
+                    self._absorb_server(rows)
+                    if len(rows) >= self.max_rows:
+                        self.loaded_at = 0.0   # artımlı çekim sınıra dayandı → sonraki load tam
+        except Exception as e:
+            log(f"[{self.label}-Index] Yükleme hatası: {e}")
+        return list(self.rows.values())
+
+    def keys(self):
+        return set(self.rows.keys())
+
+    def add(self, records):
+        """Yerel insert'ler: index'e girer, server_cursor'a dokunmaz."""
+        for row in records:
+            self.rows[self.key_of(row)] = row
+
+    def remove(self, keys):
+        for k in keys:
+            self.rows.pop(k, None)
+
+
+_SIGNAL_INDEXES = {
+    'underdog_signals': SignalTableIndex(
+        'underdog_signals',
+        'match_key,selection_code,home_team,away_team,date:match_date,volume,'
+        'current_odds,current_pct,current_amt,current_volume',
+        'Underdog'),
+    'confirmed_money_signals': SignalTableIndex(
+        'confirmed_money_signals',
+        'match_key,selection_code,home_team,away_team,match_date,odds_now,odds_16h,'
+        'current_odds,current_pct,current_volume',
+        'CM'),
+    'confirmed_money_v2_signals': SignalTableIndex(
+        'confirmed_money_v2_signals',
+        'match_key,selection_code,home_team,away_team,match_date,odds_16h',
+        'CMv2'),
+    'fake_sharp_signals': SignalTableIndex(
+        'fake_sharp_signals',
+        'match_key,selection_code,home_team,away_team,match_date,odds_16h,'
+        'current_odds,current_pct,current_volume',
+        'FS'),
+    'early_money_lock_signals': SignalTableIndex(
+        'early_money_lock_signals', 'match_key,selection_code', 'EML', max_rows=10000),
+}
+
+
+def signal_index(table):
+    return _SIGNAL_INDEXES[table]
+
+
+COOLDOWN_RECONCILE_INTERVAL = 5 * 60
+COOLDOWN_FULL_RELOAD = 60 * 60
+
+
+class CooldownIndex:
+    """(match_key, selection_code) → cooldown bitiş zamanı (epoch).
+
+    Son `hours` saatin sinyallerinden yüklenir (COOLDOWN_FULL_RELOAD'da bir
+    baştan); engine sinyal kaydettiğinde / sildiğinde yerinde güncellenir,
+    süresi dolanlar okumada düşülür. COOLDOWN_RECONCILE_INTERVAL'da bir, başka
+    process'lerin yazdığı sinyaller için created_at >= server_cursor -
+    SIGNAL_INDEX_OVERLAP satırları çekilir ve id ile tekilleştirilir.
+    server_cursor sadece sunucudan okunan satırlarla ilerler."""
+
+    def __init__(self, table, hours, label):
+        self.table = table
+        self.hours = hours
+        self.label = label
+        self.expiry = {}
+        self.seen_ids = {}          # sunucu satır id → bitiş (overlap tekrarlarını atlamak için)
+        self.loaded_at = 0.0
+        self.reconciled_at = 0.0
+        self.server_cursor = None
+
+    def _put(self, mk, sc, expires):
+        for key in {(mk, sc), (_normalize_mk(mk), sc)}:
+            if expires > self.expiry.get(key, 0):
+                self.expiry[key] = expires
+
+    def _absorb(self, rows):
+        for row in rows:
+            created = _parse_created_at(row.get('created_at')) if row.get('created_at') else time.time()
+            self._put(row.get('match_key', ''), row.get('selection_code', ''), created + self.hours * 3600)
+
+    def _absorb_server(self, rows):
+        fresh = []
+        for row in rows:
+            rid = row.get('id')
+            if rid in self.seen_ids:
+                continue
+            self.seen_ids[rid] = _parse_created_at(row.get('created_at')) + self.hours * 3600
+            fresh.append(row)
+            ca = row.get('created_at')
+            if ca and (self.server_cursor is None or _parse_created_at(ca) > _parse_created_at(self.server_cursor)):
+                self.server_cursor = ca
+        self._absorb(fresh)
+
+    def _fetch_since(self, since_iso):
+        return fetch_keyset(self.table, 'id,match_key,selection_code,created_at',
+                            f"&created_at=gte.{url_quote(since_iso, safe='')}", timeout=10)
+
+    def members(self):
+        """Cooldown'daki (match_key, selection_code) kümesi (normalize edilmiş key'ler dahil)."""
+        now = time.time()
+        try:
+            if not self.loaded_at or now - self.loaded_at >= COOLDOWN_FULL_RELOAD:
+                cutoff = (datetime.now(timezone.utc) - timedelta(hours=self.hours)).isoformat()
+                rows = self._fetch_since(cutoff)
+                if rows is not None:
+                    self.expiry, self.seen_ids, self.server_cursor = {}, {}, None
+                    self._absorb_server(rows)
+                    self.server_cursor = self.server_cursor or cutoff
+                    self.loaded_at = self.reconciled_at = now
+            elif now - self.reconciled_at >= COOLDOWN_RECONCILE_INTERVAL:
+                rows = self._fetch_since(_iso_minus(self.server_cursor, SIGNAL_INDEX_OVERLAP))
+                if rows is not None:
+                    self._absorb_server(rows)
+                    self.reconciled_at = now
+        except Exception as e:
+            log(f"[{self.label}-Cooldown] Yükleme hatası: {e}")
+        expired = [k for k, exp in self.expiry.items() if exp <= now]
+        for k in expired:
+            del self.expiry[k]
+        expired_ids = [rid for rid, exp in self.seen_ids.items() if exp <= now]
+        for rid in expired_ids:
+            del self.seen_ids[rid]
+        return set(self.expiry)
+
+    def add(self, records):
+        """Yerel insert'ler: cooldown'a girer, server_cursor'a dokunmaz."""
+        self._absorb(records)
+
+    def remove(self, signals):
+        for sig in signals:
+            mk = sig.get('match_key', '')
+            sc = sig.get('selection_code', '')
+            self.expiry.pop((mk, sc), None)
+            self.expiry.pop((_normalize_mk(mk), sc), None)
+
+
+_COOLDOWN_INDEXES = {
+    'confirmed_money_signals': CooldownIndex('confirmed_money_signals', CM_COOLDOWN_HOURS, 'CM'),
+    'confirmed_money_v2_signals': CooldownIndex('confirmed_money_v2_signals', CMV2_COOLDOWN_HOURS, 'CMv2'),
+    'fake_sharp_signals': CooldownIndex('fake_sharp_signals', FS_COOLDOWN_HOURS, 'FS'),
+}
+
+
+def bulk_insert_signals(table, records, prefer='return=minimal', on_conflict=None, index_rows=None):
+    """Yeni sinyalleri tek POST ile ekle; başarılıysa index'e de ekle. Dönüş: response."""
+    url = f"{SUPABASE_URL}/rest/v1/{table}"
+    if on_conflict:
+        url += f"?on_conflict={on_conflict}"
+    r = requests.post(url, headers=_headers_write(prefer), json=records, timeout=15)
+    if r.status_code in (200, 201):
+        signal_index(table).add(records if index_rows is None else index_rows)
+        if table in _COOLDOWN_INDEXES:
+            _COOLDOWN_INDEXES[table].add(records)
+    return r
+
+
+def bulk_delete_signals(table, signals, label):
+    """Sinyalleri selection_code başına tek DELETE (match_key=in.(...)) ile sil.
+    Dönüş: silinen satırlar (index'ten de düşülür)."""
+    if not signals:
+        return []
+    by_code = {}
+    for sig in signals:
+        by_code.setdefault(sig.get('selection_code', ''), []).append(sig)
+    wh = _headers_write()
+    deleted = []
+    for sc, sigs in by_code.items():
+        for i in range(0, len(sigs), SIGNAL_DELETE_CHUNK):
+            chunk = sigs[i:i + SIGNAL_DELETE_CHUNK]
+            quoted = ','.join(
+                '"' + s.get('match_key', '').replace('\\', '\\\\').replace('"', '\\"') + '"'
+                for s in chunk
+            )
+            del_url = (
+                f"{SUPABASE_URL}/rest/v1/{table}"
+                f"?selection_code=eq.{url_quote(sc, safe='')}"
+                f"&match_key=in.({url_quote(quoted, safe=',')})"
+            )
+            try:
+                r = requests.delete(del_url, headers=wh, timeout=15)
+                if r.status_code in (200, 204):
+                    deleted.extend(chunk)
+                else:
+                    log(f"[{label}-Delete] Hata: {r.status_code} {r.text[:200]}")
+            except Exception as e:
+                log(f"[{label}-Delete] Hata: {e}")
+    signal_index(table).remove(SignalTableIndex.key_of(s) for s in deleted)
+    if table in _COOLDOWN_INDEXES:
+        _COOLDOWN_INDEXES[table].remove(deleted)
+    return deleted
+
+
+BULK_CURRENT_CHUNK = 500
+_bulk_current_rpc_missing = False
+
+
+def _current_changed(sig, data):
+    """Yeni current_* değerleri DB'de son yazılanlardan farklı mı? (last_updated_at hariç)"""
+    for k, v in data.items():
+        if k == 'last_updated_at':
+            continue
+        if str(sig.get(k) or '') != str(v or ''):
+            return True
+    return False
+
+
+def _patch_current_row(table, row, wh):
+    mk = url_quote(row['match_key'], safe='')
+    sc = url_quote(row['selection_code'], safe='')
+    patch_url = f"{SUPABASE_URL}/rest/v1/{table}?match_key=eq.{mk}&selection_code=eq.{sc}"
+    data = {k: v for k, v in row.items() if k not in ('match_key', 'selection_code')}
+    r = requests.patch(patch_url, headers=wh, json=data, timeout=10)
+    return r.status_code in (200, 204)
+
+
+def write_current_values(table, rows, label):
+    """Değişen current_* satırlarını toplu yaz.
+    Önce bulk_update_signal_current RPC (chunk başına 1 istek); RPC yoksa satır başına PATCH.
+    Dönüş: (yazılan, http_istek_sayısı, toplam_süre_ms)"""
+    global _bulk_current_rpc_missing
+    if not rows:
+        return 0, 0, 0.0
+    t0 = time.time()
+    wh = _headers_write()
+    written = 0
+    calls = 0
+    pending = rows
+    if not _bulk_current_rpc_missing:
+        pending = []
+        url = f"{SUPABASE_URL}/rest/v1/rpc/bulk_update_signal_current"
+        for i in range(0, len(rows), BULK_CURRENT_CHUNK):
+            chunk = rows[i:i + BULK_CURRENT_CHUNK]
+            try:
+                calls += 1
+                r = requests.post(url, headers=_headers_write('return=representation'),
+                                  json={'p_table': table, 'p_rows': chunk}, timeout=20)
+                if r.status_code == 200:
+                    try:
+                        written += int(r.json() or 0)
+                    except Exception:
+                        written += len(chunk)
+                    continue
+                if r.status_code == 404:
+                    _bulk_current_rpc_missing = True
+                    log(f"[{label}-Current] bulk_update_signal_current RPC yok — "
+                        f"migrations/2026_10_18_bulk_update_signal_current.sql çalıştırın (satır başına PATCH)")
+                else:
+                    log(f"[{label}-Current] Bulk RPC hatası: {r.status_code} {r.text[:200]}")
+            except Exception as e:
+                log(f"[{label}-Current] Bulk RPC hata: {e}")
+            pending.extend(rows[i:])
+            break
+    for row in pending:
+        try:
+            calls += 1
+            if _patch_current_row(table, row, wh):
+                written += 1
+        except Exception as e:
+            log(f"[{label}-Current] Hata: {e}")
+    return written, calls, (time.time() - t0) * 1000
+
+
+def refresh_current_values(table, existing, build_fn, label):
+    """existing sinyaller için build_fn(sig) → current_* dict (veya None = snapshot yok).
+    Sadece DB'deki değerden farklı olanlar yazılır. Dönüş: (yazılan, no_snapshot)"""
+    now = datetime.now(timezone.utc).isoformat()
+    changed = []
+    not_found = 0
+    unchanged = 0
+    for sig in existing:
+        data = build_fn(sig)
+        if data is None:
+            not_found += 1
+            continue
+        if not data:
+            continue
+        if not _current_changed(sig, data):
+            unchanged += 1
+            continue
+        data['last_updated_at'] = now
+        changed.append({'match_key': sig.get('match_key', ''),
+                        'selection_code': sig.get('selection_code', ''), **data})
+    written, calls, elapsed_ms = write_current_values(table, changed, label)
+    if changed and written >= len(changed):
+        # Index'teki satırlar (existing) son yazılan değerleri taşısın → sonraki diff doğru olsun
+        by_key = {(c['match_key'], c['selection_code']): c for c in changed}
+        for sig in existing:
+            c = by_key.get((sig.get('match_key', ''), sig.get('selection_code', '')))
+            if c:
+                sig.update({k: v for k, v in c.items() if k not in ('match_key', 'selection_code')})
+    # Eski yol: değişmeyenler dahil her sinyal için 1 PATCH
+    baseline_calls = len(changed) + unchanged
+    saved_ms = 0.0
+    if calls:
+        saved_ms = max(0.0, (baseline_calls - calls) * (elapsed_ms / calls))
+    log(f"[{label}-Current] written={written}/{len(changed)} unchanged={unchanged} "
+        f"http={calls} (eski: {baseline_calls}) {elapsed_ms:.0f}ms, ~{saved_ms / 1000:.1f}s tasarruf")
+    return written, not_found
+
+
 # ============================================================
 # UNDERDOG PRESSURE ENGINE
 # ============================================================
@@ -456,82 +916,52 @@ def save_new_signals(signals, with_current_cols):
             rec['current_volume'] = s['volume']
             rec['last_updated_at'] = now
         records.append(rec)
-    headers = _headers_write('resolution=ignore-duplicates,return=representation')
-    url = f"{SUPABASE_URL}/rest/v1/underdog_signals?on_conflict=match_key,selection_code"
-    r = requests.post(url, headers=headers, json=records, timeout=15)
+    r = bulk_insert_signals('underdog_signals', records,
+                            prefer='resolution=ignore-duplicates,return=representation',
+                            on_conflict='match_key,selection_code', index_rows=[])
     if r.status_code in (200, 201):
         try:
-            return len(r.json()) if r.text else 0
+            inserted = r.json() if r.text else []
         except Exception:
             return 0
+        signal_index('underdog_signals').add([{**row, 'date': row.get('match_date')} for row in inserted])
+        return len(inserted)
     log(f"[SinyalEngine] INSERT hatası: {r.status_code} {r.text[:200]}")
     return 0
 
 
 def fetch_existing_signals():
-    """DB'deki mevcut tüm underdog sinyallerini çek."""
-    try:
-        url = (
-            f"{SUPABASE_URL}/rest/v1/underdog_signals"
-            "?select=match_key,selection_code,home_team,away_team,date:match_date"
-            "&limit=5000"
-        )
-        r = requests.get(url, headers=_headers_read(), timeout=12)
-        if r.status_code == 200:
-            return r.json()
-        return []
-    except Exception as e:
-        log(f"[FetchExisting] Hata: {e}")
-        return []
+    """DB'deki mevcut tüm underdog sinyalleri (bellek içi index, artımlı tazelenir)."""
+    return signal_index('underdog_signals').load()
 
 
 def update_current_values_for_existing(existing_signals, snapshot_lookup):
     """
     DB'deki tüm underdog sinyallerinin current_* değerlerini güncelle.
     Kriterler karşılanmasa bile güncellenir — ilk tetiklenme sabit, şu anki takip edilir.
+    Sadece değeri değişen satırlar toplu yazılır (refresh_current_values).
     """
-    now = datetime.now(timezone.utc).isoformat()
-    updated = 0
-    failed = 0
-    not_found = 0
-    wh = _headers_write()
     code_map = {
         '1': ('odds1', 'pct1', 'amt1'),
         'X': ('oddsx', 'pctx', 'amtx'),
         '2': ('odds2', 'pct2', 'amt2'),
     }
-    for sig in existing_signals:
-        match_key = sig.get('match_key', '')
-        sel_code = sig.get('selection_code', '')
-        row = snapshot_lookup.get(match_key)
+
+    def build(sig):
+        row = snapshot_lookup.get(sig.get('match_key', ''))
         if not row:
-            not_found += 1
-            continue
-        fields = code_map.get(sel_code)
+            return None
+        fields = code_map.get(sig.get('selection_code', ''))
         if not fields:
-            continue
-        try:
-            mk = url_quote(match_key, safe='')
-            sc = url_quote(sel_code, safe='')
-            patch_url = f"{SUPABASE_URL}/rest/v1/underdog_signals?match_key=eq.{mk}&selection_code=eq.{sc}"
-            data = {
-                'current_odds': str(row.get(fields[0]) or ''),
-                'current_pct': str(row.get(fields[1]) or ''),
-                'current_amt': str(row.get(fields[2]) or ''),
-                'current_volume': str(row.get('volume') or ''),
-                'last_updated_at': now,
-            }
-            r = requests.patch(patch_url, headers=wh, json=data, timeout=10)
-            if r.status_code in (200, 204):
-                updated += 1
-            else:
-                failed += 1
-        except Exception as e:
-            log(f"[Update] Hata: {e}")
-            failed += 1
-    if failed and not updated:
-        log(f"[SinyalEngine] current_* kolonları yok — migrations/underdog_signals_current_columns.sql çalıştırın.")
-    return updated, not_found
+            return {}
+        return {
+            'current_odds': str(row.get(fields[0]) or ''),
+            'current_pct': str(row.get(fields[1]) or ''),
+            'current_amt': str(row.get(fields[2]) or ''),
+            'current_volume': str(row.get('volume') or ''),
+        }
+
+    return refresh_current_values('underdog_signals', existing_signals, build, 'Underdog')
 
 
 def cleanup_low_volume_signals():
@@ -539,15 +969,7 @@ def cleanup_low_volume_signals():
     volume VE current_volume sütunlarının ikisi de kontrol edilir; hangisi düşükse esas alınır.
     """
     try:
-        url = (
-            f"{SUPABASE_URL}/rest/v1/underdog_signals"
-            "?select=match_key,selection_code,home_team,away_team,volume,current_volume&limit=5000"
-        )
-        r = requests.get(url, headers=_headers_read(), timeout=12)
-        if r.status_code != 200:
-            log(f"[Cleanup] Sinyal listesi alınamadı: HTTP {r.status_code}")
-            return
-        rows = r.json()
+        rows = signal_index('underdog_signals').load()
         to_delete = []
         for row in rows:
             vol_orig = parse_volume_amt(row.get('volume', ''))
@@ -559,22 +981,10 @@ def cleanup_low_volume_signals():
         if not to_delete:
             log(f"[Cleanup] Tüm {len(rows)} underdog sinyali hacim eşiğini (£{VOLUME_THRESHOLD:,.0f}) karşılıyor.")
             return
-        wh = _headers_write()
-        deleted = 0
-        for row in to_delete:
-            mk = url_quote(row.get('match_key', ''), safe='')
-            sc = url_quote(row.get('selection_code', ''), safe='')
-            del_url = (
-                f"{SUPABASE_URL}/rest/v1/underdog_signals"
-                f"?match_key=eq.{mk}&selection_code=eq.{sc}"
-            )
-            dr = requests.delete(del_url, headers=wh, timeout=10)
-            if dr.status_code in (200, 204):
-                deleted += 1
-                log(f"[Cleanup] Silindi: {row.get('home_team','?')} vs {row.get('away_team','?')} vol={row.get('volume','?')}")
-            else:
-                log(f"[Cleanup] Silinemedi: {row.get('home_team','?')} vs {row.get('away_team','?')} HTTP {dr.status_code}")
-        log(f"[Cleanup] {deleted}/{len(to_delete)} düşük hacimli underdog kaydı silindi (eşik: £{VOLUME_THRESHOLD:,.0f})")
+        deleted = bulk_delete_signals('underdog_signals', to_delete, 'Cleanup')
+        for row in deleted:
+            log(f"[Cleanup] Silindi: {row.get('home_team','?')} vs {row.get('away_team','?')} vol={row.get('volume','?')}")
+        log(f"[Cleanup] {len(deleted)}/{len(to_delete)} düşük hacimli underdog kaydı silindi (eşik: £{VOLUME_THRESHOLD:,.0f})")
     except Exception as e:
         log(f"[Cleanup] Hata: {e}")
 
@@ -644,23 +1054,133 @@ def check_cm_v2_table_exists():
         return False
 
 
+RECENT_HISTORY_WINDOW = 10 * 3600 + 5 * 60   # CM/CMv2/FS stabilite penceresi (10sa 5dk)
+RECENT_HISTORY_OVERLAP = 120                 # sn — geç yazılan satırlar için cursor geri payı
+RECENT_HISTORY_MAX_PAGES = 10                # artımlı çekim bu kadar POSTGREST_MAX_ROWS sayfasını doldurursa gap → tam reload
+RECENT_HISTORY_MIN_INTERVAL = 20             # aynı cycle içinde tekrar senkron yapma
+RECENT_HISTORY_SELECT = (
+    "home,away,league,date,odds1,oddsx,odds2,pct1,pctx,pct2,"
+    "amt1,amtx,amt2,volume,scraped_at,match_id_hash,id"
+)
+
+
+class RecentHistoryCache:
+    """moneyway_1x2_history'nin son RECENT_HISTORY_WINDOW'luk kayan penceresi (bellek içi).
+
+    İlk çağrıda (veya gap tespit edilince) pencerenin tamamı çekilir; sonraki
+    cycle'larda sadece scraped_at >= cursor - RECENT_HISTORY_OVERLAP satırları
+    gelir ((scraped_at, id) keyset sayfalama). Satırlar id ile tekilleştirilir,
+    pencere dışına düşenler her senkronda atılır.
+    Gap: son başarılı senkron pencereden eski ya da artımlı çekim sayfa
+    sınırını aştı → tam reload.
+    """
+
+    def __init__(self):
+        self.rows = {}          # row_id -> (ts, row)
+        self.cursor_ts = None   # görülen en yeni scraped_at (epoch)
+        self.oldest_ts = None
+        self.synced_at = 0.0
+        self.stats = {'full': 0, 'incremental': 0, 'fetched': 0, 'trimmed': 0}
+
+    @staticmethod
+    def _row_id(row):
+        if row.get('id') is not None:
+            return row['id']
+        return (row.get('match_id_hash') or '', row.get('home', ''), row.get('away', ''),
+                row.get('date', ''), row.get('scraped_at', ''))
+
+    def _fetch_full(self):
+        cutoff = datetime.fromtimestamp(time.time() - RECENT_HISTORY_WINDOW, tz=timezone.utc).isoformat()
+        return fetch_keyset('moneyway_1x2_history', RECENT_HISTORY_SELECT,
+                            f"&scraped_at=gte.{url_quote(cutoff, safe='')}",
+                            ts_col='scraped_at', desc=True, timeout=30)
+
+    def _fetch_since(self, since_ts):
+        """(rows, gap) — hata durumunda rows None."""
+        since = datetime.fromtimestamp(since_ts, tz=timezone.utc).isoformat()
+        limit = RECENT_HISTORY_MAX_PAGES * POSTGREST_MAX_ROWS
+        rows = fetch_keyset('moneyway_1x2_history', RECENT_HISTORY_SELECT,
+                            f"&scraped_at=gte.{url_quote(since, safe='')}",
+                            ts_col='scraped_at', max_rows=limit, timeout=20)
+        if rows is None:
+            return None, False
+        return rows, len(rows) >= limit
+
+    def _absorb(self, rows):
+        added = 0
+        for row in rows:
+            ts = _parse_created_at(row.get('scraped_at'))
+            rid = self._row_id(row)
+            if rid not in self.rows:
+                added += 1
+            self.rows[rid] = (ts, row)
+            if self.cursor_ts is None or ts > self.cursor_ts:
+                self.cursor_ts = ts
+            if self.oldest_ts is None or ts < self.oldest_ts:
+                self.oldest_ts = ts
+        return added
+
+    def _trim(self, now):
+        cutoff = now - RECENT_HISTORY_WINDOW
+        if self.oldest_ts is None or self.oldest_ts >= cutoff:
+            return 0
+        before = len(self.rows)
+        self.rows = {rid: v for rid, v in self.rows.items() if v[0] >= cutoff}
+        self.oldest_ts = min((v[0] for v in self.rows.values()), default=None)
+        return before - len(self.rows)
+
+    def sync(self):
+        """Pencereyi tazele. Veri kullanılabilir durumdaysa True."""
+        now = time.time()
+        if self.synced_at and now - self.synced_at < RECENT_HISTORY_MIN_INTERVAL:
+            return True
+        try:
+            mode = 'incremental'
+            gap = not self.synced_at or now - self.synced_at > RECENT_HISTORY_WINDOW
+            rows = None
+            if not gap and self.cursor_ts is not None:
+                rows, gap = self._fetch_since(self.cursor_ts - RECENT_HISTORY_OVERLAP)
+                if rows is None:
+                    return bool(self.synced_at)
+            if gap or self.cursor_ts is None:
+                mode = 'full'
+                rows = self._fetch_full()
+                if rows is None:
+                    return bool(self.synced_at)
+                self.rows = {}
+                self.cursor_ts = self.oldest_ts = None
+            added = self._absorb(rows)
+            trimmed = self._trim(now)
+            self.synced_at = now
+            self.stats[mode] += 1
+            self.stats['fetched'] += len(rows)
+            self.stats['trimmed'] += trimmed
+            log(f"[CM-Fetch] History cache ({mode}): {len(rows)} satır çekildi, +{added} yeni, "
+                f"-{trimmed} pencere dışı, {len(self.rows)} satır bellekte")
+            return True
+        except Exception as e:
+            log(f"[CM-Fetch] History cache hata: {e}")
+            return bool(self.synced_at)
+
+    def rows_since(self, since_ts):
+        """scraped_at >= since_ts satırları, en yeni önce (cache'teki dict'ler — değiştirmeyin)."""
+        items = [v for v in self.rows.values() if v[0] >= since_ts]
+        items.sort(key=lambda v: v[0], reverse=True)
+        return [row for _, row in items]
+
+
+_RECENT_HISTORY = RecentHistoryCache()
+
+
 def fetch_recent_history(active_keys=None):
-    """Son 10 saatin tüm snapshot'larını çek, home|away|date bazlı grupla.
+    """Son 10 saatin tüm snapshot'larını home|away|date bazlı grupla.
     PCT stabilite kontrolü için kullanılır (son N ardışık snapshot'ta pct > eşik).
+    Satırlar _RECENT_HISTORY kayan penceresinden gelir — her cycle'da sadece yeni satırlar çekilir.
     active_keys: moneyway_1x2 canlı tablosundan gelen başlamamış maç key seti.
     Bu set verilirse yalnızca o maçların geçmişi işlenir, biten maçlar atlanır."""
-    cutoff = (datetime.now(timezone.utc) - timedelta(hours=10, minutes=5)).isoformat()
-    url = (
-        f"{SUPABASE_URL}/rest/v1/moneyway_1x2_history"
-        f"?select=home,away,date,odds1,oddsx,odds2,pct1,pctx,pct2,volume,scraped_at,match_id_hash"
-        f"&scraped_at=gte.{cutoff}"
-        f"&order=scraped_at.desc&limit=50000"
-    )
-    r = requests.get(url, headers=_headers_read(), timeout=30)
-    if r.status_code != 200:
-        log(f"[CM-Fetch] HTTP {r.status_code}: {r.text[:200]}")
+    if not _RECENT_HISTORY.sync():
         return {}
-    rows = r.json()
+    rows = _RECENT_HISTORY.rows_since(time.time() - RECENT_HISTORY_WINDOW)
     history = {}
     skipped = 0
     for row in rows:
@@ -682,7 +1202,7 @@ def fetch_recent_history(active_keys=None):
         history[primary].append(row)
         if real_hash and composite != primary and composite not in history:
             history[composite] = history[primary]
-    log(f"[CM-Fetch] {len(history)} aktif maç için son geçmiş çekildi ({len(rows)} satır, {skipped} biten atlandı)")
+    log(f"[CM-Fetch] {len(history)} aktif maç için son geçmiş hazır ({len(rows)} satır, {skipped} biten atlandı)")
     return history
 
 
@@ -760,6 +1280,201 @@ def fetch_first_snapshots(active_keys=None):
     return first_snaps
 
 
+# ============================================================
+# HISTORY FRAME (CM / CMv2 / FS / EML ortak kolonlu geçmiş)
+# ============================================================
+#
+# fetch_recent_history() satırları cycle başına bir kez maç bazında zaman
+# sıralı (en yeni önce) tek bir düz listeye dizilir; her maç için offset/count
+# tutulur. Kolonlar (odds*, pct*, amt*, volume) float64 dizisi olarak tembel
+# parse edilir — bir hücre dört tarayıcı arasında en fazla bir kez parse edilir.
+# "Son N snapshot'ta pct > eşik" gibi pencere kontrolleri tüm maçlar için tek
+# numpy işlemiyle hesaplanır.
+
+_FRAME_VOLUME_COLS = ('volume', 'amt1', 'amtx', 'amt2')
+
+
+def _snapshot_column(rows, field):
+    """Satır listesinden tek kolonu float64 dizisine parse et (hacim/miktar ayrımıyla)."""
+    parse = parse_volume_amt if field in _FRAME_VOLUME_COLS else parse_odds_pct
+    return np.fromiter((parse(r.get(field)) for r in rows), dtype=np.float64, count=len(rows))
+
+
+class HistoryFrame:
+    """Maç bazında zaman sıralı, kolonlu history.
+
+    history_by_hash: fetch_recent_history() / fetch_eml_history() çıktısı
+    (key -> satır listesi). Alias key'ler (hash + composite) aynı listeyi
+    paylaştığı için aynı gruba bağlanır, satırlar tekrar parse edilmez.
+    """
+
+    def __init__(self, history_by_hash):
+        self.index = {}
+        groups = {}
+        ordered = []
+        counts = []
+        for key, rows in (history_by_hash or {}).items():
+            if not rows:
+                continue
+            gid = groups.get(id(rows))
+            if gid is None:
+                gid = len(counts)
+                groups[id(rows)] = gid
+                rows_sorted = sorted(rows, key=lambda r: r.get('scraped_at', ''), reverse=True)
+                ordered.extend(rows_sorted)
+                counts.append(len(rows_sorted))
+            self.index[key] = gid
+        self.rows = ordered
+        self.counts = np.asarray(counts, dtype=np.int64)
+        self.starts = np.zeros(len(counts), dtype=np.int64)
+        if len(counts) > 1:
+            np.cumsum(self.counts[:-1], out=self.starts[1:])
+        self._cols = {}
+        self._tail_min = {}
+        self._snap = None
+
+    def __len__(self):
+        return len(self.counts)
+
+    def lookup(self, keys):
+        """Key listesi → grup indeksi dizisi (history'si olmayan key için -1)."""
+        index = self.index
+        return np.fromiter((index.get(k, -1) for k in keys), dtype=np.int64, count=len(keys))
+
+    def values(self, col, idx):
+        """idx satırlarındaki kolon değerleri; henüz parse edilmemiş hücreler burada parse edilir."""
+        arr = self._cols.get(col)
+        if arr is None:
+            arr = np.full(len(self.rows), np.nan)
+            self._cols[col] = arr
+        missing = idx[np.isnan(arr[idx])]
+        if missing.size:
+            rows = self.rows
+            arr[missing] = _snapshot_column([rows[i] for i in missing], col)
+        return arr[idx]
+
+    def tail_min(self, col, n, gidx=None):
+        """Her maçın en yeni n satırındaki minimum değer.
+        n'den az satırı olan maç (ve gidx=-1) için NaN — NaN her eşik karşılaştırmasında False."""
+        key = (col, n)
+        out = self._tail_min.get(key)
+        if out is None:
+            out = np.full(len(self.counts), np.nan)
+            ok = self.counts >= n
+            if ok.any():
+                idx = (self.starts[ok][:, None] + np.arange(n)).ravel()
+                out[ok] = self.values(col, idx).reshape(-1, n).min(axis=1)
+            self._tail_min[key] = out
+        if gidx is None:
+            return out
+        if not len(out):
+            return np.full(len(gidx), np.nan)
+        return np.where(gidx >= 0, out[gidx], np.nan)
+
+    def snapshot_columns(self, latest_snapshots, first_snapshots=None):
+        """latest / first snapshot kolonları — aynı dict'ler için cycle boyunca bir kez parse edilir."""
+        snap = self._snap
+        if snap is None or snap.latest is not latest_snapshots or snap.first is not first_snapshots:
+            snap = SnapshotColumns(latest_snapshots, first_snapshots, self)
+            self._snap = snap
+        return snap
+
+
+class SnapshotColumns:
+    """latest_snapshots satırları + her birinin first snapshot'ı, frame grubuna hizalı."""
+
+    def __init__(self, latest_snapshots, first_snapshots, frame):
+        self.latest = latest_snapshots
+        self.first = first_snapshots
+        self.keys = list(latest_snapshots)
+        self.rows = [latest_snapshots[k] for k in self.keys]
+        first_snapshots = first_snapshots or {}
+        self.refs = [first_snapshots.get(k) or {} for k in self.keys]
+        self.has_ref = np.fromiter((bool(r) for r in self.refs), dtype=bool, count=len(self.keys))
+        self.gidx = frame.lookup(self.keys)
+        self._cols = {}
+
+    def __len__(self):
+        return len(self.keys)
+
+    def column(self, field):
+        arr = self._cols.get(('latest', field))
+        if arr is None:
+            arr = _snapshot_column(self.rows, field)
+            self._cols[('latest', field)] = arr
+        return arr
+
+    def ref_column(self, field):
+        arr = self._cols.get(('first', field))
+        if arr is None:
+            arr = _snapshot_column(self.refs, field)
+            self._cols[('first', field)] = arr
+        return arr
+
+
+def as_history_frame(history):
+    """HistoryFrame ya da key -> satır listesi dict'i kabul eder."""
+    if isinstance(history, HistoryFrame):
+        return history
+    return HistoryFrame(history)
+
+
+def _scan_odds_move(latest_snapshots, history, cooldown_set, first_snapshots, selections,
+                    vol_min, pct_min, pct_strict, stability, odds_min, odds_max,
+                    move_min, rising):
+    """CM / CMv2 / FS ortak vektörel tarama.
+    pct_strict: True → pct > eşik (CM/FS), False → pct >= eşik (CMv2).
+    rising: True → ilk snapshot'a göre oran yükselişi (FS), False → düşüş (CM/CMv2).
+    Sinyal sırası eski döngüyle aynıdır (maç sırası, sonra seçim sırası)."""
+    frame = as_history_frame(history)
+    snap = frame.snapshot_columns(latest_snapshots, first_snapshots)
+    if not len(snap):
+        return []
+
+    base = (snap.column('volume') >= vol_min) & (snap.gidx >= 0) & snap.has_ref
+    checks = []
+    with np.errstate(divide='ignore', invalid='ignore'):
+        for code, label, o_field, p_field in selections:
+            pct_now = snap.column(p_field)
+            stable = frame.tail_min(p_field, stability, snap.gidx)
+            if pct_strict:
+                ok = base & (pct_now > pct_min) & (stable > pct_min)
+            else:
+                ok = base & (pct_now >= pct_min) & (stable >= pct_min)
+            odds_0 = snap.column(o_field)
+            odds_ref = snap.ref_column(o_field)
+            move = (odds_0 - odds_ref) / odds_ref if rising else (odds_ref - odds_0) / odds_ref
+            ok &= ((odds_0 >= odds_min) & (odds_0 <= odds_max)
+                   & (odds_0 > 0) & (odds_ref > 0) & (move >= move_min))
+            checks.append((code, label, ok, pct_now, odds_0, odds_ref, move))
+
+    move_field = 'odds_rise_pct' if rising else 'odds_drop_pct'
+    volume = snap.column('volume')
+    candidates = np.flatnonzero(np.logical_or.reduce([c[2] for c in checks]))
+    signals = []
+    for i in candidates:
+        latest = snap.rows[i]
+        mk = f"{latest.get('home', '')}|{latest.get('away', '')}|{_normalize_date_key(latest.get('date', ''))}"
+        for code, label, ok, pct_now, odds_0, odds_ref, move in checks:
+            if not ok[i] or (mk, code) in cooldown_set:
+                continue
+            signals.append({
+                'match_key': mk,
+                'home_team': latest.get('home', ''),
+                'away_team': latest.get('away', ''),
+                'league': latest.get('league', ''),
+                'date': latest.get('date', ''),
+                'selection_code': code,
+                'selection_label': label,
+                'odds_16h': str(round(float(odds_ref[i]), 4)),
+                'odds_now': str(round(float(odds_0[i]), 4)),
+                'pct_now': str(round(float(pct_now[i]), 2)),
+                'volume_now': str(int(volume[i])),
+                move_field: round(float(move[i]) * 100, 2),
+            })
+    return signals
+
+
 def _normalize_mk(mk):
     """Match_key'in tarih kısmını UTC+3'e normalize eder (cooldown kontrol tutarlılığı).
     'home|away|14.Apr 18:45:00' → 'home|away|14.Apr 21:45'
@@ -771,57 +1486,13 @@ def _normalize_mk(mk):
 
 
 def fetch_cm_recent_cooldowns():
-    """Son CM_COOLDOWN_HOURS saatteki confirmed_money_signals kayıtlarını çek."""
-    try:
-        cutoff = (datetime.now(timezone.utc) - timedelta(hours=CM_COOLDOWN_HOURS)).isoformat()
-        url = (
-            f"{SUPABASE_URL}/rest/v1/confirmed_money_signals"
-            f"?select=match_key,selection_code"
-            f"&created_at=gte.{cutoff}"
-            f"&limit=5000"
-        )
-        r = requests.get(url, headers=_headers_read(), timeout=10)
-        if r.status_code == 200:
-            rows = r.json()
-            result = set()
-            for row in rows:
-                mk = row['match_key']
-                sc = row['selection_code']
-                result.add((mk, sc))
-                mk_norm = _normalize_mk(mk)
-                if mk_norm != mk:
-                    result.add((mk_norm, sc))
-            return result
-        return set()
-    except Exception:
-        return set()
+    """Son CM_COOLDOWN_HOURS saatteki confirmed_money_signals kayıtları (bellek içi cooldown index)."""
+    return _COOLDOWN_INDEXES['confirmed_money_signals'].members()
 
 
 def fetch_cm_v2_recent_cooldowns():
-    """Son CMV2_COOLDOWN_HOURS saatteki confirmed_money_v2_signals kayıtlarını çek."""
-    try:
-        cutoff = (datetime.now(timezone.utc) - timedelta(hours=CMV2_COOLDOWN_HOURS)).isoformat()
-        url = (
-            f"{SUPABASE_URL}/rest/v1/confirmed_money_v2_signals"
-            f"?select=match_key,selection_code"
-            f"&created_at=gte.{cutoff}"
-            f"&limit=5000"
-        )
-        r = requests.get(url, headers=_headers_read(), timeout=10)
-        if r.status_code == 200:
-            rows = r.json()
-            result = set()
-            for row in rows:
-                mk = row['match_key']
-                sc = row['selection_code']
-                result.add((mk, sc))
-                mk_norm = _normalize_mk(mk)
-                if mk_norm != mk:
-                    result.add((mk_norm, sc))
-            return result
-        return set()
-    except Exception:
-        return set()
+    """Son CMV2_COOLDOWN_HOURS saatteki confirmed_money_v2_signals kayıtları (bellek içi cooldown index)."""
+    return _COOLDOWN_INDEXES['confirmed_money_v2_signals'].members()
 
 
 def find_confirmed_money(latest_snapshots, history_by_hash, cooldown_set, first_snapshots=None):
@@ -833,73 +1504,15 @@ def find_confirmed_money(latest_snapshots, history_by_hash, cooldown_set, first_
       4. Anlık odds 1.35-2.20 aralığında
       5. Oran düşüşü: maçın ilk snapshot'ına göre >= %4 düşüş (pct'den bağımsız)
     """
-    if first_snapshots is None:
-        first_snapshots = {}
-    signals = []
-
-    for h, latest in latest_snapshots.items():
-        # Kriter 1: Hacim
-        if parse_volume_amt(latest.get('volume', '')) < CM_VOLUME_THRESHOLD:
-            continue
-        match_history = history_by_hash.get(h, [])
-        if not match_history:
-            continue
-        match_history_sorted = sorted(match_history, key=lambda r: r.get('scraped_at', ''), reverse=True)
-
-        for code, label, o_field, p_field in [
-            ('1', 'Ev Sahibi',  'odds1', 'pct1'),
-            ('X', 'Beraberlik', 'oddsx', 'pctx'),
-            ('2', 'Deplasman',  'odds2', 'pct2'),
-        ]:
-            mk = f"{latest.get('home', '')}|{latest.get('away', '')}|{_normalize_date_key(latest.get('date', ''))}"
-
-            if (mk, code) in cooldown_set:
-                continue
-
-            # Kriter 2: Anlık para yüzdesi
-            pct_now = parse_odds_pct(latest.get(p_field))
-            if pct_now <= CM_PCT_THRESHOLD:
-                continue
-
-            # Kriter 3: Stabilite — son N snapshot'ta pct > eşik
-            last_snaps = match_history_sorted[:CM_STABILITY_SNAPSHOTS]
-            if len(last_snaps) < CM_STABILITY_SNAPSHOTS:
-                continue
-            if not all(parse_odds_pct(r.get(p_field)) > CM_PCT_THRESHOLD for r in last_snaps):
-                continue
-
-            # Kriter 4: Anlık oran aralığı
-            odds_0 = parse_odds_pct(latest.get(o_field))
-            if not (CM_MIN_ODDS <= odds_0 <= CM_MAX_ODDS):
-                continue
-
-            # Kriter 5: Oran düşüşü — maçın ilk snapshot'ına göre >= %4 düşüş
-            ref_snap = first_snapshots.get(h)
-            if not ref_snap:
-                continue
-            odds_ref = parse_odds_pct(ref_snap.get(o_field))
-            if odds_0 <= 0 or odds_ref <= 0:
-                continue
-            drop_pct = (odds_ref - odds_0) / odds_ref
-            if drop_pct < CM_ODDS_DROP_PCT:
-                continue
-
-            signals.append({
-                'match_key': mk,
-                'home_team': latest.get('home', ''),
-                'away_team': latest.get('away', ''),
-                'league': latest.get('league', ''),
-                'date': latest.get('date', ''),
-                'selection_code': code,
-                'selection_label': label,
-                'odds_16h': str(round(odds_ref, 4)),
-                'odds_now': str(round(odds_0, 4)),
-                'pct_now': str(round(pct_now, 2)),
-                'volume_now': str(int(parse_volume_amt(latest.get('volume', '')))),
-                'odds_drop_pct': round(drop_pct * 100, 2),
-            })
-
-    return signals
+    return _scan_odds_move(
+        latest_snapshots, history_by_hash, cooldown_set, first_snapshots,
+        [('1', 'Ev Sahibi',  'odds1', 'pct1'),
+         ('X', 'Beraberlik', 'oddsx', 'pctx'),
+         ('2', 'Deplasman',  'odds2', 'pct2')],
+        vol_min=CM_VOLUME_THRESHOLD, pct_min=CM_PCT_THRESHOLD, pct_strict=True,
+        stability=CM_STABILITY_SNAPSHOTS, odds_min=CM_MIN_ODDS, odds_max=CM_MAX_ODDS,
+        move_min=CM_ODDS_DROP_PCT, rising=False,
+    )
 
 
 def find_confirmed_money_v2(latest_snapshots, history_by_hash, cooldown_set, first_snapshots=None):
@@ -910,67 +1523,14 @@ def find_confirmed_money_v2(latest_snapshots, history_by_hash, cooldown_set, fir
       - Oran düşüşü: ≥%4 → ≥%7
       - X (beraberlik) seçimi yoktur (sadece '1' ve '2')
     """
-    if first_snapshots is None:
-        first_snapshots = {}
-    signals = []
-
-    for h, latest in latest_snapshots.items():
-        if parse_volume_amt(latest.get('volume', '')) < CMV2_VOLUME_THRESHOLD:
-            continue
-        match_history = history_by_hash.get(h, [])
-        if not match_history:
-            continue
-        match_history_sorted = sorted(match_history, key=lambda r: r.get('scraped_at', ''), reverse=True)
-
-        for code, label, o_field, p_field in [
-            ('1', 'Ev Sahibi', 'odds1', 'pct1'),
-            ('2', 'Deplasman', 'odds2', 'pct2'),
-        ]:
-            mk = f"{latest.get('home', '')}|{latest.get('away', '')}|{_normalize_date_key(latest.get('date', ''))}"
-
-            if (mk, code) in cooldown_set:
-                continue
-
-            pct_now = parse_odds_pct(latest.get(p_field))
-            if pct_now < CMV2_PCT_THRESHOLD:
-                continue
-
-            last_snaps = match_history_sorted[:CMV2_STABILITY_SNAPSHOTS]
-            if len(last_snaps) < CMV2_STABILITY_SNAPSHOTS:
-                continue
-            if not all(parse_odds_pct(r.get(p_field)) >= CMV2_PCT_THRESHOLD for r in last_snaps):
-                continue
-
-            odds_0 = parse_odds_pct(latest.get(o_field))
-            if not (CMV2_MIN_ODDS <= odds_0 <= CMV2_MAX_ODDS):
-                continue
-
-            ref_snap = first_snapshots.get(h)
-            if not ref_snap:
-                continue
-            odds_ref = parse_odds_pct(ref_snap.get(o_field))
-            if odds_0 <= 0 or odds_ref <= 0:
-                continue
-            drop_pct = (odds_ref - odds_0) / odds_ref
-            if drop_pct < CMV2_ODDS_DROP_PCT:
-                continue
-
-            signals.append({
-                'match_key': mk,
-                'home_team': latest.get('home', ''),
-                'away_team': latest.get('away', ''),
-                'league': latest.get('league', ''),
-                'date': latest.get('date', ''),
-                'selection_code': code,
-                'selection_label': label,
-                'odds_16h': str(round(odds_ref, 4)),
-                'odds_now': str(round(odds_0, 4)),
-                'pct_now': str(round(pct_now, 2)),
-                'volume_now': str(int(parse_volume_amt(latest.get('volume', '')))),
-                'odds_drop_pct': round(drop_pct * 100, 2),
-            })
-
-    return signals
+    return _scan_odds_move(
+        latest_snapshots, history_by_hash, cooldown_set, first_snapshots,
+        [('1', 'Ev Sahibi', 'odds1', 'pct1'),
+         ('2', 'Deplasman', 'odds2', 'pct2')],
+        vol_min=CMV2_VOLUME_THRESHOLD, pct_min=CMV2_PCT_THRESHOLD, pct_strict=False,
+        stability=CMV2_STABILITY_SNAPSHOTS, odds_min=CMV2_MIN_ODDS, odds_max=CMV2_MAX_ODDS,
+        move_min=CMV2_ODDS_DROP_PCT, rising=False,
+    )
 
 
 def _betwatch_date_to_iso(date_str):
@@ -999,22 +1559,15 @@ def _betwatch_to_iso_datetime(date_str):
     _extractKickoffTime ile '14:00' verir (JS saat uyumlu).
     """
     try:
-        import re as _re
         from datetime import date as _d
-        s = str(date_str)
-        m = _re.search(r'(\d{2})\.(\w{3})', s)
-        if m:
-            months = {'Jan': 1, 'Feb': 2, 'Mar': 3, 'Apr': 4, 'May': 5,
-                      'Jun': 6, 'Jul': 7, 'Aug': 8, 'Sep': 9, 'Oct': 10,
-                      'Nov': 11, 'Dec': 12}
-            day = int(m.group(1))
-            mon = months.get(m.group(2).capitalize(), 0)
-            if mon:
-                iso_date = _d(_d.today().year, mon, day).isoformat()
-                t = _re.search(r'(\d{2}):(\d{2})(?::\d{2})?', s)
-                if t:
-                    return f"{iso_date}T{t.group(1)}:{t.group(2)}:00+03:00"
-                return iso_date
+        # core.timezone önbelleği: aynı string her döngüde tekrar parse edilmez
+        fields = parse_kickoff_fields(str(date_str).strip()) if date_str else None
+        if fields:
+            year, mon, day, hour, minute, _ = fields
+            iso_date = _d(year or _d.today().year, mon, day).isoformat()
+            if hour is not None:
+                return f"{iso_date}T{hour:02d}:{minute:02d}:00+03:00"
+            return iso_date
     except Exception:
         pass
     return str(date_str)[:10] if date_str else ''
@@ -1046,9 +1599,7 @@ def save_confirmed_money_signals(signals):
             'created_at': now,
             'last_updated_at': now,
         })
-    url = f"{SUPABASE_URL}/rest/v1/confirmed_money_signals"
-    headers = _headers_write('return=minimal')
-    r = requests.post(url, headers=headers, json=records, timeout=15)
+    r = bulk_insert_signals('confirmed_money_signals', records)
     if r.status_code in (200, 201):
         log(f"[ConfirmedMoney] INSERT OK ({len(records)} yeni sinyal)")
         return len(records)
@@ -1082,9 +1633,7 @@ def save_confirmed_money_v2_signals(signals):
             'created_at': now,
             'last_updated_at': now,
         })
-    url = f"{SUPABASE_URL}/rest/v1/confirmed_money_v2_signals"
-    headers = _headers_write('return=minimal')
-    r = requests.post(url, headers=headers, json=records, timeout=15)
+    r = bulk_insert_signals('confirmed_money_v2_signals', records)
     if r.status_code in (200, 201):
         log(f"[CMv2] INSERT OK ({len(records)} yeni sinyal)")
         return len(records)
@@ -1093,37 +1642,13 @@ def save_confirmed_money_v2_signals(signals):
 
 
 def fetch_existing_cm_v2_signals():
-    """DB'deki mevcut confirmed_money_v2_signals listesini çek."""
-    try:
-        url = (
-            f"{SUPABASE_URL}/rest/v1/confirmed_money_v2_signals"
-            "?select=match_key,selection_code,home_team,away_team,match_date,odds_16h"
-            "&limit=5000"
-        )
-        r = requests.get(url, headers=_headers_read(), timeout=12)
-        if r.status_code == 200:
-            return r.json()
-        return []
-    except Exception as e:
-        log(f"[CMv2-FetchExisting] Hata: {e}")
-        return []
+    """DB'deki mevcut confirmed_money_v2_signals listesi (bellek içi index, artımlı tazelenir)."""
+    return signal_index('confirmed_money_v2_signals').load()
 
 
 def fetch_existing_cm_signals():
-    """DB'deki mevcut confirmed_money_signals listesini çek."""
-    try:
-        url = (
-            f"{SUPABASE_URL}/rest/v1/confirmed_money_signals"
-            "?select=match_key,selection_code,home_team,away_team,match_date,odds_now,odds_16h"
-            "&limit=5000"
-        )
-        r = requests.get(url, headers=_headers_read(), timeout=12)
-        if r.status_code == 200:
-            return r.json()
-        return []
-    except Exception as e:
-        log(f"[CM-FetchExisting] Hata: {e}")
-        return []
+    """DB'deki mevcut confirmed_money_signals listesi (bellek içi index, artımlı tazelenir)."""
+    return signal_index('confirmed_money_signals').load()
 
 
 def delete_invalid_cm_signals(invalid_signals):
@@ -1131,22 +1656,10 @@ def delete_invalid_cm_signals(invalid_signals):
     Geçersizlik koşulu: sinyal anındaki referans orana (odds_16h) göre mevcut düşüş CM_ODDS_DROP_PCT eşiğinin altında."""
     if not invalid_signals:
         return 0
-    deleted = 0
-    wh = _headers_write()
-    for sig in invalid_signals:
-        try:
-            mk = sig.get('match_key', '')
-            sc = sig.get('selection_code', '')
-            mk_enc = url_quote(mk, safe='')
-            sc_enc = url_quote(sc, safe='')
-            del_url = f"{SUPABASE_URL}/rest/v1/confirmed_money_signals?match_key=eq.{mk_enc}&selection_code=eq.{sc_enc}"
-            r = requests.delete(del_url, headers=wh, timeout=10)
-            if r.status_code in (200, 204):
-                deleted += 1
-                log(f"[CM-Invalidate] Silindi: {sig.get('home_team')} vs {sig.get('away_team')} [{sc}] — düşüş eşiğin altına düştü")
-        except Exception as e:
-            log(f"[CM-Invalidate] Hata: {e}")
-    return deleted
+    deleted = bulk_delete_signals('confirmed_money_signals', invalid_signals, 'CM-Invalidate')
+    for sig in deleted:
+        log(f"[CM-Invalidate] Silindi: {sig.get('home_team')} vs {sig.get('away_team')} [{sig.get('selection_code', '')}] — düşüş eşiğin altına düştü")
+    return len(deleted)
 
 
 def delete_invalid_cm_v2_signals(invalid_signals):
@@ -1154,22 +1667,10 @@ def delete_invalid_cm_v2_signals(invalid_signals):
     Geçersizlik koşulu: sinyal anındaki referans orana (odds_16h) göre mevcut düşüş CMV2_ODDS_DROP_PCT eşiğinin altında."""
     if not invalid_signals:
         return 0
-    deleted = 0
-    wh = _headers_write()
-    for sig in invalid_signals:
-        try:
-            mk = sig.get('match_key', '')
-            sc = sig.get('selection_code', '')
-            mk_enc = url_quote(mk, safe='')
-            sc_enc = url_quote(sc, safe='')
-            del_url = f"{SUPABASE_URL}/rest/v1/confirmed_money_v2_signals?match_key=eq.{mk_enc}&selection_code=eq.{sc_enc}"
-            r = requests.delete(del_url, headers=wh, timeout=10)
-            if r.status_code in (200, 204):
-                deleted += 1
-                log(f"[CMv2-Invalidate] Silindi: {sig.get('home_team')} vs {sig.get('away_team')} [{sc}] — düşüş eşiğin altına düştü")
-        except Exception as e:
-            log(f"[CMv2-Invalidate] Hata: {e}")
-    return deleted
+    deleted = bulk_delete_signals('confirmed_money_v2_signals', invalid_signals, 'CMv2-Invalidate')
+    for sig in deleted:
+        log(f"[CMv2-Invalidate] Silindi: {sig.get('home_team')} vs {sig.get('away_team')} [{sig.get('selection_code', '')}] — düşüş eşiğin altına düştü")
+    return len(deleted)
 
 
 def backfill_odds_16h_to_first_snap(table, existing, snapshot_lookup, first_snaps,
@@ -1256,50 +1757,40 @@ def backfill_odds_16h_to_first_snap(table, existing, snapshot_lookup, first_snap
     return fixed, checked
 
 
+def _cm_fs_current_builder(snapshot_lookup, code_map):
+    """CM / FS için ortak current_* üretici (match_date saatsizse saatli haliyle düzeltilir)."""
+    def build(sig):
+        row = snapshot_lookup.get(sig.get('match_key', ''))
+        if not row:
+            return None
+        fields = code_map.get(sig.get('selection_code', ''))
+        if not fields:
+            return {}
+        data = {
+            'current_odds': str(row.get(fields[0]) or ''),
+            'current_pct': str(row.get(fields[1]) or ''),
+            'current_volume': str(row.get('volume') or ''),
+        }
+        raw_date = row.get('date', '')
+        existing_date = sig.get('match_date', '') or ''
+        if raw_date and ':' in raw_date and len(existing_date) <= 10:
+            data['match_date'] = _betwatch_to_iso_datetime(raw_date)
+        return data
+    return build
+
+
 def update_cm_current_values(existing_cm, snapshot_lookup):
     """
     DB'deki tüm CM sinyallerinin current_* değerlerini güncelle.
-    Kriterler karşılanmasa bile güncellenir.
+    Kriterler karşılanmasa bile güncellenir; sadece değişen satırlar yazılır.
     """
-    now = datetime.now(timezone.utc).isoformat()
-    updated = 0
-    not_found = 0
-    wh = _headers_write()
     code_map = {
         '1': ('odds1', 'pct1'),
         'X': ('oddsx', 'pctx'),
         '2': ('odds2', 'pct2'),
     }
-    for sig in existing_cm:
-        mk = sig.get('match_key', '')
-        sc = sig.get('selection_code', '')
-        row = snapshot_lookup.get(mk)
-        if not row:
-            not_found += 1
-            continue
-        fields = code_map.get(sc)
-        if not fields:
-            continue
-        try:
-            mk_enc = url_quote(mk, safe='')
-            sc_enc = url_quote(sc, safe='')
-            patch_url = f"{SUPABASE_URL}/rest/v1/confirmed_money_signals?match_key=eq.{mk_enc}&selection_code=eq.{sc_enc}"
-            data = {
-                'current_odds': str(row.get(fields[0]) or ''),
-                'current_pct': str(row.get(fields[1]) or ''),
-                'current_volume': str(row.get('volume') or ''),
-                'last_updated_at': now,
-            }
-            raw_date = row.get('date', '')
-            existing_date = sig.get('match_date', '')
-            if raw_date and ':' in raw_date and len(existing_date) <= 10:
-                data['match_date'] = _betwatch_to_iso_datetime(raw_date)
-            r = requests.patch(patch_url, headers=wh, json=data, timeout=10)
-            if r.status_code in (200, 204):
-                updated += 1
-        except Exception as e:
-            log(f"[CM-Update] Hata: {e}")
-    return updated, not_found
+    return refresh_current_values('confirmed_money_signals', existing_cm,
+                                  _cm_fs_current_builder(snapshot_lookup, code_map), 'CM')
 
 
 def run_cm_scan(snapshots, snapshot_lookup, active_keys=None, history=None, first_snaps=None):
@@ -1480,30 +1971,8 @@ def check_fs_table_exists():
 
 
 def fetch_fs_cooldown():
-    """Son FS_COOLDOWN_HOURS saatteki fake_sharp_signals kayıtlarını çek."""
-    try:
-        cutoff = (datetime.now(timezone.utc) - timedelta(hours=FS_COOLDOWN_HOURS)).isoformat()
-        url = (
-            f"{SUPABASE_URL}/rest/v1/fake_sharp_signals"
-            f"?select=match_key,selection_code"
-            f"&created_at=gte.{cutoff}"
-            f"&limit=5000"
-        )
-        r = requests.get(url, headers=_headers_read(), timeout=10)
-        if r.status_code == 200:
-            rows = r.json()
-            result = set()
-            for row in rows:
-                mk = row['match_key']
-                sc = row['selection_code']
-                result.add((mk, sc))
-                mk_norm = _normalize_mk(mk)
-                if mk_norm != mk:
-                    result.add((mk_norm, sc))
-            return result
-        return set()
-    except Exception:
-        return set()
+    """Son FS_COOLDOWN_HOURS saatteki fake_sharp_signals kayıtları (bellek içi cooldown index)."""
+    return _COOLDOWN_INDEXES['fake_sharp_signals'].members()
 
 
 def find_fake_sharp(latest_snapshots, history_by_hash, cooldown_set, first_snapshots=None):
@@ -1515,72 +1984,14 @@ def find_fake_sharp(latest_snapshots, history_by_hash, cooldown_set, first_snaps
       4. Anlık odds 1.35-2.20 aralığında
       5. Oran yükselişi: maçın ilk snapshot'ına göre >= %4 yükseliş (pct'den bağımsız)
     CM'in tam tersi: pct yüksekken oran da yükselmişse sahte sharp baskısı."""
-    if first_snapshots is None:
-        first_snapshots = {}
-    signals = []
-
-    for h, latest in latest_snapshots.items():
-        # Kriter 1: Hacim
-        if parse_volume_amt(latest.get('volume', '')) < FS_VOLUME_THRESHOLD:
-            continue
-        match_history = history_by_hash.get(h, [])
-        if not match_history:
-            continue
-        match_history_sorted = sorted(match_history, key=lambda r: r.get('scraped_at', ''), reverse=True)
-
-        for code, label, o_field, p_field in [
-            ('1', 'Ev Sahibi', 'odds1', 'pct1'),
-            ('2', 'Deplasman', 'odds2', 'pct2'),
-        ]:
-            mk = f"{latest.get('home', '')}|{latest.get('away', '')}|{_normalize_date_key(latest.get('date', ''))}"
-
-            if (mk, code) in cooldown_set:
-                continue
-
-            # Kriter 2: Anlık para yüzdesi
-            pct_now = parse_odds_pct(latest.get(p_field))
-            if pct_now <= FS_PCT_THRESHOLD:
-                continue
-
-            # Kriter 3: Stabilite — son N snapshot'ta pct > eşik
-            last_snaps = match_history_sorted[:FS_STABILITY_SNAPSHOTS]
-            if len(last_snaps) < FS_STABILITY_SNAPSHOTS:
-                continue
-            if not all(parse_odds_pct(r.get(p_field)) > FS_PCT_THRESHOLD for r in last_snaps):
-                continue
-
-            # Kriter 4: Anlık oran aralığı
-            odds_0 = parse_odds_pct(latest.get(o_field))
-            if not (FS_MIN_ODDS <= odds_0 <= FS_MAX_ODDS):
-                continue
-
-            # Kriter 5: Oran yükselişi — maçın ilk snapshot'ına göre (pct'den bağımsız)
-            ref_snap = first_snapshots.get(h)
-            if not ref_snap:
-                continue
-            odds_ref = parse_odds_pct(ref_snap.get(o_field))
-            if odds_0 <= 0 or odds_ref <= 0:
-                continue
-            rise_pct = (odds_0 - odds_ref) / odds_ref
-            if rise_pct < FS_ODDS_RISE_PCT:
-                continue
-
-            signals.append({
-                'match_key': mk,
-                'home_team': latest.get('home', ''),
-                'away_team': latest.get('away', ''),
-                'league': latest.get('league', ''),
-                'date': latest.get('date', ''),
-                'selection_code': code,
-                'selection_label': label,
-                'odds_16h': str(round(odds_ref, 4)),
-                'odds_now': str(round(odds_0, 4)),
-                'pct_now': str(round(pct_now, 2)),
-                'volume_now': str(int(parse_volume_amt(latest.get('volume', '')))),
-                'odds_rise_pct': round(rise_pct * 100, 2),
-            })
-
-    return signals
+    return _scan_odds_move(
+        latest_snapshots, history_by_hash, cooldown_set, first_snapshots,
+        [('1', 'Ev Sahibi', 'odds1', 'pct1'),
+         ('2', 'Deplasman', 'odds2', 'pct2')],
+        vol_min=FS_VOLUME_THRESHOLD, pct_min=FS_PCT_THRESHOLD, pct_strict=True,
+        stability=FS_STABILITY_SNAPSHOTS, odds_min=FS_MIN_ODDS, odds_max=FS_MAX_ODDS,
+        move_min=FS_ODDS_RISE_PCT, rising=True,
+    )
 
 
 def save_fake_sharp_signals(signals):
@@ -1609,9 +2020,7 @@ def save_fake_sharp_signals(signals):
             'created_at': now,
             'last_updated_at': now,
         })
-    url = f"{SUPABASE_URL}/rest/v1/fake_sharp_signals"
-    headers = _headers_write('return=minimal')
-    r = requests.post(url, headers=headers, json=records, timeout=15)
+    r = bulk_insert_signals('fake_sharp_signals', records)
     if r.status_code in (200, 201):
         log(f"[FakeSharp] INSERT OK ({len(records)} yeni sinyal)")
         return len(records)
@@ -1620,20 +2029,8 @@ def save_fake_sharp_signals(signals):
 
 
 def fetch_existing_fs_signals():
-    """DB'deki mevcut fake_sharp_signals listesini çek."""
-    try:
-        url = (
-            f"{SUPABASE_URL}/rest/v1/fake_sharp_signals"
-            "?select=match_key,selection_code,home_team,away_team,match_date,odds_16h"
-            "&limit=5000"
-        )
-        r = requests.get(url, headers=_headers_read(), timeout=12)
-        if r.status_code == 200:
-            return r.json()
-        return []
-    except Exception as e:
-        log(f"[FS-FetchExisting] Hata: {e}")
-        return []
+    """DB'deki mevcut fake_sharp_signals listesi (bellek içi index, artımlı tazelenir)."""
+    return signal_index('fake_sharp_signals').load()
 
 
 def delete_invalid_fs_signals(invalid_signals):
@@ -1641,64 +2038,20 @@ def delete_invalid_fs_signals(invalid_signals):
     Geçersizlik koşulu: mevcut oran yükselişi artık FS_ODDS_RISE_PCT eşiğinin altında."""
     if not invalid_signals:
         return 0
-    deleted = 0
-    wh = _headers_write()
-    for sig in invalid_signals:
-        try:
-            mk = sig.get('match_key', '')
-            sc = sig.get('selection_code', '')
-            mk_enc = url_quote(mk, safe='')
-            sc_enc = url_quote(sc, safe='')
-            del_url = f"{SUPABASE_URL}/rest/v1/fake_sharp_signals?match_key=eq.{mk_enc}&selection_code=eq.{sc_enc}"
-            r = requests.delete(del_url, headers=wh, timeout=10)
-            if r.status_code in (200, 204):
-                deleted += 1
-                log(f"[FS-Invalidate] Silindi: {sig.get('home_team')} vs {sig.get('away_team')} [{sc}] — yükseliş eşiğin altına düştü")
-        except Exception as e:
-            log(f"[FS-Invalidate] Hata: {e}")
-    return deleted
+    deleted = bulk_delete_signals('fake_sharp_signals', invalid_signals, 'FS-Invalidate')
+    for sig in deleted:
+        log(f"[FS-Invalidate] Silindi: {sig.get('home_team')} vs {sig.get('away_team')} [{sig.get('selection_code', '')}] — yükseliş eşiğin altına düştü")
+    return len(deleted)
 
 
 def update_fs_current_odds(existing_fs, snapshot_lookup):
-    """DB'deki tüm FS sinyallerinin current_* değerlerini güncelle."""
-    now = datetime.now(timezone.utc).isoformat()
-    updated = 0
-    not_found = 0
-    wh = _headers_write()
+    """DB'deki tüm FS sinyallerinin current_* değerlerini güncelle (sadece değişenler yazılır)."""
     code_map = {
         '1': ('odds1', 'pct1'),
         '2': ('odds2', 'pct2'),
     }
-    for sig in existing_fs:
-        mk = sig.get('match_key', '')
-        sc = sig.get('selection_code', '')
-        row = snapshot_lookup.get(mk)
-        if not row:
-            not_found += 1
-            continue
-        fields = code_map.get(sc)
-        if not fields:
-            continue
-        try:
-            mk_enc = url_quote(mk, safe='')
-            sc_enc = url_quote(sc, safe='')
-            patch_url = f"{SUPABASE_URL}/rest/v1/fake_sharp_signals?match_key=eq.{mk_enc}&selection_code=eq.{sc_enc}"
-            data = {
-                'current_odds': str(row.get(fields[0]) or ''),
-                'current_pct': str(row.get(fields[1]) or ''),
-                'current_volume': str(row.get('volume') or ''),
-                'last_updated_at': now,
-            }
-            raw_date = row.get('date', '')
-            existing_date = sig.get('match_date', '')
-            if raw_date and ':' in raw_date and len(existing_date) <= 10:
-                data['match_date'] = _betwatch_to_iso_datetime(raw_date)
-            r = requests.patch(patch_url, headers=wh, json=data, timeout=10)
-            if r.status_code in (200, 204):
-                updated += 1
-        except Exception as e:
-            log(f"[FS-Update] Hata: {e}")
-    return updated, not_found
+    return refresh_current_values('fake_sharp_signals', existing_fs,
+                                  _cm_fs_current_builder(snapshot_lookup, code_map), 'FS')
 
 
 def run_fs_scan(snapshots, snapshot_lookup, active_keys=None, history=None, first_snaps=None):
@@ -1802,27 +2155,15 @@ def check_eml_columns_exist():
 
 def fetch_eml_existing():
     """Tüm mevcut EML sinyallerinin (match_key, selection_code) çiftlerini döndür (tekrar tetikleme engeli)."""
-    try:
-        url = (
-            f"{SUPABASE_URL}/rest/v1/early_money_lock_signals"
-            f"?select=match_key,selection_code"
-            f"&limit=10000"
-        )
-        r = requests.get(url, headers=_headers_read(), timeout=10)
-        if r.status_code == 200:
-            rows = r.json()
-            result = set()
-            for row in rows:
-                mk = row['match_key']
-                sc = row['selection_code']
-                result.add((mk, sc))
-                mk_norm = _normalize_mk(mk)
-                if mk_norm != mk:
-                    result.add((mk_norm, sc))
-            return result
-        return set()
-    except Exception:
-        return set()
+    result = set()
+    for row in signal_index('early_money_lock_signals').load():
+        mk = row.get('match_key', '')
+        sc = row.get('selection_code', '')
+        result.add((mk, sc))
+        mk_norm = _normalize_mk(mk)
+        if mk_norm != mk:
+            result.add((mk_norm, sc))
+    return result
 
 
 def fetch_eml_history(match_hashes):
@@ -1905,39 +2246,19 @@ def _make_match_id_hash(home: str, away: str, league: str) -> str:
     return hashlib.md5(canonical.encode('utf-8')).hexdigest()[:12]
 
 
-_EML_MONTH_MAP = {
-    'jan': 1, 'feb': 2, 'mar': 3, 'apr': 4, 'may': 5, 'jun': 6,
-    'jul': 7, 'aug': 8, 'sep': 9, 'oct': 10, 'nov': 11, 'dec': 12,
-}
-
-
 def _parse_betwatch_date_to_utc(raw_date, now_utc):
     """Betwatch date formatı '02.May 12:00:00' → UTC datetime.
-    Yıl belirsiz olduğu için en yakın gelecek/yakın geçmiş seçilir."""
+    Yıl belirsiz olduğu için en yakın gelecek/yakın geçmiş seçilir.
+    Parse core.timezone kickoff önbelleğinden gelir (string başına bir kez)."""
     if not raw_date:
         return None
-    m = re.match(r'^\s*(\d{1,2})\.([A-Za-z]{3})\s+(\d{1,2}):(\d{2})(?::(\d{2}))?', str(raw_date))
-    if not m:
-        return None
     try:
-        day = int(m.group(1))
-        month = _EML_MONTH_MAP.get(m.group(2).lower())
-        if not month:
-            return None
-        hour = int(m.group(3))
-        minute = int(m.group(4))
-        sec = int(m.group(5)) if m.group(5) else 0
-        year = now_utc.year
-        try:
-            dt = datetime(year, month, day, hour, minute, sec, tzinfo=timezone.utc)
-        except ValueError:
+        dt = kickoff_datetime(raw_date, now_utc.year, timezone.utc)
+        if dt is None:
             return None
         # 7 günden fazla geçmişteyse +1 yıl (yılbaşı geçişi için)
         if (dt - now_utc).total_seconds() < -7 * 86400:
-            try:
-                dt = datetime(year + 1, month, day, hour, minute, sec, tzinfo=timezone.utc)
-            except ValueError:
-                return None
+            dt = kickoff_datetime(raw_date, now_utc.year + 1, timezone.utc)
         return dt
     except Exception:
         return None
@@ -1980,24 +2301,38 @@ def find_early_money_lock(latest_snapshots, existing_signals, kickoff_map, activ
         log(f"[EML] {skipped_inactive} biten maç atlandı (active_keys filtresi)")
 
     all_computed_hashes = set(hash_to_row.keys())
-    history_by_hash = fetch_eml_history(all_computed_hashes)
+    frame = HistoryFrame(fetch_eml_history(all_computed_hashes))
+    snap = SnapshotColumns(hash_to_row, None, frame)
+    selections = [
+        ('1', 'Ev Sahibi', 'pct1'),
+        ('2', 'Deplasman', 'pct2'),
+        ('X', 'Beraberlik', 'pctx'),
+    ]
+    amt_field_map = {'1': 'amt1', 'X': 'amtx', '2': 'amt2'}
+
+    # Kriter 1 (hacim) ve Kriter 3 (son N snapshot'ta pct >= eşik) tüm maçlar için tek seferde
+    vol_ok = snap.column('volume') >= EML_VOLUME_THRESHOLD
+    has_history = snap.gidx >= 0
+    snap_counts = frame.counts[snap.gidx] if len(frame) else np.zeros(len(snap), dtype=np.int64)
+    has_snaps = has_history & (snap_counts >= EML_CONSECUTIVE_SNAPS)
+    stable = {
+        code: frame.tail_min(p_field, EML_CONSECUTIVE_SNAPS, snap.gidx) >= EML_PCT_THRESHOLD
+        for code, _, p_field in selections
+    }
 
     # Debug sayaçları
     cnt_total = len(hash_to_row)
-    cnt_vol = cnt_kickoff = cnt_history = cnt_snap = 0
+    cnt_vol = int(vol_ok.sum())
+    cnt_kickoff = cnt_history = cnt_snap = 0
     cnt_kickoff_fallback = 0
 
-    for computed_hash, latest in hash_to_row.items():
+    for i in np.flatnonzero(vol_ok):
+        computed_hash = snap.keys[i]
+        latest = snap.rows[i]
         home = latest.get('home', '')
         away = latest.get('away', '')
         league = latest.get('league', '')
 
-        # Kriter 1: Hacim >= £5,000
-        vol = parse_volume_amt(latest.get('volume', ''))
-        if vol < EML_VOLUME_THRESHOLD:
-            continue
-        cnt_vol += 1
-
         # Kriter 2: Kickoff >= 24 saat ileride
         # 1. Önce fixtures.kickoff_utc dene (en güvenilir)
         # 2. Olmazsa latest.date alanından parse et (fallback)
@@ -2042,44 +2377,27 @@ def find_early_money_lock(latest_snapshots, existing_signals, kickoff_map, activ
         match_date = fixture_date if fixture_date else raw_date
 
         # Kriter 3: Son 5 ardışık snapshot'ta pct >= %85
-        # computed_hash ile history_by_hash'e bak (key formatı artık eşleşiyor)
-        match_history = history_by_hash.get(computed_hash, [])
-        if not match_history:
+        # computed_hash ile history frame'e bak (key formatı artık eşleşiyor)
+        if not has_history[i]:
             continue
         cnt_history += 1
 
-        match_history_sorted = sorted(match_history, key=lambda r: r.get('scraped_at', ''), reverse=True)
-
-        if len(match_history_sorted) < EML_CONSECUTIVE_SNAPS:
+        if not has_snaps[i]:
             continue
         cnt_snap += 1
 
-        amt_field_map = {'1': 'amt1', 'X': 'amtx', '2': 'amt2'}
-
-        for code, label, p_field in [
-            ('1', 'Ev Sahibi', 'pct1'),
-            ('2', 'Deplasman', 'pct2'),
-            ('X', 'Beraberlik', 'pctx'),
-        ]:
+        for code, label, p_field in selections:
             # match_key için raw_date kullan (_normalize_date_key UTC→TR çevirisi yapar)
             mk = f"{home}|{away}|{_normalize_date_key(raw_date)}"
 
             if (mk, code) in existing_signals:
                 continue
 
-            last_snaps = match_history_sorted[:EML_CONSECUTIVE_SNAPS]
-            if len(last_snaps) < EML_CONSECUTIVE_SNAPS:
-                continue
-
-            all_above = all(
-                parse_odds_pct(snap.get(p_field)) >= EML_PCT_THRESHOLD
-                for snap in last_snaps
-            )
-            if not all_above:
+            if not stable[code][i]:
                 continue
 
-            pct_now = parse_odds_pct(latest.get(p_field))
-            amt_raw = parse_volume_amt(latest.get(amt_field_map.get(code, ''), ''))
+            pct_now = float(snap.column(p_field)[i])
+            amt_raw = float(snap.column(amt_field_map[code])[i])
 
             signals.append({
                 'match_key': mk,
@@ -2102,30 +2420,26 @@ def find_early_money_lock(latest_snapshots, existing_signals, kickoff_map, activ
 
 
 def save_eml_signals(signals):
-    """EML sinyallerini Supabase'e kaydet (UPSERT)."""
+    """EML sinyallerini Supabase'e kaydet (tek toplu UPSERT, duplicate'ler yok sayılır)."""
     if not signals:
         return
     try:
-        url = (
-            f"{SUPABASE_URL}/rest/v1/early_money_lock_signals"
-            f"?on_conflict=match_key,selection_code"
-        )
-        hdrs = {**_headers_write(), 'Prefer': 'resolution=ignore-duplicates,return=minimal'}
-        for sig in signals:
-            payload = {**sig, 'last_updated_at': datetime.now(timezone.utc).isoformat()}
-            r = requests.post(url, json=payload, headers=hdrs, timeout=10)
-            if r.status_code in (200, 201):
-                log(f"[EML] Sinyal kaydedildi: {sig['home_team']} vs {sig['away_team']} ({sig['selection_label']})")
-            elif r.status_code in (400, 422) and ('amt_now' in r.text or 'hours_before_kickoff' in r.text or 'column' in r.text.lower()):
-                # Yeni kolonlar henüz DB'de yok — fallback: kolonlar olmadan kaydet
-                payload_compat = {k: v for k, v in payload.items() if k not in ('amt_now', 'hours_before_kickoff')}
-                r2 = requests.post(url, json=payload_compat, headers=hdrs, timeout=10)
-                if r2.status_code in (200, 201):
-                    log(f"[EML] Sinyal kaydedildi (compat): {sig['home_team']} vs {sig['away_team']} ({sig['selection_label']})")
-                else:
-                    log(f"[EML] Kayıt hatası (compat): {r2.status_code} {r2.text[:120]}")
-            else:
-                log(f"[EML] Kayıt hatası: {r.status_code} {r.text[:120]}")
+        now = datetime.now(timezone.utc).isoformat()
+        payload = [{**sig, 'last_updated_at': now} for sig in signals]
+        prefer = 'resolution=ignore-duplicates,return=minimal'
+        conflict = 'match_key,selection_code'
+        r = bulk_insert_signals('early_money_lock_signals', payload, prefer=prefer, on_conflict=conflict)
+        compat = False
+        if r.status_code in (400, 422) and ('amt_now' in r.text or 'hours_before_kickoff' in r.text or 'column' in r.text.lower()):
+            # Yeni kolonlar henüz DB'de yok — fallback: kolonlar olmadan kaydet
+            compat = True
+            payload = [{k: v for k, v in p.items() if k not in ('amt_now', 'hours_before_kickoff')} for p in payload]
+            r = bulk_insert_signals('early_money_lock_signals', payload, prefer=prefer, on_conflict=conflict)
+        if r.status_code in (200, 201):
+            for sig in signals:
+                log(f"[EML] Sinyal kaydedildi{' (compat)' if compat else ''}: {sig['home_team']} vs {sig['away_team']} ({sig['selection_label']})")
+        else:
+            log(f"[EML] Kayıt hatası{' (compat)' if compat else ''}: {r.status_code} {r.text[:120]}")
     except Exception as e:
         log(f"[EML] save_eml_signals hata: {e}")
 
@@ -2158,8 +2472,8 @@ def run_scan():
         return
     snapshot_lookup = build_snapshot_lookup(snapshots)
     active_keys = fetch_live_active_keys()
-    # Cycle başına 1x fetch — CM/CMv2/FS arasında paylaşılır (3x tarama önlenir).
-    history = fetch_recent_history(active_keys)
+    # Cycle başına 1x fetch + 1x parse — CM/CMv2/FS aynı kolonlu frame'i paylaşır.
+    history = HistoryFrame(fetch_recent_history(active_keys))
     first_snaps = fetch_first_snapshots(active_keys)
     run_underdog_scan(snapshots, snapshot_lookup, active_keys)
     run_cm_scan(snapshots, snapshot_lookup, active_keys, history=history, first_snaps=first_snaps)
@@ -42,12 +42,14 @@ let overlay=document.getElementById('deviceKickedOverlay');if(overlay){overlay.s
 +'<p style="color:#7d848c;font-size:15px;line-height:1.6;margin:0 0 28px;">Hesabınıza başka bir cihazdan giriş yapılmıştır. Aynı anda yalnızca izin verilen sayıda cihazda oturum açılabilir.</p>'
 +'<button onclick="deviceKickedRelogin()" style="display:inline-block;background:linear-gradient(135deg,#2BFF88,#1ae070);color:#141719;font-size:15px;font-weight:700;padding:14px 36px;border-radius:12px;border:none;cursor:pointer;transition:transform 0.2s,box-shadow 0.2s;">Tekrar Giriş Yap</button>'
 +'</div>';document.body.appendChild(overlay);}}
-function deviceKickedRelogin(){fetch('/api/licenses/logout',{method:'POST'}).catch(()=>{});localStorage.removeItem('smartxflow_web_license');localStorage.removeItem('smartxflow_web_license_valid');localStorage.removeItem('license_days_remaining');localStorage.removeItem('license_plan');window.location.reload();}
+function deviceKickedRelogin(){fetch('/api/licenses/logout',{method:'POST'}).catch(()=>{});localStorage.removeItem('smartxflow_web_license');localStorage.removeItem(LICENSE_TOKEN_KEY);localStorage.removeItem('smartxflow_web_license_valid');localStorage.removeItem('license_days_remaining');localStorage.removeItem('license_plan');window.location.reload();}
 let _licenseStatusInterval=null;function startLicenseStatusRefresh(){if(_licenseStatusInterval)return;async function checkLicenseStatus(){try{const savedLicKey=localStorage.getItem('smartxflow_web_license');const statusHeaders={};if(savedLicKey)statusHeaders['X-License-Key']=savedLicKey;const webDid=getWebDeviceId();const statusUrl='/api/license/status?device_id='+encodeURIComponent(webDid);const resp=await _originalFetch(statusUrl,{headers:statusHeaders});if(!resp.ok){try{const data=await resp.json();if(data.error==='DEVICE_KICKED'){showDeviceKickedOverlay();}else if(data.error==='LICENSE_EXPIRED'||data.error==='LICENSE_REVOKED'||data.error==='LICENSE_NOT_FOUND'){showLicenseExpiredOverlay();updateLicenseDaysBadge(0);localStorage.setItem('license_days_remaining','0');}}catch(parseErr){}
 return;}
-const data=await resp.json();if(data.valid&&data.days_left!==undefined){localStorage.setItem('license_days_remaining',data.days_left);updateLicenseDaysBadge(data.days_left);}else if(!data.valid){if(data.error==='DEVICE_KICKED'){showDeviceKickedOverlay();}else{showLicenseExpiredOverlay();updateLicenseDaysBadge(0);localStorage.setItem('license_days_remaining','0');}}}catch(e){}}
+const data=await resp.json();_storeLicenseToken(data);if(data.valid&&data.days_left!==undefined){localStorage.setItem('license_days_remaining',data.days_left);updateLicenseDaysBadge(data.days_left);}else if(!data.valid){if(data.error==='DEVICE_KICKED'){showDeviceKickedOverlay();}else{showLicenseExpiredOverlay();updateLicenseDaysBadge(0);localStorage.setItem('license_days_remaining','0');}}}catch(e){}}
 checkLicenseStatus();_licenseStatusInterval=setInterval(checkLicenseStatus,5*60*1000);}
-const _originalFetch=window.fetch;window.fetch=function(url,options={}){const urlStr=typeof url==='string'?url:url.url||'';if(urlStr.startsWith('/api/')){const savedKey=localStorage.getItem('smartxflow_web_license');if(savedKey){options=options||{};options.headers=options.headers||{};if(options.headers instanceof Headers){options.headers.set('X-License-Key',savedKey);}else{options.headers['X-License-Key']=savedKey;}}}
+const LICENSE_TOKEN_KEY='smartxflow_license_token';function _storeLicenseToken(data){if(data&&data.valid&&data.token){localStorage.setItem(LICENSE_TOKEN_KEY,data.token);localStorage.setItem(LICENSE_TOKEN_KEY+'_exp',String(Date.now()+(data.token_expires_in||0)*1000));}}
+function _getLicenseToken(){const exp=parseInt(localStorage.getItem(LICENSE_TOKEN_KEY+'_exp')||'0',10);if(!exp||exp-30000<Date.now())return null;return localStorage.getItem(LICENSE_TOKEN_KEY);}
+const _originalFetch=window.fetch;window.fetch=function(url,options={}){const urlStr=typeof url==='string'?url:url.url||'';if(urlStr.startsWith('/api/')){const savedKey=localStorage.getItem('smartxflow_web_license');if(savedKey){options=options||{};options.headers=options.headers||{};const licToken=_getLicenseToken();if(options.headers instanceof Headers){options.headers.set('X-License-Key',savedKey);if(licToken)options.headers.set('X-License-Token',licToken);}else{options.headers['X-License-Key']=savedKey;if(licToken)options.headers['X-License-Token']=licToken;}}}
 return _originalFetch.call(window,url,options).then(function(response){if(response.status===403&&urlStr.startsWith('/api/')){response.clone().json().then(function(data){if(data&&(data.error==='LICENSE_EXPIRED'||data.error==='LICENSE_REVOKED'||data.error==='LICENSE_REQUIRED')){showLicenseExpiredOverlay();}}).catch(function(){});}
 return response;});};let mobileSelectedLine='1';let mobileTimeRange='1440';let isAlarmsPageActive=false;let matchesDisplayCount=20;let _allFilteredMatches=[];let _renderedCount=0;const _RENDER_BATCH=20;let _scrollListenerAttached=false;let currentOffset=0;let totalMatchCount=0;let hasMoreMatches=false;let _loadMatchesLock=false;let _loadMatchesPending=null;let _lastMatchRefreshTime=null;let _matchRefreshInterval=null;const MATCH_REFRESH_INTERVAL=10*60*1000;const APP_TIMEZONE='Europe/Istanbul';function translateSelection(sel,market){if(!sel)return'-';const s=String(sel).trim();const m=String(market||'').toUpperCase();if(m.includes('OU')||m.includes('O/U')||m.includes('2.5')){if(s==='O'||s==='Over'||s.toLowerCase()==='over')return _t('app.dyn.ust','Üst');if(s==='U'||s==='Under'||s.toLowerCase()==='under')return _t('app.dyn.alt','Alt');}
 if(m.includes('BTTS')||m.includes('KG')){if(s==='Y'||s==='Yes'||s.toLowerCase()==='yes')return _t('app.dyn.evet','Evet');if(s==='N'||s==='No'||s.toLowerCase()==='no')return _t('app.dyn.hayir','Hayır');}
@@ -114,7 +116,7 @@ const kickoffRaw=alarm.kickoff_utc||alarm.kickoff||alarm.fixture_date;const trig
 const kickoffTime=toTurkeyTime(kickoffRaw);const triggerTime=toTurkeyTime(triggerAtRaw);if(!kickoffTime||!triggerTime||!kickoffTime.isValid()||!triggerTime.isValid()){return 0;}
 const diffHours=kickoffTime.diff(triggerTime,'hour',true);return diffHours>0?diffHours:0;}
 function escapeHtml(str){if(!str)return'';return String(str).replace(/[&<>"']/g,c=>({'&':'&amp;','<':'&lt;','>':'&gt;','"':'&quot;',"'":'&#39;'})[c]);}
-document.addEventListener('DOMContentLoaded',async()=>{const allBtn=document.getElementById('allBtn');if(allBtn)allBtn.classList.add('active');setupTabs();setupSearch();setupModalChartTabs();await _licenseReady;if(!_isLicensed)return;fetchAnalysisMatchHashes();loadFinishedScores();await Promise.all([loadUserFavorites(),loadFavoriteCounts()]);loadMatches();_startBackgroundLiveFetch();checkStatus();window.statusInterval=window.setInterval(checkStatus,60000);if(window.loadChartLibs)window.loadChartLibs().then(()=>registerChartPlugins()).catch(()=>{});setupAutoRefresh();_startBackgroundLiveFetch();document.addEventListener('visibilitychange',handleVisibilityChange);});function updateLastRefreshDisplay(){const now=dayjs().tz(APP_TIMEZONE);_lastMatchRefreshTime=now;let refreshEl=document.getElementById('lastRefreshTime');if(!refreshEl){const statusArea=document.querySelector('.status-area');if(statusArea){refreshEl=document.createElement('span');refreshEl.id='lastRefreshTime';refreshEl.className='last-refresh-time';refreshEl.style.cssText='margin-left: 15px; color: #888; font-size: 12px;';statusArea.appendChild(refreshEl);}}
+document.addEventListener('DOMContentLoaded',async()=>{const allBtn=document.getElementById('allBtn');if(allBtn)allBtn.classList.add('active');setupTabs();setupSearch();setupModalChartTabs();await _licenseReady;if(!_isLicensed)return;fetchAnalysisMatchHashes();loadFinishedScores();await Promise.all([loadUserFavorites(),loadFavoriteCounts()]);loadMatches();_startBackgroundLiveFetch();checkStatus();window.statusInterval=window.setInterval(checkStatus,60000);if(window.loadChartLibs)window.loadChartLibs().then(()=>registerChartPlugins()).catch(()=>{});setupAutoRefresh();_startBackgroundLiveFetch();_startUpdatesStream();document.addEventListener('visibilitychange',handleVisibilityChange);});function updateLastRefreshDisplay(){const now=dayjs().tz(APP_TIMEZONE);_lastMatchRefreshTime=now;let refreshEl=document.getElementById('lastRefreshTime');if(!refreshEl){const statusArea=document.querySelector('.status-area');if(statusArea){refreshEl=document.createElement('span');refreshEl.id='lastRefreshTime';refreshEl.className='last-refresh-time';refreshEl.style.cssText='margin-left: 15px; color: #888; font-size: 12px;';statusArea.appendChild(refreshEl);}}
 if(refreshEl){refreshEl.textContent=`Son güncelleme: ${now.format('HH:mm')} (TR)`;}}
 function getRefreshJitter(){return Math.floor(Math.random()*60000);}
 function setupAutoRefresh(){updateLastRefreshDisplay();const jitter=getRefreshJitter();const intervalWithJitter=MATCH_REFRESH_INTERVAL+jitter;_matchRefreshInterval=setInterval(async()=>{console.log('[AutoRefresh] 10 dakika doldu, maçlar yenileniyor...');await refreshMatchData();},intervalWithJitter);console.log(`[AutoRefresh] Kuruldu - ${Math.round(intervalWithJitter/1000)}s'de bir yenilenecek (jitter: ${Math.round(jitter/1000)}s)`);}
@@ -1609,8 +1611,9 @@ async function loadAdminVolumeLeaderData(){const body=document.getElementById('a
                 `;});html+='</tbody></table>';}
 html+='</div>';body.innerHTML=html;}catch(e){console.error('Volume Leader admin veri hatası:',e);body.innerHTML='<div class="admin-no-data">Veri yüklenirken hata oluştu.</div>';}}
 async function saveVolumeLeaderConfig(){const config={leader_threshold:parseInt(document.getElementById('vlLeaderThreshold').value)||50,min_volume_1x2:parseInt(document.getElementById('vlMinVolume1x2').value)||5000,min_volume_ou25:parseInt(document.getElementById('vlMinVolumeOu25').value)||2000,min_volume_btts:parseInt(document.getElementById('vlMinVolumeBtts').value)||1000};try{const res=await fetch('/api/volumeleader/config',{method:'POST',headers:{'Content-Type':'application/json'},body:JSON.stringify(config)});if(res.ok){showToast('Ayarlar kaydedildi','success');}else{showToast('Kaydetme hatası','error');}}catch(e){showToast('Bağlantı hatası','error');}}
+async function waitForCalcJob(data,onProgress){if(!data||!data.success||!data.job_id)return data||{success:false};while(true){await new Promise(r=>setTimeout(r,1000));const res=await fetch(`/api/calc-jobs/${data.job_id}?t=${Date.now()}`);if(!res.ok)return{success:false,error:`Job durumu alınamadı (${res.status})`};const job=await res.json();if(onProgress&&job.progress)onProgress(job.progress);if(job.status==='done')return{success:true,...(job.result||{})};if(job.status==='failed')return{success:false,error:job.error||'Hesaplama hatası'};if(job.status==='cancelled')return{success:false,error:'Hesaplama iptal edildi'};}}
 async function calculateVolumeLeaderAlarms(){const btn=document.getElementById('vlCalcBtn');const statusDiv=document.getElementById('vlCalcStatus');if(btn)btn.disabled=true;if(statusDiv){statusDiv.style.display='block';statusDiv.textContent='Hesaplama başlatılıyor...';}
-try{const res=await fetch('/api/volumeleader/calculate',{method:'POST'});const data=await res.json();if(data.success){showToast(`${data.count} yeni alarm bulundu!`,'success');loadAdminVolumeLeaderData();}else{showToast(data.error||'Hesaplama hatası','error');}}catch(e){showToast('Bağlantı hatası','error');}finally{if(btn)btn.disabled=false;}}
+try{const res=await fetch('/api/volumeleader/calculate',{method:'POST'});const data=await waitForCalcJob(await res.json(),(p)=>{if(statusDiv)statusDiv.textContent=p;});if(data.success){showToast(`${data.count} yeni alarm bulundu!`,'success');loadAdminVolumeLeaderData();}else{showToast(data.error||'Hesaplama hatası','error');}}catch(e){showToast('Bağlantı hatası','error');}finally{if(btn)btn.disabled=false;}}
 async function deleteVolumeLeaderAlarms(){if(!confirm('Tüm Hacim Lideri alarmlarını silmek istediğinize emin misiniz?'))return;try{const res=await fetch('/api/volumeleader/alarms',{method:'DELETE'});if(res.ok){showToast('Alarmlar silindi','success');loadAdminVolumeLeaderData();}else{showToast('Silme hatası','error');}}catch(e){showToast('Bağlantı hatası','error');}}
 async function loadAdminDroppingData(){const body=document.getElementById('adminPanelBody');if(!body)return;body.innerHTML='<div style="text-align:center; padding:40px; color:#94a3b8;">Yükleniyor...</div>';try{const configRes=await fetch('/api/dropping/config');const config=configRes.ok?await configRes.json():{};await fetchAlarmsBatch();const alarms=getCachedAlarmsByType('dropping');let html=`
             <div class="admin-section">
@@ -1771,9 +1774,9 @@ function hideLicenseGate(){const gate=document.getElementById('licenseGate');if(
 function updateLicenseDaysBadge(days){const badge=document.getElementById('licenseDaysBadge');const text=document.getElementById('licenseDaysText');if(!badge||!text)return;badge.classList.remove('warning','danger');if(days>=36500){text.textContent='Lifetime';}else if(days<=0){text.textContent=window.SXFI18n?window.SXFI18n.t('app.dyn.suresi_doldu'):'Süresi doldu';badge.classList.add('danger');}else{text.textContent=(window.SXFI18n?window.SXFI18n.t('app.dyn.kalan_pre'):'Kalan ')+days+(window.SXFI18n?window.SXFI18n.t('app.dyn.kalan_suf'):' gün');if(days<=3){badge.classList.add('danger');}else if(days<=7){badge.classList.add('warning');}}
 badge.style.display='flex';}
 window.addEventListener('i18n:change',function(){var savedDays=localStorage.getItem('license_days_remaining');if(savedDays!==null)updateLicenseDaysBadge(parseInt(savedDays,10));if(typeof _updateFavCountsInDOM==='function')_updateFavCountsInDOM();var si=document.getElementById('searchInput');if(si&&window.SXFI18n)si.placeholder=window.SXFI18n.t('idx.takim_veya_lig_ara')||si.placeholder;});async function validateWebLicense(){const input=document.getElementById('licenseKeyInput');const errorDiv=document.getElementById('licenseError');const successDiv=document.getElementById('licenseSuccess');const progressBar=document.getElementById('licenseProgressBar');const progressFill=document.getElementById('licenseProgressFill');const submitBtn=document.getElementById('licenseSubmitBtn');const btnText=submitBtn.querySelector('.license-btn-text');const btnLoading=document.getElementById('licenseBtnLoading');const key=input.value.trim().toUpperCase();if(!key){errorDiv.textContent='Lisans anahtari girin';errorDiv.style.display='block';return;}
-errorDiv.style.display='none';successDiv.style.display='none';progressBar.style.display='block';progressFill.style.width='30%';btnText.style.opacity='0';btnLoading.style.display='block';submitBtn.disabled=true;try{progressFill.style.width='60%';const res=await fetch('/api/licenses/validate',{method:'POST',headers:{'Content-Type':'application/json'},body:JSON.stringify({key:key,device_id:getWebDeviceId(),device_name:navigator.userAgent.substring(0,50)})});const data=await res.json();progressFill.style.width='90%';if(data.valid){progressFill.style.width='100%';localStorage.setItem(WEB_LICENSE_KEY,key);const validUntil=data.expires_at||new Date(Date.now()+24*60*60*1000).toISOString();localStorage.setItem(WEB_LICENSE_VALID_KEY,validUntil);window.userPlan=data.plan||'core';window.userLicenseKey=key;localStorage.setItem('license_plan',window.userPlan);if(typeof _isPro!=='undefined')_isPro=(window.userPlan==='pro');let daysRemaining=data.days_left||data.days_remaining;if(!daysRemaining&&data.expires_at){const expiresDate=new Date(data.expires_at);const now=new Date();daysRemaining=Math.ceil((expiresDate-now)/(1000*60*60*24));}
+errorDiv.style.display='none';successDiv.style.display='none';progressBar.style.display='block';progressFill.style.width='30%';btnText.style.opacity='0';btnLoading.style.display='block';submitBtn.disabled=true;try{progressFill.style.width='60%';const res=await fetch('/api/licenses/validate',{method:'POST',headers:{'Content-Type':'application/json'},body:JSON.stringify({key:key,device_id:getWebDeviceId(),device_name:navigator.userAgent.substring(0,50)})});const data=await res.json();progressFill.style.width='90%';_storeLicenseToken(data);if(data.valid){progressFill.style.width='100%';localStorage.setItem(WEB_LICENSE_KEY,key);const validUntil=data.expires_at||new Date(Date.now()+24*60*60*1000).toISOString();localStorage.setItem(WEB_LICENSE_VALID_KEY,validUntil);window.userPlan=data.plan||'core';window.userLicenseKey=key;localStorage.setItem('license_plan',window.userPlan);if(typeof _isPro!=='undefined')_isPro=(window.userPlan==='pro');let daysRemaining=data.days_left||data.days_remaining;if(!daysRemaining&&data.expires_at){const expiresDate=new Date(data.expires_at);const now=new Date();daysRemaining=Math.ceil((expiresDate-now)/(1000*60*60*24));}
 if(!daysRemaining||daysRemaining>9000)daysRemaining=36500;localStorage.setItem('license_days_remaining',daysRemaining);updateLicenseDaysBadge(daysRemaining);successDiv.innerHTML='<div style="font-size:24px;margin-bottom:8px;">✓</div>'+(window.SXFI18n?window.SXFI18n.t('app.dyn.lisans_aktif_kalan_gun'):'Lisans aktif! Kalan gün: ')+daysRemaining;successDiv.style.display='block';progressBar.style.display='none';setTimeout(()=>{hideLicenseGate();const _np=new URLSearchParams(window.location.search);const _next=_np.get('next');if(_next&&_next.startsWith('/')){window.location.href=_next;}else{window.location.reload();}},1500);}else{errorDiv.textContent=data.error||'Gecersiz lisans anahtari';errorDiv.style.display='block';progressBar.style.display='none';btnText.style.opacity='1';btnLoading.style.display='none';submitBtn.disabled=false;}}catch(e){errorDiv.textContent='Baglanti hatasi';errorDiv.style.display='block';progressBar.style.display='none';btnText.style.opacity='1';btnLoading.style.display='none';submitBtn.disabled=false;}}
-async function activateTestMode(){try{var res=await fetch('/api/test/activate',{method:'POST'});var data=await res.json();if(data.success){localStorage.setItem('license_plan','test');localStorage.removeItem(WEB_LICENSE_KEY);localStorage.removeItem(WEB_LICENSE_VALID_KEY);window.userPlan='test';if(typeof _isPro!=='undefined')_isPro=false;hideLicenseGate();window.location.reload();}}catch(e){console.error('Test mode activate error:',e);}}
+async function activateTestMode(){try{var res=await fetch('/api/test/activate',{method:'POST'});var data=await res.json();if(data.success){localStorage.setItem('license_plan','test');localStorage.removeItem(WEB_LICENSE_KEY);localStorage.removeItem(LICENSE_TOKEN_KEY);localStorage.removeItem(WEB_LICENSE_VALID_KEY);window.userPlan='test';if(typeof _isPro!=='undefined')_isPro=false;hideLicenseGate();window.location.reload();}}catch(e){console.error('Test mode activate error:',e);}}
 async function _loadTestFreeHashes(){if(window.userPlan!=='test')return;try{var res=await fetch('/api/test/free-matches');var data=await res.json();window._testFreeHashes=data.hashes||[];window._testFreeTeams=data.teams||[];}catch(e){window._testFreeHashes=[];window._testFreeTeams=[];}}
 function _isTestFreeAlarm(home,away){if(window.userPlan!=='test')return true;var h=(home||'').toLowerCase().trim();var a=(away||'').toLowerCase().trim();for(var ti=0;ti<window._testFreeTeams.length;ti++){var t=window._testFreeTeams[ti];var th=(t.home||'').toLowerCase().trim();var ta=(t.away||'').toLowerCase().trim();if(th&&ta&&th===h&&ta===a)return true;}
 return false;}
@@ -1788,16 +1791,21 @@ function _addMobileMktLockIcons(){if(window.userPlan!=='test')return;var lockSvg
 async function initLicenseCheck(){if(!checkWebLicense()){showLicenseGate();const logoutBtn=document.getElementById('logoutBtn');if(logoutBtn)logoutBtn.style.display='none';_isLicensed=false;_licenseReadyResolve();}else{const logoutBtn=document.getElementById('logoutBtn');if(logoutBtn)logoutBtn.style.display='flex';if(window.userPlan==='test'){_isLicensed=true;await _loadTestFreeHashes();_licenseReadyResolve();updateLicenseDaysBadge(-1);var daysBadge=document.getElementById('licenseDaysBadge');if(daysBadge){var daysText=document.getElementById('licenseDaysText');if(daysText)daysText.textContent='Test Modu';daysBadge.classList.add('warning');}
 setTimeout(function(){_addTestLockIcons();_addMobileMktLockIcons();},100);return;}
 const savedDays=localStorage.getItem('license_days_remaining');if(savedDays){updateLicenseDaysBadge(parseInt(savedDays));}
-_isLicensed=true;_licenseReadyResolve();startLicenseStatusRefresh();const savedKey=localStorage.getItem(WEB_LICENSE_KEY);if(savedKey){fetch('/api/licenses/validate',{method:'POST',headers:{'Content-Type':'application/json'},body:JSON.stringify({key:savedKey,device_id:getWebDeviceId(),device_name:navigator.userAgent.substring(0,50)})}).then(r=>r.json()).then(data=>{if(data.valid&&data.days_left!==undefined){localStorage.setItem('license_days_remaining',data.days_left);updateLicenseDaysBadge(data.days_left);}
+_isLicensed=true;_licenseReadyResolve();startLicenseStatusRefresh();const savedKey=localStorage.getItem(WEB_LICENSE_KEY);if(savedKey){fetch('/api/licenses/validate',{method:'POST',headers:{'Content-Type':'application/json'},body:JSON.stringify({key:savedKey,device_id:getWebDeviceId(),device_name:navigator.userAgent.substring(0,50)})}).then(r=>r.json()).then(data=>{_storeLicenseToken(data);if(data.valid&&data.days_left!==undefined){localStorage.setItem('license_days_remaining',data.days_left);updateLicenseDaysBadge(data.days_left);}
 if(data.plan){window.userPlan=data.plan;localStorage.setItem('license_plan',data.plan);if(typeof _isPro!=='undefined')_isPro=(window.userPlan==='pro');}}).catch(()=>{});}}}
-function logoutWebLicense(){if(confirm('Cikis yapmak istediginize emin misiniz?')){fetch('/api/licenses/logout',{method:'POST'}).catch(()=>{});localStorage.removeItem(WEB_LICENSE_KEY);localStorage.removeItem(WEB_LICENSE_VALID_KEY);localStorage.removeItem('license_days_remaining');localStorage.removeItem('license_plan');window.location.reload();}}
+function logoutWebLicense(){if(confirm('Cikis yapmak istediginize emin misiniz?')){fetch('/api/licenses/logout',{method:'POST'}).catch(()=>{});localStorage.removeItem(WEB_LICENSE_KEY);localStorage.removeItem(LICENSE_TOKEN_KEY);localStorage.removeItem(WEB_LICENSE_VALID_KEY);localStorage.removeItem('license_days_remaining');localStorage.removeItem('license_plan');window.location.reload();}}
 function copyLicenseEmail(){const email='smartxflow29@gmail.com';const emailText=document.getElementById('licenseEmailText');navigator.clipboard.writeText(email).then(()=>{if(emailText){const original=emailText.textContent;emailText.textContent='Kopyalandi!';setTimeout(()=>{emailText.textContent=original;},1500);}}).catch(()=>{window.location.href='mailto:'+email;});}
-document.addEventListener('DOMContentLoaded',function(){initLicenseCheck();});document.getElementById('licenseKeyInput')?.addEventListener('keypress',function(e){if(e.key==='Enter')validateWebLicense();});var _bgLiveInterval=null;async function _fetchBackgroundLiveData(){if(_liveMode)return;try{var resp=await fetch('/api/live/matches');var data=await resp.json();_liveData=data.matches||[];_updateLiveCapsulesInDOM();}catch(e){}}
+document.addEventListener('DOMContentLoaded',function(){initLicenseCheck();});document.getElementById('licenseKeyInput')?.addEventListener('keypress',function(e){if(e.key==='Enter')validateWebLicense();});var _bgLiveInterval=null;async function _fetchBackgroundLiveData(){if(_liveMode||_updatesStreamOpen)return;try{var resp=await fetch('/api/live/matches');var data=await resp.json();_liveData=data.matches||[];_updateLiveCapsulesInDOM();}catch(e){}}
 function _updateLiveCapsulesInDOM(){if(_liveMode)return;document.querySelectorAll('#matchesTableBody tr').forEach(function(row){var teamsCell=row.querySelector('.match-teams');var dateCell=row.querySelector('.match-date');if(!teamsCell||!dateCell)return;var capsuleEl=teamsCell.querySelector('.live-capsule');var deskCapsuleEl=dateCell.querySelector('.live-capsule-desk');var matchId=row.getAttribute('data-match-id')||'';var teamsText=teamsCell.textContent||'';var parts=teamsText.split(/\s*[-–]\s*/);if(parts.length<2)return;var home=parts[0].trim();var away=parts[parts.length-1].trim();var lm=_findLiveMatchByHash(matchId)||_findLiveMatch(home,away);if(!lm)return;if(_isFinishedLiveMatch(lm))return;if(capsuleEl){var rawMin=(lm.minute||'').trim();var sc=lm.score||'';if(rawMin||sc){var minDisp=rawMin||'';var scoreDisp='';if(sc){var sp=sc.split('-');if(sp.length===2){scoreDisp='<span class="lc-divider"></span><span class="lc-score-val"><span class="lc-score-h">'+sp[0].trim()+'</span><span class="lc-score-sep">-</span><span class="lc-score-a">'+sp[1].trim()+'</span></span>';}}
 capsuleEl.innerHTML='<span class="lc-dot"></span><span class="lc-min">'+minDisp+'</span>'+scoreDisp;}}
 if(deskCapsuleEl){var rawMin2=(lm.minute||'').trim();var sc2=lm.score||'';if(rawMin2||sc2){var scoreDisp2='';if(sc2){var sp2=sc2.split('-');if(sp2.length===2){scoreDisp2='<span class="lc-divider"></span><span class="lc-score-h">'+sp2[0].trim()+'</span><span class="lc-score-sep">-</span><span class="lc-score-a">'+sp2[1].trim()+'</span>';}}
 deskCapsuleEl.innerHTML='<span class="lc-dot"></span><span class="lc-min">'+rawMin2+'</span>'+scoreDisp2;}}});}
 function _startBackgroundLiveFetch(){_fetchBackgroundLiveData();_bgLiveInterval=setInterval(_fetchBackgroundLiveData,60000);}
+var _updatesStream=null;var _updatesStreamOpen=false;var _updatesLastId=null;var _updatesMatchRefreshTimer=null;function _alarmUpdateKey(a){return a.id||((a.match_id_hash||'')+'|'+(a.selection||'')+'|'+(a.trigger_at||a.created_at||''));}
+function _applyUpdateDiff(list,ev,keyFn){var byKey={};list=list||[];for(var i=0;i<list.length;i++)byKey[keyFn(list[i])]=i;var removed={};(ev.removed||[]).forEach(function(k){removed[k]=true;});var out=list.filter(function(it){return!removed[keyFn(it)];});byKey={};for(var j=0;j<out.length;j++)byKey[keyFn(out[j])]=j;(ev.changed||[]).concat(ev.added||[]).forEach(function(it){var k=keyFn(it);if(byKey[k]!==undefined)out[byKey[k]]=it;else{byKey[k]=out.length;out.push(it);}});return out;}
+function _handleUpdateEvent(ev){var ch=ev.channel||'';if(ch==='live'){_liveData=_applyUpdateDiff(_liveData,ev,function(m){return m.match_id_hash;});if(!_liveMode)_updateLiveCapsulesInDOM();}else if(ch.indexOf('alarms:')===0){if(_alarmBatchCache){var t=ch.substring(7);_alarmBatchCache[t]=_applyUpdateDiff(_alarmBatchCache[t],ev,_alarmUpdateKey);_alarmCacheTime=Date.now();}}else if(ch.indexOf('matches:')===0){if(_updatesMatchRefreshTimer)return;_updatesMatchRefreshTimer=setTimeout(async function(){_updatesMatchRefreshTimer=null;await refreshMatchData();},2000+Math.random()*3000);}}
+function _startUpdatesStream(){if(typeof EventSource==='undefined'||_updatesStream)return;var url='/api/updates/stream'+(_updatesLastId?'?since='+encodeURIComponent(_updatesLastId):'');var es=new EventSource(url);_updatesStream=es;es.addEventListener('hello',function(e){_updatesStreamOpen=true;if(!_updatesLastId)_updatesLastId=e.lastEventId;});es.addEventListener('update',function(e){_updatesLastId=e.lastEventId||_updatesLastId;try{_handleUpdateEvent(JSON.parse(e.data));}catch(err){console.error('[Updates] parse error:',err);}});es.addEventListener('resync',function(){console.log('[Updates] Resync - tam liste yeniden çekiliyor');_alarmCacheTime=0;_fetchBackgroundLiveDataForce();refreshMatchData();});es.addEventListener('dropped',function(){es.close();_updatesStream=null;_updatesStreamOpen=false;setTimeout(_startUpdatesStream,1000);});es.onerror=function(){_updatesStreamOpen=false;};}
+async function _fetchBackgroundLiveDataForce(){try{var resp=await fetch('/api/live/matches');var data=await resp.json();_liveData=data.matches||[];if(!_liveMode)_updateLiveCapsulesInDOM();}catch(e){}}
 var _liveMode=false;var _liveInterval=null;var _liveData=[];var _liveMarket='1x2';var _modalLiveData=null;var _modalLiveMarket='1x2';var _liveDetailData=null;var _liveDetailMarket='1x2';var _prevLiveScores={};var _finishedScores={};function proLockPanelHtml(){return'<div class="smart-money-empty" style="display:block">'+_t('app.live.pro_periyot','Canlı periyot verileri için Pro üyelik gerektirir.')+'</div>';}
 function _liveProBanner(){return'<div class="live-pro-banner">'+'<svg width="13" height="13" viewBox="0 0 24 24" fill="none" stroke="currentColor" stroke-width="2.5" style="flex-shrink:0"><rect x="3" y="11" width="18" height="11" rx="2"/><path d="M7 11V7a5 5 0 0 1 10 0v4"/></svg>'+' '+_t('app.live.pro_gerekli','Canlı veriler için <strong>Pro</strong> üyelik gerekmektedir')+' <a href="/pricing" class="live-pro-banner-btn">'+_t('app.live.proya_gec',"Pro'ya Geç →")+'</a>'+'</div>';}
 async function _renderLiveProLock(){_liveMode=true;document.querySelectorAll('.tab').forEach(function(t){t.classList.remove('active');});document.querySelectorAll('.mobile-tab-btn').forEach(function(t){t.classList.remove('active');});var liveTab=document.querySelector('.tab-live');if(liveTab)liveTab.classList.add('active');var mobileLive=document.querySelector('.mobile-live-btn');if(mobileLive)mobileLive.classList.add('active');var mcLabel=document.getElementById('matchCountLabel');if(mcLabel)mcLabel.textContent=_t('app.live.canli_maclar','Canlı Maçlar')+' ';var mcSuffix=document.getElementById('matchCountSuffix');if(mcSuffix)mcSuffix.textContent='';var mcWrap=document.querySelector('.match-count');if(mcWrap)mcWrap.classList.add('mc-live');var lmt=document.getElementById('liveMarketTabs');if(lmt)lmt.style.display='none';var marketRow=document.querySelector('.mobile-tab-row.market-row');if(marketRow)marketRow.style.display='none';var table=document.querySelector('.matches-table');var tbody=document.getElementById('matchesTableBody');var thead=table?table.querySelector('thead'):null;var colgroup=table?table.querySelector('colgroup'):null;var cardList=document.getElementById('matchCardList');if(table)table.setAttribute('data-selection-count','3');if(colgroup)colgroup.innerHTML='<col class="col-fav"><col class="col-date"><col class="col-league"><col class="col-match">'+'<col class="col-selection"><col class="col-selection"><col class="col-selection"><col class="col-volume">';if(thead)thead.innerHTML='<tr>'+'<th class="col-fav"></th>'+'<th class="col-date">'+_t('app.live.dk','DK')+'</th>'+'<th class="col-league">'+_t('app.tbl.league','LİG')+'</th>'+'<th class="col-match">'+_t('app.tbl.match','MAÇ')+'</th>'+'<th class="col-selection">1</th>'+'<th class="col-selection">X</th>'+'<th class="col-selection">2</th>'+'<th class="col-volume">'+_t('app.tbl.volume','HACİM')+'</th>'+'</tr>';if(tbody)tbody.innerHTML='<tr><td colspan="8" style="text-align:center;padding:30px;"><div class="loading-spinner"></div></td></tr>';var matches=[];try{var resp=await fetch('/api/live/matches');var data=await resp.json();matches=data.matches||[];}catch(e){}
@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+"""
+Alarm Engine Shard Testleri
+Hash araligi bolumleme: her mac tam olarak bir shard'a duser
+Shard worker yazmalari yakalanir, supervisor birlestirip tek cagrida yazar
+Bagimsiz - ag yok
+"""
+
+import sys
+import os
+import hashlib
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'desktop', 'scraper_standalone'))
+
+from alarm_calculator import AlarmCalculator, generate_match_id_hash
+
+
+def _bare_calculator():
+    calc = AlarmCalculator.__new__(AlarmCalculator)
+    calc.shard = None
+    calc._captured_writes = None
+    calc._history_cache = {}
+    calc._matches_cache = {}
+    return calc
+
+
+def test_hash_range_partition():
+    """Her hash tek bir shard'a duser, araliklar siralidir, dagilim dengeli"""
+    hashes = [hashlib.md5(str(i).encode()).hexdigest()[:12] for i in range(4000)]
+    for count in (2, 3, 4, 8):
+        shards = [AlarmCalculator.shard_of(h, count) for h in hashes]
+        assert all(0 <= s < count for s in shards)
+        ordered = [AlarmCalculator.shard_of(h, count) for h in sorted(hashes)]
+        assert ordered == sorted(ordered)
+        sizes = [shards.count(i) for i in range(count)]
+        assert min(sizes) > len(hashes) / count * 0.8
+    print("\nSONUC: OK")
+
+
+def test_matches_split_once():
+    """Hash'li ve hash'siz maclar: tum shard'larin birlesimi = tum maclar, kesisim yok"""
+    matches = []
+    for i in range(300):
+        m = {'home': f'Home {i}', 'away': f'Away {i}', 'league': 'L', 'date': '20.Oct 18:00:00'}
+        if i % 3:
+            m['match_id_hash'] = generate_match_id_hash(m['home'], m['away'], m['league'], m['date'])
+        matches.append(m)
+    seen = []
+    for index in range(4):
+        calc = _bare_calculator()
+        calc.set_shard(index, 4)
+        seen.extend(id(m) for m in matches if calc._match_in_shard(m))
+    assert sorted(seen) == sorted(id(m) for m in matches)
+    print("\nSONUC: OK")
+
+
+def test_captured_writes_merged():
+    """Worker yazmalari yakalar; supervisor tablo bazinda tek upsert / post yapar"""
+    workers = []
+    for index in range(2):
+        calc = _bare_calculator()
+        calc._captured_writes = []
+        n = calc._upsert_alarms('sharp_alarms', [{'match_id_hash': f'h{index}', 'market': '1X2', 'selection': '1'}],
+                                ['match_id_hash', 'market', 'selection'])
+        assert n == 1
+        assert calc._post('volume_leader_alarms', [{'home': f'H{index}'}], on_conflict='home')
+        assert calc._delete('dropping_alarms', f'match_id_hash=eq.h{index}')
+        workers.append(calc._captured_writes)
+
+    calls = []
+    sup = _bare_calculator()
+    sup._upsert_alarms = lambda table, rows, keys: calls.append(('upsert', table, len(rows))) or len(rows)
+    sup._post = lambda table, rows, on_conflict=None: calls.append(('post', table, len(rows))) or True
+    sup._delete = lambda table, params: calls.append(('delete', table, params)) or True
+    written = sup.apply_captured_writes(workers)
+    assert written == 4
+    assert calls == [
+        ('upsert', 'sharp_alarms', 2),
+        ('post', 'volume_leader_alarms', 2),
+        ('delete', 'dropping_alarms', 'match_id_hash=eq.h0'),
+        ('delete', 'dropping_alarms', 'match_id_hash=eq.h1'),
+    ]
+    print("\nSONUC: OK")
+
+
+if __name__ == '__main__':
+    test_hash_range_partition()
+    test_matches_split_once()
+    test_captured_writes_merged()
@@ -0,0 +1,311 @@
+#!/usr/bin/env python3
+"""
+Calc Jobs Testleri
+Arka plan job'u, iptal, worker'lar arasi durum dosyasi, batch / tekil job
+karsilikli dislama, batch history loader (mac basina sinirli bellek, hata veren
+batch onbellege girmez), batch'te hata veren hesaplayici digerlerini durdurmaz
+Bagimsiz - dis bagimlilik yok (sahte Supabase client)
+"""
+
+import sys
+import os
+import ast
+import re
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from services.calc_jobs import HISTORY_TAIL_ROWS, CalcJobCancelled, CalcJobRegistry, HistoryLoader, match_pairs
+
+
+def _wait(registry, job_id, timeout=5):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        state = registry.get(job_id)
+        if state and state['status'] in ('done', 'failed', 'cancelled'):
+            return state
+        time.sleep(0.01)
+    raise AssertionError(f"job {job_id} bitmedi")
+
+
+def test_job_done_and_shared_state():
+    """Job sonucu doner; baska worker (ayri registry) ayni dizinden okur"""
+    with tempfile.TemporaryDirectory() as tmp:
+        registry = CalcJobRegistry(jobs_dir=tmp)
+        release = threading.Event()
+
+        def target(job):
+            job.set_progress('1x2 isleniyor... (1/3)')
+            release.wait(2)
+            return {'count': 7}
+
+        job, started = registry.start('sharp', target)
+        assert started
+        # Ayni tip ikinci istek yeni job acmaz
+        again, started_again = registry.start('sharp', target)
+        assert again.id == job.id and not started_again
+
+        other_worker = CalcJobRegistry(jobs_dir=tmp)
+        deadline = time.time() + 2
+        while other_worker.get(job.id)['progress'] == '' and time.time() < deadline:
+            time.sleep(0.01)
+        assert other_worker.get(job.id)['progress'].startswith('1x2')
+        # Diger worker da calisan isi gorur, kopya baslatmaz
+        remote, remote_started = other_worker.start('sharp', target)
+        assert remote.id == job.id and not remote_started
+
+        release.set()
+        state = _wait(registry, job.id)
+        assert state['status'] == 'done' and state['result'] == {'count': 7}
+        assert other_worker.get(job.id)['status'] == 'done'
+    print("\nSONUC: OK")
+
+
+def test_cancel_from_other_worker():
+    """Iptal isareti dosya ile iletilir; except Exception iptali yutmaz"""
+    with tempfile.TemporaryDirectory() as tmp:
+        registry = CalcJobRegistry(jobs_dir=tmp)
+        steps = []
+
+        def target(job):
+            for i in range(500):
+                try:
+                    job.set_progress(f"mac {i}")
+                except Exception:
+                    steps.append('yutuldu')
+                steps.append(i)
+                time.sleep(0.005)
+            return {'count': 1}
+
+        job, _ = registry.start('bigmoney', target)
+        time.sleep(0.05)
+        assert CalcJobRegistry(jobs_dir=tmp).cancel(job.id)
+        state = _wait(registry, job.id)
+        assert state['status'] == 'cancelled'
+        assert 'yutuldu' not in steps and len(steps) < 500
+        assert not registry.cancel(job.id)
+        assert registry.get('yokboyle') is None
+    print("\nSONUC: OK")
+
+
+def test_batch_and_single_jobs_are_exclusive():
+    """batch calisirken tekil hesaplayici (ve tersi) yeni job acmaz, calisan job doner"""
+    with tempfile.TemporaryDirectory() as tmp:
+        registry = CalcJobRegistry(jobs_dir=tmp)
+        release = threading.Event()
+        batch, started = registry.start('batch', lambda job: release.wait(2) and {}, exclusive_with=('sharp', 'bigmoney'))
+        assert started
+        single, single_started = registry.start('sharp', lambda job: {}, exclusive_with=('batch',))
+        assert single.id == batch.id and not single_started
+        release.set()
+        _wait(registry, batch.id)
+
+        release.clear()
+        single, started = registry.start('bigmoney', lambda job: release.wait(2) and {}, exclusive_with=('batch',))
+        assert started
+        again, again_started = CalcJobRegistry(jobs_dir=tmp).start('batch', lambda job: {},
+                                                                   exclusive_with=('sharp', 'bigmoney'))
+        assert again.id == single.id and not again_started
+        release.set()
+        _wait(registry, single.id)
+    print("\nSONUC: OK")
+
+
+class _FakeClient:
+    def __init__(self, histories, failing=()):
+        self.histories = histories
+        self.failing = set(failing)
+        self.batch_calls = []
+        self.single_calls = []
+        self.match_calls = []
+
+    def get_all_matches_with_latest(self, market):
+        self.match_calls.append(market)
+        return [{'home_team': h, 'away_team': a} for (h, a) in self.histories]
+
+    def get_match_histories_for_sharp(self, pairs, history_table, per_match_limit=1000, tail=0):
+        self.batch_calls.append((history_table, list(pairs)))
+        result = {}
+        for pair in pairs:
+            if pair in self.failing:
+                continue
+            rows = list(self.histories.get(pair, []))
+            head = rows if per_match_limit is None else rows[:per_match_limit]
+            result[pair] = head + (rows[len(head):][-tail:] if tail else [])
+        return result
+
+    def get_match_history_for_sharp(self, home, away, history_table):
+        self.single_calls.append((home, away))
+        return list(self.histories.get((home, away), []))[:1000]
+
+
+def test_history_loader_batches_and_shares():
+    """Market basina tek batch; ikinci hesaplayici ayni history'yi tekrar cekmez"""
+    rows = [{'scraped_at': f"t{i:04d}", 'amt1': i} for i in range(1200)]
+    client = _FakeClient({('A', 'B'): rows, ('C', 'D'): rows[:3], ('E', 'F'): []})
+    loader = HistoryLoader(client)
+
+    matches = loader.matches('moneyway_1x2')
+    assert loader.matches('moneyway_1x2') is matches and client.match_calls == ['moneyway_1x2']
+
+    pairs = match_pairs(matches + [{'home': '', 'away': 'X'}])
+    assert sorted(pairs) == [('A', 'B'), ('C', 'D'), ('E', 'F')]
+
+    loader.prefetch('moneyway_1x2_history', pairs)
+    loader.prefetch('moneyway_1x2_history', pairs)
+    assert len(client.batch_calls) == 1
+
+    # Varsayilan limit get_match_history_for_sharp ile ayni (ilk 1000, asc)
+    assert loader.get('moneyway_1x2_history', 'A', 'B') == rows[:1000]
+    # tail: son snapshot'lar (volume leader); bellekte mac basina ilk 1000 + son 50
+    assert loader.get('moneyway_1x2_history', 'A', 'B', tail=50) == rows[-50:]
+    assert len(loader._cache[('moneyway_1x2_history', 'A', 'B')]) == 1000 + HISTORY_TAIL_ROWS
+    assert loader.get('moneyway_1x2_history', 'C', 'D', tail=50) == rows[:3]
+    assert loader.get('moneyway_1x2_history', 'E', 'F') == []
+    assert client.single_calls == []
+
+    # Prefetch disi mac tekil yola duser ve onbellege girer
+    loader.get('moneyway_1x2_history', 'Q', 'R')
+    loader.get('moneyway_1x2_history', 'Q', 'R')
+    assert client.single_calls == [('Q', 'R')]
+    print(f"\nLoader stats: {loader.stats}")
+    print("SONUC: OK")
+
+
+class _FakeResponse:
+    def __init__(self, rows, status=200):
+        self.status_code = status
+        self._rows = rows
+
+    def json(self):
+        return self._rows
+
+
+class _FakeHttp:
+    """home=in.(...) filtresini ve limit/offset sayfalamasini taklit eder"""
+
+    def __init__(self, rows, fail_homes=()):
+        self.rows = rows
+        self.fail_homes = set(fail_homes)
+        self.urls = []
+
+    def get(self, url, headers=None, timeout=None):
+        from urllib.parse import unquote, urlparse, parse_qs
+        self.urls.append(url)
+        qs = parse_qs(urlparse(url).query)
+        assert qs['order'][0] == 'scraped_at.asc,id.asc'
+        quoted = re.findall(r'"((?:[^"\\]|\\.)*)"', unquote(qs['home'][0]))
+        homes = [re.sub(r'\\(.)', r'\1', h) for h in quoted]
+        if self.fail_homes & set(homes):
+            return _FakeResponse([], status=500)
+        limit, offset = int(qs['limit'][0]), int(qs['offset'][0])
+        matched = [r for r in self.rows if r['home'] in homes]
+        return _FakeResponse(matched[offset:offset + limit])
+
+
+def test_failed_batch_is_not_cached_as_empty():
+    """Hata veren batch'in ciftleri [] olarak onbellege girmez, tekil yola duser"""
+    rows = [{'scraped_at': f"t{i:04d}"} for i in range(5)]
+    client = _FakeClient({('A', 'B'): rows, ('C', 'D'): rows}, failing=[('C', 'D')])
+    loader = HistoryLoader(client)
+    loader.prefetch('moneyway_1x2_history', [('A', 'B'), ('C', 'D')])
+    assert ('moneyway_1x2_history', 'C', 'D') not in loader._cache
+    assert loader.get('moneyway_1x2_history', 'C', 'D') == rows
+    assert client.single_calls == [('C', 'D')]
+    print("\nSONUC: OK")
+
+
+def test_supabase_batch_history_fetch():
+    """Batch fetch: home IN-batch + sayfalama, tam (home, away) eslesmesi, mac basina limit"""
+    from services.supabase_client import SupabaseClient
+    client = SupabaseClient.__new__(SupabaseClient)
+    client.url, client.key = 'https://x.supabase.co', 'k'
+    rows = []
+    for i in range(30):
+        rows.append({'home': 'A', 'away': 'B', 'scraped_at': f"t{i:03d}"})
+        rows.append({'home': 'A', 'away': 'Z', 'scraped_at': f"t{i:03d}"})
+        rows.append({'home': 'C, "x"', 'away': 'D', 'scraped_at': f"t{i:03d}"})
+    http = _FakeHttp(rows)
+    client._get_http_client = lambda: http
+
+    result = client.get_match_histories_for_sharp([('A', 'B'), ('C, "x"', 'D'), ('E', 'F')],
+                                                  'moneyway_1x2_history', page_size=25, per_match_limit=20)
+    assert len(result[('A', 'B')]) == 20 and result[('A', 'B')][0]['scraped_at'] == 't000'
+    assert len(result[('C, "x"', 'D')]) == 20
+    assert result[('E', 'F')] == [] and ('A', 'Z') not in result
+    # 3 home tek batch'te; 60 + 30 satir / 25 = 4 sayfa
+    assert len(http.urls) == 4
+
+    # tail: ilk 20 + son 5; hata veren batch'in ciftleri sonucta yok
+    http = _FakeHttp(rows, fail_homes=['C, "x"'])
+    client._get_http_client = lambda: http
+    result = client.get_match_histories_for_sharp([('A', 'B'), ('C, "x"', 'D')], 'moneyway_1x2_history',
+                                                  batch_size=1, per_match_limit=20, tail=5)
+    assert [r['scraped_at'] for r in result[('A', 'B')]] == [f"t{i:03d}" for i in list(range(20)) + list(range(25, 30))]
+    assert ('C, "x"', 'D') not in result
+    print("\nSONUC: OK")
+
+
+def _app_function(name):
+    """app.py'den (supabase olmadan import edilemez) verilen fonksiyonun kaynagi."""
+    path = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'app.py')
+    with open(path, encoding='utf-8') as f:
+        source = f.read()
+    node = next(n for n in ast.parse(source).body if isinstance(n, ast.FunctionDef) and n.name == name)
+    return ast.get_source_segment(source, node)
+
+
+def test_batch_kind_error_does_not_abort_batch():
+    """Batch'te bir hesaplayicinin hatasi errors'a yazilir, kalanlar calisir; iptal yine isi durdurur"""
+    ran = []
+
+    def ok(count):
+        def runner(job, loader):
+            ran.append(count)
+            return {'count': count}
+        return runner
+
+    def broken(job, loader):
+        ran.append('broken')
+        raise RuntimeError('supabase timeout')
+
+    def cancelled(job, loader):
+        ran.append('cancel')
+        raise CalcJobCancelled(job.id)
+
+    namespace = {
+        'CALC_JOB_RUNNERS': {'sharp': ok(2), 'publicmove': broken, 'volumeshock': ok(3), 'mim': cancelled},
+        '_new_history_loader': lambda job: None,
+        '_calc_job_progress': lambda job, text: job.set_progress(text),
+    }
+    exec(_app_function('_run_calc_batch'), namespace)
+    run_batch = namespace['_run_calc_batch']
+
+    with tempfile.TemporaryDirectory() as tmp:
+        registry = CalcJobRegistry(jobs_dir=tmp)
+        job, _ = registry.start('batch', lambda job: run_batch(job, ['sharp', 'publicmove', 'volumeshock']))
+        state = _wait(registry, job.id)
+        assert state['status'] == 'done', state
+        assert ran == [2, 'broken', 3]
+        assert state['result']['count'] == 5
+        assert state['result']['counts'] == {'sharp': 2, 'publicmove': 0, 'volumeshock': 3}
+        assert state['result']['errors'] == {'publicmove': 'supabase timeout'}
+
+        ran.clear()
+        job, _ = registry.start('batch', lambda job: run_batch(job, ['sharp', 'mim', 'volumeshock']))
+        state = _wait(registry, job.id)
+        assert state['status'] == 'cancelled', state
+        assert ran == [2, 'cancel']
+    print("\nSONUC: OK")
+
+
+if __name__ == '__main__':
+    test_job_done_and_shared_state()
+    test_cancel_from_other_worker()
+    test_batch_and_single_jobs_are_exclusive()
+    test_history_loader_batches_and_shares()
+    test_failed_batch_is_not_cached_as_empty()
+    test_supabase_batch_history_fetch()
+    test_batch_kind_error_does_not_abort_batch()
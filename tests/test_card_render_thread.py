@@ -0,0 +1,151 @@
+#!/usr/bin/env python3
+"""
+Kart Renderer Thread Testleri
+Sahte browser ile: farkli thread'lerden gelen render'lar tek loop/tek thread'de
+paralel calisir (sayfa limiti asilmaz), Future API, ekran goruntusu kart
+kutusuna kirpilir, uzun kartta viewport buyur, hata Future'a tasinir
+Bagimsiz - Playwright gerekmez
+"""
+
+import sys
+import os
+import asyncio
+import threading
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'desktop', 'scraper_standalone'))
+
+from telegram_card_renderer import CardRenderThread, alarm_card_html
+
+RENDER_DELAY = 0.05
+
+
+class _FakeCard:
+    def __init__(self, height):
+        self.height = height
+
+    async def bounding_box(self):
+        return {'x': 8, 'y': 8, 'width': 360, 'height': self.height}
+
+
+class _FakePage:
+    def __init__(self, browser, viewport):
+        self.browser = browser
+        self.viewport = dict(viewport)
+        self.html = ''
+
+    async def set_content(self, html, wait_until=None):
+        self.html = html
+        await asyncio.sleep(RENDER_DELAY)
+
+    async def evaluate(self, script):
+        return True
+
+    async def query_selector(self, selector):
+        if 'class="card"' not in self.html:
+            return None
+        return _FakeCard(1200 if 'TALL' in self.html else 420)
+
+    async def set_viewport_size(self, size):
+        self.viewport = dict(size)
+
+    async def screenshot(self, type='png', clip=None, **kwargs):
+        if 'BOOM' in self.html:
+            raise RuntimeError('page crashed')
+        self.browser.shots.append((clip, dict(self.viewport)))
+        return f"PNG:{self.html}".encode()
+
+    async def close(self):
+        with self.browser.lock:
+            self.browser.open_pages -= 1
+
+
+class _FakeBrowser:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.open_pages = 0
+        self.peak_pages = 0
+        self.opened = 0
+        self.threads = set()
+        self.shots = []
+
+    async def new_page(self, viewport=None):
+        self.threads.add(threading.get_ident())
+        with self.lock:
+            self.open_pages += 1
+            self.opened += 1
+            self.peak_pages = max(self.peak_pages, self.open_pages)
+        return _FakePage(self, viewport)
+
+
+def _renderer(max_pages=3):
+    browser = _FakeBrowser()
+
+    async def factory():
+        return browser
+    return CardRenderThread(max_pages=max_pages, browser_factory=factory), browser
+
+
+def test_concurrent_submit_from_many_threads():
+    """12 calculator thread'i ayni anda render ister: tek renderer thread'i, en fazla 3 sayfa, paralel"""
+    renderer, browser = _renderer(max_pages=3)
+    results = {}
+
+    def calculator(i):
+        results[i] = renderer.render(f'<div class="card">card {i}</div>')
+
+    t0 = time.monotonic()
+    threads = [threading.Thread(target=calculator, args=(i,)) for i in range(12)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.monotonic() - t0
+
+    assert results == {i: f'PNG:<div class="card">card {i}</div>'.encode() for i in range(12)}
+    assert len(browser.threads) == 1 and renderer._thread.ident in browser.threads
+    # Paralellik sayfa sayaciyla: 12 render'in her biri kendi sayfasinda, ayni anda tam 3 sayfa acik
+    assert browser.opened == 12 and browser.peak_pages == 3 and browser.open_pages == 0
+    assert renderer.rendered == 12
+    renderer.stop()
+    assert not renderer.running
+    print(f"\n12 render {elapsed:.2f}s, tepe sayfa {browser.peak_pages}")
+    print("SONUC: OK")
+
+
+def test_futures_clip_and_errors():
+    """submit Future doner; ekran goruntusu kart kutusuna kirpilir; uzun kartta viewport buyur; hata Future'da"""
+    renderer, browser = _renderer()
+    futures = [renderer.submit('<div class="card">a</div>'), renderer.submit('<div class="card">TALL</div>'),
+               renderer.submit('<div class="card">BOOM</div>')]
+    assert futures[0].result(5).startswith(b'PNG:')
+    futures[1].result(5)
+    try:
+        futures[2].result(5)
+        assert False, 'hata bekleniyordu'
+    except RuntimeError as e:
+        assert 'page crashed' in str(e)
+    clips = {clip['height']: viewport for clip, viewport in browser.shots}
+    assert clips[420] == {'width': 400, 'height': 800}
+    assert clips[1200]['height'] >= 8 + 1200
+    assert all(clip == {'x': 8, 'y': 8, 'width': 360, 'height': clip['height']} for clip, _ in browser.shots)
+    assert renderer.failed == 1
+    renderer.stop()
+    print("\nSONUC: OK")
+
+
+def test_alarm_card_html_is_renderable():
+    """render_alarm_card_png ile ayni HTML: .card elemani var"""
+    html = alarm_card_html('BIGMONEY', 'Arsenal', 'Wolves', '1X2', '1', money=21462, total_money=302078,
+                           previous_alarms=[{'time': '2025-12-11T19:29:00Z', 'money': 25025}], multiplier=5)
+    assert 'class="card"' in html and '£302.078' in html and '×5' in html
+    renderer, browser = _renderer()
+    assert renderer.submit(html).result(5) == f"PNG:{html}".encode()
+    renderer.stop()
+    print("\nSONUC: OK")
+
+
+if __name__ == '__main__':
+    test_concurrent_submit_from_many_threads()
+    test_futures_clip_and_errors()
+    test_alarm_card_html_is_renderable()
@@ -0,0 +1,340 @@
+#!/usr/bin/env python3
+"""
+Masaustu Delta Senkron Testleri
+Sahte yerel PostgREST sunucusu (select / updated_at=gt. / id=gt. / order /
+limit / offset, max-rows 1000) + 2.000 satirlik market: ilk yukleme tam cekim,
+sonraki yenilemeler sadece degisen satirlari ceker; 1000 satir sinirinin
+otesi sayfalanir. Treeview yerinde guncellenir (sadece degisen / yeni /
+silinen satir). Sonuc eski tam-cekim + tabloyu bastan doldurma ile ayni.
+Indirilen byte ve Treeview islem sayisi dogrulanir; sure sadece raporlanir.
+Ekran yoksa (headless) ttk.Treeview yerine ayni arayuzlu sahte agac kullanilir.
+Bagimsiz - ag yok (yalnizca 127.0.0.1)
+"""
+
+import sys
+import os
+import json
+import random
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'desktop', 'desktop_app'))
+os.environ['NO_PROXY'] = '127.0.0.1,localhost'
+
+import smartxflow_app
+from smartxflow_app import MARKET_COLUMNS, MarketCache, SupabaseClient, apply_to_tree, row_values, sync_market
+
+TABLE = 'moneyway_1x2'
+COLUMNS = MARKET_COLUMNS[TABLE]
+N_ROWS = 2000
+
+
+class _FakeTree:
+    """ttk.Treeview'in kullanilan alt kumesi; her cagri bir Tk islemi sayilir."""
+
+    def __init__(self):
+        self.order = []
+        self.values = {}
+        self.ops = 0
+
+    def get_children(self, item=''):
+        self.ops += 1
+        return tuple(self.order)
+
+    def exists(self, iid):
+        self.ops += 1
+        return iid in self.values
+
+    def item(self, iid, values=None):
+        self.ops += 1
+        self.values[iid] = tuple(values)
+
+    def insert(self, parent, index, iid=None, values=()):
+        self.ops += 1
+        iid = iid if iid is not None else f"I{len(self.values) + 1:05d}"
+        self.order.insert(len(self.order) if index == 'end' else index, iid)
+        self.values[iid] = tuple(values)
+        return iid
+
+    def delete(self, *iids):
+        self.ops += 1
+        for iid in iids:
+            self.order.remove(iid)
+            del self.values[iid]
+
+    def rows(self):
+        return [self.values[i] for i in self.order]
+
+
+class _CountingTree:
+    """Gercek ttk.Treeview sarmalayicisi (ekran varsa): islem sayar."""
+
+    def __init__(self, tree):
+        self.tree = tree
+        self.ops = 0
+
+    def __getattr__(self, name):
+        attr = getattr(self.tree, name)
+
+        def call(*a, **kw):
+            self.ops += 1
+            return attr(*a, **kw)
+        return call
+
+    def rows(self):
+        return [tuple(self.tree.item(i, 'values')) for i in self.tree.get_children()]
+
+
+def _make_tree():
+    try:
+        import tkinter as tk
+        from tkinter import ttk
+        root = tk.Tk()
+        root.withdraw()
+        tree = ttk.Treeview(root, show='headings', columns=COLUMNS)
+        return _CountingTree(tree), root
+    except Exception:
+        return _FakeTree(), None
+
+
+class _FakePostgrest:
+    """moneyway_1x2 tablosu; updated_at sunucu saatiyle degisiklikte ilerler. Yanit en fazla MAX_ROWS satir."""
+
+    MAX_ROWS = 1000
+
+    def __init__(self, n_rows, seed=1):
+        self.rng = random.Random(seed)
+        self.lock = threading.Lock()
+        self.clock = datetime(2026, 10, 18, 12, 0, tzinfo=timezone.utc)
+        self.rows = {}
+        self.next_id = 1
+        self.bytes_sent = 0
+        self.requests = 0
+        for _ in range(n_rows):
+            self._add()
+        api = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def do_GET(self):
+                url = urlparse(self.path)
+                data = json.dumps(api.query(url.path.rsplit('/', 1)[-1], parse_qs(url.query))).encode()
+                with api.lock:
+                    api.bytes_sent += len(data)
+                    api.requests += 1
+                self.send_response(200)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+
+    def _row(self, row_id):
+        rng = self.rng
+        day = rng.randint(18, 25)
+        return {
+            'id': row_id, 'league': f"League {rng.randint(1, 60)}",
+            'date': f"{day}.Oct {rng.randint(10, 22):02d}:{rng.choice(['00', '15', '30', '45'])}:00",
+            'home': f"Home {row_id}", 'away': f"Away {row_id}",
+            'odds1': f"{rng.uniform(1.1, 9):.2f}", 'oddsx': f"{rng.uniform(2.5, 5):.2f}",
+            'odds2': f"{rng.uniform(1.1, 9):.2f}", 'pct1': f"{rng.uniform(0, 100):.1f}%",
+            'pctx': f"{rng.uniform(0, 100):.1f}%", 'pct2': f"{rng.uniform(0, 100):.1f}%",
+            'amt1': f"£ {rng.randint(0, 90000):,}", 'amtx': f"£ {rng.randint(0, 9000):,}",
+            'amt2': f"£ {rng.randint(0, 90000):,}", 'volume': f"£ {rng.randint(0, 500000):,}",
+            'updated_at': (self.clock - timedelta(minutes=rng.randint(0, 600))).isoformat(),
+        }
+
+    def _add(self):
+        self.rows[self.next_id] = self._row(self.next_id)
+        self.next_id += 1
+
+    def tick(self, changed=40, added=3, deleted=3):
+        """Bir scrape turu: birkac satir degisir / eklenir / silinir."""
+        with self.lock:
+            self.clock += timedelta(minutes=10)
+            for row_id in self.rng.sample(sorted(self.rows), changed + deleted)[:changed]:
+                row = self.rows[row_id]
+                row.update(odds1=f"{self.rng.uniform(1.1, 9):.2f}", volume=f"£ {self.rng.randint(0, 500000):,}",
+                           updated_at=self.clock.isoformat())
+            for row_id in self.rng.sample(sorted(self.rows), deleted):
+                del self.rows[row_id]
+            for _ in range(added):
+                self._add()
+                self.rows[self.next_id - 1]['updated_at'] = self.clock.isoformat()
+
+    def query(self, table, params):
+        assert table == TABLE
+        with self.lock:
+            rows = [dict(r) for r in self.rows.values()]
+        since = params.get('updated_at', [None])[0]
+        if since:
+            cutoff = datetime.fromisoformat(since[3:])
+            rows = [r for r in rows if datetime.fromisoformat(r['updated_at']) > cutoff]
+        after_id = params.get('id', [None])[0]
+        if after_id:
+            rows = [r for r in rows if r['id'] > int(after_id[3:])]
+        for term in reversed(params.get('order', ['date.desc'])[0].split(',')):
+            field, direction = term.split('.')
+            rows.sort(key=lambda r: r[field], reverse=direction == 'desc')
+        offset = int(params.get('offset', ['0'])[0])
+        limit = min(int(params.get('limit', [self.MAX_ROWS])[0]), self.MAX_ROWS)
+        rows = rows[offset:offset + limit]
+        if params.get('select', ['*'])[0] == 'id':
+            rows = [{'id': r['id']} for r in rows]
+        return rows
+
+    def __enter__(self):
+        self.thread.start()
+        return SupabaseClient(f"http://127.0.0.1:{self.server.server_address[1]}", 'anon')
+
+    def __exit__(self, *exc):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+# ---- Eski implementasyon (referans) ----
+
+def _old_refresh(client, tree):
+    """Eski load_data + display_data: tum tabloyu cek, Treeview'i bosaltip bastan doldur."""
+    data = client.fetch_table(TABLE)
+    tree.delete(*tree.get_children())
+    for row in data:
+        values = []
+        for col in COLUMNS:
+            col_lower = col.lower()
+            val = row.get(col_lower, row.get(col, ''))
+            if val is None:
+                val = ''
+            values.append(str(val))
+        tree.insert('', 'end', values=values)
+    return data
+
+
+def _expected(api):
+    with api.lock:
+        rows = sorted(sorted(api.rows.values(), key=lambda r: r['id']), key=lambda r: r['date'], reverse=True)
+    return [row_values(r, COLUMNS) for r in rows]
+
+
+def test_delta_refresh_matches_full_reload():
+    """10 yenileme: delta sonuc her turda tam cekimle ayni, sadece degisenler inip agaca dokunur"""
+    tree, root = _make_tree()
+    old_tree, _ = _make_tree()
+    api = _FakePostgrest(N_ROWS)
+    cache = MarketCache(TABLE)
+    try:
+        with api as client:
+            changed, deleted, full = sync_market(client, cache)
+            apply_to_tree(tree, COLUMNS, cache.rows, changed, deleted)
+            assert full and tree.rows() == _expected(api)
+
+            old_s = new_s = 0.0
+            old_bytes = new_bytes = old_ops = new_ops = 0
+            for _ in range(10):
+                api.tick()
+                expected = _expected(api)
+
+                api.bytes_sent, old_tree.ops = 0, 0
+                t0 = time.perf_counter()
+                _old_refresh(client, old_tree)
+                old_s += time.perf_counter() - t0
+                old_bytes += api.bytes_sent
+                old_ops += old_tree.ops
+                assert old_tree.rows() == expected
+
+                api.bytes_sent, tree.ops = 0, 0
+                t0 = time.perf_counter()
+                changed, deleted, full = sync_market(client, cache)
+                apply_to_tree(tree, COLUMNS, cache.rows, changed, deleted)
+                new_s += time.perf_counter() - t0
+                new_bytes += api.bytes_sent
+                new_ops += tree.ops
+                assert not full and len(deleted) == 3
+                assert tree.rows() == expected
+
+        print(f"\n{N_ROWS} satir, 10 yenileme ({type(tree).__name__}):")
+        print(f"  Eski:  {old_s / 10 * 1000:.1f} ms/yenileme, {old_bytes / 10 / 1024:.0f} KB, {old_ops // 10} agac islemi")
+        print(f"  Delta: {new_s / 10 * 1000:.1f} ms/yenileme, {new_bytes / 10 / 1024:.0f} KB, {new_ops // 10} agac islemi")
+        assert new_bytes < old_bytes / 3
+        assert new_ops < old_ops / 10
+    finally:
+        if root is not None:
+            root.destroy()
+    print("SONUC: OK")
+
+
+def test_pages_past_server_row_cap():
+    """Sunucu 1000 satirda keser: tam cekim, delta ve id listesi kisa sayfaya kadar sayfalanir"""
+    api = _FakePostgrest(2500, seed=3)
+    with api as client:
+        api.requests = 0
+        assert len(client.fetch_table(TABLE)) == 2500 and api.requests == 3
+        api.requests = 0
+        keys = client.fetch_keys(TABLE)
+        assert keys == {str(i) for i in range(1, 2501)} and api.requests == 3
+        api.tick(changed=1200, added=0, deleted=0)
+        api.requests = 0
+        since = (api.clock - timedelta(minutes=1)).isoformat()
+        changed = client.fetch_changed(TABLE, since)
+        assert len(changed) == 1200 and len({r['id'] for r in changed}) == 1200 and api.requests == 2
+    print("\nSONUC: OK")
+
+
+def test_unchanged_rows_touch_nothing():
+    """Cursor payi nedeniyle tekrar gelen ayni satirlar agaca dokunmaz; periyodik tam cekim de fark uygular"""
+    tree = _FakeTree()
+    api = _FakePostgrest(300, seed=2)
+    cache = MarketCache(TABLE)
+    with api as client:
+        apply_to_tree(tree, COLUMNS, cache.rows, *sync_market(client, cache)[:2])
+        tree.ops = 0
+        changed, deleted, full = sync_market(client, cache)
+        assert not full and changed == {} and deleted == []
+        apply_to_tree(tree, COLUMNS, cache.rows, changed, deleted)
+        assert tree.ops == 0
+
+        cache.syncs = smartxflow_app.FULL_RESYNC_EVERY
+        api.tick(changed=5, added=1, deleted=1)
+        changed, deleted, full = sync_market(client, cache)
+        assert full and len(changed) == 6 and len(deleted) == 1
+        apply_to_tree(tree, COLUMNS, cache.rows, changed, deleted)
+        assert tree.rows() == _expected(api)
+    print("\nSONUC: OK")
+
+
+def test_missing_updated_at_falls_back_to_full_fetch():
+    """updated_at kolonu yoksa (migration uygulanmamis) her yenileme tam cekim, agac yine yerinde guncellenir"""
+    class _Client:
+        def __init__(self, rows):
+            self.rows = rows
+
+        def fetch_table(self, table):
+            return [dict(r) for r in self.rows]
+
+        def fetch_changed(self, table, since):
+            raise AssertionError('cursor yokken delta istenmemeli')
+
+    rows = [{'id': i, 'date': f"2{i % 8}.Oct", 'home': f"H{i}", 'away': f"A{i}"} for i in range(50)]
+    client, cache, tree = _Client(rows), MarketCache(TABLE), _FakeTree()
+    apply_to_tree(tree, COLUMNS, cache.rows, *sync_market(client, cache)[:2])
+    rows[7]['home'] = 'Yeni'
+    tree.ops = 0
+    changed, deleted, full = sync_market(client, cache)
+    assert full and list(changed) == ['7'] and cache.since() is None
+    apply_to_tree(tree, COLUMNS, cache.rows, changed, deleted)
+    assert tree.ops == 2 and 'Yeni' in tree.values['7']
+    print("\nSONUC: OK")
+
+
+if __name__ == '__main__':
+    test_delta_refresh_matches_full_reload()
+    test_pages_past_server_row_cap()
+    test_unchanged_rows_touch_nothing()
+    test_missing_updated_at_falls_back_to_full_fetch()
@@ -0,0 +1,206 @@
+#!/usr/bin/env python3
+"""
+Fetch Scheduler Testleri
+Sahte HTTP sunucusu ile: ayni istek/sn tavaninda pencere eski sabit havuzun
+(2 worker) otesine buyur, tavan asilmaz, 429 ve her 5xx'te pencere daralir,
+bucket Retry-After kadar durur ve istekler tekrar denenir, calistirma ozeti
+hata oranini raporlar. Sureler sadece yazdirilir; dogrulama sayilarla yapilir.
+Bagimsiz - ag yok
+"""
+
+import sys
+import os
+import random
+import threading
+import time
+import concurrent.futures
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'desktop', 'scraper_standalone'))
+
+from fetch_scheduler import FetchScheduler, TokenBucket
+
+# Gercek degerlerin 1/50'si: eski uyku 1.0-2.5s -> 20-50ms, sunucu gecikmesi 2-3s -> 40-60ms
+SCALE = 0.02
+OLD_WORKERS = 2
+OLD_SLEEP = (1.0 * SCALE, 2.5 * SCALE)
+# Eski duzenin ulasabilecegi en yuksek hiz: 2 worker / en kisa uyku
+RATE_CEILING = OLD_WORKERS / OLD_SLEEP[0]
+
+
+class _Resp:
+    def __init__(self, status_code, text='', headers=None):
+        self.status_code = status_code
+        self.text = text
+        self.headers = headers or {}
+
+
+class _FakeServer:
+    """Gecikmeli sahte sunucu; capacity asilinca 503 (veya 429 + Retry-After) doner."""
+
+    def __init__(self, latency=(0.04, 0.06), capacity=None, overload_status=503):
+        self.latency = latency
+        self.capacity = capacity
+        self.overload_status = overload_status
+        self.in_flight = 0
+        self.peak = 0
+        self.hits = []
+        self._lock = threading.Lock()
+
+    def get(self, game_id):
+        with self._lock:
+            self.in_flight += 1
+            self.peak = max(self.peak, self.in_flight)
+            self.hits.append(time.monotonic())
+            overloaded = self.capacity is not None and self.in_flight > self.capacity
+        try:
+            time.sleep(random.uniform(*self.latency))
+            if overloaded:
+                return _Resp(self.overload_status, headers={'Retry-After': '0.05'})
+            return _Resp(200, text=f"<html>{game_id}</html>")
+        finally:
+            with self._lock:
+                self.in_flight -= 1
+
+
+def _max_rate(hits, window=0.5):
+    """Herhangi bir `window` saniyelik aralikta gorulen en yuksek istek/sn."""
+    hits = sorted(hits)
+    best, j = 0, 0
+    for i, t in enumerate(hits):
+        while hits[j] < t - window:
+            j += 1
+        best = max(best, i - j + 1)
+    return best / window
+
+
+def _old_fetch(server, items):
+    """Eski run_scrape_excapper: ThreadPoolExecutor(2) + istek basina rastgele uyku."""
+    def one(gid):
+        time.sleep(random.uniform(*OLD_SLEEP))
+        return gid, server.get(gid).text
+    with concurrent.futures.ThreadPoolExecutor(max_workers=OLD_WORKERS) as pool:
+        return dict(pool.map(one, items))
+
+
+def _record_pauses(scheduler):
+    """bucket.pause cagrilarini (saniye) kaydet, davranisi degistirmeden."""
+    pauses = []
+    pause = scheduler.bucket.pause
+    scheduler.bucket.pause = lambda seconds: (pauses.append(seconds), pause(seconds))[1]
+    return pauses
+
+
+def test_faster_at_same_rate_ceiling():
+    """Ayni istek/sn tavaninda adaptif pencere eski 2 worker'in otesine buyur, tavan asilmaz"""
+    random.seed(7)
+    items = [str(i) for i in range(80)]
+
+    old_server = _FakeServer()
+    t0 = time.monotonic()
+    old = _old_fetch(old_server, items)
+    old_elapsed = time.monotonic() - t0
+
+    server = _FakeServer()
+    scheduler = FetchScheduler(rate=RATE_CEILING, burst=2, initial_window=2, max_window=6,
+                               log=lambda m: None)
+    results, stats = scheduler.run(items, fetch=server.get, parse=lambda i, r: r.text)
+
+    assert results == old and len(results) == len(items)
+    assert stats.failed == 0 and stats.error_rate == 0
+    assert stats.requests == len(items) and stats.window_decreases == 0
+    # Tavan asilmaz (burst payi ile)
+    assert _max_rate(server.hits) <= RATE_CEILING * 1.1 + 2 / 0.5, _max_rate(server.hits)
+    # Pencere basarili yanit sayisiyla buyur: 80 hatasiz yanit 2'den tavana (6) cikarir
+    assert stats.window_final == 6 > OLD_WORKERS
+    print(f"\nEski: {old_elapsed:.2f}s ({_max_rate(old_server.hits):.0f} istek/sn tepe)  "
+          f"Adaptif: {stats.duration:.2f}s ({_max_rate(server.hits):.0f} istek/sn tepe, tavan {RATE_CEILING:.0f})")
+    print(f"Ozet: {stats.summary()}")
+    print("SONUC: OK")
+
+
+def test_backoff_on_overload():
+    """Sunucu 3 eszamanli istekten fazlasinda 503 doner: pencere daralir, tekrar denenen istekler biter"""
+    random.seed(3)
+    server = _FakeServer(capacity=3)
+    scheduler = FetchScheduler(rate=1000, burst=10, initial_window=6, max_window=8, max_retries=5,
+                               log=lambda m: None)
+    results, stats = scheduler.run([str(i) for i in range(80)], fetch=server.get, parse=lambda i, r: r.text)
+    assert len(results) == 80 and stats.failed == 0
+    assert stats.window_decreases >= 1
+    assert stats.status_counts.get('503', 0) > 0 and stats.retries == stats.status_counts['503']
+    assert 0 < stats.error_rate < 0.5
+    d = stats.to_dict()
+    assert d['requests'] == 80 + stats.retries and d['ok'] == 80
+    print(f"\nOzet: {stats.summary()}")
+    print("SONUC: OK")
+
+
+def test_429_pauses_bucket_and_gives_up_after_retries():
+    """429 + Retry-After bucket'i durdurur; hep hata donen istek max_retries sonra birakilir"""
+    server = _FakeServer(latency=(0.001, 0.002), capacity=0, overload_status=429)
+    scheduler = FetchScheduler(rate=1000, burst=5, initial_window=2, max_window=2, max_retries=2,
+                               log=lambda m: None)
+    pauses = _record_pauses(scheduler)
+    results, stats = scheduler.run(['a', 'b'], fetch=server.get, parse=lambda i, r: r.text)
+    assert results == {} and stats.failed == 2
+    assert stats.requests == 6 and stats.status_counts == {'429': 6}
+    # Son deneme haric her 429 bucket'i Retry-After kadar durdurur
+    assert pauses == [0.05] * 4
+    print("\nSONUC: OK")
+
+
+def test_5xx_backs_off_like_429():
+    """503 / 520 hemen tekrar denenmez: pencere daralir, bucket Retry-After (yoksa varsayilan) kadar durur"""
+    import fetch_scheduler as fs
+    now = [0.0]
+    responses = [_Resp(503), _Resp(520, headers={'Retry-After': '2'}), _Resp(200, text='ok')]
+    scheduler = FetchScheduler(rate=1000, initial_window=4, max_window=4, max_retries=2, log=lambda m: None,
+                               clock=lambda: now[0], sleep=lambda s: now.__setitem__(0, now[0] + s))
+    pauses = _record_pauses(scheduler)
+    results, stats = scheduler.run(['x'], fetch=lambda item: responses.pop(0), parse=lambda i, r: r.text)
+    assert results == {'x': 'ok'} and stats.retries == 2
+    assert stats.status_counts == {'503': 1, '520': 1, '200': 1}
+    assert pauses == [fs.DEFAULT_RETRY_AFTER, 2.0]
+    # Ikinci deneme bucket durdurulmadan once baslamaz (sahte saat pause kadar ilerler)
+    assert now[0] >= fs.DEFAULT_RETRY_AFTER + 2.0
+    assert stats.window_decreases == 2
+    print("\nSONUC: OK")
+
+
+def test_token_bucket_rate():
+    """Sahte saat: 10 istek/sn, burst 2 -> 22 token ~2sn"""
+    now = [0.0]
+    bucket = TokenBucket(10, burst=2, clock=lambda: now[0], sleep=lambda s: now.__setitem__(0, now[0] + s))
+    for _ in range(22):
+        bucket.acquire()
+    assert abs(now[0] - 2.0) < 1e-6, now[0]
+    bucket.pause(1.5)
+    bucket.acquire()
+    assert now[0] >= 3.5
+    print("\nSONUC: OK")
+
+
+def test_fetch_exception_is_retried():
+    """fetch exception (timeout) -> tekrar denenir, pencere daralir"""
+    calls = {'n': 0}
+
+    def flaky(item):
+        calls['n'] += 1
+        if calls['n'] <= 2:
+            raise TimeoutError('read timed out')
+        return _Resp(200, text=item)
+
+    scheduler = FetchScheduler(rate=1000, initial_window=1, max_window=1, log=lambda m: None)
+    results, stats = scheduler.run(['x'], fetch=flaky, parse=lambda i, r: r.text)
+    assert results == {'x': 'x'} and stats.status_counts.get('timeout') == 2
+    assert stats.retries == 2
+    print("\nSONUC: OK")
+
+
+if __name__ == '__main__':
+    test_faster_at_same_rate_ceiling()
+    test_backoff_on_overload()
+    test_429_pauses_bucket_and_gives_up_after_retries()
+    test_5xx_backs_off_like_429()
+    test_token_bucket_rate()
+    test_fetch_exception_is_retried()
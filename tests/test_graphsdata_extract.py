@@ -0,0 +1,219 @@
+#!/usr/bin/env python3
+"""
+graphsData Extractor Testleri
+Tek gecisli extract_graphsdata_odds, eski tab basina _parse_graphsdata_prev_odds
+ile ayni sonucu verir (korpus: tests/fixtures/excapper/*.html kayitli gercek
+sayfalar - scripts/capture_excapper_fixtures.py ile - + Excapper detay sayfasi
+yapisinda uretilen sayfalar); sayfa basina odds blogu tarama sayisi kontrolu
+Bagimsiz - ag yok
+"""
+
+import sys
+import os
+import glob
+import random
+import re
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'desktop', 'scraper_standalone'))
+
+from excapper_scraper import extract_graphsdata_odds, _parse_graphsdata_prev_odds, _graphs_id
+
+FIXTURES = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures', 'excapper')
+
+
+# ---- Eski implementasyon (referans) ----
+
+def _old_parse_graphsdata_prev_odds(html, tab_id):
+    prev_odds = {}
+    try:
+        m_num = re.search(r'(\d+)', tab_id)
+        if not m_num:
+            return prev_odds
+        nid = m_num.group(1)
+        marker = f"graphsData[{nid}]['odds']"
+        idx = html.find(marker)
+        if idx < 0:
+            return prev_odds
+        block = html[idx: idx + 12000]
+        ds_start = block.find('datasets:')
+        if ds_start < 0:
+            return prev_odds
+        bopen = block.find('[', ds_start)
+        if bopen < 0:
+            return prev_odds
+        depth = 0
+        bclose = bopen
+        for ci, ch in enumerate(block[bopen:], bopen):
+            if ch == '[':
+                depth += 1
+            elif ch == ']':
+                depth -= 1
+                if depth == 0:
+                    bclose = ci
+                    break
+        datasets_block = block[bopen: bclose + 1]
+        for ds in re.finditer(
+            r"label\s*:\s*['\"]([^'\"]+)['\"]\s*,.*?data\s*:\s*\[([^\]]*)\]",
+            datasets_block, re.DOTALL
+        ):
+            label = ds.group(1).strip()
+            if label in prev_odds:
+                continue
+            nums = [
+                float(x.strip()) for x in ds.group(2).split(',')
+                if x.strip() and x.strip() not in ('0', '0.0', 'null', 'undefined')
+            ]
+            if nums:
+                prev_odds[label] = nums[0]
+    except Exception:
+        pass
+    return prev_odds
+
+
+# ---- Korpus ----
+
+_MARKETS = [('Match Odds', ['1', 'X', '2']),
+            ('Over/Under 2.5 Goals', ['Under', 'Over']),
+            ('Both teams to Score?', ['Yes', 'No'])]
+
+
+def _series(rng, n, lead_zeros=0, variant=None):
+    vals = ['0'] * lead_zeros + [f"{rng.uniform(1.05, 9.0):.2f}" for _ in range(n)]
+    if variant == 'null':
+        vals.insert(0, 'null')
+    elif variant == 'bad':
+        vals.append('abc')
+    elif variant == 'empty':
+        vals = []
+    return ', '.join(vals)
+
+
+def _odds_block(rng, nid, labels, variant=None):
+    points = rng.randint(5, 120)
+    times = ', '.join(f"'{h:02d}:{m:02d}'" for h, m in
+                      ((rng.randint(0, 23), rng.randint(0, 59)) for _ in range(points)))
+    datasets = []
+    for i, label in enumerate(labels):
+        v = variant if (variant and i == len(labels) - 1) else None
+        if variant == 'nodata' and i == 0:
+            datasets.append(f"{{\n            label: '{label}',\n            borderColor: '#{rng.randint(0, 0xffffff):06x}',\n"
+                            f"            fill: false\n        }}")
+            continue
+        datasets.append(
+            f"{{\n            label: '{label}',\n            borderColor: '#{rng.randint(0, 0xffffff):06x}',\n"
+            f"            backgroundColor: 'rgba(0,0,0,0)',\n            pointRadius: [{', '.join(['0'] * 3)}],\n"
+            f"            data: [{_series(rng, points, rng.randint(0, 3), v)}],\n            fill: false\n        }}")
+    if variant == 'dup':
+        datasets.append(f"{{ label: '{labels[0]}', data: [9.99] }}")
+    close = '' if variant == 'unclosed' else ']'
+    return (f"graphsData[{nid}] = {{}};\n"
+            f"graphsData[{nid}]['odds'] = {{\n    labels: [{times}],\n    datasets: [\n        "
+            + ',\n        '.join(datasets) + f"\n    {close}\n}};\n"
+            f"graphsData[{nid}]['money'] = {{\n    labels: [{times}],\n    datasets: [{{ label: 'Money', "
+            f"data: [{', '.join(str(rng.randint(0, 90000)) for _ in range(points))}] }}]\n}};\n")
+
+
+def _detail_page(rng):
+    variants = [None] * 8 + ['null', 'bad', 'empty', 'nodata', 'dup', 'unclosed']
+    nids = [str(rng.randint(10 ** 8, 10 ** 9)) for _ in _MARKETS]
+    tabs = ''.join(f'<a href="#" data-tab="tab_content_{nid}">{name}</a>' for nid, (name, _) in zip(nids, _MARKETS))
+    filler = ''.join(f'<div class="row"><span>{rng.random():.6f}</span> [{i}]</div>' for i in range(rng.randint(50, 400)))
+    script = ''.join(_odds_block(rng, nid, labels, rng.choice(variants))
+                     for nid, (_, labels) in zip(nids, _MARKETS))
+    if rng.random() < 0.2:
+        # Ayni id ikinci kez (ilk blok kazanir)
+        script += _odds_block(rng, nids[0], _MARKETS[0][1])
+    if rng.random() < 0.1:
+        # datasets'i olmayan blok (pencere sonraki bloga tasabilir)
+        script = f"graphsData[{nids[1]}]['odds'] = {{ labels: [] }};\n" + script
+    return (f'<html><head><script>var graphsData = {{}};</script></head><body>'
+            f'<div class="smenu">{tabs}</div>{filler}<script>{script}</script></body></html>',
+            [f"tab_content_{nid}" for nid in nids] + ['tab_content_1', 'tab_nodigits'])
+
+
+def _captured_pages():
+    """tests/fixtures/excapper/*.html: kayitli gercek detay sayfalari (tab id'leriyle)."""
+    pages = []
+    for path in sorted(glob.glob(os.path.join(FIXTURES, '*.html'))):
+        html = open(path, encoding='utf-8', errors='replace').read()
+        tab_ids = re.findall(r'data-tab="([^"]+)"', html) or re.findall(r"graphsData\[(\d+)\]", html)
+        pages.append((html, tab_ids))
+    return pages
+
+
+def _corpus(n=200):
+    rng = random.Random(42)
+    return [_detail_page(rng) for _ in range(n)] + _captured_pages()
+
+
+def test_identical_to_per_tab_parser():
+    """Her sayfa ve tab icin tek gecis sonucu eski parser ile birebir ayni"""
+    pages = _corpus()
+    compared = nonempty = 0
+    for html, tab_ids in pages:
+        graphs = extract_graphsdata_odds(html)
+        for tab_id in tab_ids:
+            old = _old_parse_graphsdata_prev_odds(html, tab_id)
+            new = graphs.get(_graphs_id(tab_id) or '', {})
+            assert new == old, (tab_id, new, old)
+            assert _parse_graphsdata_prev_odds(html, tab_id) == old
+            compared += 1
+            nonempty += bool(old)
+    assert nonempty > compared // 2
+    print(f"\n{len(pages)} sayfa, {compared} tab karsilastirildi ({nonempty} dolu)")
+    print("SONUC: OK")
+
+
+def test_captured_pages():
+    """Kayitli gercek sayfalar: her odds blogu iki parser'da ayni, her sayfada en az bir dolu tab"""
+    pages = _captured_pages()
+    if not pages:
+        print("\ntests/fixtures/excapper/*.html yok - gercek sayfa karsilastirmasi ATLANDI "
+              "(scripts/capture_excapper_fixtures.py ile kaydedin)")
+        return
+    for html, tab_ids in pages:
+        graphs = extract_graphsdata_odds(html)
+        ids = set(re.findall(r"graphsData\[(\d+)\]\['odds'\]", html))
+        assert set(graphs) == ids
+        for nid in ids:
+            assert graphs[nid] == _old_parse_graphsdata_prev_odds(html, nid), nid
+        assert any(graphs.get(_graphs_id(t) or '') for t in tab_ids), tab_ids
+    print(f"\n{len(pages)} kayitli sayfa karsilastirildi")
+    print("SONUC: OK")
+
+
+def test_single_scan_per_block():
+    """Sayfa basina her odds blogu bir kez taranir; tab lookup'lari tekrar taramaz.
+    Sure sadece yazdirilir (eski: tab basina sayfa taramasi)."""
+    import excapper_scraper as es
+    pages = _corpus(150)
+    scans = []
+    orig = es._scan_datasets
+    es._scan_datasets = lambda html, start, end: scans.append(start) or orig(html, start, end)
+    try:
+        start = time.perf_counter()
+        expected = 0
+        for html, tab_ids in pages:
+            graphs = es.extract_graphsdata_odds(html)
+            for tab_id in tab_ids[:3]:
+                graphs.get(_graphs_id(tab_id) or '', {})
+            expected += len(set(re.findall(r"graphsData\[(\d+)\]\['odds'\]", html)))
+        new_elapsed = time.perf_counter() - start
+    finally:
+        es._scan_datasets = orig
+    assert len(scans) == expected
+
+    start = time.perf_counter()
+    for html, tab_ids in pages:
+        for tab_id in tab_ids[:3]:
+            _old_parse_graphsdata_prev_odds(html, tab_id)
+    old_elapsed = time.perf_counter() - start
+    print(f"\n{len(scans)} blok taramasi / {len(pages)} sayfa. Eski: {len(pages) / old_elapsed:.0f} sayfa/sn  "
+          f"Tek gecis: {len(pages) / new_elapsed:.0f} sayfa/sn")
+    print("SONUC: OK")
+
+if __name__ == '__main__':
+    test_identical_to_per_tab_parser()
+    test_captured_pages()
+    test_single_scan_per_block()
@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+"""
+History Multi Cursor Testleri
+get_match_history_multi: after cursor'u market basina, overlap ile
+(scraped_at=gte.cursor-overlap) okunur; gec commit edilen satir kacmaz,
+overlap'te tekrar gelen satirlar Id ile ayiklanabilir.
+Sahte PostgREST (bellek ici history tablolari) ile - ag yok
+"""
+
+import sys
+import os
+from datetime import datetime, timedelta, timezone
+from urllib.parse import parse_qs, urlparse
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from services.supabase_client import HISTORY_CURSOR_OVERLAP_SECONDS, SupabaseClient
+
+T0 = datetime(2026, 10, 18, 12, 0, tzinfo=timezone.utc)
+
+
+class _Resp:
+    def __init__(self, rows):
+        self.status_code = 200
+        self.text = ''
+        self._rows = rows
+
+    def json(self):
+        return [dict(r) for r in self._rows]
+
+
+class _FakeHttp:
+    """{market}_history tablolari: match_id_hash=in / scraped_at=gte / order / limit / offset."""
+
+    def __init__(self):
+        self.tables = {}
+        self.urls = []
+        self.next_id = 1
+
+    def add(self, market, seconds, match_hash='abc12345'):
+        self.tables.setdefault(f"{market}_history", []).append({
+            'id': self.next_id, 'match_id_hash': match_hash,
+            'scraped_at': (T0 + timedelta(seconds=seconds)).isoformat(), 'volume': str(self.next_id),
+        })
+        self.next_id += 1
+
+    def get(self, url, headers=None, timeout=None):
+        self.urls.append(url)
+        parsed = urlparse(url)
+        q = parse_qs(parsed.query)
+        rows = self.tables.get(parsed.path.rsplit('/', 1)[-1], [])
+        hashes = q['match_id_hash'][0][len('in.('):-1].split(',')
+        rows = [r for r in rows if r['match_id_hash'] in hashes]
+        if 'scraped_at' in q:
+            op, value = q['scraped_at'][0].split('.', 1)
+            assert op == 'gte'
+            cutoff = datetime.fromisoformat(value)
+            rows = [r for r in rows if datetime.fromisoformat(r['scraped_at']) >= cutoff]
+        assert q['order'][0] == 'scraped_at.asc,id.asc'
+        rows.sort(key=lambda r: (r['scraped_at'], r['id']))
+        offset, limit = int(q['offset'][0]), int(q['limit'][0])
+        return _Resp(rows[offset:offset + limit])
+
+
+def _client(http):
+    client = SupabaseClient.__new__(SupabaseClient)
+    client.url, client.key = 'https://x.supabase.co', 'k'
+    client._get_http_client = lambda: http
+    return client
+
+
+def test_late_commit_is_picked_up_per_market():
+    """Cursor'dan once zaman damgali ama sonra commit edilen satir overlap ile gelir; market cursor'lari ayri"""
+    http = _FakeHttp()
+    client = _client(http)
+    for s in (0, 30, 60):
+        http.add('moneyway_1x2', s)
+    http.add('dropping_1x2', 600)
+
+    first = client.get_match_history_multi(['abc12345'], ['moneyway_1x2', 'dropping_1x2'])
+    mw = first['abc12345']['moneyway_1x2']
+    assert [r['Id'] for r in mw] == [1, 2, 3]
+    cursors = {'moneyway_1x2': mw[-1]['ScrapedAt'],
+               'dropping_1x2': first['abc12345']['dropping_1x2'][-1]['ScrapedAt']}
+
+    # scraped_at=45 olan satir, 60'li satir okunduktan sonra commit edildi
+    http.add('moneyway_1x2', 45)
+    http.add('moneyway_1x2', 90)
+    second = client.get_match_history_multi(['abc12345'], ['moneyway_1x2', 'dropping_1x2'], after=cursors)
+    seen = {r['Id'] for r in mw}
+    new_rows = [r for r in second['abc12345']['moneyway_1x2'] if r['Id'] not in seen]
+    assert sorted(r['Id'] for r in new_rows) == [5, 6]
+    # dropping cursor'u (600 sn) moneyway cursor'undan bagimsiz: sadece kendi overlap'i tekrar gelir
+    assert [r['Id'] for r in second['abc12345']['dropping_1x2']] == [4]
+    assert all('gte.' in u for u in http.urls[-2:])
+    print("\nSONUC: OK")
+
+
+def test_overlap_is_bounded():
+    """Overlap disindaki eski satirlar tekrar cekilmez"""
+    http = _FakeHttp()
+    client = _client(http)
+    http.add('moneyway_ou25', 0)
+    http.add('moneyway_ou25', HISTORY_CURSOR_OVERLAP_SECONDS * 3)
+    after = (T0 + timedelta(seconds=HISTORY_CURSOR_OVERLAP_SECONDS * 3)).isoformat()
+    result = client.get_match_history_multi(['abc12345'], ['moneyway_ou25'], after=after)
+    assert [r['Id'] for r in result['abc12345']['moneyway_ou25']] == [2]
+    print("\nSONUC: OK")
+
+
+if __name__ == '__main__':
+    test_late_commit_is_picked_up_per_market()
+    test_overlap_is_bounded()
@@ -0,0 +1,352 @@
+#!/usr/bin/env python3
+"""
+Kart Uretici Cache Testleri
+Font cache (weight, size) + layout basina statik zemin: eski (her cagrida
+truetype + tum kart cizimi) implementasyonla piksel-piksel ayni cikti,
+font yukleme / zemin cizim sayilari (kart/sn sadece yazdirilir)
+Bagimsiz - ag yok (Pillow + pytz gerekli)
+"""
+
+import sys
+import os
+import random
+import time
+from io import BytesIO
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'desktop', 'scraper_standalone'))
+
+from PIL import Image, ImageChops, ImageDraw, ImageFont
+
+import image_generator
+from image_generator import (
+    generate_alarm_card, generate_bigmoney_card, get_font, draw_rounded_rect, format_kickoff,
+    format_money_uk, format_prev_datetime, format_tr_datetime,
+    BG_COLOR, CARD_BG, CARD_PADDING, CARD_WIDTH, FONTS_DIR, GREEN, HERO_BG_END, HERO_BG_START,
+    HERO_BORDER, LEFT_BORDER_WIDTH, ORANGE, TEXT_MUTED, TEXT_SECONDARY, TEXT_WHITE,
+)
+
+
+# ---- Eski implementasyon (referans) ----
+
+def _old_get_font(size, weight='regular'):
+    weight_map = {
+        'regular': 'Inter-Regular.ttf',
+        'medium': 'Inter-Medium.ttf',
+        'semibold': 'Inter-SemiBold.ttf',
+        'bold': 'Inter-Bold.ttf',
+        'extrabold': 'Inter-ExtraBold.ttf',
+    }
+
+    font_file = weight_map.get(weight, 'Inter-Regular.ttf')
+    font_path = os.path.join(FONTS_DIR, font_file)
+
+    fallback_paths = [
+        font_path,
+        os.path.join(os.path.dirname(__file__), 'fonts', font_file),
+        f"/tmp/inter/extras/ttf/{font_file}",
+        "/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf",
+    ]
+
+    for path in fallback_paths:
+        try:
+            return ImageFont.truetype(path, size)
+        except:
+            continue
+
+    return ImageFont.load_default()
+
+
+def _old_generate_bigmoney_card(
+    home_team: str,
+    away_team: str,
+    market: str,
+    selection: str,
+    current_money: float,
+    total_money: float = None,
+    alarm_time: str = None,
+    kickoff_utc: str = None,
+    previous_alarms: list = None,
+    multiplier: int = None
+) -> BytesIO:
+    prev_count = min(len(previous_alarms) if previous_alarms else 0, 4)
+
+    base_height = 14 + 30 + 12 + 22 + 8 + 20 + 12 + 80 + 12
+    kickoff_section = 24 if kickoff_utc else 0
+    total_section = 30 if total_money and total_money != current_money else 0
+    prev_section = (prev_count * 26 + 24) if prev_count > 0 else 0
+    multiplier_section = 24 if multiplier and multiplier > 1 else 0
+    cta_section = 48
+
+    card_height = base_height + kickoff_section + total_section + prev_section + multiplier_section + cta_section + 10
+
+    img = Image.new('RGB', (CARD_WIDTH, card_height), BG_COLOR)
+    draw = ImageDraw.Draw(img)
+
+    draw_rounded_rect(draw, (0, 0, CARD_WIDTH, card_height), 16, CARD_BG)
+
+    draw.rectangle([0, 8, LEFT_BORDER_WIDTH, card_height - 8], fill=ORANGE)
+
+    font_badge = _old_get_font(10, 'bold')
+    font_time = _old_get_font(12, 'regular')
+    font_match = _old_get_font(16, 'semibold')
+    font_market = _old_get_font(12, 'regular')
+    font_hero = _old_get_font(28, 'extrabold')
+    font_hero_label = _old_get_font(11, 'medium')
+    font_total_val = _old_get_font(14, 'semibold')
+    font_total_lbl = _old_get_font(11, 'medium')
+    font_prev_title = _old_get_font(10, 'medium')
+    font_prev = _old_get_font(12, 'regular')
+    font_mult = _old_get_font(11, 'bold')
+
+    y = 14
+
+    badge_text = "BIG MONEY"
+    badge_width = draw.textlength(badge_text, font=font_badge) + 16
+    badge_height = 20
+    badge_x = CARD_PADDING + LEFT_BORDER_WIDTH
+
+    badge_bg = (48, 35, 22)
+    draw_rounded_rect(draw, (badge_x, y, badge_x + badge_width, y + badge_height), 6, badge_bg)
+    draw.text((badge_x + 8, y + 4), badge_text, fill=ORANGE, font=font_badge)
+
+    if alarm_time:
+        time_str = format_tr_datetime(alarm_time)
+        time_width = draw.textlength(time_str, font=font_time)
+        draw.text((CARD_WIDTH - CARD_PADDING - time_width, y + 4), time_str, fill=TEXT_SECONDARY, font=font_time)
+
+    dot_x = CARD_WIDTH - CARD_PADDING - 40
+    draw.ellipse([dot_x, y + 6, dot_x + 8, y + 14], fill=ORANGE)
+
+    y += 30
+
+    y += 12
+    match_text = f"{home_team} – {away_team}"
+    draw.text((CARD_PADDING + LEFT_BORDER_WIDTH, y), match_text, fill=TEXT_WHITE, font=font_match)
+
+    y += 22
+
+    market_text = f"{market} · {selection}"
+    draw.text((CARD_PADDING + LEFT_BORDER_WIDTH, y), market_text, fill=TEXT_SECONDARY, font=font_market)
+
+    y += 16
+    y += 8
+
+    hero_margin = CARD_PADDING + LEFT_BORDER_WIDTH
+    hero_width = CARD_WIDTH - hero_margin - CARD_PADDING
+    hero_height = 70
+    hero_top = y
+    hero_bottom = y + hero_height
+    hero_radius = 8
+
+    hero_img = Image.new('RGBA', (hero_width, hero_height), (0, 0, 0, 0))
+    hero_draw = ImageDraw.Draw(hero_img)
+
+    for i in range(hero_height):
+        ratio = i / hero_height
+        r = int(HERO_BG_START[0] * (1 - ratio) + HERO_BG_END[0] * ratio)
+        g = int(HERO_BG_START[1] * (1 - ratio) + HERO_BG_END[1] * ratio)
+        b = int(HERO_BG_START[2] * (1 - ratio) + HERO_BG_END[2] * ratio)
+        hero_draw.line([(0, i), (hero_width, i)], fill=(r, g, b, 255))
+
+    mask = Image.new('L', (hero_width, hero_height), 0)
+    mask_draw = ImageDraw.Draw(mask)
+    mask_draw.rounded_rectangle([0, 0, hero_width, hero_height], radius=hero_radius, fill=255)
+
+    hero_img.putalpha(mask)
+    img.paste(hero_img, (hero_margin, hero_top), hero_img)
+
+    draw.rounded_rectangle([hero_margin, hero_top, hero_margin + hero_width, hero_bottom], radius=hero_radius, outline=HERO_BORDER, width=1)
+
+    display_money = total_money if total_money else current_money
+    money_text = format_money_uk(display_money)
+    money_width = draw.textlength(money_text, font=font_hero)
+    money_x = hero_margin + (hero_width - money_width) / 2
+    draw.text((money_x, hero_top + 14), money_text, fill=ORANGE, font=font_hero)
+
+    label_text = "Büyük Para Girişi"
+    label_width = draw.textlength(label_text, font=font_hero_label)
+    label_x = hero_margin + (hero_width - label_width) / 2
+    draw.text((label_x, hero_top + 48), label_text, fill=ORANGE, font=font_hero_label)
+
+    y = hero_bottom + 12
+
+    if total_money and total_money != current_money:
+        total_str = format_money_uk(total_money)
+        toplam_text = "Toplam"
+
+        total_val_width = draw.textlength(total_str, font=font_total_val)
+        toplam_width = draw.textlength(toplam_text, font=font_total_lbl)
+        combined_width = total_val_width + 8 + toplam_width
+        start_x = (CARD_WIDTH - combined_width) / 2
+
+        draw.text((start_x, y), total_str, fill=TEXT_SECONDARY, font=font_total_val)
+        draw.text((start_x + total_val_width + 8, y + 2), toplam_text, fill=GREEN, font=font_total_lbl)
+
+        y += 28
+
+    if previous_alarms and len(previous_alarms) > 0:
+        y += 4
+        draw.text((CARD_PADDING + LEFT_BORDER_WIDTH, y), "ÖNCEKİ", fill=TEXT_MUTED, font=font_prev_title)
+        y += 18
+
+        for prev in previous_alarms[:4]:
+            prev_time = format_prev_datetime(prev.get('time', ''))
+            prev_money = format_money_uk(prev.get('money', 0))
+
+            draw.ellipse([CARD_PADDING + LEFT_BORDER_WIDTH, y + 4, CARD_PADDING + LEFT_BORDER_WIDTH + 6, y + 10], fill=ORANGE)
+
+            draw.text((CARD_PADDING + LEFT_BORDER_WIDTH + 12, y), prev_time, fill=TEXT_SECONDARY, font=font_prev)
+
+            money_w = draw.textlength(prev_money, font=font_prev)
+            draw.text((CARD_WIDTH - CARD_PADDING - money_w, y), prev_money, fill=ORANGE, font=font_prev)
+
+            y += 26
+
+    if multiplier and multiplier > 1:
+        mult_text = f"x{multiplier}"
+        mult_width = draw.textlength(mult_text, font=font_mult) + 12
+        mult_height = 20
+        mult_x = CARD_WIDTH - CARD_PADDING - mult_width
+        mult_y = 14
+
+        mult_bg = (48, 35, 22)
+        draw_rounded_rect(draw, (mult_x, mult_y, mult_x + mult_width, mult_y + mult_height), 10, mult_bg)
+        draw.text((mult_x + 6, mult_y + 3), mult_text, fill=ORANGE, font=font_mult)
+
+    if kickoff_utc:
+        font_kickoff = _old_get_font(12, 'regular')
+        kickoff_str = format_kickoff(kickoff_utc)
+        draw.text((CARD_PADDING + LEFT_BORDER_WIDTH, y), kickoff_str, fill=TEXT_SECONDARY, font=font_kickoff)
+        y += 24
+
+    y += 8
+    btn_height = 36
+    btn_margin = CARD_PADDING + LEFT_BORDER_WIDTH
+    btn_left = btn_margin
+    btn_right = CARD_WIDTH - CARD_PADDING
+    btn_top = y
+    btn_bottom = y + btn_height
+
+    btn_bg = (30, 30, 32)
+    draw_rounded_rect(draw, (btn_left, btn_top, btn_right, btn_bottom), 8, btn_bg, (48, 54, 61), 1)
+
+    btn_text = "Maç Detayı"
+    font_btn = _old_get_font(12, 'semibold')
+    btn_text_width = draw.textlength(btn_text, font=font_btn)
+    btn_text_x = btn_left + (btn_right - btn_left - btn_text_width) / 2
+    draw.text((btn_text_x, btn_top + 10), btn_text, fill=ORANGE, font=font_btn)
+
+    arrow_x = btn_text_x + btn_text_width + 6
+    draw.text((arrow_x, btn_top + 10), "→", fill=ORANGE, font=font_btn)
+
+    buffer = BytesIO()
+    img.save(buffer, format='PNG', quality=95)
+    buffer.seek(0)
+
+    return buffer
+
+
+# ---- Korpus ----
+
+_TEAMS = ['Arsenal', 'Wolves', 'Manchester United', 'Borussia Mönchengladbach', 'Fenerbahçe', 'Beşiktaş',
+          'Paris Saint-Germain', 'Athletic Bilbao', 'Qarabağ', 'Göztepe', 'Çaykur Rizespor', 'AZ']
+
+
+def _cases(n=120):
+    rng = random.Random(11)
+    cases = []
+    for i in range(n):
+        money = rng.choice([850, 15000, 21462, 302078, 1250000, 9999999])
+        prev = [{'time': f"2025-12-{rng.randint(1, 28):02d}T{rng.randint(0, 23):02d}:{rng.randint(0, 59):02d}:00Z",
+                 'money': rng.randint(1000, 90000)} for _ in range(rng.choice([0, 0, 1, 2, 4, 6]))]
+        cases.append(dict(
+            home_team=rng.choice(_TEAMS), away_team=rng.choice(_TEAMS),
+            market=rng.choice(['1X2', 'O/U 2.5', 'BTTS']), selection=rng.choice(['1', 'X', '2', 'Over', 'Yes']),
+            current_money=money,
+            total_money=rng.choice([None, money, money * 3 + 17]),
+            alarm_time=rng.choice([None, f"2025-12-{rng.randint(1, 28):02d}T{rng.randint(0, 23):02d}:06:00Z"]),
+            kickoff_utc=rng.choice([None, '2025-12-13T20:00:00Z']),
+            previous_alarms=prev or rng.choice([None, []]),
+            multiplier=rng.choice([None, 1, 2, 5, 12]),
+        ))
+    return cases
+
+
+def _pixels(buf):
+    return Image.open(BytesIO(buf.getvalue())).convert('RGB')
+
+
+def test_pixel_identical_to_uncached_renderer():
+    """Her kombinasyonda cache'li kart eski kartla piksel-piksel ayni"""
+    cases = _cases()
+    for case in cases:
+        new = _pixels(generate_bigmoney_card(**case))
+        old = _pixels(_old_generate_bigmoney_card(**case))
+        assert new.size == old.size, case
+        assert ImageChops.difference(new, old).getbbox() is None, case
+    # generate_alarm_card (telegram_notifier yolu)
+    case = cases[0]
+    via_alarm = _pixels(generate_alarm_card('BIGMONEY', case['home_team'], case['away_team'], case['market'],
+                                            case['selection'], alarm_time=case['alarm_time'], money=5000))
+    old = _pixels(_old_generate_bigmoney_card(case['home_team'], case['away_team'], case['market'],
+                                              case['selection'], 5000, alarm_time=case['alarm_time']))
+    assert ImageChops.difference(via_alarm, old).getbbox() is None
+    print(f"\n{len(cases) + 1} kart piksel-piksel ayni")
+    print("SONUC: OK")
+
+
+def test_font_cache_is_shared():
+    """get_font ayni (weight, size) icin ayni nesneyi dondurur"""
+    assert get_font(12, 'regular') is get_font(12, 'regular')
+    assert get_font(12, 'regular') is not get_font(13, 'regular')
+    assert ('regular', 12) in image_generator._FONT_CACHE
+    print("\nSONUC: OK")
+
+
+class _CountingCache(dict):
+    """_BACKGROUND_CACHE yerine: setdefault = zemin cizildi (cache miss)."""
+
+    def __init__(self):
+        super().__init__()
+        self.builds = 0
+
+    def setdefault(self, key, value):
+        self.builds += 1
+        return super().setdefault(key, value)
+
+
+def test_cards_per_second():
+    """Alarm patlamasi: 60 kart, eski vs cache'li (PNG kodlama dahil); soguk = zemin cache'i bos.
+    Dogrulama font yukleme / zemin cizim sayilariyla; sureler sadece yazdirilir"""
+    cases = _cases(60)
+    loads = []
+    orig_truetype, orig_cache = ImageFont.truetype, image_generator._BACKGROUND_CACHE
+    ImageFont.truetype = lambda *a, **k: loads.append(a) or orig_truetype(*a, **k)
+    cache = image_generator._BACKGROUND_CACHE = _CountingCache()
+
+    def run(render):
+        loads.clear()
+        t0 = time.perf_counter()
+        for case in cases:
+            render(**case)
+        return time.perf_counter() - t0, len(loads)
+
+    try:
+        old_elapsed, old_loads = run(_old_generate_bigmoney_card)
+        cold_elapsed, _ = run(generate_bigmoney_card)
+        cold_builds = cache.builds
+        warm_elapsed, warm_loads = run(generate_bigmoney_card)
+    finally:
+        ImageFont.truetype, image_generator._BACKGROUND_CACHE = orig_truetype, orig_cache
+
+    print(f"\nEski: {len(cases) / old_elapsed:.0f} kart/sn  Cache'li: soguk {len(cases) / cold_elapsed:.0f} / "
+          f"sicak {len(cases) / warm_elapsed:.0f} kart/sn ({old_elapsed / warm_elapsed:.1f}x)")
+    # Eski yol her kartta fontlari diskten yukler; sicak cache'li yol hic yuklemez, zemini tekrar cizmez
+    assert old_loads >= len(cases) and warm_loads == 0
+    assert 0 < cold_builds == len(cache) < len(cases) and cache.builds == cold_builds
+    print("SONUC: OK")
+
+if __name__ == '__main__':
+    test_pixel_identical_to_uncached_renderer()
+    test_font_cache_is_shared()
+    test_cards_per_second()
@@ -0,0 +1,161 @@
+#!/usr/bin/env python3
+"""
+Kickoff Parse Cache Testleri
+core.timezone kickoff onbellegi: eski parse fonksiyonlariyla ayni sonuc +
+dongu basina parse sayisi (cache hit/miss) kontrolu
+Bagimsiz - dis bagimlilik yok
+"""
+
+import sys
+import os
+import re
+import time
+from datetime import datetime, timezone, timedelta
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from core.timezone import (TURKEY_TZ, now_turkey, kickoff_datetime, kickoff_epoch, snapshot_epoch,
+                           clear_kickoff_cache, kickoff_cache_info)
+import sinyal_engine as se
+
+
+# ---- Eski implementasyonlar (referans) ----
+
+def _old_app_parse_match_datetime(date_str):
+    if not date_str:
+        return None
+    today = now_turkey().date()
+    date_str = date_str.replace('  ', ' ').strip()
+    for fmt in ('%d.%b %H:%M:%S', '%d.%b%H:%M:%S', '%d.%m.%Y %H:%M', '%d.%m.%Y %H:%M:%S'):
+        try:
+            dt = datetime.strptime(date_str, fmt)
+            if '%Y' not in fmt:
+                dt = dt.replace(year=today.year)
+            return TURKEY_TZ.localize(dt)
+        except ValueError:
+            continue
+    return None
+
+
+_MONTHS = {'jan': 1, 'feb': 2, 'mar': 3, 'apr': 4, 'may': 5, 'jun': 6,
+           'jul': 7, 'aug': 8, 'sep': 9, 'oct': 10, 'nov': 11, 'dec': 12}
+
+
+def _old_parse_betwatch_date_to_utc(raw_date, now_utc):
+    if not raw_date:
+        return None
+    m = re.match(r'^\s*(\d{1,2})\.([A-Za-z]{3})\s+(\d{1,2}):(\d{2})(?::(\d{2}))?', str(raw_date))
+    if not m:
+        return None
+    month = _MONTHS.get(m.group(2).lower())
+    if not month:
+        return None
+    args = (month, int(m.group(1)), int(m.group(3)), int(m.group(4)), int(m.group(5)) if m.group(5) else 0)
+    try:
+        dt = datetime(now_utc.year, *args, tzinfo=timezone.utc)
+    except ValueError:
+        return None
+    if (dt - now_utc).total_seconds() < -7 * 86400:
+        dt = datetime(now_utc.year + 1, *args, tzinfo=timezone.utc)
+    return dt
+
+
+def _old_betwatch_to_iso_datetime(date_str):
+    from datetime import date as _d
+    try:
+        s = str(date_str)
+        m = re.search(r'(\d{2})\.(\w{3})', s)
+        if m:
+            months = {k.capitalize(): v for k, v in _MONTHS.items()}
+            mon = months.get(m.group(2).capitalize(), 0)
+            if mon:
+                iso_date = _d(_d.today().year, mon, int(m.group(1))).isoformat()
+                t = re.search(r'(\d{2}):(\d{2})(?::\d{2})?', s)
+                if t:
+                    return f"{iso_date}T{t.group(1)}:{t.group(2)}:00+03:00"
+                return iso_date
+    except Exception:
+        pass
+    return str(date_str)[:10] if date_str else ''
+
+
+def _kickoff_corpus(n=300):
+    months = ['Jan', 'Feb', 'Mar', 'Apr', 'May', 'Jun', 'Jul', 'Aug', 'Sep', 'Oct', 'Nov', 'Dec']
+    out = []
+    for i in range(n):
+        day = 1 + i % 28
+        mon = months[i % 12]
+        hour, minute = 10 + i % 12, (i * 15) % 60
+        out.append(f"{day:02d}.{mon} {hour:02d}:{minute:02d}:00")
+    return out
+
+
+def test_parity_with_old_parsers():
+    """Yeni onbellekli yollar eski parse sonuclariyla ayni"""
+    betwatch = _kickoff_corpus() + ['08.Apr', '', 'bozuk', '2026-04-08T14:00:00+03:00', '31.Feb 10:00:00']
+    extra = ['03.Dec17:00:00', '03.12.2025 17:00', ' 5.Jan  09:30:00']
+    now_utc = datetime.now(timezone.utc)
+    for raw in betwatch + extra:
+        old = _old_app_parse_match_datetime(raw)
+        if old is not None:
+            assert kickoff_datetime(raw) == old, raw
+            assert kickoff_epoch(raw) == int(old.timestamp()), raw
+    for raw in betwatch:
+        assert se._parse_betwatch_date_to_utc(raw, now_utc) == _old_parse_betwatch_date_to_utc(raw, now_utc), raw
+        assert se._betwatch_to_iso_datetime(raw) == _old_betwatch_to_iso_datetime(raw), raw
+    # Bitisik / sayisal formatlar artik sinyal tarafinda da taniniyor
+    assert se._parse_betwatch_date_to_utc('03.Dec17:00:00', now_utc).hour == 17
+
+    for ts in ('2026-10-18T10:00:00', '2026-10-18T07:00:00Z', '2026-10-18T10:00:00.5+03:00',
+               '2026-10-18 10:00:00'):
+        dt = datetime.fromisoformat(ts.replace('Z', '+00:00'))
+        if dt.tzinfo is None:
+            dt = TURKEY_TZ.localize(dt)
+        assert snapshot_epoch(ts) == int(dt.timestamp()), ts
+    assert snapshot_epoch('bozuk') is None
+    print("\nSONUC: OK")
+
+
+def test_cycle_benchmark():
+    """Bir dongu: 300 mac x 3 market x 3 secim x 20 snapshot kickoff kontrolu.
+    Sure sadece yazdirilir; dogrulama parse sayilariyla (cache hit/miss) yapilir."""
+    kickoffs = _kickoff_corpus()
+    base = datetime(2026, 10, 18, 8, 0)
+    snaps = [(base + timedelta(minutes=10 * i)).strftime('%Y-%m-%dT%H:%M:%S') for i in range(20)]
+    reps = 3 * 3
+
+    start = time.perf_counter()
+    for ko in kickoffs:
+        for _ in range(reps):
+            kick = _old_app_parse_match_datetime(ko)
+            for ts in snaps:
+                snap_dt = TURKEY_TZ.localize(datetime.fromisoformat(ts))
+                _ = (kick - snap_dt).total_seconds() / 3600.0
+    old_elapsed = time.perf_counter() - start
+
+    clear_kickoff_cache()
+    start = time.perf_counter()
+    for ko in kickoffs:
+        for _ in range(reps):
+            kick = kickoff_epoch(ko)
+            for ts in snaps:
+                _ = (kick - snapshot_epoch(ts)) / 3600.0
+    new_elapsed = time.perf_counter() - start
+
+    info = kickoff_cache_info()
+    print(f"\nEski: {old_elapsed * 1000:.1f}ms  Onbellekli: {new_elapsed * 1000:.1f}ms  "
+          f"({old_elapsed / max(new_elapsed, 1e-9):.1f}x)")
+    print(f"Kickoff cache: {info['kickoff']}  Snapshot cache: {info['snapshot']}")
+    calls = len(kickoffs) * reps
+    # Her kickoff string'i bir kez parse edilir, kalan cagrilar cache'ten
+    assert info['kickoff']['misses'] == info['fields']['misses'] == len(set(kickoffs))
+    assert info['kickoff']['hits'] == calls - len(set(kickoffs))
+    # Snapshot string'leri dongu basina bir kez parse edilir (eski yol: calls * len(snaps))
+    assert info['snapshot']['misses'] == len(snaps)
+    assert info['snapshot']['hits'] == calls * len(snaps) - len(snaps)
+    print("SONUC: OK")
+
+
+if __name__ == '__main__':
+    test_parity_with_old_parsers()
+    test_cycle_benchmark()
@@ -0,0 +1,111 @@
+#!/usr/bin/env python3
+"""
+get_matches_paginated Testleri
+Keyset sayfalama kickoff_utc'si olmayan eski fixture'lari dusurmez: once
+kickoff_utc sirali maclar, sonra kickoff_utc'siz olanlar (fixture_date sirali)
+gelir; bunlarin tarihi history'nin eski date kolonundan gosterilir.
+Sahte PostgREST (bellek ici fixtures tablosu) ile - ag yok
+"""
+
+import sys
+import os
+import re
+from datetime import datetime, timedelta
+from urllib.parse import parse_qs, urlparse
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from services.supabase_client import SupabaseClient
+
+
+class _Resp:
+    def __init__(self, rows, total):
+        self.status_code = 200
+        self.text = ''
+        self.headers = {'Content-Range': f"0-{len(rows) - 1}/{total}"}
+        self._rows = rows
+
+    def json(self):
+        return [dict(r) for r in self._rows]
+
+
+def _unquote(v):
+    return v[1:-1] if v.startswith('"') else v
+
+
+class _FakeFixtures:
+    """fixtures: fixture_date=gte / kickoff_utc=is.null / get_matches_paginated'in or=(...) keyset filtreleri."""
+
+    def __init__(self, rows):
+        self.rows = rows
+        self.urls = []
+
+    def _keyset(self, expr, row):
+        m = re.fullmatch(r'\(kickoff_utc\.gt\.(.+),and\(kickoff_utc\.eq\.(.+),match_id_hash\.gt\.(.+)\),kickoff_utc\.is\.null\)', expr)
+        if m:
+            k, h = _unquote(m.group(1)), m.group(3)
+            ko = row['kickoff_utc']
+            return ko is None or ko > k or (ko == k and row['match_id_hash'] > h)
+        m = re.fullmatch(r'\(fixture_date\.gt\.(.+),and\(fixture_date\.eq\.(.+),match_id_hash\.gt\.(.+)\)\)', expr)
+        assert m, expr
+        d, h = _unquote(m.group(1)), m.group(3)
+        return row['fixture_date'] > d or (row['fixture_date'] == d and row['match_id_hash'] > h)
+
+    def get(self, url, headers=None, timeout=None):
+        self.urls.append(url)
+        q = parse_qs(urlparse(url).query)
+        assert q['order'][0] == 'kickoff_utc.asc.nullslast,fixture_date.asc,match_id_hash.asc'
+        rows = [r for r in self.rows if r['fixture_date'] >= q['fixture_date'][0][len('gte.'):]]
+        total = len(rows)
+        if 'kickoff_utc' in q:
+            assert q['kickoff_utc'][0] == 'is.null'
+            rows = [r for r in rows if r['kickoff_utc'] is None]
+        if 'or' in q:
+            rows = [r for r in rows if self._keyset(q['or'][0], r)]
+        rows.sort(key=lambda r: (r['kickoff_utc'] is None, r['kickoff_utc'] or '', r['fixture_date'], r['match_id_hash']))
+        return _Resp(rows[:int(q['limit'][0])], total)
+
+
+def _fixtures():
+    day = datetime.now().date()
+    rows = []
+    for i in range(7):
+        ko = f"{day + timedelta(days=i % 3)}T1{i}:00:00+00:00"
+        rows.append({'match_id_hash': f"{i:08x}a", 'home_team': f"H{i}", 'away_team': f"A{i}", 'league': 'L',
+                     'kickoff_utc': ko, 'fixture_date': ko[:10]})
+    for i in range(5):
+        rows.append({'match_id_hash': f"{i:08x}b", 'home_team': f"Legacy{i}", 'away_team': f"X{i}", 'league': 'L',
+                     'kickoff_utc': None, 'fixture_date': str(day + timedelta(days=i % 2))})
+    return rows
+
+
+def test_fixtures_without_kickoff_are_paged_last():
+    """Tum fixture'lar tam bir kez gelir; kickoff_utc'sizler sonda, tarihleri eski date kolonundan"""
+    fixtures = _fixtures()
+    http = _FakeFixtures(fixtures)
+    client = SupabaseClient.__new__(SupabaseClient)
+    client.url, client.key = 'https://x.supabase.co', 'k'
+    client._get_http_client = lambda: http
+    client.get_latest_snapshots = lambda market, hashes: {
+        h: {'latest': {'match_id_hash': h, 'date': '20.Oct 18:00:00', 'odds1': '1.50'}} for h in hashes if h.endswith('b')}
+
+    seen, cursor, pages = [], None, 0
+    while True:
+        result = client.get_matches_paginated('moneyway_1x2', limit=3, cursor=cursor)
+        seen.extend(result['matches'])
+        pages += 1
+        if not result['has_more']:
+            break
+        cursor = result['next_cursor']
+    hashes = [m['match_id_hash'] for m in seen]
+    assert len(hashes) == len(set(hashes)) == len(fixtures) and pages == 4
+    assert all(h.endswith('a') for h in hashes[:7]) and all(h.endswith('b') for h in hashes[7:])
+    legacy = seen[7:]
+    assert [m['kickoff_utc'] for m in legacy] == [''] * 5
+    assert all(m['date'] == '20.Oct 18:00:00' for m in legacy)
+    assert any('kickoff_utc=is.null' in u for u in http.urls)
+    print("\nSONUC: OK")
+
+
+if __name__ == '__main__':
+    test_fixtures_without_kickoff_are_paged_last()
@@ -0,0 +1,173 @@
+#!/usr/bin/env python3
+"""
+RecentHistoryCache Testleri
+Ilk cagrida tam yukleme, sonra sadece cursor sonrasi satirlar; overlap
+tekillestirme, pencere disi trim, gap'te tam reload; (scraped_at, id) keyset
+sayfalama sunucunun 1000 satir sinirinda satir kacirmaz
+Sahte PostgREST (bellek ici history tablosu, max-rows 1000) ile - ag yok
+"""
+
+import sys
+import os
+import re
+from datetime import datetime, timezone
+from urllib.parse import urlparse, parse_qs
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+import sinyal_engine as se
+
+
+class _Resp:
+    def __init__(self, rows):
+        self.status_code = 200
+        self._rows = rows
+        self.text = ''
+
+    def json(self):
+        return [dict(r) for r in self._rows]
+
+
+class _FakeHistory:
+    """moneyway_1x2_history: scraped_at=gte / order=(scraped_at,id) / or=(keyset) / limit (max-rows kirpar)."""
+
+    MAX_ROWS = 1000
+
+    def __init__(self):
+        self.rows = []
+        self.calls = []
+
+    def add(self, ts, match, pct='80'):
+        self.rows.append({
+            'id': len(self.rows) + 1,
+            'home': f'H{match}', 'away': f'A{match}', 'date': '20.Oct 18:00:00', 'league': 'L',
+            'match_id_hash': f'hash{match}', 'pct1': pct, 'volume': '6000',
+            'scraped_at': datetime.fromtimestamp(ts, tz=timezone.utc).isoformat(),
+        })
+
+    def get(self, url, headers=None, timeout=None):
+        q = parse_qs(urlparse(url).query)
+        since = se._parse_created_at(q['scraped_at'][0][len('gte.'):])
+        order = q['order'][0]
+        desc = order == 'scraped_at.desc,id.desc'
+        assert desc or order == 'scraped_at.asc,id.asc', order
+        key = lambda r: (se._parse_created_at(r['scraped_at']), r['id'])
+        rows = [r for r in self.rows if se._parse_created_at(r['scraped_at']) >= since]
+        if 'or' in q:
+            m = re.fullmatch(r'\(scraped_at\.(lt|gt)\."(.+)",and\(scraped_at\.eq\."(.+)",id\.(lt|gt)\.(\d+)\)\)', q['or'][0])
+            last = (se._parse_created_at(m.group(2)), int(m.group(5)))
+            rows = [r for r in rows if (key(r) < last if desc else key(r) > last)]
+        rows.sort(key=key, reverse=desc)
+        limit = min(int(q['limit'][0]), self.MAX_ROWS, se.POSTGREST_MAX_ROWS)
+        self.calls.append('desc' if desc else 'asc')
+        return _Resp(rows[:limit])
+
+
+def _with_fake(fn):
+    db = _FakeHistory()
+    orig_get, orig_time = se.requests.get, se.time.time
+    clock = [1_800_000_000.0]
+    se.requests.get = db.get
+    se.time.time = lambda: clock[0]
+    try:
+        fn(db, clock)
+    finally:
+        se.requests.get, se.time.time = orig_get, orig_time
+
+
+def test_incremental_overlap_and_trim():
+    """Ikinci senkron sadece yeni satirlari ceker, overlap tekrar eklenmez, eskiler atilir"""
+    def body(db, clock):
+        now = clock[0]
+        for m in range(3):
+            for k in range(6):
+                db.add(now - 3600 * k, m)
+        db.add(now - se.RECENT_HISTORY_WINDOW - 60, 9)   # pencere disi
+        cache = se.RecentHistoryCache()
+        assert cache.sync() and db.calls == ['desc']
+        assert len(cache.rows) == 18
+
+        clock[0] += 600
+        for m in range(3):
+            db.add(clock[0] - 30, m)
+        assert cache.sync() and db.calls == ['desc', 'asc']
+        assert cache.stats['incremental'] == 1
+        assert len(cache.rows) == 21     # overlap'te gelen eski satirlar tekrar eklenmedi
+
+        clock[0] += 5 * 3600 + 10
+        assert cache.sync()
+        # 5sa ileri: 5sa'ten eski satirlar pencere disina dustu
+        cutoff = clock[0] - se.RECENT_HISTORY_WINDOW
+        assert all(ts >= cutoff for ts, _ in cache.rows.values())
+        assert cache.stats['trimmed'] > 0
+        assert db.calls.count('desc') == 1
+    _with_fake(body)
+    print("\nSONUC: OK")
+
+
+def test_gap_triggers_full_reload():
+    """Pencereden uzun sure senkron yok / sayfa siniri asildi -> tam reload"""
+    def body(db, clock):
+        db.add(clock[0] - 60, 1)
+        cache = se.RecentHistoryCache()
+        assert cache.sync()
+        clock[0] += se.RECENT_HISTORY_WINDOW + 60
+        db.add(clock[0] - 10, 2)
+        assert cache.sync()
+        assert db.calls == ['desc', 'desc'] and cache.stats['full'] == 2
+
+        orig_page, orig_pages = se.POSTGREST_MAX_ROWS, se.RECENT_HISTORY_MAX_PAGES
+        se.POSTGREST_MAX_ROWS, se.RECENT_HISTORY_MAX_PAGES = 2, 2
+        try:
+            clock[0] += 600
+            for k in range(6):
+                db.add(clock[0] - k, 3)
+            n_calls = len(db.calls)
+            assert cache.sync()
+        finally:
+            se.POSTGREST_MAX_ROWS, se.RECENT_HISTORY_MAX_PAGES = orig_page, orig_pages
+        # 2 artimli sayfa doldu -> gap -> tam reload (7 satir / 2'lik sayfa = 4 istek)
+        assert db.calls[n_calls:] == ['asc', 'asc', 'desc', 'desc', 'desc', 'desc'] and cache.stats['full'] == 3
+        assert len(cache.rows) == 7
+    _with_fake(body)
+    print("\nSONUC: OK")
+
+
+def test_server_row_cap_and_equal_timestamps():
+    """Sunucu 1000 satirda keser: ayni scraped_at'li 2.500 yeni satirin hepsi keyset sayfalarla gelir"""
+    def body(db, clock):
+        db.add(clock[0] - 60, 1)
+        cache = se.RecentHistoryCache()
+        assert cache.sync()
+        clock[0] += 600
+        for m in range(2500):
+            db.add(clock[0] - 5, 100 + m)       # hepsi ayni zaman damgasi
+        assert cache.sync()
+        assert db.calls[1:] == ['asc', 'asc', 'asc'] and cache.stats['incremental'] == 1
+        assert len(cache.rows) == 2501
+    _with_fake(body)
+    print("\nSONUC: OK")
+
+
+def test_fetch_recent_history_grouping():
+    """fetch_recent_history: hash + composite alias ayni liste, en yeni once"""
+    def body(db, clock):
+        for k in range(4):
+            db.add(clock[0] - 600 * k, 1, pct=str(80 + k))
+        orig = se._RECENT_HISTORY
+        se._RECENT_HISTORY = se.RecentHistoryCache()
+        try:
+            history = se.fetch_recent_history()
+        finally:
+            se._RECENT_HISTORY = orig
+        assert history['hash1'] is history['H1|A1|20.Oct 18:00:00']
+        assert [r['pct1'] for r in history['hash1']] == ['80', '81', '82', '83']
+    _with_fake(body)
+    print("\nSONUC: OK")
+
+
+if __name__ == '__main__':
+    test_incremental_overlap_and_trim()
+    test_gap_triggers_full_reload()
+    test_server_row_cap_and_equal_timestamps()
+    test_fetch_recent_history_grouping()
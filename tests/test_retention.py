@@ -0,0 +1,447 @@
+#!/usr/bin/env python3
+"""
+Retention Testleri
+Chunk'li silme: hicbir chunk sure butcesini asmaz, 57014'te chunk kuculur,
+calistirma butcesi dolunca kaldigi yerden devam eder, RPC yoksa eski yola duser.
+Sahte PostgREST + sahte saat ile bagimsiz. Her silme hedefinin (tablo, kolon)
+migration'larda indeksi olmali (chunk alt sorgusu o kolona gore siralar).
+SMARTXFLOW_TEST_PG_DSN verilirse (bos bir test veritabani) chunk butcesi ve gun
+partition'ina tasimada PK / UNIQUE korunmasi gercek PostgreSQL uzerinde de denenir.
+"""
+
+import sys
+import os
+import re
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+import core.retention as retention
+from core.retention import ChunkedRetention, RetentionTarget
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+MIGRATION = os.path.join(ROOT, 'migrations', '2026_10_18_retention_chunked_delete.sql')
+PARTITION_MIGRATION = os.path.join(ROOT, 'migrations', '2026_10_18_retention_day_partitions.sql')
+
+
+class _Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.now += seconds
+
+
+class _Resp:
+    def __init__(self, status_code, body=None, text=''):
+        self.status_code = status_code
+        self._body = body
+        self.text = text
+        self.headers = {}
+
+    def json(self):
+        return self._body
+
+
+class _FakeRest:
+    """retention_delete_chunk + retention_progress taklidi.
+
+    Chunk maliyeti: 20ms + satir basina 0.05ms (+ tablo basina carpan).
+    statement_timeout_ms'i asan chunk 57014 ile reddedilir (hicbir satir silinmez).
+    """
+
+    def __init__(self, clock, tables, statement_timeout_ms=8000, rpc=True, progress_table=True, slow=None):
+        self.clock = clock
+        self.tables = dict(tables)
+        self.statement_timeout_ms = statement_timeout_ms
+        self.rpc = rpc
+        self.progress_table = progress_table
+        self.slow = slow or {}
+        self.progress = {}
+        self.chunks = []
+        self.timeouts = 0
+
+    def post(self, url, headers=None, json=None, timeout=None, **kwargs):
+        if url.endswith('/rpc/retention_drop_partitions'):
+            return _Resp(404, text='{"code":"PGRST202"}')
+        if url.endswith('/rpc/retention_delete_chunk'):
+            if not self.rpc:
+                return _Resp(404, text='{"code":"PGRST202"}')
+            table, limit = json['p_table'], json['p_limit']
+            cost_ms = (20 + 0.05 * limit) * self.slow.get(table, 1.0)
+            if cost_ms > self.statement_timeout_ms:
+                self.clock.now += self.statement_timeout_ms / 1000
+                self.timeouts += 1
+                return _Resp(500, text='{"code":"57014","message":"canceling statement due to statement timeout"}')
+            self.clock.now += cost_ms / 1000
+            n = min(limit, self.tables.get(table, 0))
+            self.tables[table] = self.tables.get(table, 0) - n
+            self.chunks.append((table, limit, n, cost_ms))
+            return _Resp(200, n)
+        if '/retention_progress' in url:
+            if not self.progress_table:
+                return _Resp(404)
+            for row in json:
+                self.progress[row['table_name']] = dict(row)
+            return _Resp(201)
+        raise AssertionError(url)
+
+    def get(self, url, headers=None, timeout=None, **kwargs):
+        assert '/retention_progress' in url
+        if not self.progress_table:
+            return _Resp(404)
+        return _Resp(200, list(self.progress.values()))
+
+
+def _cleaner(rest, clock, **kwargs):
+    return ChunkedRetention('https://x.supabase.co', lambda: {'apikey': 'k'}, rest,
+                            clock=clock, sleep=clock.sleep, log=lambda m: None, **kwargs)
+
+
+def test_no_chunk_exceeds_budget():
+    """200k satir: chunk boyu butceye gore buyur, hicbir chunk butceyi asmaz"""
+    retention._LOCAL_PROGRESS.clear()
+    clock = _Clock()
+    rest = _FakeRest(clock, {'live_snapshots': 200000, 'moneyway_1x2_history': 35000})
+    cleaner = _cleaner(rest, clock, chunk_budget_ms=1500)
+    deleted = cleaner.run([RetentionTarget('live_snapshots', 'snapshot_at', '2026-10-10'),
+                           RetentionTarget('moneyway_1x2_history', 'scraped_at', '2026-10-10T00:00:00')])
+    assert deleted == {'live_snapshots': 200000, 'moneyway_1x2_history': 35000}
+    assert rest.tables['live_snapshots'] == 0
+    worst = max(c[3] for c in rest.chunks)
+    assert worst <= 1500, worst
+    assert max(c[1] for c in rest.chunks) > retention.INITIAL_CHUNK_ROWS
+    report = cleaner.report['live_snapshots']
+    assert report['status'] == 'done' and report['mode'] == 'chunked'
+    assert rest.progress['live_snapshots']['status'] == 'done'
+    print(f"\n{len(rest.chunks)} chunk, en uzun {worst:.0f}ms, "
+          f"chunk boyu {min(c[1] for c in rest.chunks)}..{max(c[1] for c in rest.chunks)}")
+    print("SONUC: OK")
+
+
+def test_statement_timeout_shrinks_chunk():
+    """57014 alan chunk yariya iner; sonunda tablo biter"""
+    retention._LOCAL_PROGRESS.clear()
+    clock = _Clock()
+    rest = _FakeRest(clock, {'moneyway_snapshots': 20000}, statement_timeout_ms=300,
+                     slow={'moneyway_snapshots': 4.0})
+    retention._LOCAL_PROGRESS['moneyway_snapshots'] = {'table_name': 'moneyway_snapshots', 'chunk_rows': 8000}
+    cleaner = _cleaner(rest, clock, chunk_budget_ms=250)
+    deleted = cleaner.run([('moneyway_snapshots', 'scraped_at_utc', '2026-10-10')])
+    assert rest.timeouts >= 1
+    assert deleted['moneyway_snapshots'] == 20000
+    assert all(c[3] <= 300 for c in rest.chunks)
+    print("\nSONUC: OK")
+
+
+def test_run_budget_and_resume():
+    """Butce dolunca yarim kalan tablo bir sonraki calistirmada once ve ogrenilmis chunk ile devam eder"""
+    retention._LOCAL_PROGRESS.clear()
+    clock = _Clock()
+    rest = _FakeRest(clock, {'live_snapshots': 400000, 'fixtures': 500})
+    targets = [('fixtures', 'fixture_date', '2026-10-10'), ('live_snapshots', 'snapshot_at', '2026-10-10')]
+
+    first = _cleaner(rest, clock, chunk_budget_ms=1000, run_budget=5)
+    first.run(targets)
+    assert first.report['fixtures']['status'] == 'done'
+    assert first.report['live_snapshots']['status'] == 'partial'
+    assert first.pending == ['live_snapshots']
+    left = rest.tables['live_snapshots']
+    assert 0 < left < 400000
+    learned = rest.progress['live_snapshots']['chunk_rows']
+    assert learned > retention.INITIAL_CHUNK_ROWS
+
+    rest.chunks.clear()
+    second = _cleaner(rest, clock, chunk_budget_ms=1000, run_budget=600)
+    deleted = second.run(targets)
+    # Yarim kalan tablo listenin basina alinir ve ogrenilen boyla baslar
+    assert list(second.report)[0] == 'live_snapshots'
+    assert rest.chunks[0][1] == learned
+    assert deleted['live_snapshots'] == left and rest.tables['live_snapshots'] == 0
+    assert second.pending == []
+    print("\nSONUC: OK")
+
+
+def test_progress_without_table_and_legacy_fallback():
+    """retention_progress / RPC yoksa: process ici progress + eski tek-statement silme"""
+    retention._LOCAL_PROGRESS.clear()
+    clock = _Clock()
+    rest = _FakeRest(clock, {'sharp_alarms': 42, 'mim_alarms': 3}, rpc=False, progress_table=False)
+    calls = []
+
+    def legacy(table, column, cutoff):
+        calls.append((table, column, cutoff))
+        return rest.tables.pop(table, 0)
+
+    cleaner = _cleaner(rest, clock, legacy_delete=legacy)
+    deleted = cleaner.run([('sharp_alarms', 'match_date', '2026-10-11'), ('mim_alarms', 'match_date', '2026-10-11')])
+    assert deleted == {'sharp_alarms': 42, 'mim_alarms': 3}
+    assert calls == [('sharp_alarms', 'match_date', '2026-10-11'), ('mim_alarms', 'match_date', '2026-10-11')]
+    assert all(s['mode'] == 'legacy' for s in cleaner.report.values())
+    assert retention._LOCAL_PROGRESS['sharp_alarms']['status'] == 'done'
+    print("\nSONUC: OK")
+
+
+def _retention_targets():
+    """cleanup_old_matches + cleanup_old_alarms'in sildigi (tablo, kolon) ciftleri."""
+    import services.supabase_client as sc
+    sys.path.insert(0, os.path.join(ROOT, 'desktop', 'scraper_standalone'))
+    import alarm_calculator as ac
+
+    seen = []
+
+    class _Recorder:
+        def __init__(self, *args, **kwargs):
+            self.report, self.pending = {}, []
+
+        def run(self, targets):
+            seen.extend((t[0], t[1]) for t in targets)
+            return {}
+
+    orig = sc.ChunkedRetention, ac.ChunkedRetention
+    sc.ChunkedRetention = ac.ChunkedRetention = _Recorder
+    try:
+        client = sc.SupabaseClient.__new__(sc.SupabaseClient)
+        client.url, client.key = 'https://x.supabase.co', 'k'
+        client.cleanup_old_matches('2026-10-10')
+        calc = ac.AlarmCalculator.__new__(ac.AlarmCalculator)
+        calc.url, calc.key = 'https://x.supabase.co', 'k'
+        calc.cleanup_old_alarms()
+    finally:
+        sc.ChunkedRetention, ac.ChunkedRetention = orig
+    return seen
+
+
+def _indexed_columns():
+    """migrations/ + sql/ icindeki CREATE INDEX'lerin (tablo, ilk kolon) ciftleri."""
+    found = set()
+    for folder in ('migrations', 'sql'):
+        for name in os.listdir(os.path.join(ROOT, folder)):
+            if not name.endswith('.sql'):
+                continue
+            text = open(os.path.join(ROOT, folder, name), encoding='utf-8').read()
+            for m in re.finditer(r'CREATE\s+(?:UNIQUE\s+)?INDEX\s+(?:IF\s+NOT\s+EXISTS\s+)?\w+\s+'
+                                 r'ON\s+(?:public\.)?(\w+)\s*(?:USING\s+\w+\s*)?\(\s*(\w+)', text, re.I):
+                found.add((m.group(1), m.group(2)))
+    # retention migration'indaki DO blogu: ('tablo', 'kolon', 'indeks') satirlari
+    text = open(MIGRATION, encoding='utf-8').read()
+    found.update(re.findall(r"\('(\w+)',\s*'(\w+)',\s*'idx_\w+'\)", text))
+    return found
+
+
+def test_every_target_column_is_indexed():
+    """retention_delete_chunk ORDER BY <kolon> LIMIT n: her hedefin silme kolonunda indeks var"""
+    targets = _retention_targets()
+    assert ('moneyway_1x2', 'date') in targets and ('fixtures', 'fixture_date') in targets
+    assert ('sharp_alarms', 'match_date') in targets
+    indexed = _indexed_columns()
+    missing = sorted(set(targets) - indexed)
+    assert not missing, missing
+    print("\nSONUC: OK")
+
+
+def test_every_target_is_whitelisted():
+    """retention_delete_chunk bilinmeyen tabloyu reddeder: her hedef whitelist'te (match_latest_snapshots dahil)"""
+    targets = _retention_targets()
+    assert ('match_latest_snapshots', 'latest_scraped_at') in targets
+    text = open(MIGRATION, encoding='utf-8').read()
+    block = re.search(r'IF p_table NOT IN \((.*?)\) THEN', text, re.S).group(1)
+    whitelist = set(re.findall(r"'(\w+)'", block))
+    missing = sorted({t for t, _ in targets} - whitelist)
+    assert not missing, missing
+    print("\nSONUC: OK")
+
+
+# ---- Yerel PostgreSQL ----
+
+class _PgRest:
+    """PostgREST yerine psycopg: RPC'yi statement_timeout = chunk butcesi ile cagirir."""
+
+    def __init__(self, conn, statement_timeout_ms):
+        self.conn = conn
+        self.statement_timeout_ms = statement_timeout_ms
+        self.durations = []
+
+    def post(self, url, headers=None, json=None, timeout=None, **kwargs):
+        name = url.rsplit('/', 1)[-1]
+        if name != 'retention_delete_chunk':
+            return _Resp(404, text='{"code":"PGRST202"}')
+        cur = self.conn.cursor()
+        try:
+            cur.execute(f"SET statement_timeout = {int(self.statement_timeout_ms)}")
+            t0 = time.perf_counter()
+            cur.execute("SELECT public.retention_delete_chunk(%s, %s, %s, %s)",
+                        (json['p_table'], json['p_column'], json['p_cutoff'], json['p_limit']))
+            count = cur.fetchone()[0]
+            self.conn.commit()
+            self.durations.append((time.perf_counter() - t0) * 1000)
+            return _Resp(200, count)
+        except Exception as e:
+            self.conn.rollback()
+            code = getattr(e, 'pgcode', None) or getattr(e, 'sqlstate', None) or ''
+            return _Resp(500, text=f'{{"code":"{code}","message":"{e}"}}')
+
+    def get(self, url, headers=None, timeout=None, **kwargs):
+        return _Resp(404)
+
+
+def _pg_connect(dsn):
+    try:
+        import psycopg2
+        return psycopg2.connect(dsn)
+    except ImportError:
+        import psycopg
+        return psycopg.connect(dsn)
+
+
+def test_local_postgres_chunks_within_budget():
+    """Gercek PostgreSQL: 300k live_snapshots satiri, hicbir chunk butceyi asmaz"""
+    dsn = os.environ.get('SMARTXFLOW_TEST_PG_DSN')
+    if not dsn:
+        print("\nSMARTXFLOW_TEST_PG_DSN yok - yerel PostgreSQL testi ATLANDI")
+        return
+    try:
+        conn = _pg_connect(dsn)
+    except ImportError:
+        print("\npsycopg2/psycopg yok - yerel PostgreSQL testi ATLANDI")
+        return
+
+    budget_ms = 500
+    sql = open(MIGRATION, encoding='utf-8').read()
+    # Sadece fonksiyon + progress tablosu; Supabase rolleri yerelde olmayabilir
+    sql = re.sub(r'^(GRANT|ALTER TABLE|DROP POLICY|CREATE POLICY|CREATE INDEX).*?;\s*$', '', sql,
+                 flags=re.M | re.S)
+    cur = conn.cursor()
+    cur.execute("""
+        DROP TABLE IF EXISTS public.live_snapshots;
+        CREATE TABLE public.live_snapshots (
+            id BIGSERIAL PRIMARY KEY,
+            match_id_hash TEXT NOT NULL,
+            snapshot_at TIMESTAMPTZ NOT NULL,
+            odds REAL
+        );
+        INSERT INTO public.live_snapshots (match_id_hash, snapshot_at, odds)
+        SELECT md5(g::text), TIMESTAMPTZ '2026-10-01' + (g || ' seconds')::interval * 5, 1.5
+        FROM generate_series(1, 300000) g;
+        CREATE INDEX idx_live_snapshots_at ON public.live_snapshots(snapshot_at);
+        ANALYZE public.live_snapshots;
+    """)
+    cur.execute(sql)
+    conn.commit()
+
+    retention._LOCAL_PROGRESS.clear()
+    rest = _PgRest(conn, budget_ms)
+    cleaner = ChunkedRetention('http://localhost', lambda: {}, rest, chunk_budget_ms=budget_ms,
+                               pause=0, log=lambda m: None)
+    deleted = cleaner.run([('live_snapshots', 'snapshot_at', '2026-10-10')])
+
+    cur.execute("SELECT count(*) FROM public.live_snapshots WHERE snapshot_at < '2026-10-10'")
+    left = cur.fetchone()[0]
+    cur.execute("DROP TABLE public.live_snapshots")
+    conn.commit()
+    conn.close()
+
+    report = cleaner.report['live_snapshots']
+    print(f"\n{report['chunks']} chunk, {deleted.get('live_snapshots', 0)} satir, "
+          f"en uzun {max(rest.durations):.0f}ms (butce {budget_ms}ms)")
+    assert left == 0 and report['status'] == 'done'
+    assert max(rest.durations) <= budget_ms
+    print("SONUC: OK")
+
+
+
+def test_local_postgres_partition_keeps_constraints():
+    """Gercek PostgreSQL: gun partition'ina tasimada SERIAL PK ve UNIQUE constraint korunur,
+    partition kolonunu icermeyen unique index varsa tasima hicbir sey degistirmeden durur"""
+    dsn = os.environ.get('SMARTXFLOW_TEST_PG_DSN')
+    if not dsn:
+        print("\nSMARTXFLOW_TEST_PG_DSN yok - yerel PostgreSQL testi ATLANDI")
+        return
+    try:
+        conn = _pg_connect(dsn)
+    except ImportError:
+        print("\npsycopg2/psycopg yok - yerel PostgreSQL testi ATLANDI")
+        return
+
+    sql = open(PARTITION_MIGRATION, encoding='utf-8').read()
+    sql = re.sub(r'^(GRANT|REVOKE).*?;\s*$', '', sql, flags=re.M | re.S)
+    cur = conn.cursor()
+    # Fonksiyon yeni tabloya Supabase rollerine GRANT verir
+    for role in ('anon', 'authenticated', 'service_role'):
+        cur.execute(f"DO $$ BEGIN CREATE ROLE {role}; EXCEPTION WHEN duplicate_object THEN NULL; END $$")
+    cur.execute("""
+        DROP TABLE IF EXISTS public.moneyway_1x2_history, public.moneyway_1x2_history_legacy,
+                             public.moneyway_ou25_history CASCADE;
+        CREATE TABLE public.moneyway_1x2_history (
+            id SERIAL PRIMARY KEY,
+            match_id_hash TEXT NOT NULL,
+            scraped_at TIMESTAMPTZ NOT NULL,
+            volume TEXT,
+            CONSTRAINT uq_mw1x2_hist_snap UNIQUE (match_id_hash, scraped_at)
+        );
+        CREATE INDEX idx_mw1x2_hist_at ON public.moneyway_1x2_history(scraped_at);
+        INSERT INTO public.moneyway_1x2_history (match_id_hash, scraped_at, volume)
+        SELECT md5(g::text), now() - (g || ' minutes')::interval, '1'
+        FROM generate_series(1, 500) g;
+        CREATE TABLE public.moneyway_ou25_history (
+            id SERIAL PRIMARY KEY,
+            match_id_hash TEXT NOT NULL UNIQUE,
+            scraped_at TIMESTAMPTZ NOT NULL
+        );
+    """)
+    cur.execute(sql)
+    cur.execute("SELECT public.retention_partition_table('moneyway_1x2_history', 'scraped_at')")
+    conn.commit()
+
+    cur.execute("""
+        SELECT contype, conname, pg_get_constraintdef(oid) FROM pg_constraint
+        WHERE conrelid = 'public.moneyway_1x2_history'::regclass AND contype IN ('p', 'u')
+        ORDER BY contype
+    """)
+    constraints = cur.fetchall()
+    cur.execute("SELECT count(*) FROM public.moneyway_1x2_history")
+    moved = cur.fetchone()[0]
+    duplicate_rejected = False
+    try:
+        cur.execute("""INSERT INTO public.moneyway_1x2_history (match_id_hash, scraped_at, volume)
+                       SELECT match_id_hash, scraped_at, '2' FROM public.moneyway_1x2_history LIMIT 1""")
+    except Exception:
+        duplicate_rejected = True
+    conn.rollback()
+
+    refused = False
+    try:
+        cur.execute("SELECT public.retention_partition_table('moneyway_ou25_history', 'scraped_at')")
+    except Exception:
+        refused = True
+    conn.rollback()
+    cur.execute("SELECT to_regclass('public.moneyway_ou25_history_legacy') IS NULL, "
+                "NOT EXISTS (SELECT 1 FROM pg_partitioned_table "
+                "WHERE partrelid = 'public.moneyway_ou25_history'::regclass)")
+    untouched = cur.fetchone()
+
+    cur.execute("""DROP TABLE IF EXISTS public.moneyway_1x2_history, public.moneyway_1x2_history_legacy,
+                                        public.moneyway_ou25_history CASCADE""")
+    conn.commit()
+    conn.close()
+
+    print(f"\n{moved} satir tasindi, constraint'ler: {constraints}")
+    assert moved == 500
+    assert ('p', 'moneyway_1x2_history_pkey', 'PRIMARY KEY (id, scraped_at)') in constraints
+    assert ('u', 'uq_mw1x2_hist_snap', 'UNIQUE (match_id_hash, scraped_at)') in constraints
+    assert duplicate_rejected
+    assert refused and untouched == (True, True)
+    print("SONUC: OK")
+
+if __name__ == '__main__':
+    test_no_chunk_exceeds_budget()
+    test_statement_timeout_shrinks_chunk()
+    test_run_budget_and_resume()
+    test_progress_without_table_and_legacy_fallback()
+    test_every_target_column_is_indexed()
+    test_every_target_is_whitelisted()
+    test_local_postgres_chunks_within_budget()
+    test_local_postgres_partition_keeps_constraints()
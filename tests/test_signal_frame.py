@@ -0,0 +1,339 @@
+#!/usr/bin/env python3
+"""
+Sinyal Engine HistoryFrame Parite Testleri
+Vektorel CM / CMv2 / FS / EML taramasi eski satir bazli dongulerle ayni
+sinyalleri uretmeli (ayni sira, ayni alanlar)
+Veri: deterministik uretilmis snapshot kayitlari (virgullu oran, £/binlik
+ayiricili hacim, bos / bozuk alanlar, alias key'ler) + tests/fixtures/signal_history/
+altindaki kayitli gercek cycle verisi (kayit anindaki beklenen sinyallerle)
+"""
+
+import sys
+import os
+import glob
+import json
+import random
+from datetime import datetime, timezone, timedelta
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+import sinyal_engine as se
+from sinyal_engine import parse_odds_pct, parse_volume_amt, _normalize_date_key
+
+FIXTURES = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures', 'signal_history')
+
+
+# ---- Eski (satir bazli) uygulamalar — parite referansi ----
+
+def _ref_odds_move(latest_snapshots, history_by_hash, cooldown_set, first_snapshots, selections,
+                   vol_min, pct_ok, stability, odds_min, odds_max, move_min, rising):
+    signals = []
+    for h, latest in latest_snapshots.items():
+        if parse_volume_amt(latest.get('volume', '')) < vol_min:
+            continue
+        match_history = history_by_hash.get(h, [])
+        if not match_history:
+            continue
+        match_history_sorted = sorted(match_history, key=lambda r: r.get('scraped_at', ''), reverse=True)
+        for code, label, o_field, p_field in selections:
+            mk = f"{latest.get('home', '')}|{latest.get('away', '')}|{_normalize_date_key(latest.get('date', ''))}"
+            if (mk, code) in cooldown_set:
+                continue
+            pct_now = parse_odds_pct(latest.get(p_field))
+            if not pct_ok(pct_now):
+                continue
+            last_snaps = match_history_sorted[:stability]
+            if len(last_snaps) < stability:
+                continue
+            if not all(pct_ok(parse_odds_pct(r.get(p_field))) for r in last_snaps):
+                continue
+            odds_0 = parse_odds_pct(latest.get(o_field))
+            if not (odds_min <= odds_0 <= odds_max):
+                continue
+            ref_snap = first_snapshots.get(h)
+            if not ref_snap:
+                continue
+            odds_ref = parse_odds_pct(ref_snap.get(o_field))
+            if odds_0 <= 0 or odds_ref <= 0:
+                continue
+            move = (odds_0 - odds_ref) / odds_ref if rising else (odds_ref - odds_0) / odds_ref
+            if move < move_min:
+                continue
+            signals.append({
+                'match_key': mk,
+                'home_team': latest.get('home', ''),
+                'away_team': latest.get('away', ''),
+                'league': latest.get('league', ''),
+                'date': latest.get('date', ''),
+                'selection_code': code,
+                'selection_label': label,
+                'odds_16h': str(round(odds_ref, 4)),
+                'odds_now': str(round(odds_0, 4)),
+                'pct_now': str(round(pct_now, 2)),
+                'volume_now': str(int(parse_volume_amt(latest.get('volume', '')))),
+                ('odds_rise_pct' if rising else 'odds_drop_pct'): round(move * 100, 2),
+            })
+    return signals
+
+
+_SEL_1X2 = [('1', 'Ev Sahibi', 'odds1', 'pct1'), ('X', 'Beraberlik', 'oddsx', 'pctx'),
+            ('2', 'Deplasman', 'odds2', 'pct2')]
+_SEL_12 = [('1', 'Ev Sahibi', 'odds1', 'pct1'), ('2', 'Deplasman', 'odds2', 'pct2')]
+
+
+def _ref_cm(latest, history, cooldown, first):
+    return _ref_odds_move(latest, history, cooldown, first, _SEL_1X2, se.CM_VOLUME_THRESHOLD,
+                          lambda p: p > se.CM_PCT_THRESHOLD, se.CM_STABILITY_SNAPSHOTS,
+                          se.CM_MIN_ODDS, se.CM_MAX_ODDS, se.CM_ODDS_DROP_PCT, False)
+
+
+def _ref_cm_v2(latest, history, cooldown, first):
+    return _ref_odds_move(latest, history, cooldown, first, _SEL_12, se.CMV2_VOLUME_THRESHOLD,
+                          lambda p: p >= se.CMV2_PCT_THRESHOLD, se.CMV2_STABILITY_SNAPSHOTS,
+                          se.CMV2_MIN_ODDS, se.CMV2_MAX_ODDS, se.CMV2_ODDS_DROP_PCT, False)
+
+
+def _ref_fs(latest, history, cooldown, first):
+    return _ref_odds_move(latest, history, cooldown, first, _SEL_12, se.FS_VOLUME_THRESHOLD,
+                          lambda p: p > se.FS_PCT_THRESHOLD, se.FS_STABILITY_SNAPSHOTS,
+                          se.FS_MIN_ODDS, se.FS_MAX_ODDS, se.FS_ODDS_RISE_PCT, True)
+
+
+def _ref_eml_stable(history_by_hash, latest_by_hash, existing):
+    """EML'in history kismi: (mk, code, pct_now, amt_now) listesi (kickoff her mac icin uygun)."""
+    out = []
+    for h, latest in latest_by_hash.items():
+        if parse_volume_amt(latest.get('volume', '')) < se.EML_VOLUME_THRESHOLD:
+            continue
+        match_history = history_by_hash.get(h, [])
+        if not match_history:
+            continue
+        srt = sorted(match_history, key=lambda r: r.get('scraped_at', ''), reverse=True)
+        if len(srt) < se.EML_CONSECUTIVE_SNAPS:
+            continue
+        for code, p_field, a_field in [('1', 'pct1', 'amt1'), ('2', 'pct2', 'amt2'), ('X', 'pctx', 'amtx')]:
+            mk = f"{latest['home']}|{latest['away']}|{_normalize_date_key(latest.get('date', ''))}"
+            if (mk, code) in existing:
+                continue
+            last = srt[:se.EML_CONSECUTIVE_SNAPS]
+            if not all(parse_odds_pct(s.get(p_field)) >= se.EML_PCT_THRESHOLD for s in last):
+                continue
+            amt = parse_volume_amt(latest.get(a_field, ''))
+            out.append((mk, code, f"{parse_odds_pct(latest.get(p_field)):.1f}",
+                        str(int(amt)) if amt > 0 else ''))
+    return out
+
+
+# ---- Kayit uretici ----
+
+def _fmt_odds(rng, v):
+    s = f"{v:.2f}"
+    return s.replace('.', ',') if rng.random() < 0.3 else s
+
+
+def _fmt_pct(rng, v):
+    r = rng.random()
+    if r < 0.05:
+        return ''
+    if r < 0.08:
+        return 'n/a'
+    s = f"{v:.1f}"
+    return s + '%' if r < 0.4 else s
+
+
+def _fmt_vol(rng, v):
+    r = rng.random()
+    if r < 0.3:
+        return f"£{v:,.0f}"
+    if r < 0.5:
+        return f"{v:,.0f}"
+    return f"{v:.0f}"
+
+
+def _build_dataset(seed, n_matches=400):
+    rng = random.Random(seed)
+    base = datetime(2026, 10, 18, 12, 0, tzinfo=timezone.utc)
+    latest, history, first = {}, {}, {}
+    for m in range(n_matches):
+        home, away, league = f"Home {m}", f"Away {m}", f"League {m % 7}"
+        date = f"{(m % 28) + 1:02d}.Oct {10 + m % 10}:00:00"
+        composite = f"{home}|{away}|{date}"
+        use_hash = rng.random() < 0.7
+        key = se._make_match_id_hash(home, away, league) if use_hash else composite
+        fav = rng.choice(['pct1', 'pctx', 'pct2'])
+        ref_odds = {c: rng.uniform(1.3, 3.5) for c in ('odds1', 'oddsx', 'odds2')}
+        drift = rng.uniform(-0.15, 0.15)
+        rows = []
+        n_rows = rng.randint(0, 9)
+        for k in range(n_rows):
+            level = rng.choice([70.0, 76.0, 80.0, 80.5, 85.0, 88.0, 90.0, 95.0])
+            row = {
+                'home': home, 'away': away, 'date': date, 'league': league,
+                'match_id_hash': key if use_hash else '',
+                # ayni scraped_at degerleri (tie) siralama kararliligini da sinar
+                'scraped_at': (base - timedelta(minutes=10 * (k // 2 if rng.random() < 0.2 else k))).isoformat(),
+                'volume': _fmt_vol(rng, rng.uniform(1000, 40000)),
+            }
+            for c in ('pct1', 'pctx', 'pct2'):
+                row[c] = _fmt_pct(rng, level if c == fav else rng.uniform(0, 100 - level))
+            for c in ('odds1', 'oddsx', 'odds2'):
+                row[c] = _fmt_odds(rng, ref_odds[c] * (1 + drift))
+            rows.append(row)
+        rng.shuffle(rows)
+        if rows:
+            history[key] = rows
+            if use_hash:
+                history[composite] = rows
+        snap = dict(rows[0]) if rows else {
+            'home': home, 'away': away, 'date': date, 'league': league,
+            'pct1': '90', 'pctx': '5', 'pct2': '5', 'odds1': '1,80', 'oddsx': '3.4', 'odds2': '4.2',
+        }
+        snap['volume'] = _fmt_vol(rng, rng.uniform(2000, 60000))
+        for c in ('amt1', 'amtx', 'amt2'):
+            snap[c] = _fmt_vol(rng, rng.uniform(0, 20000)) if rng.random() < 0.8 else ''
+        latest[key] = snap
+        if rng.random() < 0.9:
+            first[key] = {c: _fmt_odds(rng, ref_odds[c]) for c in ref_odds}
+    return latest, history, first
+
+
+def _cooldowns(latest, seed):
+    rng = random.Random(seed)
+    out = set()
+    for snap in latest.values():
+        if rng.random() < 0.1:
+            mk = f"{snap['home']}|{snap['away']}|{_normalize_date_key(snap['date'])}"
+            out.add((mk, rng.choice(['1', 'X', '2'])))
+    return out
+
+
+def test_cm_cmv2_fs_parity():
+    """CM / CMv2 / FS: paylasilan frame ile eski dongu ayni sinyalleri uretir"""
+    total = 0
+    for seed in range(5):
+        latest, history, first = _build_dataset(seed)
+        cooldown = _cooldowns(latest, seed)
+        frame = se.HistoryFrame(history)
+        for new_fn, ref_fn in [(se.find_confirmed_money, _ref_cm),
+                               (se.find_confirmed_money_v2, _ref_cm_v2),
+                               (se.find_fake_sharp, _ref_fs)]:
+            expected = ref_fn(latest, history, cooldown, first)
+            assert new_fn(latest, frame, cooldown, first) == expected
+            # dict ile cagri (geriye uyum) da ayni sonucu vermeli
+            assert new_fn(latest, history, cooldown, first) == expected
+            total += len(expected)
+    print(f"\nToplam eslesen sinyal: {total}")
+    assert total > 0
+    print("SONUC: OK")
+
+
+def test_eml_parity():
+    """EML: frame tabanli pencere kontrolu eski donguyle ayni"""
+    total = 0
+    kickoff = (datetime.now(timezone.utc) + timedelta(hours=48)).isoformat()
+    orig_fetch = se.fetch_eml_history
+    try:
+        for seed in range(5):
+            latest, history, _ = _build_dataset(seed + 100)
+            by_hash, latest_by_hash, kickoff_map = {}, {}, {}
+            for key, snap in latest.items():
+                h = se._make_match_id_hash(snap['home'], snap['away'], snap['league'])
+                latest_by_hash[h] = snap
+                kickoff_map[h] = {'kickoff_utc': kickoff, 'fixture_date': '2026-10-20'}
+                if history.get(key):
+                    by_hash[h] = history[key]
+            existing = _cooldowns(latest, seed)
+            se.fetch_eml_history = lambda hashes, _d=by_hash: {h: r for h, r in _d.items() if h in hashes}
+            signals = se.find_early_money_lock(latest, existing, kickoff_map)
+            got = [(s['match_key'], s['selection_code'], s['pct_now'], s['amt_now']) for s in signals]
+            assert got == _ref_eml_stable(by_hash, latest_by_hash, existing)
+            total += len(got)
+    finally:
+        se.fetch_eml_history = orig_fetch
+    print(f"\nToplam eslesen EML sinyali: {total}")
+    assert total > 0
+    print("SONUC: OK")
+
+
+def _captured_cycles():
+    """tests/fixtures/signal_history/*.json: kayitli gercek cycle girdileri + beklenen sinyaller."""
+    cycles = []
+    for path in sorted(glob.glob(os.path.join(FIXTURES, '*.json'))):
+        with open(path, encoding='utf-8') as f:
+            doc = json.load(f)
+        history = dict(doc['history'])
+        # alias key'ler (hash + home|away|date) production'daki gibi ayni listeyi paylasir
+        for alias, owner in doc['history_aliases'].items():
+            history[alias] = history[owner]
+        doc['history'] = history
+        doc['cooldowns'] = {k: {tuple(p) for p in v} for k, v in doc['cooldowns'].items()}
+        doc['eml']['existing'] = {tuple(p) for p in doc['eml']['existing']}
+        cycles.append((os.path.basename(path), doc))
+    return cycles
+
+
+def test_captured_history_parity():
+    """Kayitli gercek cycle'lar: frame taramasi kayit anindaki sinyallerle (ve referans dongulerle) birebir ayni"""
+    cycles = _captured_cycles()
+    if not cycles:
+        print("\ntests/fixtures/signal_history/*.json yok - gercek veri karsilastirmasi ATLANDI "
+              "(scripts/capture_signal_history_fixtures.py ile kaydedin)")
+        return
+    kickoff = (datetime.now(timezone.utc) + timedelta(hours=48)).isoformat()
+    orig_fetch = se.fetch_eml_history
+    try:
+        for name, doc in cycles:
+            latest, history, first, expected = doc['latest'], doc['history'], doc['first'], doc['expected']
+            frame = se.HistoryFrame(history)
+            assert len(frame) == len(doc['history']) - len(doc['history_aliases']), name
+            for kind, new_fn, ref_fn in [('cm', se.find_confirmed_money, _ref_cm),
+                                         ('cmv2', se.find_confirmed_money_v2, _ref_cm_v2),
+                                         ('fs', se.find_fake_sharp, _ref_fs)]:
+                cooldown = doc['cooldowns'][kind]
+                assert new_fn(latest, frame, cooldown, first) == expected[kind], (name, kind)
+                assert ref_fn(latest, history, cooldown, first) == expected[kind], (name, kind)
+
+            # EML: kickoff kriteri frame'den bagimsiz; pencere kontrolu gercek 24 saatlik history ile
+            latest_by_hash, kickoff_map = {}, {}
+            for snap in latest.values():
+                if snap.get('home') and snap.get('away'):
+                    h = se._make_match_id_hash(snap['home'], snap['away'], snap.get('league', ''))
+                    latest_by_hash[h] = snap
+                    kickoff_map[h] = {'kickoff_utc': kickoff, 'fixture_date': ''}
+            eml_history = doc['eml']['history']
+            se.fetch_eml_history = lambda hashes, _d=eml_history: {h: r for h, r in _d.items() if h in hashes}
+            signals = se.find_early_money_lock(latest, doc['eml']['existing'], kickoff_map)
+            got = [[s['match_key'], s['selection_code'], s['pct_now'], s['amt_now']] for s in signals]
+            assert got == expected['eml'], name
+            print(f"\n{name}: {len(latest)} mac, sinyal " + ', '.join(f"{k}={len(v)}" for k, v in expected.items()))
+    finally:
+        se.fetch_eml_history = orig_fetch
+    print("SONUC: OK")
+
+
+def test_frame_parses_each_cell_once():
+    """Frame: alias key'ler tek grup, pencere hucreleri bir kez parse edilir"""
+    latest, history, first = _build_dataset(7)
+    frame = se.HistoryFrame(history)
+    assert len(frame) == len({id(v) for v in history.values()})
+    calls = []
+    orig = se.parse_odds_pct
+    se.parse_odds_pct = lambda v: calls.append(v) or orig(v)
+    try:
+        frame.tail_min('pct1', 3)
+        n_first = len(calls)
+        frame.tail_min('pct1', 5)
+        frame.tail_min('pct1', 3)
+    finally:
+        se.parse_odds_pct = orig
+    assert n_first == int((frame.counts >= 3).sum()) * 3
+    # 5'lik pencere sadece ilk 3'un disindaki hucreleri parse eder
+    assert len(calls) - n_first == int((frame.counts >= 5).sum()) * 2
+    print("\nSONUC: OK")
+
+
+if __name__ == '__main__':
+    test_cm_cmv2_fs_parity()
+    test_eml_parity()
+    test_captured_history_parity()
+    test_frame_parses_each_cell_once()
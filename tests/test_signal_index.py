@@ -0,0 +1,161 @@
+#!/usr/bin/env python3
+"""
+Sinyal Index Testleri
+SignalTableIndex: tam yukleme en yeni satirlari tutar (created_at.desc,id.desc
+keyset, sunucu 1000 satir sinirinda ayni created_at'li satirlar kaybolmaz);
+reconcile cursor'u sadece sunucudan okunan satirlarla ilerler, yerel insert
+sonrasi baska writer'in daha once yazdigi satir yine gelir.
+CooldownIndex: ayni reconcile cursor'u + overlap, id ile tekillestirme,
+periyodik tam reload (sunucuda silinen satirlar duser).
+Sahte PostgREST (bellek ici tablo, max-rows 1000) ile - ag yok
+"""
+
+import sys
+import os
+import re
+from datetime import datetime, timedelta, timezone
+from urllib.parse import parse_qs, urlparse
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+import sinyal_engine as se
+
+T0 = datetime(2026, 10, 18, 12, 0, tzinfo=timezone.utc)
+
+
+class _Resp:
+    def __init__(self, rows, status=200):
+        self.status_code = status
+        self.text = ''
+        self._rows = rows
+
+    def json(self):
+        return [dict(r) for r in self._rows]
+
+
+class _FakeTable:
+    """select / created_at=gte / order=(created_at,id) / or=(keyset) / limit (max 1000)."""
+
+    MAX_ROWS = 1000
+
+    def __init__(self, base=T0):
+        self.base = base
+        self.rows = []
+        self.next_id = 1
+        self.urls = []
+
+    def add(self, seconds, mk=None, sc='1'):
+        row = {'id': self.next_id, 'match_key': mk or f"H{self.next_id}|A{self.next_id}|20.Oct",
+               'selection_code': sc, 'created_at': (self.base + timedelta(seconds=seconds)).isoformat()}
+        self.rows.append(row)
+        self.next_id += 1
+        return row
+
+    def get(self, url, headers=None, timeout=None):
+        self.urls.append(url)
+        q = parse_qs(urlparse(url).query)
+        rows = list(self.rows)
+        if 'created_at' in q:
+            cutoff = datetime.fromisoformat(q['created_at'][0][len('gte.'):])
+            rows = [r for r in rows if datetime.fromisoformat(r['created_at']) >= cutoff]
+        order = q['order'][0]
+        desc = order == 'created_at.desc,id.desc'
+        assert desc or order == 'created_at.asc,id.asc', order
+        if 'or' in q:
+            m = re.fullmatch(r'\(created_at\.(lt|gt)\."(.+)",and\(created_at\.eq\."(.+)",id\.(lt|gt)\.(\d+)\)\)', q['or'][0])
+            ts, last_id = datetime.fromisoformat(m.group(2)), int(m.group(5))
+            key = (ts, last_id)
+            rows = [r for r in rows if ((datetime.fromisoformat(r['created_at']), r['id']) < key) == desc
+                    and (datetime.fromisoformat(r['created_at']), r['id']) != key]
+        rows.sort(key=lambda r: (datetime.fromisoformat(r['created_at']), r['id']), reverse=desc)
+        limit = min(int(q['limit'][0]), self.MAX_ROWS)
+        select = q['select'][0].split(',')
+        return _Resp([{k: r.get(k) for k in select} for r in rows[:limit]])
+
+
+def _with_fake(fn, base=T0):
+    table = _FakeTable(base)
+    orig = se.requests.get
+    se.requests.get = table.get
+    try:
+        fn(table)
+    finally:
+        se.requests.get = orig
+
+
+def test_full_load_keeps_newest_rows():
+    """max_rows sinirinda en yeni satirlar tutulur; ayni created_at'li 1000+ satir sayfa sinirinda kaybolmaz"""
+    def body(table):
+        for i in range(1200):
+            table.add(0)            # hepsi ayni created_at
+        for i in range(1300):
+            table.add(60 + i)
+        index = se.SignalTableIndex('underdog_signals', 'match_key,selection_code', 'T', max_rows=2000)
+        rows = index.load()
+        ids = sorted(r['id'] for r in rows)
+        assert len(ids) == 2000 and ids == list(range(501, 2501))
+        assert index.server_cursor == table.rows[-1]['created_at']
+
+        index2 = se.SignalTableIndex('underdog_signals', 'match_key,selection_code', 'T', max_rows=5000)
+        assert len(index2.load()) == 2500
+    _with_fake(body)
+    print("\nSONUC: OK")
+
+
+def test_local_insert_does_not_advance_cursor():
+    """Yerel insert cursor'u ilerletmez: baska writer'in daha once commit ettigi satir sonraki load'da gelir"""
+    def body(table):
+        for i in range(10):
+            table.add(i)
+        index = se.SignalTableIndex('underdog_signals', 'match_key,selection_code', 'T')
+        index.load()
+        cursor = index.server_cursor
+        # yerel insert (yeni created_at) + baska writer'in cursor'dan hemen once zaman damgali gec commit'i
+        index.add([{'match_key': 'L|L|20.Oct', 'selection_code': '1',
+                    'created_at': (T0 + timedelta(hours=1)).isoformat()}])
+        late = table.add(5, mk='Late|X|20.Oct')
+        assert index.server_cursor == cursor
+        rows = index.load()
+        assert ('Late|X|20.Oct', '1') in index.keys() and len(rows) == 12
+        assert 'gte.' in table.urls[-1]
+        assert late['id'] in {r.get('id') for r in rows}
+    _with_fake(body)
+    print("\nSONUC: OK")
+
+
+def test_cooldown_reconcile_overlap_dedupe_and_full_reload():
+    """Cooldown: gec commit overlap ile gelir, tekrar gelen satirlar id ile atlanir, tam reload silineni dusurur"""
+    def body(table):
+        for i in range(1500):
+            table.add(i, mk=f"M{i}|A|20.Oct")
+        index = se.CooldownIndex('confirmed_money_signals', 6, 'T')
+        assert len({k for k in index.members() if k[0].startswith('M')}) == 1500
+        cursor = index.server_cursor
+        assert cursor == table.rows[-1]['created_at']
+
+        index.add([{'match_key': 'Local|A|20.Oct', 'selection_code': '1'}])
+        table.add(1490, mk='Late|A|20.Oct')           # cursor'dan once zaman damgali, gec commit
+        index.reconciled_at -= se.COOLDOWN_RECONCILE_INTERVAL
+        members = index.members()
+        assert index.server_cursor == cursor
+        assert ('Late|A|20.Oct', '1') in members and ('Local|A|20.Oct', '1') in members
+        assert len(index.seen_ids) == 1501
+
+        # overlap'te tekrar gelen, engine'in yerelde sildigi satir geri eklenmez
+        index.remove([{'match_key': 'Late|A|20.Oct', 'selection_code': '1'}])
+        index.reconciled_at -= se.COOLDOWN_RECONCILE_INTERVAL
+        assert ('Late|A|20.Oct', '1') not in index.members()
+
+        # tam reload: sunucuda silinen satir duser
+        table.rows = [r for r in table.rows if r['match_key'] != 'M0|A|20.Oct']
+        index.loaded_at -= se.COOLDOWN_FULL_RELOAD
+        members = index.members()
+        assert ('M0|A|20.Oct', '1') not in members and ('Late|A|20.Oct', '1') in members
+    _with_fake(body, base=datetime.now(timezone.utc) - timedelta(hours=1))
+    print("\nSONUC: OK")
+
+
+if __name__ == '__main__':
+    test_full_load_keeps_newest_rows()
+    test_local_insert_does_not_advance_cursor()
+    test_cooldown_reconcile_overlap_dedupe_and_full_reload()
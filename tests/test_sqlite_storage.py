@@ -0,0 +1,207 @@
+#!/usr/bin/env python3
+"""
+SQLiteStorage Testleri
+Thread basina kalici WAL baglantisi, degerlerin yazildigi gibi (TEXT) geri
+okunmasi, upsert ile replace_table, tek transaction append_history, index
+kullanimi, eski (index'siz TEXT / v2 REAL kolonlu) tablolarin tasinmasi +
+100k history satiri benchmark (sureler sadece yazdirilir)
+Bagimsiz - dis bagimlilik yok
+"""
+
+import sys
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from core.storage import SQLiteStorage
+
+HEADERS = ['League', 'Date', 'Home', 'Away', 'Odds1', 'OddsX', 'Odds2', 'Amt1', 'AmtX', 'Amt2', 'Pct1', 'PctX', 'Pct2', 'Volume']
+
+
+def _record(i, scrape=0):
+    return {
+        'League': f"League {i % 40}", 'Date': f"{1 + i % 28:02d}.Nov 20:00:00",
+        'Home': f"Home {i}", 'Away': f"Away {i}",
+        'Odds1': f"{1.5 + (i + scrape) % 7 / 10:.2f}", 'OddsX': '3.40', 'Odds2': '4.10',
+        'Amt1': f"£{1000 + i * 3 + scrape:,}", 'AmtX': '£250', 'Amt2': '£90',
+        'Pct1': '71%', 'PctX': '20%', 'Pct2': '9%', 'Volume': f"£{2000 + i:,}",
+    }
+
+
+def _scraped_at(scrape):
+    return f"2026-10-18T{scrape // 60:02d}:{scrape % 60:02d}:00"
+
+
+class _OldSQLiteStorage:
+    """Eski implementasyon (referans): cagri basina connect, hepsi TEXT, index yok."""
+
+    def __init__(self, db_path):
+        self.db_path = db_path
+
+    def append_history(self, hist_table, headers, records, scraped_at):
+        conn = sqlite3.connect(self.db_path)
+        try:
+            cur = conn.cursor()
+            hist_headers = list(headers) + ["ScrapedAt"]
+            cols_def = ", ".join([f'"{h}" TEXT' for h in hist_headers])
+            cur.execute(f"CREATE TABLE IF NOT EXISTS \"{hist_table}\" ({cols_def})")
+            cols = ", ".join([f'"{h}"' for h in hist_headers])
+            placeholders = ", ".join(["?"] * len(hist_headers))
+            insert_sql = f"INSERT INTO \"{hist_table}\" ({cols}) VALUES ({placeholders})"
+            rows = [[r.get(h, "") for h in headers] + [scraped_at] for r in records]
+            cur.executemany(insert_sql, rows)
+            conn.commit()
+        finally:
+            conn.close()
+
+    def query_history(self, hist_table, home, away):
+        conn = sqlite3.connect(self.db_path)
+        try:
+            cur = conn.cursor()
+            cur.execute(f"SELECT * FROM \"{hist_table}\" WHERE Home=? AND Away=? ORDER BY ScrapedAt", (home, away))
+            rows = cur.fetchall()
+            headers = [d[0] for d in cur.description] if cur.description else []
+            return [{h: row[i] for i, h in enumerate(headers)} for row in rows]
+        finally:
+            conn.close()
+
+
+def test_replace_table_upsert_and_round_trip():
+    """replace_table: satirlar yerinde guncellenir, artik olanlar silinir, sira korunur, degerler aynen doner"""
+    with tempfile.TemporaryDirectory() as d:
+        st = SQLiteStorage(os.path.join(d, 'x.db'))
+        st.replace_table('moneyway_1x2', HEADERS, [_record(i) for i in range(5)])
+        st.replace_table('moneyway_1x2', HEADERS, [_record(i, 1) for i in (4, 2, 7)])
+        res = st.fetch_table_values('moneyway_1x2')
+        assert res.headers == HEADERS
+        assert [r[2] for r in res.rows] == ['Home 4', 'Home 2', 'Home 7']
+        row = st.query_row('moneyway_1x2', 'Home 2', 'Away 2')
+        assert row == _record(2, 1), row
+        assert row['Odds1'] == '1.80' and row['Amt1'] == '£1,007' and row['Pct1'] == '71%'
+        assert row['League'] == 'League 2' and '_gen' not in row
+        assert st.query_row('moneyway_1x2', 'Home 0', 'Away 0') is None
+        st.replace_table('moneyway_1x2', HEADERS, [])
+        assert st.fetch_table_values('moneyway_1x2').rows == []
+        st.close()
+    print("\nSONUC: OK")
+
+
+def test_append_history_indexes_and_connection_reuse():
+    """append_history: (Home, Away, ScrapedAt) upsert, match_id_hash dolu, sorgular index kullanir, WAL"""
+    with tempfile.TemporaryDirectory() as d:
+        st = SQLiteStorage(os.path.join(d, 'x.db'))
+        for scrape in range(3):
+            st.append_history('moneyway_1x2_hist', HEADERS, [_record(i, scrape) for i in range(10)], _scraped_at(scrape))
+        # Ayni scrape tekrar yazilirsa satir cogalmaz
+        st.append_history('moneyway_1x2_hist', HEADERS, [_record(3, 9)], _scraped_at(2))
+        hist = st.query_history('moneyway_1x2_hist', 'Home 3', 'Away 3')
+        assert [h['ScrapedAt'] for h in hist] == [_scraped_at(s) for s in range(3)]
+        assert hist[-1]['Amt1'] == '£1,018' and hist[-1]['Volume'] == '£2,003'
+        assert hist[0]['match_id_hash'] and len(hist[0]['match_id_hash']) == 12
+        row = st.lookup_hist_row_by_label('moneyway_1x2_hist', 'Home 3', 'Away 3', _record(3)['Date'])
+        assert row['ScrapedAt'] == _scraped_at(2)
+
+        conn = st._conn()
+        assert conn is st._conn()
+        assert conn.execute('PRAGMA journal_mode').fetchone()[0] == 'wal'
+        plan = ' '.join(str(r) for r in conn.execute(
+            'EXPLAIN QUERY PLAN SELECT * FROM "moneyway_1x2_hist" WHERE Home=? AND Away=? ORDER BY ScrapedAt', ('a', 'b')))
+        assert 'ux_moneyway_1x2_hist_key' in plan and 'TEMP B-TREE' not in plan, plan
+        # Sadece unique key index'i (match_id_hash okunmuyor, ikinci index yazmayi yavaslatiyordu)
+        indexes = [r[1] for r in conn.execute('PRAGMA index_list("moneyway_1x2_hist")')]
+        assert indexes == ['ux_moneyway_1x2_hist_key'], indexes
+
+        other = []
+        t = threading.Thread(target=lambda: other.append((st._conn(), st.query_history('moneyway_1x2_hist', 'Home 1', 'Away 1'))))
+        t.start()
+        t.join()
+        assert other[0][0] is not conn and len(other[0][1]) == 3
+        st.close()
+    print("\nSONUC: OK")
+
+
+def test_legacy_tables_are_migrated():
+    """Eski surumun yazdigi index'siz tablo ilk yazmada index'li tabloya tasinir, degerler aynen kalir"""
+    with tempfile.TemporaryDirectory() as d:
+        path = os.path.join(d, 'x.db')
+        _OldSQLiteStorage(path).append_history('dropping_1x2_hist', HEADERS, [_record(i) for i in range(4)], _scraped_at(0))
+        st = SQLiteStorage(path)
+        st.append_history('dropping_1x2_hist', HEADERS + ['Extra'], [dict(_record(i, 1), Extra='e') for i in range(4)], _scraped_at(1))
+        hist = st.query_history('dropping_1x2_hist', 'Home 1', 'Away 1')
+        assert [h['ScrapedAt'] for h in hist] == [_scraped_at(0), _scraped_at(1)]
+        assert hist[0]['Odds1'] == '1.60' and hist[0]['Amt1'] == '£1,003'
+        assert hist[0]['match_id_hash'] == hist[1]['match_id_hash']
+        assert hist[0]['Extra'] == '' and hist[1]['Extra'] == 'e'
+        types = {r[1]: r[2] for r in st._conn().execute('PRAGMA table_info("dropping_1x2_hist")')}
+        assert set(types.values()) <= {'TEXT', 'INTEGER'} and types['Odds1'] == 'TEXT'
+        st.close()
+    print("\nSONUC: OK")
+
+
+def test_v2_real_tables_are_rebuilt_as_text():
+    """v2'nin REAL kolonlu tablosu TEXT'e tasinir; yeni yazilan degerler birebir geri okunur"""
+    with tempfile.TemporaryDirectory() as d:
+        path = os.path.join(d, 'x.db')
+        conn = sqlite3.connect(path)
+        conn.executescript('''
+            CREATE TABLE _storage_schema (tbl TEXT PRIMARY KEY, version INTEGER NOT NULL);
+            INSERT INTO _storage_schema VALUES ('moneyway_1x2_hist', 2);
+            CREATE TABLE moneyway_1x2_hist ("Home" TEXT, "Away" TEXT, "Amt1" REAL, "ScrapedAt" TEXT,
+                "match_id_hash" TEXT, "_gen" INTEGER NOT NULL DEFAULT 0, "_pos" INTEGER NOT NULL DEFAULT 0);
+            CREATE UNIQUE INDEX ux_moneyway_1x2_hist_key ON moneyway_1x2_hist ("Home", "Away", "ScrapedAt");
+            INSERT INTO moneyway_1x2_hist VALUES ('Home 1', 'Away 1', 1234.0, 'old', 'h', 0, 0);
+        ''')
+        conn.commit()
+        conn.close()
+        st = SQLiteStorage(path)
+        st.append_history('moneyway_1x2_hist', HEADERS, [_record(1)], _scraped_at(0))
+        hist = st.query_history('moneyway_1x2_hist', 'Home 1', 'Away 1')
+        assert [h['Amt1'] for h in hist] == ['£1,003', '1234.0']
+        types = {r[1]: r[2] for r in st._conn().execute('PRAGMA table_info("moneyway_1x2_hist")')}
+        assert types['Amt1'] == 'TEXT' and '_gen' in types
+        st.close()
+    print("\nSONUC: OK")
+
+
+def test_benchmark_100k_history_rows():
+    """100 scrape x 1000 mac = 100k history satiri: yazma + 500 mac sorgusu, eski vs yeni.
+    Sureler sadece yazdirilir; sorgunun tam tablo taramasi yerine index kullandigi plan ile dogrulanir."""
+    scrapes, matches, queries = 100, 1000, 500
+    batches = [[_record(i, s) for i in range(matches)] for s in range(scrapes)]
+    timings, plans = {}, {}
+    with tempfile.TemporaryDirectory() as d:
+        for name, st in (('eski', _OldSQLiteStorage(os.path.join(d, 'old.db'))),
+                         ('yeni', SQLiteStorage(os.path.join(d, 'new.db')))):
+            t0 = time.perf_counter()
+            for s, batch in enumerate(batches):
+                st.append_history('moneyway_1x2_hist', HEADERS, batch, _scraped_at(s))
+            t1 = time.perf_counter()
+            for i in range(queries):
+                assert len(st.query_history('moneyway_1x2_hist', f"Home {i}", f"Away {i}")) == scrapes
+            t2 = time.perf_counter()
+            timings[name] = (t1 - t0, t2 - t1)
+            conn = sqlite3.connect(st.db_path)
+            plans[name] = ' '.join(str(r) for r in conn.execute(
+                'EXPLAIN QUERY PLAN SELECT * FROM "moneyway_1x2_hist" WHERE Home=? AND Away=? ORDER BY ScrapedAt',
+                ('a', 'b')))
+            conn.close()
+            if hasattr(st, 'close'):
+                st.close()
+    for name, (write, read) in timings.items():
+        print(f"\n{name}: yazma {write:.2f}s ({scrapes * matches / write:,.0f} satir/sn), "
+              f"{queries} sorgu {read:.2f}s ({read / queries * 1000:.2f} ms/sorgu)")
+    assert 'SCAN' in plans['eski'] and 'USING INDEX' not in plans['eski'], plans['eski']
+    assert 'ux_moneyway_1x2_hist_key' in plans['yeni'] and 'TEMP B-TREE' not in plans['yeni'], plans['yeni']
+    print("SONUC: OK")
+
+
+if __name__ == '__main__':
+    test_replace_table_upsert_and_round_trip()
+    test_append_history_indexes_and_connection_reuse()
+    test_legacy_tables_are_migrated()
+    test_v2_real_tables_are_rebuilt_as_text()
+    test_benchmark_100k_history_rows()
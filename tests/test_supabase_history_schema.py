@@ -0,0 +1,164 @@
+#!/usr/bin/env python3
+"""
+SupabaseStorage History Yazma Testleri
+Sahte PostgREST istemcisi ile append basina istek sayisi: kolon semasi surec
+basina bir kez cozulur (history tablolari _HISTORY_SCHEMA'dan, istek yok),
+bos tablo cache'lenmez, invalidate_table_columns sonrasi tekrar cozulur,
+satirlar tek geciste hash'lenir
+Bagimsiz - supabase paketi gerekmez
+"""
+
+import sys
+import os
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from core.hash_utils import make_match_id_hash
+from core.storage import SupabaseStorage, invalidate_table_columns
+
+HEADERS = ['League', 'Date', 'Home', 'Away', 'Odds1', 'OddsX', 'Odds2', 'Amt1', 'AmtX', 'Amt2', 'Pct1', 'PctX', 'Pct2', 'Volume']
+
+
+class _Result:
+    def __init__(self, data):
+        self.data = data
+
+
+class _Query:
+    def __init__(self, server, table):
+        self.server = server
+        self.table = table
+        self.op = None
+        self.payload = None
+
+    def select(self, *_):
+        self.op = 'select'
+        return self
+
+    def limit(self, *_):
+        return self
+
+    def insert(self, payload):
+        self.op, self.payload = 'insert', payload
+        return self
+
+    def upsert(self, payload, on_conflict=None):
+        self.op, self.payload = 'upsert', payload
+        return self
+
+    def execute(self):
+        return self.server.handle(self)
+
+
+class _FakePostgrest:
+    """supabase-py client.table(...) zincirinin yerine: her execute() bir HTTP istegi."""
+
+    def __init__(self, rows=None, fail_inserts=0):
+        self.rows = rows or {}
+        self.requests = []
+        self.fail_inserts = fail_inserts
+
+    def table(self, name):
+        return _Query(self, name)
+
+    def handle(self, q):
+        self.requests.append((q.op, q.table))
+        if q.op == 'select':
+            return _Result(self.rows.get(q.table, [])[:1])
+        if q.op == 'insert' and self.fail_inserts:
+            self.fail_inserts -= 1
+            raise RuntimeError('column "volume" does not exist')
+        payload = q.payload if isinstance(q.payload, list) else [q.payload]
+        self.rows.setdefault(q.table, []).extend(payload)
+        return _Result(payload)
+
+
+def _storage(server):
+    st = SupabaseStorage.__new__(SupabaseStorage)
+    st.client = server
+    return st
+
+
+def _records(n, scrape=0):
+    return [{'League': f"League {i % 7}", 'Date': '18.Oct 20:00', 'Home': f"Home {i}", 'Away': f"Away {i}",
+             'Odds1': '2.10', 'OddsX': '3.30', 'Odds2': '3.60', 'Amt1': f"£{i + scrape}", 'AmtX': '£10', 'Amt2': '£5',
+             'Pct1': '60%', 'PctX': '25%', 'Pct2': '15%', 'Volume': '£100'} for i in range(n)]
+
+
+def test_requests_per_append():
+    """Ilk append: _hist tablosu 1 kez introspect; sonrakiler: 1 upsert + ceil(n/500) insert"""
+    invalidate_table_columns()
+    server = _FakePostgrest(rows={'moneyway_1x2_hist': [{h: '' for h in HEADERS + ['ScrapedAt']}]})
+    st = _storage(server)
+
+    st.append_history('moneyway_1x2_hist', HEADERS, _records(700), '2026-10-18T10:00:00')
+    assert server.requests == [('select', 'moneyway_1x2_hist'), ('upsert', 'moneyway_1x2_hist'),
+                               ('insert', 'moneyway_1x2_history'), ('insert', 'moneyway_1x2_history')], server.requests
+
+    for scrape in range(1, 4):
+        server.requests.clear()
+        st.append_history('moneyway_1x2_hist', HEADERS, _records(700, scrape), f"2026-10-18T10:{scrape:02d}:00")
+        assert server.requests == [('upsert', 'moneyway_1x2_hist'),
+                                   ('insert', 'moneyway_1x2_history'), ('insert', 'moneyway_1x2_history')]
+
+    # Cache surec geneli: yeni instance da istek atmaz
+    server.requests.clear()
+    _storage(server).append_history('moneyway_1x2_hist', HEADERS, _records(10), '2026-10-18T11:00:00')
+    assert [r[0] for r in server.requests] == ['upsert', 'insert']
+
+    # Acik invalidation hook: sonraki append bir kez daha introspect eder
+    invalidate_table_columns('moneyway_1x2_hist')
+    server.requests.clear()
+    st.append_history('moneyway_1x2_hist', HEADERS, _records(10), '2026-10-18T11:10:00')
+    assert [r[0] for r in server.requests] == ['select', 'upsert', 'insert']
+    print("\nSONUC: OK")
+
+
+def test_history_rows_shape_and_hash():
+    """History satirlari _HISTORY_SCHEMA kolonlari, hash + TR saat damgasi; tekrarlar elenir"""
+    invalidate_table_columns()
+    server = _FakePostgrest()
+    st = _storage(server)
+    records = _records(3) + [_records(1)[0], {'Home': '', 'Away': 'x'}]
+    st.append_history('moneyway_1x2_hist', HEADERS, records, '2026-10-18T10:00:00')
+    rows = server.rows['moneyway_1x2_history']
+    assert len(rows) == 3
+    expected_cols = set(SupabaseStorage._HISTORY_SCHEMA['moneyway_1x2_history'])
+    for i, row in enumerate(rows):
+        assert set(row) == expected_cols
+        assert row['match_id_hash'] == make_match_id_hash(f"Home {i}", f"Away {i}", f"League {i}")
+        assert row['scraped_at'] == '2026-10-18T13:00:00+03:00'
+        assert row['odds1'] == '2.10' and row['amt1'] == f"£{i}"
+    print("\nSONUC: OK")
+
+
+def test_empty_table_is_not_cached():
+    """Bos _hist tablosu [] doner ama cache'lenmez: ilk satirdan sonra gercek kolonlar alinir"""
+    invalidate_table_columns()
+    server = _FakePostgrest()
+    st = _storage(server)
+    assert st._get_table_columns('moneyway_1x2_hist') == []
+    server.rows['moneyway_1x2_hist'] = [{h: '' for h in HEADERS + ['ScrapedAt']}]
+    assert st._get_table_columns('moneyway_1x2_hist') == HEADERS + ['ScrapedAt']
+    assert st._get_table_columns('moneyway_1x2_hist') == HEADERS + ['ScrapedAt']
+    assert server.requests == [('select', 'moneyway_1x2_hist')] * 2
+    print("\nSONUC: OK")
+
+
+def test_write_error_keeps_static_schema():
+    """History batch insert hatasi satir satir tekrar denenir; sabit sema icin introspect istegi atilmaz"""
+    invalidate_table_columns()
+    server = _FakePostgrest(fail_inserts=1)
+    st = _storage(server)
+    st._write_to_history_table('moneyway_1x2_hist', HEADERS, _records(2), '2026-10-18T10:00:00')
+    assert len(server.rows['moneyway_1x2_history']) == 2
+    assert server.requests == [('insert', 'moneyway_1x2_history')] * 3
+    st._write_to_history_table('moneyway_1x2_hist', HEADERS, _records(2, 1), '2026-10-18T10:01:00')
+    assert ('select', 'moneyway_1x2_history') not in server.requests
+    print("\nSONUC: OK")
+
+if __name__ == '__main__':
+    test_requests_per_append()
+    test_history_rows_shape_and_hash()
+    test_empty_table_is_not_cached()
+    test_write_error_keeps_static_schema()
@@ -0,0 +1,253 @@
+#!/usr/bin/env python3
+"""
+Telegram Governor Testleri
+Sahte yerel Bot API sunucusu (global + chat basina limit, asilinca 429 +
+retry_after) ile 100 alarmlik patlama: tum mesajlar gider, 429 olusmaz;
+zorlanan 429'un retry_after'i tum gondericilerce beklenir; kuyruk derinligi
+ve throttle sayaclari raporlanir. AlarmCalculator'in 429'u da ayni governor
+bloguna yazilir. GCRA bucket'lari sahte saatle dogrulanir.
+Bagimsiz - ag yok (yalnizca 127.0.0.1)
+"""
+
+import sys
+import os
+import json
+import threading
+import time
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'desktop', 'scraper_standalone'))
+os.environ['NO_PROXY'] = '127.0.0.1,localhost'
+
+from core.telegram_governor import TelegramGovernor, set_governor
+import telegram_notifier
+import alarm_calculator
+
+TOKEN = 'test-token'
+
+
+class _Server(ThreadingHTTPServer):
+    # 20 gonderici thread'i ayni anda baglanir; varsayilan backlog (5) baglanti reddine yol acar
+    request_queue_size = 128
+
+
+class _FakeBotApi:
+    """sendMessage: 1sn pencerede global/chat limiti asilirsa 429; force_429 ile ilk istek(ler) 429.
+    Verilen 429'un retry_after'i dolana kadar gelen her istek de 429 alir (gercek Bot API gibi)."""
+
+    def __init__(self, global_limit=40, chat_limit=10, retry_after=1, force_429=0):
+        self.global_limit = global_limit
+        self.chat_limit = chat_limit
+        self.retry_after = retry_after
+        self.force_429 = force_429
+        self.blocked_until = 0.0
+        self.lock = threading.Lock()
+        self.window = deque()
+        self.chat_windows = {}
+        self.accepted = []
+        self.rejected = []
+        api = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def do_POST(self):
+                body = json.loads(self.rfile.read(int(self.headers.get('Content-Length', 0))) or b'{}')
+                status, payload = api.handle(str(body.get('chat_id')), body.get('text', ''))
+                data = json.dumps(payload).encode()
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+        self.server = _Server(('127.0.0.1', 0), Handler)
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+
+    def handle(self, chat_id, text):
+        now = time.monotonic()
+        with self.lock:
+            chat = self.chat_windows.setdefault(chat_id, deque())
+            for q in (self.window, chat):
+                while q and q[0] <= now - 1.0:
+                    q.popleft()
+            if (self.force_429 or now < self.blocked_until
+                    or len(self.window) >= self.global_limit or len(chat) >= self.chat_limit):
+                self.force_429 = max(0, self.force_429 - 1)
+                self.blocked_until = max(self.blocked_until, now + self.retry_after)
+                self.rejected.append((now, chat_id))
+                return 429, {'ok': False, 'error_code': 429, 'description': 'Too Many Requests',
+                             'parameters': {'retry_after': self.retry_after}}
+            self.window.append(now)
+            chat.append(now)
+            self.accepted.append((now, chat_id, text))
+            return 200, {'ok': True, 'result': {'message_id': len(self.accepted)}}
+
+    def __enter__(self):
+        self.thread.start()
+        port = self.server.server_address[1]
+        self._old_url = telegram_notifier.TELEGRAM_API_URL
+        telegram_notifier.TELEGRAM_API_URL = f"http://127.0.0.1:{port}/bot{{token}}/sendMessage"
+        return self
+
+    def __exit__(self, *exc):
+        telegram_notifier.TELEGRAM_API_URL = self._old_url
+        self.server.shutdown()
+        self.server.server_close()
+
+
+def _burst(n_alarms, chats, threads=20):
+    """n_alarms alarmi `threads` hesaplayici thread'inden chat'lere dagit."""
+    results = []
+    lock = threading.Lock()
+
+    def calculator(worker):
+        for i in range(worker, n_alarms, threads):
+            ok = telegram_notifier.send_telegram_message(f"alarm {i}", token=TOKEN, chat_id=chats[i % len(chats)])
+            with lock:
+                results.append(ok)
+
+    workers = [threading.Thread(target=calculator, args=(w,)) for w in range(threads)]
+    for w in workers:
+        w.start()
+    for w in workers:
+        w.join()
+    return results
+
+
+def test_100_alarm_burst_without_429():
+    """100 alarm / 4 chat / 20 thread: governor limitlerin altinda tutar, 429 yok, hepsi gider"""
+    governor = TelegramGovernor(global_rate=30, global_burst=5, chat_rate=6, chat_burst=2)
+    set_governor(governor)
+    try:
+        with _FakeBotApi(global_limit=60, chat_limit=20) as api:
+            t0 = time.monotonic()
+            results = _burst(100, ['101', '102', '103', '104'])
+            elapsed = time.monotonic() - t0
+        assert results.count(True) == 100
+        assert api.rejected == [] and len(api.accepted) == 100
+        stats = telegram_notifier.get_rate_limit_stats()
+        # granted: baglanti hatasi sonrasi tekrar deneme de slot alir
+        assert stats['granted'] >= 100 and stats['throttled_429'] == 0 and stats['queue_depth'] == 0
+        assert stats['peak_queue_depth'] > 1 and stats['waited'] > 0
+        print(f"\n100 alarm {elapsed:.2f}s, istatistik: {stats}")
+    finally:
+        set_governor(None)
+    print("SONUC: OK")
+
+
+def test_retry_after_is_shared_by_all_senders():
+    """Zorlanan 429 (retry_after=1) sirasinda baslayan 10 gonderici thread'i: hicbiri sunucuya blok icinde
+    gitmez, ilk slotlari blok sonuna ertelenir, sonra 29 mesajin hepsi gider"""
+    governor = TelegramGovernor(global_rate=1000, global_burst=50, chat_rate=1000, chat_burst=50)
+    blocked = threading.Event()
+    penalize = governor.penalize
+
+    def recording_penalize(*a, **kw):
+        penalize(*a, **kw)
+        blocked.set()
+
+    governor.penalize = recording_penalize
+    set_governor(governor)
+    try:
+        with _FakeBotApi(global_limit=1000, chat_limit=1000, retry_after=1, force_429=1) as api:
+            first = []
+            opener = threading.Thread(target=lambda: first.append(
+                telegram_notifier.send_telegram_message("alarm 0", token=TOKEN, chat_id='201')))
+            opener.start()
+            assert blocked.wait(10)
+            # Blok kaydedildi, yolda istek yok: geri kalanlar blok icinde baslar
+            results = _burst(29, ['201'], threads=10)
+            opener.join()
+        assert first == [True] and results.count(True) == 29 and len(api.accepted) == 30
+        # Sunucu blok suresince gelen her istege 429 verir: tek 429 = blok icinde kimse gitmedi
+        assert len(api.rejected) == 1
+        stats = governor.stats()
+        # 10 thread'in ilk slotu + 429 alanin tekrar denemesi blok sonuna ertelendi (bucket'lar bos, tek sebep blok)
+        assert stats['throttled_429'] == 1 and stats['waited'] == 10 + 1 and stats['rejected'] == 0
+        print(f"\nistatistik: {stats}")
+    finally:
+        set_governor(None)
+    print("SONUC: OK")
+
+
+def test_alarm_calculator_shares_governor_block():
+    """AlarmCalculator kendi basina uyumaz: aldigi 429 governor bloguna yazilir, blok icinde baslayan
+    telegram_notifier gondericileri de bekler; tekrar denemesi blok sonunda gider"""
+    governor = TelegramGovernor(global_rate=1000, global_burst=50, chat_rate=1000, chat_burst=50)
+    blocked = threading.Event()
+    penalize = governor.penalize
+
+    def recording_penalize(*a, **kw):
+        penalize(*a, **kw)
+        blocked.set()
+
+    governor.penalize = recording_penalize
+    set_governor(governor)
+    old_env = {k: os.environ.get(k) for k in ('TELEGRAM_BOT_TOKEN', 'TELEGRAM_CHAT_ID')}
+    os.environ.update({'TELEGRAM_BOT_TOKEN': TOKEN, 'TELEGRAM_CHAT_ID': '301'})
+    old_url = alarm_calculator.TELEGRAM_API_URL
+    calc = alarm_calculator.AlarmCalculator.__new__(alarm_calculator.AlarmCalculator)
+    alarm = {'home': 'Ev', 'away': 'Dep', 'market': '1X2', 'selection': '1'}
+    try:
+        with _FakeBotApi(global_limit=1000, chat_limit=1000, retry_after=1, force_429=1) as api:
+            alarm_calculator.TELEGRAM_API_URL = telegram_notifier.TELEGRAM_API_URL
+            first = []
+            opener = threading.Thread(target=lambda: first.append(
+                calc._send_telegram_notification(alarm, 'test')))
+            opener.start()
+            assert blocked.wait(10)
+            results = _burst(9, ['301'], threads=3)
+            opener.join()
+        assert first == [True] and results.count(True) == 9 and len(api.accepted) == 10
+        assert len(api.rejected) == 1
+        stats = governor.stats()
+        assert stats['throttled_429'] == 1 and stats['waited'] == 3 + 1 and stats['rejected'] == 0
+    finally:
+        alarm_calculator.TELEGRAM_API_URL = old_url
+        for k, v in old_env.items():
+            if v is None:
+                os.environ.pop(k, None)
+            else:
+                os.environ[k] = v
+        set_governor(None)
+    print("\nSONUC: OK")
+
+
+def test_gcra_buckets_fake_clock():
+    """Sahte saat: chat 1/sn burst 3, grup 20/dk, global 30/sn; max_wait asilirsa red"""
+    now = [0.0]
+    gov = TelegramGovernor(global_rate=30, global_burst=30, chat_rate=1, chat_burst=3,
+                           group_rate=20 / 60, group_burst=5, max_wait=10,
+                           clock=lambda: now[0], sleep=lambda s: now.__setitem__(0, now[0] + s))
+    for _ in range(5):
+        assert gov.acquire(TOKEN, '7')
+    # 3 burst + 2 x 1sn
+    assert abs(now[0] - 2.0) < 1e-9, now[0]
+
+    now[0] = 100.0
+    for _ in range(7):
+        assert gov.acquire(TOKEN, '-1009')
+    # grup: 5 burst + 2 x 3sn
+    assert abs(now[0] - 106.0) < 1e-9, now[0]
+
+    now[0] = 200.0
+    gov.penalize(TOKEN, '8', 4)
+    assert gov.stats()['blocked_bots'] == 1
+    # Ayni botun baska chat'i de bloga uyar
+    assert gov.acquire(TOKEN, '9') and abs(now[0] - 204.0) < 1e-9
+    gov.penalize(TOKEN, '9', 60)
+    assert not gov.acquire(TOKEN, '9') and gov.stats()['rejected'] == 1
+    # Farkli bot etkilenmez
+    assert gov.acquire('other-token', '9') and abs(now[0] - 204.0) < 1e-9
+    print("\nSONUC: OK")
+
+
+if __name__ == '__main__':
+    test_100_alarm_burst_without_429()
+    test_retry_after_is_shared_by_all_senders()
+    test_alarm_calculator_shares_governor_block()
+    test_gcra_buckets_fake_clock()
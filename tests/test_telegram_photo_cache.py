@@ -0,0 +1,167 @@
+#!/usr/bin/env python3
+"""
+Telegram Foto file_id Cache Testleri
+Sahte yerel sendPhoto sunucusu (multipart = yukleme -> yeni file_id, JSON =
+file_id ile gonderim, bilinmeyen file_id -> 400) ile: 3 chat'e fan-out tek
+yukleme, ayni gorselin tekrari yuklemesiz, yeni gorsel yuklenir, gecersiz
+file_id yeniden yuklemeye duser, eszamanli ayni gorsel tek yukleme;
+palette / webp kodlayici gercek alarm kartini kucultur.
+Bagimsiz - ag yok (yalnizca 127.0.0.1, Pillow + pytz gerekli)
+"""
+
+import sys
+import os
+import json
+import threading
+from io import BytesIO
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'desktop', 'scraper_standalone'))
+os.environ['NO_PROXY'] = '127.0.0.1,localhost'
+
+from PIL import Image
+
+from core.telegram_governor import TelegramGovernor, set_governor
+import telegram_notifier
+from image_generator import generate_bigmoney_card
+
+TOKEN = 'photo-token'
+
+
+class _FakePhotoApi:
+    """sendPhoto: multipart govde -> yukleme (file_id f<n>), JSON govde -> file_id gonderimi."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.file_ids = set()
+        self.uploads = []
+        self.by_file_id = []
+        api = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def do_POST(self):
+                body = self.rfile.read(int(self.headers.get('Content-Length', 0)))
+                if self.headers.get('Content-Type', '').startswith('multipart/'):
+                    status, payload = api.upload(len(body))
+                else:
+                    status, payload = api.reuse(json.loads(body))
+                data = json.dumps(payload).encode()
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+
+    def upload(self, size):
+        with self.lock:
+            self.uploads.append(size)
+            file_id = f"f{len(self.uploads)}"
+            self.file_ids.add(file_id)
+        return 200, {'ok': True, 'result': {'photo': [{'file_id': f"{file_id}-thumb"}, {'file_id': file_id}]}}
+
+    def reuse(self, body):
+        with self.lock:
+            if body.get('photo') not in self.file_ids:
+                return 400, {'ok': False, 'error_code': 400, 'description': 'Bad Request: wrong file identifier'}
+            self.by_file_id.append((body['chat_id'], body['photo']))
+        return 200, {'ok': True, 'result': {'photo': [{'file_id': body['photo']}]}}
+
+    def __enter__(self):
+        self.thread.start()
+        port = self.server.server_address[1]
+        self._old_url = telegram_notifier.TELEGRAM_PHOTO_URL
+        telegram_notifier.TELEGRAM_PHOTO_URL = f"http://127.0.0.1:{port}/bot{{token}}/sendPhoto"
+        set_governor(TelegramGovernor(global_rate=1000, global_burst=100, chat_rate=1000, chat_burst=100))
+        with telegram_notifier._photo_cache_lock:
+            telegram_notifier._photo_file_ids.clear()
+        return self
+
+    def __exit__(self, *exc):
+        set_governor(None)
+        telegram_notifier.TELEGRAM_PHOTO_URL = self._old_url
+        self.server.shutdown()
+        self.server.server_close()
+
+
+def _card(seed=0):
+    return generate_bigmoney_card(f"Home {seed}", f"Away {seed}", '1X2', '1', 45000 + seed, 120000,
+                                  '2026-10-18T12:00:00Z', '2026-10-18T18:00:00Z')
+
+
+def test_fan_out_and_resend_upload_once():
+    """3 chat'e fan-out tek yukleme; ayni kartin tekrari yuklemesiz, yeni kart yuklenir"""
+    card = _card()
+    with _FakePhotoApi() as api:
+        assert telegram_notifier.send_telegram_photo(card, "alarm", token=TOKEN, chat_id=['1', '2', '3'])
+        assert len(api.uploads) == 1 and [c for c, _ in api.by_file_id] == ['2', '3']
+        assert all(f == 'f1' for _, f in api.by_file_id)
+
+        # Ayni icerik, yeni BytesIO
+        assert telegram_notifier.send_telegram_photo(BytesIO(card.getvalue()), "tekrar", token=TOKEN, chat_id='4')
+        assert len(api.uploads) == 1 and len(api.by_file_id) == 3
+
+        assert telegram_notifier.send_telegram_photo(_card(1), "yeni", token=TOKEN, chat_id='4')
+        assert len(api.uploads) == 2
+        stats = telegram_notifier.get_photo_cache_stats()
+        assert stats['cached_file_ids'] == 2
+        print(f"\n5 gonderim: {len(api.uploads)} yukleme, {len(api.by_file_id)} file_id, istatistik: {stats}")
+    print("SONUC: OK")
+
+
+def test_rejected_file_id_falls_back_to_upload():
+    """Telegram file_id'yi reddederse (400) cache'ten silinir, gorsel yeniden yuklenir"""
+    card = _card(2)
+    with _FakePhotoApi() as api:
+        assert telegram_notifier.send_telegram_photo(card, token=TOKEN, chat_id='1')
+        api.file_ids.clear()
+        assert telegram_notifier.send_telegram_photo(card, token=TOKEN, chat_id='1')
+        assert len(api.uploads) == 2 and api.by_file_id == []
+        assert telegram_notifier.send_telegram_photo(card, token=TOKEN, chat_id='1')
+        assert len(api.uploads) == 2 and api.by_file_id == [('1', 'f2')]
+    print("\nSONUC: OK")
+
+
+def test_concurrent_identical_sends_upload_once():
+    """Ayni karti 5 thread ayni anda 5 chat'e gonderir: tek yukleme"""
+    card = _card(3).getvalue()
+    results = []
+    with _FakePhotoApi() as api:
+        threads = [threading.Thread(target=lambda c=c: results.append(
+            telegram_notifier.send_telegram_photo(BytesIO(card), token=TOKEN, chat_id=str(c)))) for c in range(5)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        assert results == [True] * 5
+        assert len(api.uploads) == 1 and len(api.by_file_id) == 4
+    print("\nSONUC: OK")
+
+
+def test_optional_encoders_shrink_card():
+    """palette / webp kodlayici kart boyutunu kucultur; png oldugu gibi kalir"""
+    original = _card(4).getvalue()
+    assert telegram_notifier.encode_photo(original, 'png') == (original, 'alarm.png', 'image/png')
+    sizes = {}
+    for encoding, mime in (('palette', 'image/png'), ('webp', 'image/webp')):
+        data, name, got_mime = telegram_notifier.encode_photo(original, encoding)
+        assert got_mime == mime and len(data) < len(original)
+        assert Image.open(BytesIO(data)).size == Image.open(BytesIO(original)).size
+        sizes[encoding] = len(data)
+    # Bozuk girdi: orijinal geri doner
+    assert telegram_notifier.encode_photo(b'not an image', 'webp')[0] == b'not an image'
+    print(f"\npng {len(original)} B, palette {sizes['palette']} B, webp {sizes['webp']} B")
+    print("SONUC: OK")
+
+
+if __name__ == '__main__':
+    test_fan_out_and_resend_upload_once()
+    test_rejected_file_id_falls_back_to_upload()
+    test_concurrent_identical_sends_upload_once()
+    test_optional_encoders_shrink_card()
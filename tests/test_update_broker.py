@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+"""
+Update Broker Testleri
+Diff uretimi, since ile resync, yavas abone dusurme, bosta abone maliyeti
+Bagimsiz - dis bagimlilik yok
+"""
+
+import sys
+import os
+import threading
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from services.update_broker import UpdateBroker
+
+
+def _key(m):
+    return m['id']
+
+
+def test_diff_and_backlog():
+    """Eklenen / degisen / silinen kayitlar; since ile kacirilanlar geri gelir"""
+    broker = UpdateBroker()
+    assert broker.publish('matches:x', [{'id': 'a', 'o': 1}, {'id': 'b', 'o': 2}], _key) is None
+
+    ev = broker.publish('matches:x', [{'id': 'a', 'o': 1}, {'id': 'b', 'o': 3}, {'id': 'c', 'o': 4}], _key)
+    assert ev['v'] == 1
+    assert [m['id'] for m in ev['added']] == ['c']
+    assert [m['id'] for m in ev['changed']] == ['b']
+    assert ev['removed'] == []
+
+    assert broker.publish('matches:x', [{'id': 'a', 'o': 1}, {'id': 'b', 'o': 3}, {'id': 'c', 'o': 4}], _key) is None
+    ev = broker.publish('matches:x', [{'id': 'a', 'o': 1}], _key)
+    assert ev['v'] == 2 and sorted(ev['removed']) == ['b', 'c']
+
+    sub, backlog, resync = broker.subscribe(since=0)
+    assert not resync and [e['v'] for e in backlog] == [1, 2]
+    sub.close()
+
+    since, resync = broker.parse_since('deadbeef.1')
+    assert since is None and resync
+    since, resync = broker.parse_since(broker.event_id(ev))
+    assert since == 2 and not resync
+    print("\nSONUC: OK")
+
+
+def test_resync_outside_buffer():
+    """Ring buffer disina dusen since -> resync"""
+    broker = UpdateBroker(history_size=2)
+    broker.publish('alarms:sharp', [], _key)
+    for i in range(5):
+        broker.publish('alarms:sharp', [{'id': str(i)}], _key)
+    sub, backlog, resync = broker.subscribe(since=1)
+    assert resync and backlog == []
+    sub.close()
+    print("\nSONUC: OK")
+
+
+def test_slow_consumer_dropped():
+    """Kuyrugu dolan abone dusurulur, digerleri etkilenmez"""
+    broker = UpdateBroker(queue_size=2)
+    broker.publish('live', [], _key)
+    slow, _, _ = broker.subscribe()
+    other, _, _ = broker.subscribe(channels=['alarms'])
+    for i in range(4):
+        broker.publish('live', [{'id': str(i)}], _key)
+    assert slow.dropped and slow.get(timeout=0.1) is None
+    assert not other.dropped
+    assert broker.subscriber_count() == 1
+    assert broker.stats['dropped_clients'] == 1
+    other.close()
+    print("\nSONUC: OK")
+
+
+def test_idle_subscribers_cheap():
+    """1000 bosta abone: thread acilmaz, yayin abone basina tek put_nowait, fingerprint sadece kayit basina"""
+    import services.update_broker as ub
+    broker = UpdateBroker()
+    broker.publish('live', [], _key)
+    threads = threading.active_count()
+    subs = [broker.subscribe()[0] for _ in range(1000)]
+    assert threading.active_count() == threads
+
+    calls = []
+    orig = ub._fingerprint
+    ub._fingerprint = lambda item: calls.append(item) or orig(item)
+    try:
+        broker.publish('live', [{'id': 'x'}], _key)
+    finally:
+        ub._fingerprint = orig
+    assert len(calls) == 1
+    assert all(s.queue.qsize() == 1 for s in subs)
+    assert broker.stats['published'] == 1 and broker.stats['dropped_clients'] == 0
+    for s in subs:
+        s.close()
+    assert broker.subscriber_count() == 0
+    print("\nSONUC: OK")
+
+if __name__ == '__main__':
+    test_diff_and_backlog()
+    test_resync_outside_buffer()
+    test_slow_consumer_dropped()
+    test_idle_subscribers_cheap()
@@ -0,0 +1,219 @@
+#!/usr/bin/env python3
+"""
+Wire Format Testleri
+/api/matches (bulk) ve /api/alarms/all yapisinda yanitlar: JSON ve sutunsal
+(JSON / msgpack) kodlamalar cozuldugunde birebir ayni nesne; payload byte
+(ham + gzip) ve client cozme suresi raporlanir. Content negotiation varsayilani JSON.
+msgpack'in tasidigi binary belge (little-endian int64/float64 bytes) msgpack
+olmadan da dogrudan cozulur. app.py'nin _wire_response + add_header'i ayri bir
+Flask uygulamasinda calistirilir: Vary hem Accept hem Accept-Encoding icerir.
+Bagimsiz - ag yok (msgpack kurulu degilse msgpack kontrolleri atlanir)
+"""
+
+import sys
+import os
+import ast
+import gzip
+import json
+import random
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from services import wire_format
+from services.wire_format import (
+    COLUMNAR_JSON_MIME, JSON_MIME, MSGPACK_MIME, decode_columnar, dumps, encode_columnar, loads, negotiate,
+)
+
+
+def _money(rng):
+    return f"£{rng.randint(0, 900000):,}"
+
+
+def _matches_payload(n=1500, dropping=False, seed=5):
+    """get_matches bulk yaniti: maclar + odds (formatli string'ler) + finished_scores"""
+    rng = random.Random(seed)
+    leagues = [f"League {i} {'Premier' if i % 3 else 'Cup'}" for i in range(80)]
+    matches = []
+    for i in range(n):
+        odds = {
+            'Odds1': f"{rng.uniform(1.05, 12):.2f}", 'OddsX': f"{rng.uniform(2.5, 6):.2f}",
+            'Odds2': f"{rng.uniform(1.05, 12):.2f}",
+            'Pct1': f"{rng.uniform(0, 100):.1f}%", 'Amt1': _money(rng),
+            'PctX': f"{rng.uniform(0, 100):.1f}%", 'AmtX': _money(rng),
+            'Pct2': f"{rng.uniform(0, 100):.1f}%", 'Amt2': _money(rng),
+            'Volume': _money(rng),
+        }
+        if rng.random() < 0.05:
+            odds['Odds1'] = '-'
+        if dropping:
+            odds.update({
+                'PrevOdds1': f"{rng.uniform(1.05, 12):.2f}", 'PrevOddsX': '', 'PrevOdds2': f"{rng.uniform(1.05, 12):.2f}",
+                'Trend1': rng.choice(['up', 'down', '']), 'TrendX': '', 'Trend2': rng.choice(['up', 'down', '']),
+                'DropPct1': f"{rng.uniform(-30, 30):.1f}", 'DropPctX': '', 'DropPct2': f"{rng.uniform(-30, 30):.1f}",
+            })
+        match = {
+            'home_team': f"Home Team {i}", 'away_team': f"Away Team {i}", 'league': rng.choice(leagues),
+            'date': f"{rng.randint(18, 25)}.Oct {rng.randint(10, 22):02d}:{rng.choice(['00', '30'])}:00",
+            'match_id': f"{rng.getrandbits(48):012x}", 'odds': odds, 'history_count': 1,
+        }
+        matches.append(match)
+    scores = {m['match_id']: {'home': rng.randint(0, 4), 'away': rng.randint(0, 4), 'status': 'FT'}
+              for m in rng.sample(matches, n // 10)}
+    return {'matches': matches, 'total': n, 'has_more': False, 'finished_scores': scores}
+
+
+def _alarms_payload(per_type=300, seed=9):
+    """get_all_alarms_batch yaniti: tip basina alarm listesi"""
+    rng = random.Random(seed)
+    result = {}
+    for alarm_type in ('sharp', 'bigmoney', 'volumeshock', 'dropping', 'volumeleader', 'mim'):
+        alarms = []
+        for i in range(per_type):
+            alarm = {
+                'id': rng.randint(1, 10 ** 6), 'match_id_hash': f"{rng.getrandbits(48):012x}",
+                'home': f"Home {rng.randint(1, 400)}", 'away': f"Away {rng.randint(1, 400)}",
+                'league': f"League {rng.randint(1, 80)}", 'market': rng.choice(['1X2', 'O/U 2.5', 'BTTS']),
+                'selection': rng.choice(['1', 'X', '2', 'Over', 'Under', 'Yes', 'No']),
+                'event_time': f"2026-10-{rng.randint(10, 18)}T{rng.randint(0, 23):02d}:{rng.randint(0, 59):02d}:00+00:00",
+                'created_at': f"2026-10-18T{rng.randint(0, 23):02d}:{rng.randint(0, 59):02d}:{rng.randint(0, 59):02d}.{rng.randint(0, 999999):06d}+00:00",
+                'incoming_money': round(rng.uniform(100, 90000), 2),
+                'alarm_history': [{'t': f"{rng.randint(0, 23):02d}:{rng.randint(0, 59):02d}", 'money': round(rng.uniform(100, 9000), 2)}
+                                  for _ in range(rng.randint(0, 4))],
+            }
+            if rng.random() < 0.7:
+                alarm['kickoff_utc'] = f"2026-10-{rng.randint(18, 25)}T{rng.randint(10, 22):02d}:00:00+00:00"
+            if alarm_type == 'sharp':
+                alarm['sharp_score'] = round(rng.uniform(0, 100), 1)
+                alarm['data'] = {'odds_drop': round(rng.uniform(0, 30), 2), 'volume_ratio': rng.uniform(0, 5)}
+            if rng.random() < 0.05:
+                alarm['incoming_money'] = None
+            alarms.append(alarm)
+        result[alarm_type] = alarms
+    return result
+
+
+def _payloads():
+    return {
+        'matches moneyway_1x2': _matches_payload(),
+        'matches dropping_1x2': _matches_payload(dropping=True, seed=6),
+        'alarms/all': _alarms_payload(),
+    }
+
+
+def _mimes():
+    return [COLUMNAR_JSON_MIME] + ([MSGPACK_MIME] if wire_format.msgpack is not None else [])
+
+
+def test_decoded_formats_are_identical():
+    """JSON ve sutunsal kodlamalar ayni nesneye cozulur (flask jsonify ile ayni JSON modeli)"""
+    edge = {'a': [], 'b': [{}], 'c': [{'x': 1}, {'y': '1.50'}, {'x': 2.5}], 'd': ['-0.50', '0.50', '007', '1e3'],
+            'e': [{'v': '-0.5'}, {'v': '-0.50'}], 'f': [True, 1, 1.0, None, 'ş'], 'g': [[{'q': 1}], {'h': [1, 2]}],
+            'big': [{'n': 2 ** 70}, {'n': 1}], 'neg': [{'p': '-12.30'}, {'p': '0.00'}]}
+    for name, payload in list(_payloads().items()) + [('edge', edge)]:
+        expected = json.loads(dumps(payload, JSON_MIME))
+        for mime in _mimes():
+            decoded = loads(dumps(payload, mime), mime)
+            assert decoded == expected, (name, mime)
+            assert json.dumps(decoded, sort_keys=True) == json.dumps(expected, sort_keys=True)
+        assert decode_columnar(encode_columnar(expected)) == expected
+    if wire_format.msgpack is None:
+        print("\nmsgpack kurulu degil - yalnizca sutunsal JSON karsilastirildi")
+    print("SONUC: OK")
+
+
+def _binary_columns(node):
+    """Belgedeki bytes (tipli dizi) sutunlarini say."""
+    if isinstance(node, (bytes, bytearray)):
+        return 1
+    if isinstance(node, (list, tuple)):
+        return sum(_binary_columns(v) for v in node)
+    if isinstance(node, dict):
+        return sum(_binary_columns(v) for v in node.values())
+    return 0
+
+
+def test_binary_columns_round_trip():
+    """msgpack yolunun belgesi (binary=True): sayi sutunlari little-endian bytes, cozumu JSON ile ayni"""
+    assert wire_format._pack([1, -2], 'q', True) == (1).to_bytes(8, 'little') + (-2).to_bytes(8, 'little', signed=True)
+    assert wire_format._pack([0.5], 'd', True) == b'\x00\x00\x00\x00\x00\x00\xe0?'
+    assert wire_format._unpack(wire_format._pack([3, 4], 'q', True), 'q') == [3, 4]
+    sparse = [{'x': 1}, {'y': '1.50'}, {'x': 2.5}, {'y': '2.25', 'z': 7}]
+    for name, payload in list(_payloads().items()) + [('sparse', {'rows': sparse})]:
+        expected = json.loads(dumps(payload, JSON_MIME))
+        doc = encode_columnar(expected, binary=True)
+        assert _binary_columns(doc['d']) > 0, name
+        assert decode_columnar(doc) == expected, name
+    print("\nSONUC: OK")
+
+
+def _app_functions(*names):
+    """app.py'den (supabase olmadan import edilemez) verilen fonksiyonlarin kaynagi."""
+    path = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'app.py')
+    with open(path, encoding='utf-8') as f:
+        source = f.read()
+    tree = ast.parse(source)
+    nodes = {n.name: n for n in tree.body if isinstance(n, ast.FunctionDef)}
+    return '\n\n'.join(ast.get_source_segment(source, nodes[name]) for name in names)
+
+
+def test_vary_keeps_accept():
+    """add_header Vary'yi ezmez: negotiation'li yanitta Accept ve Accept-Encoding birlikte"""
+    from flask import Flask, Response, jsonify, request
+    app = Flask(__name__)
+    namespace = {'app': app, 'request': request, 'jsonify': jsonify, 'Response': Response, 'wire_format': wire_format}
+    exec(_app_functions('_wire_response', 'add_header'), namespace)
+    app.after_request(namespace['add_header'])
+    app.add_url_rule('/api/matches', 'matches', lambda: namespace['_wire_response'](_alarms_payload(per_type=3)))
+    client = app.test_client()
+    for accept in ('', COLUMNAR_JSON_MIME):
+        resp = client.get('/api/matches', headers={'Accept': accept} if accept else {})
+        vary = {v.strip() for v in resp.headers.get('Vary', '').split(',')}
+        assert {'Accept', 'Accept-Encoding'} <= vary, (accept, resp.headers.get('Vary'))
+        assert loads(resp.data, resp.mimetype) == json.loads(dumps(_alarms_payload(per_type=3), JSON_MIME))
+    print("\nSONUC: OK")
+
+
+def test_payload_bytes_and_decode_time():
+    """Payload byte (ham / gzip) ve client cozme suresi: JSON vs sutunsal"""
+    for name, payload in _payloads().items():
+        base = dumps(payload, JSON_MIME)
+        base_gz = len(gzip.compress(base, 6))
+        t0 = time.perf_counter()
+        for _ in range(5):
+            loads(base, JSON_MIME)
+        base_ms = (time.perf_counter() - t0) / 5 * 1000
+        print(f"\n{name}: JSON {len(base) / 1024:.0f} KB (gzip {base_gz / 1024:.0f} KB), cozme {base_ms:.1f} ms")
+        for mime in _mimes():
+            body = dumps(payload, mime)
+            gz = len(gzip.compress(body, 6))
+            t0 = time.perf_counter()
+            for _ in range(5):
+                loads(body, mime)
+            ms = (time.perf_counter() - t0) / 5 * 1000
+            print(f"  {mime}: {len(body) / 1024:.0f} KB (gzip {gz / 1024:.0f} KB, %{gz * 100 / base_gz:.0f}), cozme {ms:.1f} ms")
+            assert len(body) < len(base) * 0.6
+            assert gz < base_gz
+    print("SONUC: OK")
+
+
+def test_negotiation_defaults_to_json():
+    """Varsayilan JSON; columnar her zaman, msgpack sadece kuruluysa secilir"""
+    assert negotiate('') == JSON_MIME
+    assert negotiate('text/html,application/json;q=0.9,*/*;q=0.8') == JSON_MIME
+    assert negotiate(f'{COLUMNAR_JSON_MIME}, application/json') == COLUMNAR_JSON_MIME
+    assert negotiate('', 'columnar') == COLUMNAR_JSON_MIME
+    expected = MSGPACK_MIME if wire_format.msgpack is not None else COLUMNAR_JSON_MIME
+    assert negotiate('', 'msgpack') == expected
+    assert negotiate(f'{MSGPACK_MIME}, {COLUMNAR_JSON_MIME}') == expected
+    if wire_format.msgpack is None:
+        assert negotiate(f'{MSGPACK_MIME}, application/json') == JSON_MIME
+    print("\nSONUC: OK")
+
+
+if __name__ == '__main__':
+    test_decoded_formats_are_identical()
+    test_binary_columns_round_trip()
+    test_vary_keeps_accept()
+    test_payload_bytes_and_decode_time()
+    test_negotiation_defaults_to_json()